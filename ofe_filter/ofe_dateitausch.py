@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+# Alle Dateien einer Shapefile, die beim Austausch gemeinsam ersetzt oder entfernt werden
+SHAPEFILE_ENDUNGEN = ['.shp', '.shx', '.dbf', '.prj', '.cpg', '.qpj', '.shp.xml', '.qix', '.sbn', '.sbx']
+
+
+def arbeitsverzeichnis(pfad, praefix):
+    """Legt ein verborgenes Verzeichnis neben pfad an (selbes Dateisystem, damit Umbenennungen nicht kopieren)."""
+    return tempfile.mkdtemp(prefix=praefix, dir=os.path.dirname(os.path.abspath(pfad)))
+
+
+def dateisatz_tauschen(neu_basis, basis, endungen=SHAPEFILE_ENDUNGEN):
+    """Ersetzt den Dateisatz basis + Endung durch neu_basis + Endung, mit einer Umbenennung je Datei.
+
+    Erst werden alle vorhandenen Dateien von basis in ein Sicherungsverzeichnis daneben verschoben (auch Endungen,
+    die der neue Satz nicht hat, z. B. ein veralteter räumlicher Index), dann die neuen Dateien an ihre Stelle.
+    Schlägt eine Umbenennung fehl, werden die neuen Dateien nach neu_basis zurück- und die Sicherungen
+    wiederhergestellt; danach wird der OSError weitergegeben. Der Austausch ist nicht atomar: bricht der Prozess
+    mittendrin ab, liegen der vollständige alte Satz im Sicherungsverzeichnis und der neue unter neu_basis."""
+    sicherung = arbeitsverzeichnis(basis, '.ofe_sicherung_')
+    sicherung_basis = os.path.join(sicherung, os.path.basename(basis))
+    gesichert = []
+    ersetzt = []
+    try:
+        for ext in endungen:
+            if os.path.exists(basis + ext):
+                os.replace(basis + ext, sicherung_basis + ext)
+                gesichert.append(ext)
+        for ext in endungen:
+            if os.path.exists(neu_basis + ext):
+                os.replace(neu_basis + ext, basis + ext)
+                ersetzt.append(ext)
+    except OSError as fehler:
+        # Zurückrollen in umgekehrter Reihenfolge
+        nicht_wiederhergestellt = []
+        for ext in reversed(ersetzt):
+            try:
+                os.replace(basis + ext, neu_basis + ext)
+            except OSError:
+                pass
+        for ext in reversed(gesichert):
+            try:
+                os.replace(sicherung_basis + ext, basis + ext)
+            except OSError:
+                nicht_wiederhergestellt.append(ext)
+        if nicht_wiederhergestellt:
+            raise OSError(f"{fehler}; die Originaldateien ({', '.join(nicht_wiederhergestellt)}) "
+                          f"liegen noch in {sicherung}") from fehler
+        shutil.rmtree(sicherung, ignore_errors=True)
+        raise
+
+    shutil.rmtree(sicherung, ignore_errors=True)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from functools import partial
+
+from qgis.core import QgsProject
+
+
+def _groesse(wert):
+    """Schätzt den Speicherbedarf eines Ergebnisses in Bytes (NumPy-Arrays und Skizzen exakt, sonst pauschal)."""
+    if hasattr(wert, 'nbytes'):
+        return wert.nbytes
+    if isinstance(wert, (tuple, list)):
+        return 64 + sum(_groesse(teil) for teil in wert)
+    if isinstance(wert, dict):
+        return 64 + sum(_groesse(teil) for teil in wert.values())
+    return 32
+
+
+class ErgebnisCache:
+    """Zwischenspeicher für Filterergebnisse (Masken, Anzahlen, Histogrammklassen, Kenngrößen, Quantil-Skizzen).
+
+    Schlüssel ist (Layer-ID, Bearbeitungsstand, Spalte, Regeltyp, Parameter). Der Bearbeitungsstand wird
+    bei jeder Änderung am Layer hochgezählt; dabei, beim Speichern der Änderungen und beim Entfernen des
+    Layers aus dem Projekt werden seine Einträge verworfen. Schreibzugriffe direkt im Datenanbieter lösen
+    keine Signale aus und müssen mit verwerfen() gemeldet werden. Übersteigt der Speicherbedarf das
+    Budget, werden die am längsten nicht genutzten Einträge verdrängt (LRU)."""
+
+    def __init__(self, budget):
+        # Speicherbudget in Bytes
+        self.budget = budget
+
+        # Schlüssel -> (Ergebnis, Bytes), älteste Nutzung zuerst
+        self._eintraege = OrderedDict()
+        self._belegt = 0
+        self._generation = {}
+        self._verbindungen = {}
+
+        QgsProject.instance().layersWillBeRemoved.connect(self._layer_entfernt)
+        QgsProject.instance().cleared.connect(self.leeren)
+
+    def holen(self, layer, spalte, regel, parameter, berechnen):
+        """Gibt das Ergebnis für (Spalte, Regel, Parameter) auf dem aktuellen Stand des Layers zurück.
+        Fehlt es, wird es mit berechnen() erzeugt und abgelegt. Parameter müssen hashbar sein."""
+        layer_id = layer.id()
+        self._beobachten(layer)
+
+        key = (layer_id, self._generation[layer_id], spalte, regel, parameter)
+        eintrag = self._eintraege.get(key)
+        if eintrag is not None:
+            self._eintraege.move_to_end(key)
+            return eintrag[0]
+
+        ergebnis = berechnen()
+        groesse = _groesse(ergebnis)
+        if groesse <= self.budget:
+            self._eintraege[key] = (ergebnis, groesse)
+            self._belegt += groesse
+            self._verdraengen()
+        return ergebnis
+
+    def _verdraengen(self):
+        """Entfernt die am längsten nicht genutzten Einträge, bis das Budget eingehalten ist."""
+        while self._belegt > self.budget and self._eintraege:
+            _, (_, groesse) = self._eintraege.popitem(last=False)
+            self._belegt -= groesse
+
+    def _beobachten(self, layer):
+        """Verbindet die Änderungssignale des Layers einmalig mit dem Cache."""
+        layer_id = layer.id()
+        if layer_id in self._verbindungen:
+            return
+
+        self._generation[layer_id] = 0
+        slot = partial(self.verwerfen, layer_id)
+        signale = [
+            layer.attributeValueChanged, layer.featureAdded, layer.featureDeleted,
+            layer.attributeAdded, layer.attributeDeleted, layer.dataChanged,
+            layer.afterCommitChanges, layer.afterRollBack,
+        ]
+        for signal in signale:
+            signal.connect(slot)
+        self._verbindungen[layer_id] = (signale, slot)
+
+    def verwerfen(self, layer_id, *args):
+        """Erhöht den Bearbeitungsstand des Layers und entfernt seine Einträge."""
+        self._generation[layer_id] = self._generation.get(layer_id, 0) + 1
+        for key in [key for key in self._eintraege if key[0] == layer_id]:
+            _, groesse = self._eintraege.pop(key)
+            self._belegt -= groesse
+
+    def _layer_entfernt(self, layer_ids):
+        for layer_id in layer_ids:
+            self.verwerfen(layer_id)
+            self._trennen(layer_id)
+            self._generation.pop(layer_id, None)
+
+    def _trennen(self, layer_id):
+        signale, slot = self._verbindungen.pop(layer_id, ([], None))
+        for signal in signale:
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                # Layer wurde bereits gelöscht
+                pass
+
+    def leeren(self):
+        """Verwirft alle Einträge und trennt alle Signalverbindungen."""
+        for layer_id in list(self._verbindungen):
+            self._trennen(layer_id)
+        self._eintraege = OrderedDict()
+        self._belegt = 0
+        self._generation = {}
+
+    def entladen(self):
+        """Trennt den Cache vom Projekt (beim Entladen des Plugins)."""
+        self.leeren()
+        try:
+            QgsProject.instance().layersWillBeRemoved.disconnect(self._layer_entfernt)
+            QgsProject.instance().cleared.disconnect(self.leeren)
+        except (TypeError, RuntimeError):
+            pass
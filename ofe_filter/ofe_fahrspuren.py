@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .ofe_nachbarschaft import _zeilen_median
+
+
+# Mindestanzahl an Werten im Fenster, damit Median und MAD entlang der Fahrspur bestimmt werden
+MIN_WERTE = 3
+
+
+def _sekunden(datum):
+    """Sekunden seit 1970 aus einer Serie von Zeitpunkten (UTC), NaT als NaN."""
+    return ((datum - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+
+
+def unix_zeitstempel(roh):
+    """Wandelt die Rohwerte eines Zeitstempel-Attributs in Sekunden (float64) um; NULL und nicht lesbare Werte
+    werden NaN. Zahlen werden als Sekunden übernommen, QDateTime über die Millisekunden seit 1970 und Texte mit
+    pandas gelesen (bei Punkt-Schreibweise Tag vor Monat). Wie beim Überlappungsfilter ergeben Texte mit dem
+    Datum 01.01.0000 (nur Uhrzeit) die Sekunden seit Mitternacht."""
+    zeit = np.full(len(roh), np.nan)
+    positionen = []
+    texte = []
+    for i, wert in enumerate(roh):
+        if wert is None or (hasattr(wert, 'isNull') and wert.isNull()):
+            continue
+        if type(wert) in (int, float):
+            zeit[i] = wert
+        elif hasattr(wert, 'toMSecsSinceEpoch'):
+            zeit[i] = wert.toMSecsSinceEpoch() / 1000
+        else:
+            positionen.append(i)
+            texte.append(str(wert).strip())
+    if not texte:
+        return zeit
+
+    texte = pd.Series(texte)
+    nur_uhrzeit = texte.str.startswith('01.01.0000').to_numpy()
+    sekunden = _sekunden(pd.to_datetime(texte.where(~nur_uhrzeit), errors='coerce', dayfirst=True, utc=True))
+
+    # Das Format wird aus dem ersten Text abgeleitet; abweichende Formate einzeln lesen (ab pandas 2.0)
+    fehlt = np.isnan(sekunden) & ~nur_uhrzeit & (texte != '').to_numpy()
+    if np.any(fehlt):
+        try:
+            sekunden[fehlt] = _sekunden(pd.to_datetime(texte[fehlt], errors='coerce', dayfirst=True, utc=True, format='mixed'))
+        except (TypeError, ValueError):
+            pass
+    if np.any(nur_uhrzeit):
+        uhrzeit = pd.to_timedelta(texte[nur_uhrzeit].str.split(' ').str[1], errors='coerce')
+        sekunden[nur_uhrzeit] = (uhrzeit / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+
+    zeit[positionen] = sekunden
+    return zeit
+
+
+def fahrspuren(zeit, max_zeitdifferenz, attribut=None, schwelle=None):
+    """Teilt eine Folge von Punkten in Fahrspuren (Überfahrten) wie UeberlappungFilter.process_timestamps: eine neue
+    Spur beginnt, wenn der zeitliche Abstand zum Vorgänger max_zeitdifferenz + Median aller Abstände überschreitet
+    (fehlt einer der Zeitstempel, gilt der Abstand als max_zeitdifferenz + 1) oder wenn sich attribut um mehr als
+    schwelle ändert. Gibt (Spurnummern ab 1, Abstände zum Vorgänger) zurück; der erste Abstand ist der Median."""
+    zeit = np.asarray(zeit, dtype=np.float64)
+    dauer = np.empty(len(zeit))
+    dauer[1:] = np.diff(zeit)
+    dauer[1:][np.isnan(dauer[1:])] = max_zeitdifferenz + 1
+    median = np.median(dauer[1:]) if len(zeit) > 1 else max_zeitdifferenz
+    dauer[:1] = median
+
+    bruch = dauer > max_zeitdifferenz + median
+    if attribut is not None and schwelle is not None:
+        # NaN (NULL oder keine Zahl) ergibt keinen Bruch
+        with np.errstate(invalid='ignore'):
+            bruch[1:] |= np.abs(np.diff(np.asarray(attribut, dtype=np.float64))) > schwelle
+    bruch[:1] = False
+    return 1 + np.cumsum(bruch), dauer
+
+
+def laufender_median_mad(werte, spur, halbe_breite, blockgroesse=65536):
+    """Median und MAD im gleitenden Fenster aus jedem Punkt und je halbe_breite Punkten davor und danach in derselben
+    Fahrspur (Hampel-Filter). werte und spur sind in Fahrtrichtung sortiert; NaN zählen nicht, Fenster mit weniger
+    als MIN_WERTE Werten ergeben NaN.
+
+    Die Fenster sind Sichten mit Schrittweite (sliding_window_view) auf die an beiden Enden aufgefüllten Arrays,
+    Einträge aus anderen Spuren werden NaN; sortiert wird blockweise zeilenweise, sodass nie mehr als
+    blockgroesse Fenster kopiert im Speicher liegen."""
+    anzahl = len(werte)
+    median = np.full(anzahl, np.nan)
+    mad = np.full(anzahl, np.nan)
+    rand = np.full(halbe_breite, np.nan)
+    fenster = sliding_window_view(np.concatenate([rand, werte, rand]), 2 * halbe_breite + 1)
+    spur_fenster = sliding_window_view(np.concatenate([rand, spur, rand]), 2 * halbe_breite + 1)
+
+    for start in range(0, anzahl, blockgroesse):
+        ende = min(start + blockgroesse, anzahl)
+        matrix = np.where(spur_fenster[start:ende] == spur[start:ende, None], fenster[start:ende], np.nan)
+
+        block_median, mit_wert = _zeilen_median(matrix)
+        block_mad, _ = _zeilen_median(np.abs(matrix - block_median[:, None]))
+
+        zu_wenige = mit_wert < MIN_WERTE
+        block_median[zu_wenige] = np.nan
+        block_mad[zu_wenige] = np.nan
+        median[start:ende] = block_median
+        mad[start:ende] = block_mad
+    return median, mad
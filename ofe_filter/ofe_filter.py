@@ -23,11 +23,15 @@
 """
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication, Qt, QDate
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QAction, QMessageBox, QPushButton, QDialog, QVBoxLayout, QLabel, QInputDialog, QLineEdit
+from qgis.PyQt.QtWidgets import (
+    QAction, QMessageBox, QPushButton, QDialog, QVBoxLayout, QLabel, QInputDialog, QLineEdit,
+    QListWidget, QListWidgetItem, QDialogButtonBox
+)
 from qgis.core import (
     QgsProject, QgsVectorLayer, QgsWkbTypes, QgsVectorFileWriter, QgsSpatialIndex, 
-    QgsCoordinateTransform, QgsFeature, QgsRectangle, QgsFeatureRequest, 
-    QgsSymbol, QgsGraduatedSymbolRenderer, QgsRendererRange, QgsGeometry
+    QgsCoordinateTransform, QgsRectangle, QgsFeatureRequest, 
+    QgsSymbol, QgsGraduatedSymbolRenderer, QgsRendererRange, QgsGeometry, QgsField, QgsProviderRegistry,
+    QgsApplication, QgsVectorLayerFeatureSource
 )
 from qgis.utils import iface
 from PyQt5.QtGui import QColor
@@ -38,9 +42,25 @@ from .resources import *
 # Import the code for the dialog
 from .ofe_filter_dialog import OFEFilterDialog
 import os.path
+import hashlib
+import shutil
 import pandas as pd
 import numpy as np
 from .ofe_LogManager import LogManager as log
+from .ofe_dateitausch import arbeitsverzeichnis, dateisatz_tauschen
+from .ofe_ergebniscache import ErgebnisCache
+from .ofe_filterauswahl import ROBUSTE_VERFAHREN, FilterAuswahl, GefilterteBasis
+from .ofe_gruppen import gruppen_median_mad, gruppen_mittel_sd, gruppen_quantile, gruppen_segmente, je_punkt
+from .ofe_mahalanobis import abstand_quadrat, grenzwert, mcd_schaetzen
+from .ofe_fahrspuren import fahrspuren, laufender_median_mad
+from .ofe_moran import lokales_moran, moran_ausreisser, p_werte_analytisch, p_werte_permutation
+from .ofe_nachbarschaft import MAX_NACHBARN, NachbarIndex
+from .ofe_quantilskizze import QuantilSkizze
+from .ofe_spaltencache import SpaltenCache, spalte_in_bloecken
+from .ofe_trend import residuen
+from .ofe_zuschnitt import LinienMaske, MaskenCache, ZuschnittZustand, ZuschnittVorschauTask, StapelZuschnittTask, zu_loeschende_punkte
+
+# Bestandteile einer Shapefile, die beim Austausch gegen die kompakte Datei ersetzt oder entfernt werden
 
 class OFEFilter:
     """QGIS Plugin Implementation."""
@@ -84,6 +104,58 @@ class OFEFilter:
         self.first_start = None
         self.punktauswahl_gesamt =  []
 
+        # Auswahl der Filterregeln als Bitmasken (wird beim Wechsel in den Filter-Tab erstellt)
+        self.filter_auswahl = None
+
+        # Vorbereitete Zuschnitt-Masken bleiben über mehrere Datensätze im Projekt erhalten
+        self.masken_cache = MaskenCache()
+
+        # Punktkoordinaten und Maskenzugehörigkeit des new_layer zwischen zwei Zuschnitten
+        self.zuschnitt_zustand = None
+
+        # Zuletzt berechnete Randabstände (Layer, Fläche, Feature-IDs, Abstände)
+        self.randabstand = None
+
+        # Zuschnitt-Vorschau: aktueller Task, alle noch laufenden Tasks (Referenz halten bis zum Ende)
+        # und zuletzt berechnetes Ergebnis
+        self.vorschau_task = None
+        self.vorschau_tasks = set()
+        self.vorschau = None
+
+        # Laufender Stapel-Zuschnitt (offene Tasks und Ergebnisse)
+        self.stapel = None
+
+        # Numerische Spalten des new_layer als NumPy-Arrays für Filter und Histogramme
+        self.spalten_cache = None
+
+        # Filterergebnisse (Masken, Anzahlen, Histogramme) für das Hin- und Herwechseln zwischen Attributen und
+        # Parametern; Speicherbudget in MB über die Einstellung ofe_filter/ergebnis_cache_mb
+        budget_mb = QSettings().value('ofe_filter/ergebnis_cache_mb', 64, type=int)
+        self.ergebnis_cache = ErgebnisCache(budget_mb * 1024 * 1024)
+
+        # Laufende Summen der gefilterten Basis für den SD-Filter je Spalte (Spalte -> GefilterteBasis)
+        self.sd_basen = {}
+
+        # Ergebnis des iterativen SD-Filters je Spalte (Spalte -> (entfernte Punkte je Runde, Untergrenze, Obergrenze))
+        self.sd_iteration = {}
+
+        # Ab dieser Punktanzahl werden Perzentile und Quartile aus einer Quantil-Skizze bestimmt und die
+        # Spalte für die Auswahl blockweise gelesen, statt sie vollständig in den Spalten-Cache zu laden
+        self.skizze_ab_punkten = QSettings().value('ofe_filter/skizze_ab_punkten', 5000000, type=int)
+        # Genauigkeit der Skizze (Rangfehler etwa 2,3 / k)
+        self.skizze_k = QSettings().value('ofe_filter/skizze_k', 200, type=int)
+
+        # Höchstzahl vollständiger Punkte, auf denen die robuste Kovarianz des Mahalanobis-Filters geschätzt wird
+        self.mcd_stichprobe = QSettings().value('ofe_filter/mcd_stichprobe', 50000, type=int)
+
+        # KD-Baum über die Punkte des new_layer für den lokalen Filter (Punktkoordinaten, Feature-IDs, NachbarIndex)
+        self.nachbar_index = None
+        # Threads für die Abfragen des KD-Baums (-1 = alle Kerne)
+        self.kdtree_workers = QSettings().value('ofe_filter/kdtree_workers', -1, type=int)
+
+        # Binäre Gewichtsmatrix für das lokale Moran's I (NachbarIndex, (k, Radius), Matrix)
+        self.moran_gewichte = None
+
     # noinspection PyMethodMayBeStatic
 
     def tr(self, message):
@@ -195,6 +267,17 @@ class OFEFilter:
                 action)
             self.iface.removeToolBarIcon(action)
 
+        self.masken_cache.entladen()
+        self.ergebnis_cache.entladen()
+        self.zuschnitt_zustand_verwerfen()
+        self.spalten_cache_verwerfen()
+
+        for task in list(self.vorschau_tasks):
+            task.cancel()
+        if self.stapel is not None:
+            for task in list(self.stapel["tasks"]):
+                task.cancel()
+
     def run(self):
         """Run method that performs all the real work"""
         # Überprüfen, ob das QGIS-Projekt gespeichert ist
@@ -320,6 +403,70 @@ class OFEFilter:
         # Erstelle die Karte
         self.dlg.fill_map_widget_zuschneiden()
         
+    def layer_finalisieren(self, new_layer, ids_to_delete):
+        """Schließt den Filtervorgang ab: schreibt nur die verbleibenden Punkte in einem Durchgang in eine neue,
+        kompakte Shapefile in einem Verzeichnis neben der Datei des new_layer (Filter_<Name>.shp) und tauscht erst
+        danach den ganzen Dateisatz aus (siehe dateisatz_tauschen). Die Quelle des Layers bleibt bis dahin
+        unverändert; nur für die Umbenennungen gibt er die Dateien frei (unter Windows sind geöffnete Dateien
+        gesperrt). Schlägt ein Schritt fehl, bleibt der alte Stand erhalten, die Auswahl wird erneut gesetzt und
+        False zurückgegeben."""
+        # Offene Bearbeitungen zuerst speichern
+        if new_layer.isEditable():
+            new_layer.commitChanges()
+
+        pfad = QgsProviderRegistry.instance().decodeUri(new_layer.providerType(), new_layer.source())["path"]
+        basis = os.path.splitext(pfad)[0]
+        name = new_layer.name()
+
+        # Nur die verbleibenden Punkte auswählen und in einem Durchgang schreiben
+        ordner = arbeitsverzeichnis(pfad, '.ofe_kompakt_')
+        kompakt_basis = os.path.join(ordner, os.path.basename(basis))
+        new_layer.selectByIds(list(ids_to_delete))
+        new_layer.invertSelection()
+
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "ESRI Shapefile"
+        options.fileEncoding = "UTF-8"
+        options.onlySelectedFeatures = True
+
+        result = QgsVectorFileWriter.writeAsVectorFormatV3(
+            layer=new_layer,
+            fileName=kompakt_basis + ".shp",
+            transformContext=QgsProject.instance().transformContext(),
+            options=options
+        )
+        new_layer.removeSelection()
+
+        if result[0] != QgsVectorFileWriter.NoError:
+            shutil.rmtree(ordner, ignore_errors=True)
+            new_layer.selectByIds(list(ids_to_delete))
+            QMessageBox.critical(None, "Fehler", f"Die gefilterten Daten konnten nicht geschrieben werden. Fehlercode: {result[0]}")
+            return False
+
+        # Alle Dateien sind geschrieben: Layer nur für den Austausch auf eine leere Speicherquelle umstellen
+        crs = new_layer.crs().authid()
+        new_layer.setDataSource(f"{QgsWkbTypes.displayString(new_layer.wkbType())}?crs={crs}", name, "memory")
+        try:
+            dateisatz_tauschen(kompakt_basis, basis)
+        except OSError as e:
+            new_layer.setDataSource(pfad, name, "ogr")
+            new_layer.selectByIds(list(ids_to_delete))
+            QMessageBox.critical(None, "Fehler", f"Die Datei {os.path.basename(pfad)} konnte nicht ersetzt werden: {e}")
+            return False
+        finally:
+            shutil.rmtree(ordner, ignore_errors=True)
+        new_layer.setDataSource(pfad, name, "ogr")
+
+        # Feature-IDs sind in der neuen Datei fortlaufend neu vergeben
+        self.randabstand = None
+        self.zuschnitt_zustand_verwerfen()
+        self.spalten_cache_verwerfen()
+        self.ergebnis_cache.verwerfen(new_layer.id())
+
+        new_layer.updateExtents()
+        new_layer.triggerRepaint()
+        return True
+
     def apply_graduated_style(self, new_layer, column):
         """Weist dem Vector-Punkt-Layer 'new_layer' eine abgestufte Symbolisierung zu und setzt die Symbolgröße auf 1."""
         
@@ -373,77 +520,112 @@ class OFEFilter:
     #########################
     def lösche_punkte_ausserhalb_feldgrenze(self, new_layer, feldgrenze_layer):
         """Löscht alle Punkte im new_layer, die sich außerhalb des feldgrenze_layer Polygons befinden."""
-        # Erstellen eines temporären Layers mit transformierter Geometrie
-        temp_feldgrenze = QgsVectorLayer("Polygon?crs={}".format(new_layer.crs().authid()), 
-                                          "temp_feldgrenze", 
-                                          "memory")
-        temp_feldgrenze_data = temp_feldgrenze.dataProvider()
+        self.zuschneiden(new_layer, [(feldgrenze_layer, True, "Feldgrenze")], "Auf Feldgrenze zuschneiden")
         
-        # Transformieren der Geometrie des feldgrenze_layer in die Projektion des new_layer
-        transform_context = QgsProject.instance().transformContext()
-        coord_transform = QgsCoordinateTransform(feldgrenze_layer.crs(), new_layer.crs(), transform_context)
+    def lösche_punkte_auf_Vorgewende(self, new_layer, innenflaeche_layer):
+        """Löscht alle Punkte im new_layer, die sich außerhalb des innenflaeche_layer Polygons befinden."""
+        self.zuschneiden(new_layer, [(innenflaeche_layer, True, "Innenfläche")], "Vorgewende abschneiden")
         
-        for polygon_feature in feldgrenze_layer.getFeatures():
-            polygon_geom = polygon_feature.geometry()
-            polygon_geom.transform(coord_transform)
-            new_feature = QgsFeature()
-            new_feature.setGeometry(polygon_geom)
-            temp_feldgrenze_data.addFeature(new_feature)
+    def lösche_punkte_außerhalb_Parzellen(self, new_layer, parzellen_layer):
+        """Löscht alle Punkte im new_layer, die sich außerhalb der Parzellen befinden."""
+        self.zuschneiden(new_layer, [(parzellen_layer, True, "Parzelle")], "Löschen von Punkten außerhalb der Parzellen")
         
-        temp_feldgrenze.updateExtents()
+    def lösche_punkte_in_af(self, new_layer, af_layer):
+        """Löscht alle Punkte im new_layer, die sich innerhalb der Ausschlussfläche befinden
+        (bei einem Linien-Layer: näher als die Pufferbreite an einer Linie)."""
+        self.zuschneiden(new_layer, [(af_layer, False, "Ausschlussfläche")], "Löschen von Punkten in der Ausschlussfläche")
 
-        # Starten der Editiersitzung
-        new_layer.startEditing()
+    def lösche_punkte_alle_masken(self, new_layer, feldgrenze_layer, innenflaeche_layer, parzellen_layer, af_layer):
+        """Schneidet den new_layer in einem Durchgang mit allen ausgewählten Flächen zu
+        (innerhalb Feldgrenze UND innerhalb Innenfläche UND innerhalb Parzellen UND NICHT in Ausschlussfläche)."""
+        masken = self.alle_masken(feldgrenze_layer, innenflaeche_layer, parzellen_layer, af_layer)
 
-        # Erstellen eines räumlichen Indexes für die Suche nach Features im temporären Polygon-Layer
-        index = QgsSpatialIndex(temp_feldgrenze.getFeatures())
+        if not masken:
+            QMessageBox.warning(None, "Fehler", "Es wurde keine Fläche für den Zuschnitt ausgewählt.")
+            return
 
-        # Liste zum Speichern der IDs der zu löschenden Features
-        ids_to_delete = []
+        self.zuschneiden(new_layer, masken, "Mit allen Flächen zuschneiden")
+
+    def alle_masken(self, feldgrenze_layer, innenflaeche_layer, parzellen_layer, af_layer):
+        """Liste (masken_layer, innen_behalten, flaeche) aller ausgewählten Flächen."""
+        masken = []
+        if feldgrenze_layer is not None:
+            masken.append((feldgrenze_layer, True, "Feldgrenze"))
+        if innenflaeche_layer is not None:
+            masken.append((innenflaeche_layer, True, "Innenfläche"))
+        if parzellen_layer is not None:
+            masken.append((parzellen_layer, True, "Parzelle"))
+        if af_layer is not None:
+            masken.append((af_layer, False, "Ausschlussfläche"))
+        return masken
+
+    def vorbereitete_masken(self, new_layer, masken):
+        """Ersetzt in masken die Layer durch die (zwischengespeicherten) vorbereiteten Masken im KBS des new_layer.
+        Linien-Layer erhalten die eingestellte Pufferbreite, die dann auch im Namen der Fläche steht."""
+        vorbereitet = []
+        for masken_layer, innen_behalten, flaeche in masken:
+            maske = self.masken_cache.maske(masken_layer, new_layer.crs())
+            if isinstance(maske, LinienMaske):
+                breite = self.dlg.doubleSpinBox_AFPuffer.value()
+                maske = maske.puffer(breite)
+                flaeche = f"{flaeche} (Linien, Puffer {breite:g} m)"
+            vorbereitet.append((maske, innen_behalten, flaeche))
+        return vorbereitet
+
+    def raster_zellgroesse(self):
+        """Zellgröße der optionalen Raster-Beschleunigung oder None."""
+        return self.dlg.doubleSpinBox_Raster.value() if self.dlg.checkBox_Raster.isChecked() else None
+
+    def zuschneiden(self, new_layer, masken, titel):
+        """Gemeinsamer Zuschnitt: prüft alle Punkte des new_layer in einem Durchgang gegen die Polygone
+        aller Masken und löscht die Punkte, die mindestens eine Maske verletzen.
+
+        masken ist eine Liste von (masken_layer, innen_behalten, flaeche). Bei innen_behalten=True werden
+        Punkte außerhalb gelöscht, bei False Punkte innerhalb der Polygone."""
+        # Laufende Vorschau wird durch den Zuschnitt ohnehin ungültig
+        self.zuschnitt_vorschau_abbrechen()
+
+        # Punktkoordinaten und Zugehörigkeiten vom letzten Zuschnitt weiterverwenden
+        zustand = self.zuschnitt_zustand_fuer(new_layer)
+        punkte = zustand.punkte
+
+        # Polygone in die Projektion des new_layer transformiert und vorbereitet (aus dem Cache);
+        # nach Änderungen an einzelnen Polygonen werden nur die betroffenen Punkte neu geprüft
+        loeschen, entfernt = zu_loeschende_punkte(
+            punkte, self.vorbereitete_masken(new_layer, masken), self.raster_zellgroesse(), zustand
+        )
 
-        # Gesamtanzahl der Punkte im Layer
-        total_points = new_layer.featureCount()
+        self.zuschnitt_ausfuehren(new_layer, punkte.fids[loeschen].tolist(), entfernt, titel)
 
-        # Iteriere über alle Features im Layer und selektiere diejenigen, die außerhalb der Polygone liegen
-        for point_feature in new_layer.getFeatures():
-            point_geom = point_feature.geometry()
-            
-            # Suche im Index nach allen Polygonen, deren BoundingBox den Punkt schneidet
-            ids = index.intersects(point_geom.boundingBox())
-            
-            # Überprüfen, ob der Punkt innerhalb eines Polygons liegt
-            keep_point = False
-            for id in ids:
-                temp_polygon_feature = temp_feldgrenze.getFeature(id)
-                temp_polygon_geom = temp_polygon_feature.geometry()
-                
-                # Wenn das Polygon den Punkt enthält, markieren wir ihn zum Behalten
-                if temp_polygon_geom.contains(point_geom):
-                    keep_point = True
-                    break
-            
-            # Wenn der Punkt nicht innerhalb eines Polygons liegt, markiere ihn zum Löschen
-            if not keep_point:
-                ids_to_delete.append(point_feature.id())
+    def zuschnitt_zustand_fuer(self, new_layer):
+        """Gibt den Zuschnitt-Zustand des new_layer zurück. Die Punkte werden nur neu gelesen,
+        wenn noch kein passender Zustand existiert."""
+        if self.zuschnitt_zustand is None or not self.zuschnitt_zustand.passt_zu(new_layer):
+            self.zuschnitt_zustand_verwerfen()
+            self.zuschnitt_zustand = ZuschnittZustand(new_layer)
+        return self.zuschnitt_zustand
 
-        # Überprüfe, ob alle Punkte selektiert wurden (d.h. alle Punkte sollen gelöscht werden)
-        if len(ids_to_delete) == total_points:
-            QMessageBox.warning(None, "Fehler", "Operation nicht zulässig, Sie sind im Begriff alle Punkte zu löschen.")
-            new_layer.rollBack()  # Bricht die Editiersitzung ab
-            return
-    
-        # Wenn nicht alle Punkte ausgewählt wurden, lösche die selektierten Punkte
-        new_layer.deleteFeatures(ids_to_delete)
+    def zuschnitt_zustand_verwerfen(self):
+        if self.zuschnitt_zustand is not None:
+            self.zuschnitt_zustand.trennen()
+            self.zuschnitt_zustand = None
 
-        # Änderungen speichern und Editiersitzung beenden
-        new_layer.commitChanges()
+    def zuschnitt_ausfuehren(self, new_layer, ids_to_delete, entfernt, titel):
+        """Löscht die Punkte eines Zuschnitts, meldet und protokolliert die Anzahl je Fläche."""
+        if not self.punkte_loeschen(new_layer, ids_to_delete):
+            return
 
         deleted_count = len(ids_to_delete)
 
         # Rückmeldung über gelöschte Punkte
-        QMessageBox.information(None, "Auf Feldgrenze zuschneiden", f"{deleted_count} Punkte wurden gelöscht.")
+        if len(entfernt) > 1:
+            details = "\n".join(f"- {flaeche}: {anzahl}" for flaeche, anzahl in entfernt)
+            QMessageBox.information(None, titel, f"{deleted_count} Punkte wurden gelöscht.\n\n{details}")
+        else:
+            QMessageBox.information(None, titel, f"{deleted_count} Punkte wurden gelöscht.")
 
-        self.dlg.log.log_event("Zuschnitt",{"Fläche":"Feldgrenze", "Entfernte Punkte:":f"{deleted_count}"})
+        for flaeche, anzahl in entfernt:
+            self.dlg.log.log_event("Zuschnitt",{"Fläche":flaeche, "Entfernte Punkte:":f"{anzahl}"})
         
         # Symbolisierung des Layers updaten
         if deleted_count is not None:
@@ -451,248 +633,357 @@ class OFEFilter:
             
         # Karte aktualisieren
         self.dlg.update_map_zuschneiden_new_layer()
-        
-    def lösche_punkte_auf_Vorgewende(self, new_layer, innenflaeche_layer):
-        """Löscht alle Punkte im new_layer, die sich außerhalb des innenflaeche_layer Polygons befinden."""
-        # Erstellen eines temporären Layers mit transformierter Geometrie
-        temp_innenflaeche = QgsVectorLayer("Polygon?crs={}".format(new_layer.crs().authid()), 
-                                          "temp_innenflaeche", 
-                                          "memory")
-        temp_innenflaeche_data = temp_innenflaeche.dataProvider()
-        
-        # Transformieren der Geometrie des innenflaeche_layer in die Projektion des new_layer
-        transform_context = QgsProject.instance().transformContext()
-        coord_transform = QgsCoordinateTransform(innenflaeche_layer.crs(), new_layer.crs(), transform_context)
-        
-        for polygon_feature in innenflaeche_layer.getFeatures():
-            polygon_geom = polygon_feature.geometry()
-            polygon_geom.transform(coord_transform)
-            new_feature = QgsFeature()
-            new_feature.setGeometry(polygon_geom)
-            temp_innenflaeche_data.addFeature(new_feature)
-        
-        temp_innenflaeche.updateExtents()
 
-        new_layer.startEditing()
+        # Vorschau für den verbleibenden Datensatz neu berechnen
+        self.dlg.aktualisiere_zuschnitt_vorschau()
 
-        # Erstellen eines räumlichen Indexes für die Polygone im temporären Innenflächen-Layer
-        index = QgsSpatialIndex(temp_innenflaeche.getFeatures())
+    def zuschnitt_vorschau_starten(self, new_layer, masken):
+        """Startet die Berechnung der Zuschnitt-Vorschau im Hintergrund. Eine noch laufende Berechnung
+        wird abgebrochen. Es wird nichts gelöscht, bis die Vorschau übernommen wird."""
+        self.zuschnitt_vorschau_abbrechen()
 
-        # Liste zum Speichern der IDs der zu löschenden Punkte
-        ids_to_delete = []
+        if not masken:
+            self.dlg.label_ZuschnittVorschau.setText("keine Fläche ausgewählt")
+            return
 
-        # Gesamtanzahl der Punkte im Layer
-        total_points = new_layer.featureCount()
+        # Masken und Feature-Quelle im Haupt-Thread vorbereiten, Punkte im Task lesen und prüfen
+        task = ZuschnittVorschauTask(
+            QgsVectorLayerFeatureSource(new_layer),
+            [(maske.kopie(), innen_behalten, flaeche) for maske, innen_behalten, flaeche in self.vorbereitete_masken(new_layer, masken)],
+            self.raster_zellgroesse(),
+            self.zuschnitt_vorschau_fertig
+        )
+        task.layer_id = new_layer.id()
+        self.vorschau_task = task
+        self.vorschau_tasks.add(task)
+        self.dlg.label_ZuschnittVorschau.setText("Vorschau wird berechnet …")
+        QgsApplication.taskManager().addTask(task)
+
+    def zuschnitt_vorschau_fertig(self, task, erfolgreich):
+        """Zeigt das Ergebnis der Vorschau an und markiert die Punkte, die entfernt würden."""
+        self.vorschau_tasks.discard(task)
+
+        # Ergebnisse abgebrochener oder überholter Berechnungen verwerfen
+        if not erfolgreich or task is not self.vorschau_task:
+            return
+        self.vorschau_task = None
 
-        # Iteriere über alle Features im new_layer
-        for point_feature in new_layer.getFeatures():
-            point_geom = point_feature.geometry()
-            
-            # Suche im Index nach allen Polygonen, deren BoundingBox den Punkt schneidet
-            ids = index.intersects(point_geom.boundingBox())
-            
-            # Überprüfen, ob der Punkt innerhalb eines Polygons liegt
-            keep_point = False
-            for id in ids:
-                temp_polygon_feature = temp_innenflaeche.getFeature(id)
-                temp_polygon_geom = temp_polygon_feature.geometry()
-                
-                # Wenn das Polygon den Punkt enthält, behalten wir den Punkt
-                if temp_polygon_geom.contains(point_geom):
-                    keep_point = True
-                    break
-            
-            # Wenn der Punkt nicht innerhalb eines Polygons liegt, markiere ihn zum Löschen
-            if not keep_point:
-                ids_to_delete.append(point_feature.id())
+        new_layer = getattr(self.dlg, 'new_layer', None)
+        if new_layer is None or new_layer.id() != task.layer_id:
+            return
 
-        # Überprüfe, ob alle Punkte selektiert wurden (d.h. alle Punkte sollen gelöscht werden)
-        if len(ids_to_delete) == total_points:
-            QMessageBox.warning(None, "Fehler", "Operation nicht zulässig, Sie sind im Begriff alle Punkte zu löschen.")
-            new_layer.rollBack()  # Bricht die Editiersitzung ab
+        self.vorschau = {
+            "layer_id": task.layer_id,
+            "anzahl_punkte": task.anzahl_punkte,
+            "ids": task.ids.tolist(),
+            "entfernt": task.entfernt,
+        }
+        new_layer.selectByIds(self.vorschau["ids"])
+
+        text = f"{len(task.ids)} von {task.anzahl_punkte} Punkten würden entfernt."
+        if len(task.entfernt) > 1:
+            text += " (" + ", ".join(f"{flaeche}: {anzahl}" for flaeche, anzahl in task.entfernt) + ")"
+        self.dlg.label_ZuschnittVorschau.setText(text)
+        self.dlg.pushButton_VorschauUebernehmen.setEnabled(True)
+
+    def zuschnitt_vorschau_abbrechen(self):
+        """Bricht eine laufende Vorschau ab und verwirft die angezeigte Vorschau."""
+        if self.vorschau_task is not None:
+            try:
+                self.vorschau_task.cancel()
+            except RuntimeError:
+                # Task wurde bereits vom Task-Manager gelöscht
+                pass
+            self.vorschau_task = None
+
+        if self.vorschau is not None:
+            self.vorschau = None
+            new_layer = getattr(self.dlg, 'new_layer', None)
+            if new_layer is not None:
+                new_layer.removeSelection()
+
+        self.dlg.label_ZuschnittVorschau.setText("")
+        self.dlg.pushButton_VorschauUebernehmen.setEnabled(False)
+
+    def zuschnitt_vorschau_uebernehmen(self, new_layer):
+        """Löscht die Punkte der angezeigten Vorschau."""
+        vorschau = self.vorschau
+        if vorschau is None or vorschau["layer_id"] != new_layer.id() or vorschau["anzahl_punkte"] != new_layer.featureCount():
+            QMessageBox.warning(None, "Fehler", "Die Vorschau ist nicht mehr aktuell. Bitte berechnen Sie sie erneut.")
+            self.zuschnitt_vorschau_abbrechen()
             return
 
-        # Wenn nicht alle Punkte ausgewählt wurden, lösche die selektierten Punkte
-        new_layer.deleteFeatures(ids_to_delete)
+        self.zuschnitt_vorschau_abbrechen()
+        self.zuschnitt_ausfuehren(new_layer, vorschau["ids"], vorschau["entfernt"], "Vorschau übernehmen")
 
-        # Änderungen speichern und Editiersitzung beenden
-        new_layer.commitChanges()
+    def stapel_zuschnitt_dialog(self, masken):
+        """Fragt die Punktlayer für den Stapel-Zuschnitt ab und startet ihn mit den ausgewählten Flächen."""
+        if not masken:
+            QMessageBox.warning(None, "Fehler", "Es wurde keine Fläche für den Zuschnitt ausgewählt.")
+            return
 
-        deleted_count = len(ids_to_delete)
+        dialog = QDialog(self.dlg)
+        dialog.setWindowTitle("Stapel-Zuschnitt")
+        layout = QVBoxLayout()
 
-        # Rückmeldung über gelöschte Punkte
-        QMessageBox.information(None, "Vorgewende abschneiden", f"{deleted_count} Punkte wurden gelöscht.")
+        flaechen = ", ".join(f"{flaeche} ({masken_layer.name()})" for masken_layer, _, flaeche in masken)
+        layout.addWidget(QLabel(f"Die ausgewählten Punktlayer werden mit allen Flächen zugeschnitten:\n{flaechen}\n\n"
+                                "Jeder Layer wird als eigene Datei im Ordner OFE_Filter gespeichert."))
+
+        # Alle Punktlayer des Projekts zur Auswahl anbieten
+        liste = QListWidget()
+        for layer in QgsProject.instance().mapLayers().values():
+            if isinstance(layer, QgsVectorLayer) and layer.geometryType() == QgsWkbTypes.PointGeometry:
+                item = QListWidgetItem(layer.name())
+                item.setData(Qt.UserRole, layer.id())
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Unchecked)
+                liste.addItem(item)
+        layout.addWidget(liste)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        dialog.setLayout(layout)
 
-        self.dlg.log.log_event("Zuschnitt",{"Fläche":"Innenfläche", "Entfernte Punkte:":f"{deleted_count}"})
-        
-        # Symbolisierung des Layers updaten
-        if deleted_count is not None:
-            self.dlg.on_SymbButton_clicked()
-            
-        # Karte aktualisieren
-        self.dlg.update_map_zuschneiden_new_layer()
-        
-    def lösche_punkte_außerhalb_Parzellen(self, new_layer, parzellen_layer):
-        """Löscht alle Punkte im new_layer, die sich außerhalb der Parzellen befinden."""
-        # Erstellen eines temporären Layers mit transformierter Geometrie
-        temp_parzelle = QgsVectorLayer("Polygon?crs={}".format(new_layer.crs().authid()), 
-                                       "temp_parzelle", 
-                                       "memory")
-        temp_parzelle_data = temp_parzelle.dataProvider()
-        
-        # Transformieren der Geometrie des parzellen_layer in die Projektion des new_layer
-        transform_context = QgsProject.instance().transformContext()
-        coord_transform = QgsCoordinateTransform(parzellen_layer.crs(), new_layer.crs(), transform_context)
-        
-        for polygon_feature in parzellen_layer.getFeatures():
-            polygon_geom = polygon_feature.geometry()
-            polygon_geom.transform(coord_transform)
-            new_feature = QgsFeature()
-            new_feature.setGeometry(polygon_geom)
-            temp_parzelle_data.addFeature(new_feature)
-        
-        temp_parzelle.updateExtents()
+        if dialog.exec_() != QDialog.Accepted:
+            return
 
-        # Starten der Editiersitzung
-        new_layer.startEditing()
+        layer_ids = [liste.item(i).data(Qt.UserRole) for i in range(liste.count()) if liste.item(i).checkState() == Qt.Checked]
+        punkt_layer = [QgsProject.instance().mapLayer(layer_id) for layer_id in layer_ids]
+        if not punkt_layer:
+            QMessageBox.warning(None, "Stapel-Zuschnitt", "Es wurde kein Punktlayer ausgewählt.")
+            return
 
-        # Erstellen eines räumlichen Indexes für die Polygone im temporären Parzellen-Layer
-        index = QgsSpatialIndex(temp_parzelle.getFeatures())
+        self.stapel_zuschneiden(punkt_layer, masken)
 
-        # Liste zum Speichern der IDs der zu löschenden Punkte
-        ids_to_delete = []
+    def stapel_zuschneiden(self, punkt_layer, masken):
+        """Schneidet mehrere Punktlayer mit denselben Masken zu. Die Masken werden je KBS nur einmal
+        vorbereitet, die Layer werden parallel als Hintergrund-Tasks verarbeitet und als
+        OFE_Filter/Filter_<Name>.shp gespeichert, jeder mit einer eigenen Log-Datei."""
+        if self.stapel is not None and self.stapel["tasks"]:
+            QMessageBox.warning(None, "Stapel-Zuschnitt", "Es läuft bereits ein Stapel-Zuschnitt.")
+            return
+
+        ziel_pfade = {layer.id(): os.path.join(self.ofe_filter_dir, "Filter_" + layer.name() + ".shp") for layer in punkt_layer}
+
+        # Dateien, die gerade im Projekt geöffnet sind, dürfen nicht überschrieben werden
+        offene_pfade = {
+            os.path.normcase(os.path.abspath(QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source()).get("path", "")))
+            for layer in QgsProject.instance().mapLayers().values()
+            if isinstance(layer, QgsVectorLayer)
+        }
+        geoeffnet = [layer for layer in punkt_layer if os.path.normcase(os.path.abspath(ziel_pfade[layer.id()])) in offene_pfade]
+        if geoeffnet:
+            QMessageBox.warning(None, "Stapel-Zuschnitt",
+                                "Folgende Layer werden übersprungen, da ihre Zieldatei im Projekt geöffnet ist:\n"
+                                + "\n".join(layer.name() for layer in geoeffnet))
+            punkt_layer = [layer for layer in punkt_layer if layer not in geoeffnet]
+
+        vorhanden = [layer for layer in punkt_layer if os.path.exists(ziel_pfade[layer.id()])]
+        if vorhanden:
+            reply = QMessageBox.question(None, "Dateien existieren bereits",
+                                         f"{len(vorhanden)} Zieldatei(en) existieren bereits. Möchten Sie sie überschreiben?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.No:
+                punkt_layer = [layer for layer in punkt_layer if layer not in vorhanden]
+
+        if not punkt_layer:
+            return
 
+        self.stapel = {"offen": len(punkt_layer), "tasks": set(), "ergebnisse": []}
+        zellgroesse = self.raster_zellgroesse()
+        masken_namen = {flaeche: masken_layer.name() for masken_layer, _, flaeche in masken}
+
+        for layer in punkt_layer:
+            # Vorbereitete Masken kommen je KBS aus dem Cache, jeder Task erhält eigene vorbereitete Polygone
+            task = StapelZuschnittTask(
+                layer.name(),
+                QgsVectorLayerFeatureSource(layer),
+                layer.fields(),
+                layer.wkbType(),
+                layer.crs(),
+                [(maske.kopie(), innen_behalten, flaeche) for maske, innen_behalten, flaeche in self.vorbereitete_masken(layer, masken)],
+                zellgroesse,
+                ziel_pfade[layer.id()],
+                self.stapel_layer_fertig
+            )
+            task.masken_namen = masken_namen
+            self.stapel["tasks"].add(task)
+            QgsApplication.taskManager().addTask(task)
+
+    def stapel_layer_fertig(self, task, erfolgreich):
+        """Lädt den zugeschnittenen Layer, schreibt dessen Log-Datei und meldet nach dem letzten Layer das Ergebnis."""
+        self.stapel["tasks"].discard(task)
+        self.stapel["offen"] -= 1
+
+        if erfolgreich:
+            new_layer_name = os.path.splitext(os.path.basename(task.ziel_pfad))[0]
+            entfernt_gesamt = sum(anzahl for _, anzahl in task.entfernt)
+
+            # Eigene Log-Datei je Layer
+            layer_log = log(task.layer_name, self.ofe_filter_dir)
+            layer_log.set_plugin_info(self.dlg.plugin_name, self.dlg.plugin_version)
+            layer_log.set_layer_info(
+                punkt_layer = task.layer_name,
+                parzellen_layer = task.masken_namen.get("Parzelle", "Nicht angegeben"),
+                innenflaeche_layer = task.masken_namen.get("Innenfläche", "Nicht angegeben"),
+                feldgrenze_layer = task.masken_namen.get("Feldgrenze", "Nicht angegeben"),
+                ausschlussflaeche_layer = task.masken_namen.get("Ausschlussfläche", "Nicht angegeben"),
+                filter_layer = new_layer_name
+            )
+            for flaeche, anzahl in task.entfernt:
+                layer_log.log_event("Zuschnitt", {"Fläche": flaeche, "Entfernte Punkte:": f"{anzahl}"})
+            layer_log.write_logs()
+
+            # Zugeschnittenen Layer in die Gruppe "Gefilterte Daten" laden
+            new_layer = QgsVectorLayer(task.ziel_pfad, new_layer_name, "ogr")
+            if new_layer.isValid():
+                root = QgsProject.instance().layerTreeRoot()
+                layer_group = root.findGroup("Gefilterte Daten")
+                if layer_group is None:
+                    layer_group = root.addGroup("Gefilterte Daten")
+                QgsProject.instance().addMapLayer(new_layer, False)
+                layer_group.addLayer(new_layer)
+
+            self.stapel["ergebnisse"].append(f"- {task.layer_name}: {entfernt_gesamt} von {task.anzahl_punkte} Punkten entfernt")
+        elif task.fehler:
+            self.stapel["ergebnisse"].append(f"- {task.layer_name}: Fehler – {task.fehler}")
+        else:
+            self.stapel["ergebnisse"].append(f"- {task.layer_name}: abgebrochen")
+
+        if self.stapel["offen"] == 0:
+            QMessageBox.information(None, "Stapel-Zuschnitt", "Stapel-Zuschnitt abgeschlossen:\n\n" + "\n".join(self.stapel["ergebnisse"]))
+
+    def punkte_loeschen(self, new_layer, ids_to_delete):
+        """Löscht die Punkte mit den übergebenen IDs aus dem new_layer. Gibt False zurück, wenn dabei
+        alle Punkte gelöscht würden (dann wird nichts gelöscht)."""
         # Gesamtanzahl der Punkte im Layer
         total_points = new_layer.featureCount()
 
-        # Iteriere über alle Features im new_layer
-        for point_feature in new_layer.getFeatures():
-            point_geom = point_feature.geometry()
-            
-            # Suche im Index nach allen Polygonen, deren BoundingBox den Punkt schneidet
-            ids = index.intersects(point_geom.boundingBox())
-            
-            # Überprüfen, ob der Punkt innerhalb eines Polygons liegt
-            keep_point = False
-            for id in ids:
-                temp_polygon_feature = temp_parzelle.getFeature(id)
-                temp_polygon_geom = temp_polygon_feature.geometry()
-                
-                # Wenn das Polygon den Punkt enthält, behalten wir den Punkt
-                if temp_polygon_geom.contains(point_geom):
-                    keep_point = True
-                    break
-            
-            # Wenn der Punkt nicht innerhalb eines Polygons liegt, markiere ihn zum Löschen
-            if not keep_point:
-                ids_to_delete.append(point_feature.id())
-
         # Überprüfe, ob alle Punkte selektiert wurden (d.h. alle Punkte sollen gelöscht werden)
         if len(ids_to_delete) == total_points:
             QMessageBox.warning(None, "Fehler", "Operation nicht zulässig, Sie sind im Begriff alle Punkte zu löschen.")
-            new_layer.rollBack()  # Bricht die Editiersitzung ab
-            return
+            return False
 
-        # Wenn nicht alle Punkte ausgewählt wurden, lösche die selektierten Punkte
-        new_layer.deleteFeatures(ids_to_delete)
+        # Offene Bearbeitungen zuerst speichern, damit Puffer und Datei übereinstimmen
+        if new_layer.isEditable():
+            new_layer.commitChanges()
 
-        # Änderungen speichern und Editiersitzung beenden
-        new_layer.commitChanges()
+        # Wenn nicht alle Punkte ausgewählt wurden, alle Punkte in einem Aufruf direkt im Datenanbieter löschen
+        if not new_layer.dataProvider().deleteFeatures(ids_to_delete):
+            QMessageBox.critical(None, "Fehler", "Die Punkte konnten nicht gelöscht werden.")
+            return False
 
-        deleted_count = len(ids_to_delete)
+        new_layer.deselect(ids_to_delete)
+        new_layer.updateExtents()
+        new_layer.triggerRepaint()
 
-        # Rückmeldung über gelöschte Punkte
-        QMessageBox.information(None, "Löschen von Punkten außerhalb der Parzellen", f"{deleted_count} Punkte wurden gelöscht.")
+        # Zuschnitt-Zustand und gespeicherte Randabstände auf die verbleibenden Punkte reduzieren
+        if self.zuschnitt_zustand is not None and self.zuschnitt_zustand.layer_id == new_layer.id():
+            self.zuschnitt_zustand.entfernen(ids_to_delete)
+
+        if self.randabstand is not None and self.randabstand["layer_id"] == new_layer.id():
+            behalten = ~np.isin(self.randabstand["fids"], ids_to_delete)
+            self.randabstand["fids"] = self.randabstand["fids"][behalten]
+            self.randabstand["abstand"] = self.randabstand["abstand"][behalten]
+
+        if self.spalten_cache is not None and self.spalten_cache.layer_id == new_layer.id():
+            self.spalten_cache.entfernen(ids_to_delete)
+        self.ergebnis_cache.verwerfen(new_layer.id())
+
+        return True
+
+    def randabstand_berechnen(self, new_layer, masken_layer, flaeche):
+        """Berechnet für alle Punkte des new_layer den Abstand zum nächsten Rand der Polygone im masken_layer
+        (positiv innerhalb, negativ außerhalb) und schreibt ihn in die Spalte 'Randabst'. Die Abstände werden
+        gespeichert, damit die Randbreite ohne Neuberechnung geändert werden kann."""
+        punkte = self.zuschnitt_zustand_fuer(new_layer).punkte
+        maske = self.masken_cache.maske(masken_layer, new_layer.crs())
+        abstand = maske.randabstand(punkte)
+
+        # Abstandsspalte anlegen (falls noch nicht vorhanden) und befüllen
+        provider = new_layer.dataProvider()
+        if new_layer.fields().indexFromName("Randabst") == -1:
+            provider.addAttributes([QgsField("Randabst", QVariant.Double, "double", 12, 3)])
+            new_layer.updateFields()
+        field_index = new_layer.fields().indexFromName("Randabst")
 
-        self.dlg.log.log_event("Zuschnitt",{"Fläche":"Parzelle", "Entfernte Punkte:":f"{deleted_count}"})
-        
-        # Symbolisierung des Layers updaten
-        if deleted_count is not None:
-            self.dlg.on_SymbButton_clicked()
-            
-        # Karte aktualisieren
-        self.dlg.update_map_zuschneiden_new_layer()
-        
-    def lösche_punkte_in_af(self, new_layer, af_layer):
-        """Löscht alle Punkte im new_layer, die sich innerhalb der Ausschlussfläche befinden."""
-        # Erstellen eines temporären Layers mit transformierter Geometrie
-        temp_af = QgsVectorLayer("Polygon?crs={}".format(new_layer.crs().authid()), 
-                                 "temp_af", 
-                                 "memory")
-        temp_af_data = temp_af.dataProvider()
-        
-        # Transformieren der Geometrie des af_layer in die Projektion des new_layer
-        transform_context = QgsProject.instance().transformContext()
-        coord_transform = QgsCoordinateTransform(af_layer.crs(), new_layer.crs(), transform_context)
-        
-        for polygon_feature in af_layer.getFeatures():
-            polygon_geom = polygon_feature.geometry()
-            polygon_geom.transform(coord_transform)
-            new_feature = QgsFeature()
-            new_feature.setGeometry(polygon_geom)
-            temp_af_data.addFeature(new_feature)
-        
-        temp_af.updateExtents()
+        werte = {
+            int(fid): {field_index: None if np.isnan(d) else float(d)}
+            for fid, d in zip(punkte.fids, abstand)
+        }
+        if not provider.changeAttributeValues(werte):
+            QMessageBox.warning(None, "Fehler", "Die Spalte Randabst konnte nicht geschrieben werden.")
 
-        # Starten der Editiersitzung
-        new_layer.startEditing()
+        # Direkt im Datenanbieter geändert, daher ohne Signal am Layer
+        self.spalten_cache_verwerfen()
+        self.ergebnis_cache.verwerfen(new_layer.id())
 
-        # Erstellen eines räumlichen Indexes für die Polygone im AF-Layer
-        index = QgsSpatialIndex(temp_af.getFeatures())
+        self.randabstand = {"layer_id": new_layer.id(), "flaeche": flaeche, "fids": punkte.fids, "abstand": abstand}
 
-        # Liste zum Speichern der IDs der zu löschenden Punkte
-        ids_to_delete = []
+        # Neue Spalte auch für die Symbolisierung anbieten
+        aktuelle_spalte = self.dlg.columnComboBox.currentText()
+        self.dlg.populate_column_combobox(new_layer)
+        self.dlg.columnComboBox.setCurrentText(aktuelle_spalte)
 
-        # Gesamtanzahl der Punkte im Layer
-        total_points = new_layer.featureCount()
+        self.randabstand_vorschau(new_layer)
 
-        # Iteriere über alle Features im new_layer
-        for point_feature in new_layer.getFeatures():
-            point_geom = point_feature.geometry()
-            
-            # Suche im Index nach allen Polygonen, deren BoundingBox den Punkt schneidet
-            ids = index.intersects(point_geom.boundingBox())
-            
-            # Überprüfen, ob der Punkt innerhalb eines Polygons liegt
-            delete_point = False
-            for id in ids:
-                temp_polygon_feature = temp_af.getFeature(id)
-                temp_polygon_geom = temp_polygon_feature.geometry()
-                
-                # Wenn das Polygon den Punkt enthält, wird der Punkt markiert zum Löschen
-                if temp_polygon_geom.contains(point_geom):
-                    delete_point = True
-                    break
-            
-            # Wenn der Punkt innerhalb eines Polygons liegt, markiere ihn zum Löschen
-            if delete_point:
-                ids_to_delete.append(point_feature.id())
+    def randabstand_gueltig(self, new_layer):
+        """Prüft, ob gespeicherte Randabstände zum new_layer und zur gewählten Fläche passen."""
+        return (
+            self.randabstand is not None
+            and self.randabstand["layer_id"] == new_layer.id()
+            and self.randabstand["flaeche"] == self.dlg.comboBox_Randabstand.currentText()
+            and len(self.randabstand["fids"]) == new_layer.featureCount()
+        )
 
-        # Überprüfe, ob alle Punkte selektiert wurden (d.h. alle Punkte sollen gelöscht werden)
-        if len(ids_to_delete) == total_points:
-            QMessageBox.warning(None, "Fehler", "Operation nicht zulässig, Sie sind im Begriff alle Punkte zu löschen.")
-            new_layer.rollBack()  # Bricht die Editiersitzung ab
+    def randabstand_auswahl(self, breite):
+        """IDs aller Punkte, die näher als breite am Rand oder außerhalb der Flächen liegen."""
+        abstand = self.randabstand["abstand"]
+        # Punkte genau auf dem Rand gelten als außerhalb (Abstand -0.0)
+        auswahl = ~np.isnan(abstand) & ((abstand < breite) | np.signbit(abstand))
+        return self.randabstand["fids"][auswahl].tolist()
+
+    def randabstand_vorschau(self, new_layer):
+        """Zeigt (ohne Neuberechnung der Abstände) an, welche Punkte mit der aktuellen Randbreite
+        abgeschnitten würden, und markiert sie im Layer."""
+        if not self.randabstand_gueltig(new_layer):
+            self.dlg.label_Randvorschau.setText("kein Randabstand berechnet")
             return
 
-        # Wenn nicht alle Punkte ausgewählt wurden, lösche die selektierten Punkte
-        new_layer.deleteFeatures(ids_to_delete)
+        breite = self.dlg.doubleSpinBox_Randbreite.value()
+        ids = self.randabstand_auswahl(breite)
+        new_layer.selectByIds(ids)
+        self.dlg.label_Randvorschau.setText(
+            f"{len(ids)} von {new_layer.featureCount()} Punkten liegen näher als {breite:g} m am Rand "
+            f"({self.randabstand['flaeche']})."
+        )
 
-        # Änderungen speichern und Editiersitzung beenden
-        new_layer.commitChanges()
+    def lösche_punkte_am_rand(self, new_layer):
+        """Löscht alle Punkte im new_layer, die näher als die eingestellte Randbreite am Rand der Fläche
+        oder außerhalb der Fläche liegen."""
+        if not self.randabstand_gueltig(new_layer):
+            QMessageBox.warning(None, "Fehler", "Bitte berechnen Sie zuerst den Randabstand.")
+            return
 
-        deleted_count = len(ids_to_delete)
+        breite = self.dlg.doubleSpinBox_Randbreite.value()
+        flaeche = self.randabstand["flaeche"]
+        ids_to_delete = self.randabstand_auswahl(breite)
+
+        if not self.punkte_loeschen(new_layer, ids_to_delete):
+            return
+
+        QMessageBox.information(None, "Rand abschneiden", f"{len(ids_to_delete)} Punkte wurden gelöscht.")
+        self.dlg.log.log_event("Zuschnitt", {"Fläche": flaeche, "Randbreite": f"{breite:g} m", "Entfernte Punkte:": f"{len(ids_to_delete)}"})
 
-        # Rückmeldung über gelöschte Punkte
-        QMessageBox.information(None, "Löschen von Punkten in der Ausschlussfläche", f"{deleted_count} Punkte wurden gelöscht.")
-        
-        self.dlg.log.log_event("Zuschnitt",{"Fläche":"Ausschlussfläche", "Entfernte Punkte:":f"{deleted_count}"})
-        
         # Symbolisierung des Layers updaten
-        if deleted_count is not None:
-            self.dlg.on_SymbButton_clicked()
-            
+        self.dlg.on_SymbButton_clicked()
+
         # Karte aktualisieren
         self.dlg.update_map_zuschneiden_new_layer()
+        self.randabstand_vorschau(new_layer)
 
 
     def polygon_selection(self, new_layer):
@@ -767,10 +1058,7 @@ class OFEFilter:
 
             if reply == QMessageBox.Yes:
                 # Punkte löschen
-                new_layer.startEditing()
-                for feature in selected_features:
-                    new_layer.deleteFeature(feature.id())
-                new_layer.commitChanges()
+                self.punkte_loeschen(new_layer, new_layer.selectedFeatureIds())
 
                 QMessageBox.information(None, "Löschung", f"{count} Punkte wurden gelöscht.")
                 self.dlg.log.log_event("Manueller Zuschnitt", {"Entfernte Punkte":f"{count}"})
@@ -798,10 +1086,24 @@ class OFEFilter:
     ### Daten Filtern ###
     #####################
     
+    def spalten(self, new_layer):
+        """Gibt den Spalten-Cache des new_layer zurück. Er wird nur neu angelegt, wenn noch kein
+        passender Cache existiert; die Spalten selbst werden beim ersten Zugriff gelesen."""
+        if self.spalten_cache is None or not self.spalten_cache.passt_zu(new_layer):
+            self.spalten_cache_verwerfen()
+            self.spalten_cache = SpaltenCache(new_layer)
+        return self.spalten_cache
+
+    def spalten_cache_verwerfen(self):
+        if self.spalten_cache is not None:
+            self.spalten_cache.trennen()
+            self.spalten_cache = None
+        self.sd_basen = {}
+
     def create_auswahl_tabelle(self, layer):
         """ Erstellen der Auswahltabelle"""
         # Definiere die erste Spalte mit den Filtermethoden
-        filter_methods = ["Untergrenze", "Obergrenze", "Standardabweichung"]
+        filter_methods = ["Untergrenze", "Obergrenze", "Standardabweichung", "MAD", "IQR", "Perzentil", "Mahalanobis", "Lokal", "Moran", "Hampel"]
         
         # Erstelle eine Liste für die numerischen Spaltennamen
         numeric_columns = []
@@ -835,8 +1137,41 @@ class OFEFilter:
             "Obergrenze",
             "Obergrenze Methode (0=groeßer/1=groeßer-gleich)",
             "Standardabweichung Multiplikator", 
-            "Standardabweichung Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)"
-            "Standardabweichung Basis (0=Rohdaten/1=gefilterte Daten)"
+            "Standardabweichung Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)",
+            "Standardabweichung Basis (0=Rohdaten/1=gefilterte Daten)",
+            "MAD Multiplikator",
+            "MAD Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)",
+            "IQR Multiplikator",
+            "IQR Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)",
+            "Perzentil unten",
+            "Perzentil oben",
+            "Perzentil Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)",
+            "Standardabweichung Runden (leer=einfach/sonst Höchstzahl beim iterativen Filter)",
+            "Standardabweichung Gruppierung (Spalte)",
+            "MAD Gruppierung (Spalte)",
+            "IQR Gruppierung (Spalte)",
+            "Perzentil Gruppierung (Spalte)",
+            "Mahalanobis Quantil (%)",
+            "Lokal Multiplikator",
+            "Lokal Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)",
+            "Lokal Nachbarn k (leer bei Radius)",
+            "Lokal Radius (leer bei k Nachbarn)",
+            "Moran Typ (0=Hoch-Niedrig und Niedrig-Hoch/1=Hoch-Niedrig/2=Niedrig-Hoch)",
+            "Moran Signifikanzniveau",
+            "Moran Nachbarn k (leer bei Distanzband)",
+            "Moran Distanzband (leer bei k Nachbarn)",
+            "Moran Permutationen (leer=analytischer Test)",
+            "Hampel Multiplikator",
+            "Hampel Methode (0=Ober- und Untergrenze/1=Untergrenze/2=Obergrenze)",
+            "Hampel Fenster (Punkte je Seite)",
+            "Hampel max. Zeitdifferenz (s)",
+            "Hampel Zeitstempel (Spalte)",
+            "Standardabweichung Trend (leer=kein Trendabzug/sonst Verfahren und Parameter)",
+            "MAD Trend (leer=kein Trendabzug/sonst Verfahren und Parameter)",
+            "IQR Trend (leer=kein Trendabzug/sonst Verfahren und Parameter)",
+            "Perzentil Trend (leer=kein Trendabzug/sonst Verfahren und Parameter)",
+            "Hampel Spurwechsel-Attribut (Spalte, leer=nur Zeitlücken)",
+            "Hampel Spurwechsel-Schwelle"
         ]
         
         # Erstelle eine Liste für die numerischen Spaltennamen
@@ -862,55 +1197,24 @@ class OFEFilter:
         
         return self.filterparameter_tabelle
         
-    def create_multiindex_punktauswahl(self, new_layer):
-        """ Erstellt einen Pandas DataFrame mit einem MultiIndex für die Gruppen 'Untergrenze', 'Obergrenze' und 'Standardabweichung',
-        wobei für jede Gruppe und jedes numerische Feature eine leere Liste gespeichert wird."""
-        
-        # Definiere die Gruppen
-        groups = ["Untergrenze", "Obergrenze", "Standardabweichung"]
-        
-        # Erstelle eine Liste für die numerischen Feature-Namen
-        numeric_columns = []
-        
-        # Hole die Felder des Layers
-        fields = new_layer.fields()
-
-        # Füge nur numerische Felder in die Liste ein
-        for field in fields:
-            if field.type() in (QVariant.Int, QVariant.Double, QVariant.LongLong, QVariant.UInt, QVariant.ULongLong):
-                numeric_columns.append(field.name())
-        
-        # Erstelle den MultiIndex
-        index = pd.MultiIndex.from_product([groups, numeric_columns], names=['Gruppe', 'Feature'])
-        
-        # Erstelle ein DataFrame mit leeren Listen für jede Gruppe/Feature-Kombination
-        self.filter_punktauswahl = pd.DataFrame({'Werte': [[] for _ in range(len(index))]}, index=index)
+    def create_filter_auswahl(self, new_layer):
+        """ Erstellt die leere Filterauswahl: eine Bitmaske je Filterregel (Gruppe, Spalte), ausgerichtet an
+        den Feature-IDs des Spalten-Caches."""
+        self.filter_auswahl = FilterAuswahl(self.spalten(new_layer).feature_ids())
 
     def combine_filter_punktauswahl(self, new_layer):
-        """ Führt alle Listen aus dem MultiIndex DataFrame filter_punktauswahl zusammen,
-        entfernt Duplikate und sortiert die finale Liste in aufsteigender Reihenfolge."""
-        if hasattr(self, 'filter_punktauswahl') and self.filter_punktauswahl is not None:          
-            # Liste zum Speichern der zusammengeführten Zeilenindizes
-            punktauswahl_gesamt = []
-            
-            # Iteriere durch alle Einträge des DataFrame filter_punktauswahl
-            for row in self.filter_punktauswahl['Werte']:
-                # Überprüfe, ob die Liste nicht leer ist
-                if isinstance(row, list) and len(row) > 0:
-                    # Füge die Werte der aktuellen Liste zu punktauswahl_gesamt hinzu
-                    punktauswahl_gesamt.extend(row)
-
-            # Entferne Duplikate durch Umwandlung in eine Menge (set) und zurück zu einer Liste
-            punktauswahl_gesamt = list(set(punktauswahl_gesamt))
+        """ Vereinigt die Bitmasken aller Filterregeln zur Gesamtauswahl und wählt diese Punkte im Layer aus."""
+        if self.filter_auswahl is not None:
+            # Abhängige Regeln (SD auf gefilterter Basis) nach Änderungen der übrigen Filter nachführen
+            if self.abhaengige_filter_nachfuehren(new_layer):
+                self.dlg.fill_table_widget(self.dlg.tableWidget_Auswahl, self.auswahl_tabelle)
+                self.dlg.aktualisiere_anzahl_vorschau()
 
-            # Sortiere die Liste in aufsteigender Reihenfolge
-            punktauswahl_gesamt.sort()
-
-            # Speichern der resultierenden Liste als Instanzvariable
-            self.punktauswahl_gesamt = punktauswahl_gesamt
+            # Vereinigung aller Regeln als bitweises Oder
+            self.punktauswahl_gesamt = self.filter_auswahl.ids().tolist()
 
             # Setze die Anzahl der Einträge in punktauswahl_gesamt als gesamtauswahl
-            self.gesamtauswahl = len(punktauswahl_gesamt)
+            self.gesamtauswahl = len(self.punktauswahl_gesamt)
             
             # Überprüfen, ob punktauswahl_gesamt Einträge hat
             if self.gesamtauswahl > 0:
@@ -928,10 +1232,428 @@ class OFEFilter:
             self.dlg.label_auswahl.setText("keine Filter angewand")
             self.dlg.label_auswahl.setText("")
         
+    def positionen_untergrenze(self, new_layer, selected_column, untergrenze_wert, selected_comparison):
+        """ Positionen (im Spalten-Cache) der Punkte unter der Untergrenze; per binärer Suche im sortierten Index."""
+        return self.spalten(new_layer).positionen_unter(selected_column, untergrenze_wert, gleich=selected_comparison == 1)
+
+    def positionen_obergrenze(self, new_layer, selected_column, obergrenze_wert, selected_comparison):
+        """ Positionen (im Spalten-Cache) der Punkte über der Obergrenze; per binärer Suche im sortierten Index."""
+        return self.spalten(new_layer).positionen_ueber(selected_column, obergrenze_wert, gleich=selected_comparison == 1)
+
+    def sd_grenzen(self, new_layer, selected_column, multiplikator_wert, gefiltert):
+        """ Gibt (Untergrenze, Obergrenze) = Mittelwert ∓ Multiplikator * SD zurück. Mittelwert und SD der Rohdaten
+        werden je Spalte einmal berechnet, die der gefilterten Daten aus laufenden Summen nachgeführt."""
+        spalten = self.spalten(new_layer)
+
+        if gefiltert and self.filter_auswahl is not None:
+            # SD auf Basis der bereits gefilterten Daten (ohne SD-Filter)
+            MEAN, SD = self.sd_basis_statistik(spalten, selected_column)
+        else:
+            MEAN, SD = spalten.statistik(selected_column)
+
+        # Berechne Ober- und Untergrenze
+        SD_og = MEAN + (multiplikator_wert * SD)
+        SD_ug = MEAN - (multiplikator_wert * SD)
+        return SD_ug, SD_og
+
+    def positionen_sd(self, new_layer, selected_column, multiplikator_wert, selected_method, gefiltert, max_runden=None, gruppen_spalte=None, trend=None):
+        """ Positionen (im Spalten-Cache) der Punkte außerhalb von Mittelwert ± Multiplikator * SD
+        (mit max_runden: nach iterativem Sigma-Clipping; mit gruppen_spalte: Kennwerte je Gruppe;
+        mit trend: auf den Residuen nach Abzug der räumlichen Trendfläche)."""
+        selected_column = self.daten_spalte(new_layer, selected_column, trend)
+        if gruppen_spalte:
+            if max_runden:
+                return self.sd_clipping_gruppiert(new_layer, selected_column, gruppen_spalte, multiplikator_wert, selected_method, gefiltert, max_runden)[2]
+            SD_ug, SD_og = self.sd_grenzen_gruppiert(new_layer, selected_column, gruppen_spalte, multiplikator_wert, gefiltert)
+            return self.positionen_ausserhalb_gruppiert(new_layer, selected_column, gruppen_spalte, selected_method, SD_ug, SD_og)
+        if max_runden:
+            return self.sd_clipping(new_layer, selected_column, multiplikator_wert, selected_method, gefiltert, max_runden)[2]
+        SD_ug, SD_og = self.sd_grenzen(new_layer, selected_column, multiplikator_wert, gefiltert)
+        return self.positionen_ausserhalb(new_layer, selected_column, selected_method, SD_ug, SD_og)
+
+    def sd_clipping(self, new_layer, selected_column, multiplikator_wert, selected_method, gefiltert, max_runden):
+        """ Iteratives Sigma-Clipping: entfernt die Punkte außerhalb von Mittelwert ± Multiplikator * SD und berechnet
+        Mittelwert und SD ohne sie neu, bis keine Punkte mehr hinzukommen oder max_runden erreicht ist. Nach der
+        ersten Runde werden die laufenden Summen nur um die neu entfernten Punkte korrigiert (GefilterteBasis).
+        Gibt (Untergrenze, Obergrenze, Positionen im Spalten-Cache, entfernte Punkte je Runde) zurück."""
+        spalten = self.spalten(new_layer)
+        werte, null = spalten.spalte(selected_column)
+
+        # Ausgangsbasis: alle Punkte bzw. ohne die Punkte der übrigen Filter (ohne SD-Filter)
+        if gefiltert and self.filter_auswahl is not None:
+            ausgeschlossen = self.filter_auswahl.maske_fuer(spalten.fids, ohne_gruppen=('Standardabweichung',))
+        else:
+            ausgeschlossen = np.zeros(len(werte), dtype=bool)
+        raus = ausgeschlossen.copy()
+        gepackt = np.packbits(raus)
+        basis = GefilterteBasis(werte, null, gepackt)
+
+        entfernt = []
+        for _ in range(max_runden):
+            MEAN, SD = basis.statistik()
+            SD_og = MEAN + (multiplikator_wert * SD)
+            SD_ug = MEAN - (multiplikator_wert * SD)
+
+            # Nur die Punkte außerhalb der Grenzen, die noch zur Basis gehören
+            neu = self.positionen_ausserhalb(new_layer, selected_column, selected_method, SD_ug, SD_og)
+            neu = neu[~raus[neu]]
+            if len(neu) == 0:
+                break
+            raus[neu] = True
+            entfernt.append(len(neu))
+
+            # Bits der neu entfernten Punkte in einer Kopie der gepackten Maske setzen (erstes Element im höchsten Bit)
+            gepackt = gepackt.copy()
+            np.bitwise_or.at(gepackt, neu // 8, (0x80 >> (neu % 8)).astype(np.uint8))
+            basis.nachfuehren(gepackt)
+
+        # Die Regel enthält alle in den Runden entfernten und alle außerhalb der letzten Grenzen liegenden Punkte
+        ausserhalb = self.positionen_ausserhalb(new_layer, selected_column, selected_method, SD_ug, SD_og)
+        if entfernt:
+            positionen = np.union1d(ausserhalb, np.flatnonzero(raus & ~ausgeschlossen))
+        else:
+            positionen = ausserhalb
+        return SD_ug, SD_og, positionen, entfernt
+
+    ###### Gruppierte Filter (je Variante, Block, Parzelle oder Überfahrt) ######
+    def sd_grenzen_gruppiert(self, new_layer, selected_column, gruppen_spalte, multiplikator_wert, gefiltert):
+        """ Wie sd_grenzen, aber mit Mittelwert und SD je Gruppe der gruppen_spalte, berechnet in einem Durchgang
+        über alle Punkte (np.bincount), nicht in einer Schleife über die Gruppen. Gibt (Untergrenzen, Obergrenzen)
+        je Gruppencode zurück; Gruppen ohne Werte erhalten NaN."""
+        spalten = self.spalten(new_layer)
+        werte, null = spalten.spalte(selected_column)
+        codes, bezeichnungen = spalten.gruppen(gruppen_spalte)
+
+        basis = ~null & (codes >= 0)
+        if gefiltert and self.filter_auswahl is not None:
+            # SD auf Basis der bereits gefilterten Daten (ohne SD-Filter)
+            basis &= ~self.filter_auswahl.maske_fuer(spalten.fids, ohne_gruppen=('Standardabweichung',))
+
+        MEAN, SD = gruppen_mittel_sd(werte[basis], codes[basis], len(bezeichnungen))
+        return MEAN - (multiplikator_wert * SD), MEAN + (multiplikator_wert * SD)
+
+    def sd_clipping_gruppiert(self, new_layer, selected_column, gruppen_spalte, multiplikator_wert, selected_method, gefiltert, max_runden):
+        """ Iteratives Sigma-Clipping je Gruppe (wie sd_clipping). Anzahl, Summe und Quadratsumme je Gruppe werden
+        nach jeder Runde nur um die neu entfernten Punkte verringert. Gibt (Untergrenzen, Obergrenzen je Gruppe,
+        Positionen im Spalten-Cache, entfernte Punkte je Runde) zurück."""
+        spalten = self.spalten(new_layer)
+        werte, null = spalten.spalte(selected_column)
+        codes, bezeichnungen = spalten.gruppen(gruppen_spalte)
+        anzahl_gruppen = len(bezeichnungen)
+
+        basis = ~null & (codes >= 0)
+        if gefiltert and self.filter_auswahl is not None:
+            basis &= ~self.filter_auswahl.maske_fuer(spalten.fids, ohne_gruppen=('Standardabweichung',))
+        ausgangsbasis = basis.copy()
+
+        # Laufende Summen je Gruppe, um den Gruppenmittelwert der Ausgangsbasis verschoben (numerisch stabil)
+        verschiebung = np.nan_to_num(gruppen_mittel_sd(werte[basis], codes[basis], anzahl_gruppen)[0])
+        abweichung = werte - je_punkt(verschiebung, codes)
+        anzahl = np.bincount(codes[basis], minlength=anzahl_gruppen).astype(np.float64)
+        summe = np.bincount(codes[basis], abweichung[basis], anzahl_gruppen)
+        quadratsumme = np.bincount(codes[basis], abweichung[basis] ** 2, anzahl_gruppen)
+
+        entfernt = []
+        for _ in range(max_runden):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mittel = summe / anzahl
+                SD = np.sqrt(np.maximum(quadratsumme / anzahl - mittel * mittel, 0.0))
+            SD_og = verschiebung + mittel + (multiplikator_wert * SD)
+            SD_ug = verschiebung + mittel - (multiplikator_wert * SD)
+
+            # Nur die Punkte außerhalb der Grenzen ihrer Gruppe, die noch zur Basis gehören
+            neu = self.positionen_ausserhalb_gruppiert(new_layer, selected_column, gruppen_spalte, selected_method, SD_ug, SD_og)
+            neu = neu[basis[neu]]
+            if len(neu) == 0:
+                break
+            basis[neu] = False
+            entfernt.append(len(neu))
+
+            neu_codes = codes[neu]
+            anzahl -= np.bincount(neu_codes, minlength=anzahl_gruppen)
+            summe -= np.bincount(neu_codes, abweichung[neu], anzahl_gruppen)
+            quadratsumme -= np.bincount(neu_codes, abweichung[neu] ** 2, anzahl_gruppen)
+
+        # Die Regel enthält alle in den Runden entfernten und alle außerhalb der letzten Grenzen liegenden Punkte
+        ausserhalb = self.positionen_ausserhalb_gruppiert(new_layer, selected_column, gruppen_spalte, selected_method, SD_ug, SD_og)
+        positionen = np.union1d(ausserhalb, np.flatnonzero(ausgangsbasis & ~basis))
+        return SD_ug, SD_og, positionen, entfernt
+
+    def robuste_grenzen_gruppiert(self, new_layer, selected_column, gruppen_spalte, verfahren, multiplikator_wert, perzentil_unten, perzentil_oben):
+        """ Wie robuste_grenzen, aber je Gruppe der gruppen_spalte: Median, MAD und Quantile werden aus der einmal
+        nach (Gruppe, Wert) sortierten Spalte je Segment abgelesen. Gibt (Untergrenzen, Obergrenzen) je Gruppencode zurück."""
+        spalten = self.spalten(new_layer)
+        _, bezeichnungen = spalten.gruppen(gruppen_spalte)
+        sortierung = spalten.gruppen_sortierung(selected_column, gruppen_spalte)
+        _, werte_sortiert, codes_sortiert = sortierung
+
+        if verfahren == 0:
+            median, mad = gruppen_median_mad(werte_sortiert, codes_sortiert, len(bezeichnungen), sortierung)
+            return median - multiplikator_wert * 1.4826 * mad, median + multiplikator_wert * 1.4826 * mad
+
+        start, anzahl = gruppen_segmente(codes_sortiert, len(bezeichnungen))
+        if verfahren == 1:
+            quartile = gruppen_quantile(werte_sortiert, start, anzahl, [0.25, 0.75])
+            q1, q3 = quartile[:, 0], quartile[:, 1]
+            return q1 - multiplikator_wert * (q3 - q1), q3 + multiplikator_wert * (q3 - q1)
+        perzentile = gruppen_quantile(werte_sortiert, start, anzahl, [perzentil_unten / 100, perzentil_oben / 100])
+        return perzentile[:, 0], perzentile[:, 1]
+
+    def positionen_ausserhalb_gruppiert(self, new_layer, selected_column, gruppen_spalte, selected_method, untergrenzen, obergrenzen):
+        """ Positionen (im Spalten-Cache) der Punkte außerhalb der Grenzen ihrer Gruppe. Punkte ohne Gruppe,
+        ohne Wert oder in Gruppen ohne Grenzen (NaN) erfüllen keine Bedingung."""
+        spalten = self.spalten(new_layer)
+        werte, _ = spalten.spalte(selected_column)
+        codes, _ = spalten.gruppen(gruppen_spalte)
+        return self.positionen_ausserhalb_werte(werte, selected_method, je_punkt(untergrenzen, codes), je_punkt(obergrenzen, codes))
+
+    def positionen_ausserhalb_werte(self, werte, selected_method, untergrenze, obergrenze):
+        """ Positionen der Werte außerhalb der Grenzen (Skalare oder Grenzen je Punkt) per direktem Vergleich;
+        NaN erfüllt keine Bedingung."""
+        if selected_method == 0:  # Index 0: "Ober- und Untergrenze"
+            return np.flatnonzero((werte < untergrenze) | (werte > obergrenze))
+        elif selected_method == 1:  # Index 1: "Untergrenze"
+            return np.flatnonzero(werte < untergrenze)
+        else:  # Index 2: "Obergrenze"
+            return np.flatnonzero(werte > obergrenze)
+
+    def positionen_ausserhalb(self, new_layer, selected_column, selected_method, untergrenze, obergrenze):
+        """ Positionen (im Spalten-Cache) der Punkte außerhalb der Grenzen (SD- oder robuste Filter);
+        per binärer Suche im sortierten Index."""
+        spalten = self.spalten(new_layer)
+
+        if selected_method == 0:  # Index 0: "Ober- und Untergrenze"
+            return np.concatenate((spalten.positionen_unter(selected_column, untergrenze), spalten.positionen_ueber(selected_column, obergrenze)))
+        elif selected_method == 1:  # Index 1: "Untergrenze"
+            return spalten.positionen_unter(selected_column, untergrenze)
+        else:  # Index 2: "Obergrenze"
+            return spalten.positionen_ueber(selected_column, obergrenze)
+
+    def ids_ausserhalb_gestreamt(self, new_layer, selected_column, selected_method, untergrenze, obergrenze):
+        """ Wie positionen_ausserhalb, aber in einem blockweisen Durchgang über den Layer, ohne die Spalte in den
+        Spalten-Cache zu laden (große Layer). Gibt die Feature-IDs der Treffer zurück; nur sie bleiben im Speicher."""
+        treffer_ids = [np.empty(0, dtype=np.int64)]
+        for fids, werte in spalte_in_bloecken(new_layer, selected_column):
+            if selected_method == 0:  # Index 0: "Ober- und Untergrenze"
+                treffer = (werte < untergrenze) | (werte > obergrenze)
+            elif selected_method == 1:  # Index 1: "Untergrenze"
+                treffer = werte < untergrenze
+            else:  # Index 2: "Obergrenze"
+                treffer = werte > obergrenze
+            treffer_ids.append(fids[treffer])
+        return np.concatenate(treffer_ids)
+
+    def gestreamt(self, new_layer):
+        """ Prüft, ob der Layer so groß ist, dass quantilbasierte Filter über die Quantil-Skizze laufen."""
+        return new_layer.featureCount() > self.skizze_ab_punkten
+
+    def quantil_skizze(self, new_layer, selected_column):
+        """ Gibt die Quantil-Skizze der Spalte zurück. Sie wird in einem blockweisen Durchgang aufgebaut und im
+        Ergebnis-Cache gehalten, sodass ein geändertes Perzentil den Layer nicht erneut liest."""
+        return self.ergebnis_cache.holen(
+            new_layer, selected_column, 'Quantilskizze', self.skizze_k,
+            lambda: QuantilSkizze.aus_bloecken((werte for _, werte in spalte_in_bloecken(new_layer, selected_column)), self.skizze_k),
+        )
+
+    def sd_basis_statistik(self, spalten, selected_column):
+        """ Mittelwert und SD über alle Punkte außerhalb der Vereinigung der übrigen Filter (ohne SD-Filter).
+        Die laufenden Summen je Spalte werden nur um die Punkte korrigiert, deren Zugehörigkeit wechselt."""
+        werte, null = spalten.spalte(selected_column)
+
+        if self.filter_auswahl.fids is not spalten.fids and not np.array_equal(self.filter_auswahl.fids, spalten.fids):
+            # Auswahl und Spalten-Cache unterschiedlich ausgerichtet (z.B. nach dem Löschen von Punkten): voll berechnen
+            basis = ~null & ~self.filter_auswahl.maske_fuer(spalten.fids, ohne_gruppen=('Standardabweichung',))
+            return np.mean(werte[basis]), np.std(werte[basis])
+
+        ausgeschlossen = self.filter_auswahl.gepackt(ohne_gruppen=('Standardabweichung',))
+        basis = self.sd_basen.get(selected_column)
+        if basis is None or not basis.passt_zu(werte):
+            basis = GefilterteBasis(werte, null, ausgeschlossen)
+            self.sd_basen[selected_column] = basis
+        else:
+            basis.nachfuehren(ausgeschlossen)
+        return basis.statistik()
+
+    def daten_spalte(self, new_layer, selected_column, trend=None):
+        """ Gibt den Schlüssel der Werte im Spalten-Cache zurück, auf die SD- und robuste Filter angewendet werden:
+        ohne trend die Spalte selbst, mit trend = (Verfahren, Parameter) ihre Residuen nach Abzug der räumlichen
+        Trendfläche (siehe ofe_trend.residuen). Die Fläche wird je Spalte und Einstellung einmal nach kleinsten
+        Quadraten angepasst und im Ergebnis-Cache (mit Speicherbudget) gehalten; der Spalten-Cache führt je Spalte
+        nur die zuletzt verwendeten Residuen mit sortiertem Index, sodass ein anderer Multiplikator nur diesen
+        Index neu filtert."""
+        if not trend:
+            return selected_column
+        spalten = self.spalten(new_layer)
+        key = (selected_column, 'Trend') + tuple(trend)
+
+        def anpassen():
+            werte, _ = spalten.spalte(selected_column)
+            x, y = self.koordinaten_ausrichten(self.zuschnitt_zustand_fuer(new_layer).punkte, spalten.feature_ids())
+            return residuen(x, y, werte, *trend)
+
+        if not spalten.hat_spalte(key):
+            # Laufende Summen der Residuen einer anderen Trendeinstellung werden nicht mehr gebraucht
+            for alt in [alt for alt in self.sd_basen if isinstance(alt, tuple) and alt[:2] == key[:2]]:
+                del self.sd_basen[alt]
+        return spalten.abgeleitete_spalte(
+            key, lambda: self.ergebnis_cache.holen(new_layer, selected_column, 'Trend', tuple(trend), anpassen))
+
+    def trend_vorhanden(self, new_layer, selected_column, trend):
+        """ Prüft, ob die Residuen der Spalte für trend bereits berechnet sind (ohne sie zu berechnen)."""
+        return self.spalten(new_layer).hat_spalte((selected_column, 'Trend') + tuple(trend))
+
+    def abhaengige_filter_nachfuehren(self, new_layer):
+        """ Berechnet die Regeln neu, die von seit dem letzten Aufruf geänderten Regeln abhängen (SD auf
+        gefilterter Basis hängt von allen übrigen Filtern ab). Gibt zurück, ob eine Regel neu berechnet wurde."""
+        geaendert = self.filter_auswahl.geaenderte_regeln()
+        abhaengige = self.filter_auswahl.abhaengige(geaendert)
+
+        for (gruppe, selected_column), (multiplikator_wert, selected_method, max_runden, gruppen_spalte, trend) in abhaengige:
+            self.auswahl_tabelle.at[2, selected_column] = self.sd_regel_setzen(new_layer, selected_column, multiplikator_wert, selected_method, True, max_runden, gruppen_spalte, trend)
+
+        # Die neu berechneten SD-Regeln haben selbst keine Abhängigen
+        self.filter_auswahl.geaenderte_regeln()
+        return len(abhaengige) > 0
+
+    def regel_setzen(self, new_layer, gruppe, selected_column, parameter, positionen):
+        """ Speichert die Auswahl der Regel (Gruppe, Spalte) als Bitmaske und gibt ihre Anzahl zurück.
+        Maske und Anzahl kommen aus dem Ergebnis-Cache, wenn die Regel mit denselben Parametern auf dem
+        aktuellen Stand des Layers schon berechnet wurde; nur sonst wird positionen() aufgerufen."""
+        spalten = self.spalten(new_layer)
+        fids = spalten.feature_ids()
+
+        def berechnen():
+            treffer = np.zeros(len(fids), dtype=bool)
+            treffer[positionen()] = True
+            return np.packbits(treffer), int(np.count_nonzero(treffer))
+
+        gepackt, anzahl = self.ergebnis_cache.holen(new_layer, selected_column, gruppe, parameter, berechnen)
+        self.filter_auswahl.setzen_gepackt(gruppe, selected_column, gepackt, fids)
+        return anzahl
+
+    def regel_setzen_ids(self, new_layer, gruppe, selected_column, parameter, ids):
+        """ Wie regel_setzen für gestreamte Filter: ids() liefert die Feature-IDs der Treffer, die im Ergebnis-Cache
+        gehalten und direkt an filter_auswahl übergeben werden, ohne Spalten des Layers zu laden."""
+        treffer_ids = self.ergebnis_cache.holen(new_layer, selected_column, gruppe, parameter, ids)
+        self.filter_auswahl.setzen_ids(gruppe, selected_column, treffer_ids)
+        return len(treffer_ids)
+
+    def sd_regel_setzen(self, new_layer, selected_column, multiplikator_wert, selected_method, gefiltert, max_runden=None, gruppen_spalte=None, trend=None):
+        """ Speichert die Auswahl des SD-Filters und gibt ihre Anzahl zurück. Die Maske hängt nur von Methode
+        und Grenzen ab und wird darüber im Ergebnis-Cache wiedergefunden. Mit max_runden wird iterativ gefiltert;
+        Runden und letzte Grenzen stehen danach in sd_iteration. Mit gruppen_spalte gelten Grenzen je Gruppe,
+        mit trend werden die Grenzen auf die Residuen nach Abzug der Trendfläche angewendet."""
+        daten = self.daten_spalte(new_layer, selected_column, trend)
+        # Grenzen auf Residuen sind nicht mit Grenzen auf den Werten vergleichbar
+        trend_parameter = ('Trend',) + tuple(trend) if trend else ()
+
+        if gruppen_spalte:
+            if max_runden:
+                SD_ug, SD_og, positionen, entfernt = self.sd_clipping_gruppiert(
+                    new_layer, daten, gruppen_spalte, multiplikator_wert, selected_method, gefiltert, max_runden)
+                # Grenzen je Gruppe werden nicht einzeln angezeigt
+                self.sd_iteration[selected_column] = (entfernt, None, None)
+                parameter = ('Gruppe', gruppen_spalte, 'iterativ', selected_method, SD_ug.tobytes(), SD_og.tobytes(), len(entfernt))
+                berechnen = lambda: positionen
+            else:
+                self.sd_iteration.pop(selected_column, None)
+                SD_ug, SD_og = self.sd_grenzen_gruppiert(new_layer, daten, gruppen_spalte, multiplikator_wert, gefiltert)
+                parameter = ('Gruppe', gruppen_spalte, selected_method, SD_ug.tobytes(), SD_og.tobytes())
+                berechnen = lambda: self.positionen_ausserhalb_gruppiert(new_layer, daten, gruppen_spalte, selected_method, SD_ug, SD_og)
+            return self.regel_setzen(new_layer, 'Standardabweichung', selected_column, trend_parameter + parameter, berechnen)
+
+        if max_runden:
+            SD_ug, SD_og, positionen, entfernt = self.sd_clipping(new_layer, daten, multiplikator_wert, selected_method, gefiltert, max_runden)
+            # Grenzen auf Residuen werden nicht als Grenzen der Spalte angezeigt
+            self.sd_iteration[selected_column] = (entfernt, None, None) if trend else (entfernt, SD_ug, SD_og)
+            return self.regel_setzen(
+                new_layer, 'Standardabweichung', selected_column, trend_parameter + ('iterativ', selected_method, SD_ug, SD_og, len(entfernt)),
+                lambda: positionen,
+            )
+
+        self.sd_iteration.pop(selected_column, None)
+        SD_ug, SD_og = self.sd_grenzen(new_layer, daten, multiplikator_wert, gefiltert)
+        return self.regel_setzen(
+            new_layer, 'Standardabweichung', selected_column, trend_parameter + (selected_method, SD_ug, SD_og),
+            lambda: self.positionen_ausserhalb(new_layer, daten, selected_method, SD_ug, SD_og),
+        )
+
+    def histogramm(self, new_layer, selected_column, ausgeschlossen=None):
+        """ Gibt (Anzahlen, Klassengrenzen, Kenngrößen) der Spalte ohne NULL und ohne die ausgeschlossenen Punkte
+        zurück: Histogramm mit 50 Klassen wie in matplotlib, Kenngrößen als (Mittelwert, SD, Min, Max, Anzahl) oder
+        None ohne Werte. Das Ergebnis wird je Auswahl (Hash der gepackten Maske) im Ergebnis-Cache gehalten.
+        ausgeschlossen ist an SpaltenCache.feature_ids ausgerichtet. Bei großen Layern wird in einem blockweisen
+        Durchgang gezählt, ohne die Spalte zu laden (siehe histogramm_gestreamt)."""
+        if ausgeschlossen is None:
+            parameter = None
+        else:
+            parameter = hashlib.blake2b(np.packbits(ausgeschlossen), digest_size=16).digest()
+
+        if self.gestreamt(new_layer) and isinstance(selected_column, str):
+            return self.ergebnis_cache.holen(new_layer, selected_column, 'Histogramm', parameter,
+                                             lambda: self.histogramm_gestreamt(new_layer, selected_column, ausgeschlossen))
+
+        def berechnen():
+            werte, null = self.spalten(new_layer).spalte(selected_column)
+            behalten = ~null if ausgeschlossen is None else ~null & ~ausgeschlossen
+            auswahl = werte[behalten]
+            counts, bins = np.histogram(auswahl, bins=50)
+            if len(auswahl) == 0:
+                return counts, bins, None
+            return counts, bins, (np.mean(auswahl), np.std(auswahl), np.min(auswahl), np.max(auswahl), len(auswahl))
+
+        return self.ergebnis_cache.holen(new_layer, selected_column, 'Histogramm', parameter, berechnen)
+
+    def histogramm_gestreamt(self, new_layer, selected_column, ausgeschlossen=None):
+        """ Wie histogramm, aber Histogramm und Kenngrößen in einem blockweisen Durchgang über den Layer. Die 50 Klassen
+        reichen vom Minimum bis zum Maximum der Quantil-Skizze (exakt, für Roh- und gefilterte Daten dieselben
+        Grenzen); Mittelwert und SD werden je Block berechnet und paarweise zusammengeführt (Chan et al.)."""
+        skizze = self.quantil_skizze(new_layer, selected_column)
+        if skizze.anzahl == 0:
+            counts, bins = np.histogram(np.empty(0), bins=50)
+            return counts, bins, None
+        bins = np.histogram_bin_edges([skizze.minimum, skizze.maximum], bins=50)
+
+        fids_alle = self.spalten(new_layer).feature_ids() if ausgeschlossen is not None else None
+        ausgeschlossene_ids = None
+        counts = np.zeros(50, dtype=np.int64)
+        anzahl, mittel, quadratsumme = 0, 0.0, 0.0
+        minimum, maximum = np.inf, -np.inf
+        start = 0
+        for fids, werte in spalte_in_bloecken(new_layer, selected_column):
+            behalten = ~np.isnan(werte)
+            if ausgeschlossen is not None:
+                # Blöcke kommen in der Reihenfolge von feature_ids; sonst (Layer geändert) über die IDs zuordnen
+                if np.array_equal(fids, fids_alle[start:start + len(fids)]):
+                    behalten &= ~ausgeschlossen[start:start + len(fids)]
+                else:
+                    if ausgeschlossene_ids is None:
+                        ausgeschlossene_ids = fids_alle[ausgeschlossen]
+                    behalten &= ~np.isin(fids, ausgeschlossene_ids)
+            start += len(fids)
+
+            auswahl = werte[behalten]
+            if len(auswahl) == 0:
+                continue
+            counts += np.histogram(auswahl, bins=bins)[0]
+            block_mittel = np.mean(auswahl)
+            block_quadratsumme = np.sum((auswahl - block_mittel) ** 2)
+            gesamt = anzahl + len(auswahl)
+            differenz = block_mittel - mittel
+            quadratsumme += block_quadratsumme + differenz ** 2 * anzahl * len(auswahl) / gesamt
+            mittel += differenz * len(auswahl) / gesamt
+            anzahl = gesamt
+            minimum = min(minimum, np.min(auswahl))
+            maximum = max(maximum, np.max(auswahl))
+
+        if anzahl == 0:
+            return counts, bins, None
+        return counts, bins, (mittel, np.sqrt(quadratsumme / anzahl), minimum, maximum, anzahl)
+
     ###### Untergrenze ######
     def filterfunction_untergrenze(self, new_layer):
         """ Diese Funktion filtert die Attribute des Layers basierend auf der ausgewählten Spalte und der Untergrenze.
-        Sie speichert die Zeilenindizes, auf die die Bedingungen zutreffen, in filter_punktauswahl in der Gruppe 'Untergrenze'."""
+        Sie speichert die Punkte, auf die die Bedingungen zutreffen, in filter_auswahl in der Gruppe 'Untergrenze'."""
         
         # Hole den aktuell ausgewählten Spaltennamen aus columnComboBox2
         selected_column = self.dlg.columnComboBox2.currentText()
@@ -942,31 +1664,12 @@ class OFEFilter:
         # Prüfe, ob Index 0 (kleiner als) oder Index 1 (kleiner-gleich) in comboBox_LB ausgewählt ist
         selected_comparison = self.dlg.comboBox_LB.currentIndex()
 
-        # Liste zum Speichern der Zeilenindizes, die die Bedingung erfüllen
-        zeilenindizes = []
-
-        # Hole die Features (Zeilen) des Layers
-        features = new_layer.getFeatures()
-
-        # Hole die Spaltenindex basierend auf dem Spaltennamen
-        field_index = new_layer.fields().indexOf(selected_column)
-
-        # Durchlaufe alle Features (Zeilen) des Layers und prüfe die Bedingung
-        for feature in features:
-            value = feature[field_index]  # Hole den Wert der entsprechenden Spalte
-            
-            if selected_comparison == 0:  # Index 0: "kleiner als"
-                if value < untergrenze_wert:
-                    zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-            elif selected_comparison == 1:  # Index 1: "kleiner-gleich"
-                if value <= untergrenze_wert:
-                    zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-
-        # Speichere die Zeilenindizes in filter_punktauswahl in der Gruppe 'Untergrenze'
-        self.filter_punktauswahl.at[('Untergrenze', selected_column), 'Werte'] = zeilenindizes
-        
-        # Zähle die Anzahl der ausgewählten Zeilen
-        anzahl_ausgewaehlter_zeilen = len(zeilenindizes)
+        # Speichere die Punkte unter der Untergrenze (aus dem sortierten Index, NULL erfüllt keine Bedingung)
+        # als Bitmaske der Regel ('Untergrenze', Spalte) und zähle die ausgewählten Zeilen
+        anzahl_ausgewaehlter_zeilen = self.regel_setzen(
+            new_layer, 'Untergrenze', selected_column, (untergrenze_wert, selected_comparison),
+            lambda: self.positionen_untergrenze(new_layer, selected_column, untergrenze_wert, selected_comparison),
+        )
 
         # Speichere die Anzahl der ausgewählten Zeilen in auswahl_tabelle in der Zeile für 'Untergrenze'
         self.auswahl_tabelle.at[0, selected_column] = anzahl_ausgewaehlter_zeilen
@@ -974,7 +1677,7 @@ class OFEFilter:
     ###### Obergrenze ######
     def filterfunction_obergrenze(self, new_layer):
         """ Diese Funktion filtert die Attribute des Layers basierend auf der ausgewählten Spalte und der Obergrenze.
-        Sie speichert die Zeilenindizes, auf die die Bedingungen zutreffen, in filter_punktauswahl in der Gruppe 'Obergrenze'."""
+        Sie speichert die Punkte, auf die die Bedingungen zutreffen, in filter_auswahl in der Gruppe 'Obergrenze'."""
         
         # Hole den aktuell ausgewählten Spaltennamen aus columnComboBox2
         selected_column = self.dlg.columnComboBox2.currentText()
@@ -985,31 +1688,12 @@ class OFEFilter:
         # Prüfe, ob Index 0 (kleiner als) oder Index 1 (kleiner-gleich) in comboBox_LB ausgewählt ist
         selected_comparison = self.dlg.comboBox_UB.currentIndex()
 
-        # Liste zum Speichern der Zeilenindizes, die die Bedingung erfüllen
-        zeilenindizes = []
-
-        # Hole die Features (Zeilen) des Layers
-        features = new_layer.getFeatures()
-
-        # Hole die Spaltenindex basierend auf dem Spaltennamen
-        field_index = new_layer.fields().indexOf(selected_column)
-
-        # Durchlaufe alle Features (Zeilen) des Layers und prüfe die Bedingung
-        for feature in features:
-            value = feature[field_index]  # Hole den Wert der entsprechenden Spalte
-            
-            if selected_comparison == 0:  # Index 0: "größer als"
-                if value > obergrenze_wert:
-                    zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-            elif selected_comparison == 1:  # Index 1: "größer-gleich"
-                if value >= obergrenze_wert:
-                    zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-
-        # Speichere die Zeilenindizes in filter_punktauswahl in der Gruppe 'Obergrenze'
-        self.filter_punktauswahl.at[('Obergrenze', selected_column), 'Werte'] = zeilenindizes
-        
-        # Zähle die Anzahl der ausgewählten Zeilen
-        anzahl_ausgewaehlter_zeilen = len(zeilenindizes)
+        # Speichere die Punkte über der Obergrenze (aus dem sortierten Index, NULL erfüllt keine Bedingung)
+        # als Bitmaske der Regel ('Obergrenze', Spalte) und zähle die ausgewählten Zeilen
+        anzahl_ausgewaehlter_zeilen = self.regel_setzen(
+            new_layer, 'Obergrenze', selected_column, (obergrenze_wert, selected_comparison),
+            lambda: self.positionen_obergrenze(new_layer, selected_column, obergrenze_wert, selected_comparison),
+        )
 
         # Speichere die Anzahl der ausgewählten Zeilen in auswahl_tabelle in der Zeile für 'Obergrenze'
         self.auswahl_tabelle.at[1, selected_column] = anzahl_ausgewaehlter_zeilen
@@ -1017,7 +1701,7 @@ class OFEFilter:
     ###### Standardabweichung ######
     def filterfunction_sd(self, new_layer):
         """ Diese Funktion filtert die Attribute des Layers basierend auf der ausgewählten Spalte der Standardabweichung und des Multiplikators.
-        Sie speichert die Zeilenindizes, auf die die Bedingungen zutreffen, in filter_punktauswahl in der Gruppe 'Standardabweichung'."""
+        Sie speichert die Punkte, auf die die Bedingungen zutreffen, in filter_auswahl in der Gruppe 'Standardabweichung'."""
         
         # Hole den aktuell ausgewählten Spaltennamen aus columnComboBox2
         selected_column = self.dlg.columnComboBox2.currentText()
@@ -1028,146 +1712,490 @@ class OFEFilter:
         # Hole dir die Methode: 0 = Ober- und Untergrenze, 1 = Untergrenze, 2 = Obergrenze
         selected_method = self.dlg.comboBox_sd.currentIndex()
         
-        # Liste zum Speichern der Zeilenindizes, die die Bedingung erfüllen
-        zeilenindizes = []              
+        # Checkbox-Status holen: SD auf Basis der bereits gefilterten Daten (ohne SD-Filter) berechnen
+        gefiltert = self.dlg.checkBox_SD.isChecked()
+
+        # Iterativ (Sigma-Clipping) bis zur Konvergenz, höchstens über die eingestellte Anzahl Runden
+        max_runden = self.dlg.spinBox_SD_Runden.value() if self.dlg.checkBox_SD_iterativ.isChecked() else None
+
+        # Mittelwert und SD je Gruppe (leer = über alle Punkte)
+        gruppen_spalte = self.dlg.comboBox_Gruppe.currentText() or None
+
+        # Räumlicher Trend, der vorher abgezogen wird (None = Werte direkt filtern)
+        trend = self.dlg.trend_einstellung()
+
+        # Auf gefilterter Basis hängt die Regel von allen übrigen Filtern ab und wird bei deren Änderung neu berechnet
+        if gefiltert:
+            self.filter_auswahl.abhaengigkeit_setzen('Standardabweichung', selected_column, ('Standardabweichung',), (multiplikator_wert, selected_method, max_runden, gruppen_spalte, trend))
+        else:
+            self.filter_auswahl.abhaengigkeit_entfernen('Standardabweichung', selected_column)
+
+        # Speichere die Punkte außerhalb der SD-Grenzen (aus dem sortierten Index, NULL erfüllt keine Bedingung)
+        # als Bitmaske der Regel ('Standardabweichung', Spalte) und zähle die ausgewählten Zeilen
+        anzahl_ausgewaehlter_zeilen = self.sd_regel_setzen(new_layer, selected_column, multiplikator_wert, selected_method, gefiltert, max_runden, gruppen_spalte, trend)
+
+        # Speichere die Anzahl der ausgewählten Zeilen in auswahl_tabelle in der Zeile für 'Standardabweichung'
+        self.auswahl_tabelle.at[2, selected_column] = anzahl_ausgewaehlter_zeilen
+
+    ###### Robuste Verfahren (MAD, IQR, Perzentile) ######
+    def robuste_grenzen(self, new_layer, selected_column, verfahren, multiplikator_wert, perzentil_unten, perzentil_oben):
+        """ Gibt (Untergrenze, Obergrenze) eines robusten Verfahrens zurück: 0 = Median ∓ Multiplikator * MAD (mit 1,4826
+        auf die SD einer Normalverteilung skaliert), 1 = Tukey-Zäune Q1 - Multiplikator * IQR und Q3 + Multiplikator * IQR,
+        2 = untere und obere Perzentile. Median und Quantile werden per linearer Auswahl bestimmt, nicht per Sortierung;
+        bei großen Layern kommen Quartile und Perzentile eines Attributs aus der Quantil-Skizze (Rangfehler siehe
+        QuantilSkizze.fehler), abgeleitete Spalten (Residuen) liegen ohnehin im Spalten-Cache."""
+        spalten = self.spalten(new_layer)
+
+        if verfahren != 0 and self.gestreamt(new_layer) and isinstance(selected_column, str):
+            skizze = self.quantil_skizze(new_layer, selected_column)
+            if verfahren == 1:
+                q1, q3 = skizze.quantile([0.25, 0.75])
+                return q1 - multiplikator_wert * (q3 - q1), q3 + multiplikator_wert * (q3 - q1)
+            unten, oben = skizze.quantile([perzentil_unten / 100, perzentil_oben / 100])
+            return unten, oben
+
+        if verfahren == 0:
+            median, mad = spalten.median_mad(selected_column)
+            return median - multiplikator_wert * 1.4826 * mad, median + multiplikator_wert * 1.4826 * mad
+        elif verfahren == 1:
+            q1, q3 = spalten.quantile(selected_column, [0.25, 0.75])
+            return q1 - multiplikator_wert * (q3 - q1), q3 + multiplikator_wert * (q3 - q1)
+        else:
+            unten, oben = spalten.quantile(selected_column, [perzentil_unten / 100, perzentil_oben / 100])
+            return unten, oben
+
+    def filterfunction_robust(self, new_layer):
+        """ Diese Funktion filtert die Attribute des Layers mit dem im Dialog gewählten robusten Verfahren.
+        Sie speichert die Punkte außerhalb der Grenzen in filter_auswahl in der Gruppe 'MAD', 'IQR' bzw. 'Perzentil'.
+        Gibt die Grenzen zurück (bei Gruppierung als Arrays je Gruppencode)."""
         
-        # Checkbox-Status holen
-        if self.dlg.checkBox_SD.isChecked() and self.punktauswahl_gesamt is not None:
-               
-            filter_punktauswahl_ohne_SD = self.filter_punktauswahl.loc[self.filter_punktauswahl.index.get_level_values('Gruppe') != 'Standardabweichung']
-                                 
-            # Liste zum Speichern der zusammengeführten Zeilenindizes
-            punktauswahl_gesamt_ohne_SD = []
-            
-            # Iteriere durch alle Einträge des DataFrame filter_punktauswahl_ohne_SD
-            for row in filter_punktauswahl_ohne_SD['Werte']:
-                # Überprüfe, ob die Liste nicht leer ist
-                if isinstance(row, list) and len(row) > 0:
-                    # Füge die Werte der aktuellen Liste zu punktauswahl_gesamt_ohne_SD hinzu
-                    punktauswahl_gesamt_ohne_SD.extend(row)
-
-            # Entferne Duplikate durch Umwandlung in eine Menge (set) und zurück zu einer Liste
-            punktauswahl_gesamt_ohne_SD = list(set(punktauswahl_gesamt_ohne_SD))
-
-            # Sortiere die Liste in aufsteigender Reihenfolge
-            punktauswahl_gesamt_ohne_SD.sort()
-                                 
-            alle_filter_punkte = punktauswahl_gesamt_ohne_SD               
-            alle_filter_punkte_flat = list(itertools.chain.from_iterable(alle_filter_punkte)) if any(isinstance(i, list) for i in alle_filter_punkte) else alle_filter_punkte               
-            alle_filter_punkte_set = set(alle_filter_punkte_flat)
-            
-            # Erstelle die gefilterten Daten
-            filtered_values = []
-            for feat in self.dlg.new_layer.getFeatures():
-                feat_id = feat.id()
-                if feat_id not in alle_filter_punkte_set and feat[selected_column] is not None and self.dlg.is_numeric(feat[selected_column]):
-                    filtered_values.append(float(feat[selected_column])) 
-             
-            # Berechne die Standardabweichung
-            SD = np.std(filtered_values)
-            
-            # Berechne den Mittelwert
-            MEAN = np.mean(filtered_values)
-            
-            # Berechne Ober- und Untergrenze
-            SD_og = MEAN + (multiplikator_wert * SD)
-            SD_ug = MEAN - (multiplikator_wert * SD)
-         
-            # Liste zum Speichern der Zeilenindizes, die die Bedingung erfüllen
-            zeilenindizes = []              
-            
-            # Hole die Features (Zeilen) des Layers
-            features = new_layer.getFeatures()
+        # Hole den aktuell ausgewählten Spaltennamen aus columnComboBox2
+        selected_column = self.dlg.columnComboBox2.currentText()
 
-            # Hole die Spaltenindex basierend auf dem Spaltennamen
-            field_index = new_layer.fields().indexOf(selected_column)
+        # Hole Verfahren (0 = MAD, 1 = IQR, 2 = Perzentile), Methode (0 = Ober- und Untergrenze, 1 = Untergrenze, 2 = Obergrenze) und Parameter
+        verfahren = self.dlg.comboBox_robust.currentIndex()
+        selected_method = self.dlg.comboBox_robust_seite.currentIndex()
+        multiplikator_wert = self.dlg.doubleSpinBox_robust_k.value()
+        perzentil_unten = self.dlg.doubleSpinBox_robust_p_unten.value()
+        perzentil_oben = self.dlg.doubleSpinBox_robust_p_oben.value()
+
+        # Grenzen je Gruppe (leer = über alle Punkte)
+        gruppen_spalte = self.dlg.comboBox_Gruppe.currentText() or None
+
+        # Räumlicher Trend, der vorher abgezogen wird (None = Werte direkt filtern); die Grenzen gelten dann für die Residuen
+        trend = self.dlg.trend_einstellung()
+
+        untergrenze, obergrenze, anzahl_ausgewaehlter_zeilen = self.robust_regel_setzen(
+            new_layer, selected_column, verfahren, selected_method, multiplikator_wert, perzentil_unten, perzentil_oben, gruppen_spalte, trend)
+
+        # Speichere die Anzahl der ausgewählten Zeilen in auswahl_tabelle in der Zeile des Verfahrens (3 = MAD, 4 = IQR, 5 = Perzentil)
+        self.auswahl_tabelle.at[3 + verfahren, selected_column] = anzahl_ausgewaehlter_zeilen
+
+        return untergrenze, obergrenze
+
+    def robust_regel_setzen(self, new_layer, selected_column, verfahren, selected_method, multiplikator_wert, perzentil_unten, perzentil_oben, gruppen_spalte=None, trend=None):
+        """ Speichert die Auswahl eines robusten Verfahrens für eine Spalte und gibt (Untergrenze, Obergrenze, Anzahl)
+        zurück. Mit gruppen_spalte gelten Grenzen je Gruppe (als Arrays je Gruppencode), mit trend werden die Grenzen
+        auf die Residuen nach Abzug der Trendfläche angewendet."""
+        gruppe = ROBUSTE_VERFAHREN[verfahren]
+        daten = self.daten_spalte(new_layer, selected_column, trend)
+        trend_parameter = ('Trend',) + tuple(trend) if trend else ()
+
+        if gruppen_spalte:
+            # Grenzen je Gruppe aus der nach (Gruppe, Wert) sortierten Spalte
+            untergrenze, obergrenze = self.robuste_grenzen_gruppiert(new_layer, daten, gruppen_spalte, verfahren, multiplikator_wert, perzentil_unten, perzentil_oben)
+            anzahl = self.regel_setzen(
+                new_layer, gruppe, selected_column, trend_parameter + ('Gruppe', gruppen_spalte, selected_method, untergrenze.tobytes(), obergrenze.tobytes()),
+                lambda: self.positionen_ausserhalb_gruppiert(new_layer, daten, gruppen_spalte, selected_method, untergrenze, obergrenze),
+            )
+            return untergrenze, obergrenze, anzahl
+
+        # Grenzen aus Median/MAD bzw. Quantilen der Spalte
+        untergrenze, obergrenze = self.robuste_grenzen(new_layer, daten, verfahren, multiplikator_wert, perzentil_unten, perzentil_oben)
+
+        # Speichere die Punkte außerhalb der Grenzen (aus dem sortierten Index, NULL erfüllt keine Bedingung)
+        # als Bitmaske der Regel (Verfahren, Spalte) und zähle die ausgewählten Zeilen
+        # (bei großen Layern mit Quartilen/Perzentilen aus der Skizze blockweise, ohne die Spalte zu laden)
+        if verfahren != 0 and self.gestreamt(new_layer) and not trend:
+            anzahl = self.regel_setzen_ids(
+                new_layer, gruppe, selected_column, ('Feature-IDs', selected_method, untergrenze, obergrenze),
+                lambda: self.ids_ausserhalb_gestreamt(new_layer, daten, selected_method, untergrenze, obergrenze),
+            )
+        else:
+            anzahl = self.regel_setzen(
+                new_layer, gruppe, selected_column, trend_parameter + (selected_method, untergrenze, obergrenze),
+                lambda: self.positionen_ausserhalb(new_layer, daten, selected_method, untergrenze, obergrenze),
+            )
+        return untergrenze, obergrenze, anzahl
+
+    def filterfunction_robust_spalten(self, new_layer, spalten_liste):
+        """ Wendet das robuste Verfahren mit Methode und Parametern aus dem Dialog auf mehrere Spalten in einem
+        Durchgang an: Median/MAD bzw. Quantile werden über den 2-D-Block der Spalten berechnet. Die Auswahl jeder
+        Spalte wird über regel_setzen als eigene Regel (Verfahren, Spalte) gespeichert, sodass sie im Ergebnis-Cache
+        mit dem Filter einer einzelnen Spalte übereinstimmt; die Anzahlen stehen in auswahl_tabelle.
+        Gibt die Anzahlen je Spalte zurück."""
+        verfahren = self.dlg.comboBox_robust.currentIndex()
+        selected_method = self.dlg.comboBox_robust_seite.currentIndex()
+        multiplikator_wert = self.dlg.doubleSpinBox_robust_k.value()
+        perzentil_unten = self.dlg.doubleSpinBox_robust_p_unten.value()
+        perzentil_oben = self.dlg.doubleSpinBox_robust_p_oben.value()
+
+        gruppen_spalte = self.dlg.comboBox_Gruppe.currentText() or None
+        trend = self.dlg.trend_einstellung()
+        gruppe = ROBUSTE_VERFAHREN[verfahren]
+
+        if gruppen_spalte or trend or (verfahren != 0 and self.gestreamt(new_layer)):
+            # Gruppiert hat jede Spalte eigene Grenzen je Gruppe, mit Trend eigene Residuen, große Layer werden
+            # blockweise gelesen statt als Block geladen: Spalte für Spalte filtern
+            anzahlen = np.asarray([
+                self.robust_regel_setzen(new_layer, selected_column, verfahren, selected_method, multiplikator_wert,
+                                         perzentil_unten, perzentil_oben, gruppen_spalte, trend)[2]
+                for selected_column in spalten_liste
+            ])
+            self.auswahl_tabelle.loc[3 + verfahren, spalten_liste] = anzahlen.tolist()
+            return anzahlen
+
+        # Werte aller Spalten als Block (Punkte x Spalten), NULL ist NaN; Spalten ganz ohne Werte haben keine Grenzen
+        block = self.spalten(new_layer).block(spalten_liste)
+        mit_werten = ~np.all(np.isnan(block), axis=0)
+        werte = block[:, mit_werten]
+        untergrenzen = np.full(len(spalten_liste), np.nan)
+        obergrenzen = np.full(len(spalten_liste), np.nan)
+
+        # Grenzen je Spalte wie robuste_grenzen (lineare Interpolation der Quantile wie np.quantile)
+        if verfahren == 0:
+            median = np.nanquantile(werte, 0.5, axis=0)
+            mad = np.nanquantile(np.abs(werte - median), 0.5, axis=0)
+            untergrenzen[mit_werten] = median - multiplikator_wert * 1.4826 * mad
+            obergrenzen[mit_werten] = median + multiplikator_wert * 1.4826 * mad
+        elif verfahren == 1:
+            q1, q3 = np.nanquantile(werte, [0.25, 0.75], axis=0)
+            untergrenzen[mit_werten] = q1 - multiplikator_wert * (q3 - q1)
+            obergrenzen[mit_werten] = q3 + multiplikator_wert * (q3 - q1)
+        else:
+            untergrenzen[mit_werten], obergrenzen[mit_werten] = np.nanquantile(werte, [perzentil_unten / 100, perzentil_oben / 100], axis=0)
 
-            # Hole dir die Werte
-            values = [float(feat[selected_column]) for feat in self.dlg.new_layer.getFeatures() if feat[selected_column] is not None and self.dlg.is_numeric(feat[selected_column])]
-            
-            # Hole die Features (Zeilen) des Layers
-            features = new_layer.getFeatures()
+        # Eine Regel je Spalte; die Treffer werden nur für Spalten berechnet, die nicht im Ergebnis-Cache stehen
+        anzahlen = np.asarray([
+            self.regel_setzen(
+                new_layer, gruppe, selected_column, (selected_method, untergrenzen[j], obergrenzen[j]),
+                lambda j=j: self.positionen_ausserhalb_werte(block[:, j], selected_method, untergrenzen[j], obergrenzen[j]),
+            )
+            for j, selected_column in enumerate(spalten_liste)
+        ])
 
-            # Hole die Spaltenindex basierend auf dem Spaltennamen
-            field_index = new_layer.fields().indexOf(selected_column)
-            
-            # Durchlaufe alle Features (Zeilen) des Layers und prüfe die Bedingung
-            for feature in features:
-                value = feature[field_index]  # Hole den Wert der entsprechenden Spalte
-                
-                if selected_method == 0:  # Index 0: "Ober- und Untergrenze"
-                    if value > SD_og:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-                    elif value < SD_ug:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-                elif selected_method == 1:  # Index 1: "Untergrenze"
-                    if value < SD_ug:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-                elif selected_method == 2:  # Index 1: "Obergrenze"
-                    if value > SD_og:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-
-            # Speichere die Zeilenindizes in filter_punktauswahl in der Gruppe 'Standardabweichung'
-            self.filter_punktauswahl.at[('Standardabweichung', selected_column), 'Werte'] = zeilenindizes
-            
-            # Zähle die Anzahl der ausgewählten Zeilen
-            anzahl_ausgewaehlter_zeilen = len(zeilenindizes)
+        # Anzahlen aller Spalten in einem Schritt in die Zeile des Verfahrens schreiben
+        self.auswahl_tabelle.loc[3 + verfahren, spalten_liste] = anzahlen.tolist()
+
+        return anzahlen
+
+    def filterfunction_sd_spalten(self, new_layer, spalten_liste):
+        """ Wendet den SD-Filter mit Multiplikator, Methode und Basis aus dem Dialog auf mehrere Spalten in einem
+        Durchgang an: Mittelwert und SD werden über den 2-D-Block der Spalten berechnet. Die Auswahl jeder Spalte
+        wird über regel_setzen als eigene Regel ('Standardabweichung', Spalte) gespeichert, die Anzahlen in auswahl_tabelle.
+        Gibt die Anzahlen je Spalte zurück."""
+        multiplikator_wert = self.dlg.doubleSpinBox_SD.value()
+        selected_method = self.dlg.comboBox_sd.currentIndex()
+        gefiltert = self.dlg.checkBox_SD.isChecked()
+
+        max_runden = self.dlg.spinBox_SD_Runden.value() if self.dlg.checkBox_SD_iterativ.isChecked() else None
+        gruppen_spalte = self.dlg.comboBox_Gruppe.currentText() or None
+        trend = self.dlg.trend_einstellung()
+
+        if max_runden or gruppen_spalte or trend:
+            # Iterativ konvergiert jede Spalte in eigenen Runden, gruppiert hat jede Spalte eigene Kennwerte je Gruppe,
+            # mit Trend eigene Residuen: Spalte für Spalte filtern
+            anzahlen = []
+            for selected_column in spalten_liste:
+                if gefiltert:
+                    self.filter_auswahl.abhaengigkeit_setzen('Standardabweichung', selected_column, ('Standardabweichung',), (multiplikator_wert, selected_method, max_runden, gruppen_spalte, trend))
+                else:
+                    self.filter_auswahl.abhaengigkeit_entfernen('Standardabweichung', selected_column)
+                anzahlen.append(self.sd_regel_setzen(new_layer, selected_column, multiplikator_wert, selected_method, gefiltert, max_runden, gruppen_spalte, trend))
+            anzahlen = np.asarray(anzahlen)
+            self.auswahl_tabelle.loc[2, spalten_liste] = anzahlen.tolist()
+            return anzahlen
+
+        # Werte aller Spalten als Block (Punkte x Spalten), NULL ist NaN
+        spalten = self.spalten(new_layer)
+        block = spalten.block(spalten_liste)
+
+        # Basis für Mittelwert und SD: bei gefilterter Basis ohne die Punkte der übrigen Filter (ohne SD-Filter)
+        basis = block
+        if gefiltert:
+            ausgeschlossen = self.filter_auswahl.maske_fuer(spalten.fids, ohne_gruppen=('Standardabweichung',))
+            basis = np.where(ausgeschlossen[:, None], np.nan, block)
+
+        # Mittelwert und SD je Spalte (wie np.mean/np.std über die Nicht-NULL-Werte der Basis)
+        anzahl_basis = np.count_nonzero(~np.isnan(basis), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            MEAN = np.nansum(basis, axis=0) / anzahl_basis
+            SD = np.sqrt(np.nansum((basis - MEAN) ** 2, axis=0) / anzahl_basis)
+
+        SD_og = MEAN + (multiplikator_wert * SD)
+        SD_ug = MEAN - (multiplikator_wert * SD)
+
+        # Eine Regel je Spalte über regel_setzen, damit Ergebnis-Cache und Filter einzelner Spalten übereinstimmen;
+        # die Treffer werden nur für Spalten berechnet, die nicht im Ergebnis-Cache stehen (NaN erfüllt keine Bedingung)
+        anzahlen = []
+        for j, selected_column in enumerate(spalten_liste):
+            if gefiltert:
+                self.filter_auswahl.abhaengigkeit_setzen('Standardabweichung', selected_column, ('Standardabweichung',), (multiplikator_wert, selected_method, None, None, None))
+            else:
+                self.filter_auswahl.abhaengigkeit_entfernen('Standardabweichung', selected_column)
+            self.sd_iteration.pop(selected_column, None)
+            anzahlen.append(self.regel_setzen(
+                new_layer, 'Standardabweichung', selected_column, (selected_method, SD_ug[j], SD_og[j]),
+                lambda j=j: self.positionen_ausserhalb_werte(block[:, j], selected_method, SD_ug[j], SD_og[j]),
+            ))
+        anzahlen = np.asarray(anzahlen)
+
+        # Anzahlen aller Spalten in einem Schritt in die Zeile für 'Standardabweichung' schreiben
+        self.auswahl_tabelle.loc[2, spalten_liste] = anzahlen.tolist()
+
+        return anzahlen
+
+    ###### Mahalanobis ######
+    def mahalanobis_schaetzung(self, new_layer, spalten_liste):
+        """ Robuste Schätzung (Zentrum, Kovarianz) der Spalten nach MCD auf einer zufälligen Stichprobe von höchstens
+        mcd_stichprobe Punkten ohne NULL in einer der Spalten. Das Ergebnis wird im Ergebnis-Cache gehalten, sodass
+        ein anderes Quantil nicht neu schätzt. Gibt None zurück, wenn zu wenige vollständige Punkte vorhanden sind."""
+        spalten = self.spalten(new_layer)
+
+        def berechnen():
+            null = np.zeros(len(spalten.fids), dtype=bool)
+            for name in spalten_liste:
+                null |= spalten.spalte(name)[1]
+            vollstaendig = np.flatnonzero(~null)
+            if len(vollstaendig) <= len(spalten_liste):
+                return None
+            if len(vollstaendig) > self.mcd_stichprobe:
+                # Feste Saat: dieselben Spalten ergeben dieselbe Schätzung
+                rng = np.random.default_rng(0)
+                vollstaendig = np.sort(rng.choice(vollstaendig, self.mcd_stichprobe, replace=False))
+            daten = np.column_stack([spalten.spalte(name)[0][vollstaendig] for name in spalten_liste])
+            return mcd_schaetzen(daten)
+
+        return self.ergebnis_cache.holen(new_layer, tuple(spalten_liste), 'MCD', self.mcd_stichprobe, berechnen)
+
+    def filterfunction_mahalanobis(self, new_layer, spalten_liste):
+        """ Wählt die Punkte aus, deren quadrierte Mahalanobis-Distanz zur robusten Schätzung der Spalten das Quantil
+        aus doubleSpinBox_Maha_Quantil der Chi-Quadrat-Verteilung (Freiheitsgrade = Anzahl Spalten) überschreitet.
+        Die Distanzen werden blockweise aus dem Spalten-Cache berechnet, Punkte mit NULL werden nicht ausgewählt.
+        Die Auswahl wird als Regel ('Mahalanobis', '') gespeichert, die Anzahl in auswahl_tabelle bei allen
+        beteiligten Spalten. Gibt die Anzahl zurück, None bei zu wenigen vollständigen Punkten."""
+        quantil = self.dlg.doubleSpinBox_Maha_Quantil.value()
+
+        schaetzung = self.mahalanobis_schaetzung(new_layer, spalten_liste)
+        if schaetzung is None:
+            return None
+        zentrum, kovarianz = schaetzung
+        grenze = grenzwert(quantil / 100, len(spalten_liste))
+
+        def positionen():
+            spalten = self.spalten(new_layer)
+            d2 = abstand_quadrat([spalten.spalte(name)[0] for name in spalten_liste], zentrum, kovarianz)
+            return np.flatnonzero(d2 > grenze)
+
+        anzahl = self.regel_setzen(new_layer, 'Mahalanobis', '', (tuple(spalten_liste), quantil), positionen)
+
+        # Nur eine Mahalanobis-Regel: Anzahl bei den zuvor beteiligten Spalten entfernen
+        self.auswahl_tabelle.loc[6, self.auswahl_tabelle.columns[1:]] = None
+        self.auswahl_tabelle.loc[6, spalten_liste] = anzahl
+        return anzahl
+
+    ###### Lokal ######
+    def koordinaten_ausrichten(self, punkte, fids):
+        """ Gibt (x, y) der Punkte aus dem Zuschnitt-Zustand ausgerichtet an den Feature-IDs fids zurück."""
+        if np.array_equal(punkte.fids, fids):
+            return punkte.x, punkte.y
+        # Koordinaten über die Feature-IDs den Positionen des Spalten-Caches zuordnen
+        reihenfolge = np.argsort(punkte.fids)
+        positionen = reihenfolge[np.searchsorted(punkte.fids, fids, sorter=reihenfolge)]
+        return punkte.x[positionen], punkte.y[positionen]
+
+    def nachbar_index_fuer(self, new_layer):
+        """ Gibt den KD-Baum über die Punkte des new_layer zurück, ausgerichtet an den Positionen des Spalten-Caches.
+        Die Koordinaten kommen aus dem Zuschnitt-Zustand; der Baum wird nur neu aufgebaut, wenn die Punkte neu
+        gelesen wurden oder sich die Feature-IDs geändert haben, nicht bei anderem k, Radius oder Multiplikator."""
+        punkte = self.zuschnitt_zustand_fuer(new_layer).punkte
+        fids = self.spalten(new_layer).feature_ids()
+
+        if (
+            self.nachbar_index is None
+            or self.nachbar_index[0] is not punkte
+            or not np.array_equal(self.nachbar_index[1], fids)
+        ):
+            x, y = self.koordinaten_ausrichten(punkte, fids)
+            self.nachbar_index = (punkte, fids, NachbarIndex(x, y, self.kdtree_workers))
+        return self.nachbar_index[2]
+
+    def nachbarschaft_zu_gross(self, new_layer, k, radius):
+        """ Prüft, ob die Nachbarschaft (k nächste Nachbarn oder Radius) bei einem Punkt mehr als MAX_NACHBARN Nachbarn
+        umfasst. Im Radius wird nur gezählt; solche Nachbarschaften werden nicht abgefragt, da Speicher und Laufzeit mit
+        der Anzahl der Nachbarn wachsen."""
+        return self.nachbar_index_fuer(new_layer).max_nachbarn(k, radius) > MAX_NACHBARN
+
+    def lokale_median_mad(self, new_layer, selected_column, k, radius):
+        """ Median und MAD der Nachbarschaft (k nächste Nachbarn oder Radius) je Punkt. Beides wird im Ergebnis-Cache
+        gehalten, sodass ein anderer Multiplikator oder eine andere Methode die Nachbarn nicht erneut abfragt."""
+        def berechnen():
+            werte, _ = self.spalten(new_layer).spalte(selected_column)
+            return self.nachbar_index_fuer(new_layer).median_mad(werte, k, radius)
+
+        return self.ergebnis_cache.holen(new_layer, selected_column, 'Nachbarschaft', (k, radius), berechnen)
+
+    def positionen_lokal(self, new_layer, selected_column, k, radius, multiplikator_wert, selected_method):
+        """ Positionen der Punkte, die um mehr als Multiplikator * MAD (mit 1,4826 auf die SD skaliert) vom Median
+        ihrer Nachbarschaft abweichen. Punkte ohne Wert oder mit zu wenigen Nachbarn werden nicht ausgewählt."""
+        werte, _ = self.spalten(new_layer).spalte(selected_column)
+        median, mad = self.lokale_median_mad(new_layer, selected_column, k, radius)
+        return self.positionen_abweichung(werte, median, mad, multiplikator_wert, selected_method)
+
+    def positionen_abweichung(self, werte, median, mad, multiplikator_wert, selected_method):
+        """ Positionen der Werte, die um mehr als Multiplikator * MAD (mit 1,4826 auf die SD skaliert) vom Median
+        (beides je Punkt) abweichen; gemeinsam für den lokalen Filter und den Hampel-Filter."""
+        abweichung = werte - median
+        grenze = multiplikator_wert * 1.4826 * mad
+
+        # NaN erfüllt keine Bedingung
+        if selected_method == 0:  # Index 0: "Ober- und Untergrenze"
+            treffer = np.abs(abweichung) > grenze
+        elif selected_method == 1:  # Index 1: "Untergrenze"
+            treffer = abweichung < -grenze
+        else:  # Index 2: "Obergrenze"
+            treffer = abweichung > grenze
+        return np.flatnonzero(treffer)
+
+    def filterfunction_lokal(self, new_layer):
+        """ Wendet den lokalen Filter mit Nachbarschaft, Multiplikator und Methode aus dem Dialog auf die Spalte aus
+        columnComboBox2 an. Die Auswahl wird als Regel ('Lokal', Spalte) gespeichert, die Anzahl in auswahl_tabelle
+        und zurückgegeben; None, wenn die Nachbarschaft mehr als MAX_NACHBARN Punkte umfasst."""
+        selected_column = self.dlg.columnComboBox2.currentText()
+        multiplikator_wert = self.dlg.doubleSpinBox_lokal_mult.value()
+        selected_method = self.dlg.comboBox_lokal_seite.currentIndex()
 
-            # Speichere die Anzahl der ausgewählten Zeilen in auswahl_tabelle in der Zeile für 'Standardabweichung'
-            self.auswahl_tabelle.at[2, selected_column] = anzahl_ausgewaehlter_zeilen
+        # Index 0: k nächste Nachbarn, Index 1: alle Nachbarn im Radius
+        if self.dlg.comboBox_lokal_modus.currentIndex() == 0:
+            k, radius = self.dlg.spinBox_lokal_k.value(), None
         else:
-            # Hole die Features (Zeilen) des Layers
-            features = new_layer.getFeatures()
+            k, radius = None, self.dlg.doubleSpinBox_lokal_radius.value()
 
-            # Hole die Spaltenindex basierend auf dem Spaltennamen
-            field_index = new_layer.fields().indexOf(selected_column)
+        # Zu große Nachbarschaften werden nicht berechnet
+        if self.nachbarschaft_zu_gross(new_layer, k, radius):
+            return None
 
-            # Hole dir die Werte
-            values = [float(feat[selected_column]) for feat in self.dlg.new_layer.getFeatures() if feat[selected_column] is not None and self.dlg.is_numeric(feat[selected_column])]
-            
-            # Berechne die Standardabweichung
-            SD = np.std(values)
-            
-            # Berechne den Mittelwert
-            MEAN = np.mean(values)
-            
-            # Berechne Ober- und Untergrenze
-            SD_og = MEAN + (multiplikator_wert * SD)
-            SD_ug = MEAN - (multiplikator_wert * SD)
-         
-            # Liste zum Speichern der Zeilenindizes, die die Bedingung erfüllen
-            zeilenindizes = []              
-            
-            # Hole die Features (Zeilen) des Layers
-            features = new_layer.getFeatures()
+        anzahl = self.regel_setzen(
+            new_layer, 'Lokal', selected_column, (k, radius, multiplikator_wert, selected_method),
+            lambda: self.positionen_lokal(new_layer, selected_column, k, radius, multiplikator_wert, selected_method),
+        )
+        self.auswahl_tabelle.at[7, selected_column] = anzahl
+        return anzahl
+
+    ###### Moran's I ######
+    def moran_gewichte_fuer(self, new_layer, k, radius):
+        """ Gibt die binäre Gewichtsmatrix (k nächste Nachbarn oder Distanzband) über die Punkte des new_layer zurück.
+        Sie wird aus dem KD-Baum des lokalen Filters einmal aufgebaut und für alle Spalten, Signifikanzniveaus und
+        Permutationen wiederverwendet, bis sich Nachbarschaft oder Punkte ändern."""
+        index = self.nachbar_index_fuer(new_layer)
+        if self.moran_gewichte is None or self.moran_gewichte[0] is not index or self.moran_gewichte[1] != (k, radius):
+            self.moran_gewichte = (index, (k, radius), index.gewichte(k, radius))
+        return self.moran_gewichte[2]
+
+    def lokales_moran_ergebnis(self, new_layer, selected_column, k, radius, permutationen):
+        """ Gibt (I, z, Lag, p) je Punkt für die Spalte zurück; p aus permutationen bedingten Permutationen oder ohne
+        Permutationen (None) aus dem analytischen Test. Das Ergebnis wird im Ergebnis-Cache gehalten, sodass ein
+        anderes Signifikanzniveau oder ein anderer Typ nichts neu berechnet."""
+        def berechnen():
+            werte, _ = self.spalten(new_layer).spalte(selected_column)
+            lokal_i, z, lag, anzahl = lokales_moran(self.moran_gewichte_fuer(new_layer, k, radius), werte)
+            if permutationen:
+                p = p_werte_permutation(z, lag, anzahl, permutationen)
+            else:
+                p = p_werte_analytisch(lokal_i, z, anzahl)
+            return lokal_i, z, lag, p
 
-            # Hole die Spaltenindex basierend auf dem Spaltennamen
-            field_index = new_layer.fields().indexOf(selected_column)
-            
-            # Durchlaufe alle Features (Zeilen) des Layers und prüfe die Bedingung
-            for feature in features:
-                value = feature[field_index]  # Hole den Wert der entsprechenden Spalte
-                
-                if selected_method == 0:  # Index 0: "Ober- und Untergrenze"
-                    if value > SD_og:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-                    elif value < SD_ug:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-                elif selected_method == 1:  # Index 1: "Untergrenze"
-                    if value < SD_ug:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-                elif selected_method == 2:  # Index 1: "Obergrenze"
-                    if value > SD_og:
-                        zeilenindizes.append(feature.id())  # Speichere den Zeilenindex
-
-            # Speichere die Zeilenindizes in filter_punktauswahl in der Gruppe 'Standardabweichung'
-            self.filter_punktauswahl.at[('Standardabweichung', selected_column), 'Werte'] = zeilenindizes
-            
-            # Zähle die Anzahl der ausgewählten Zeilen
-            anzahl_ausgewaehlter_zeilen = len(zeilenindizes)
+        return self.ergebnis_cache.holen(new_layer, selected_column, 'Moran', (k, radius, permutationen), berechnen)
+
+    def filterfunction_moran(self, new_layer):
+        """ Wählt die räumlichen Ausreißer (Hoch-Niedrig und/oder Niedrig-Hoch) der Spalte aus columnComboBox2 nach dem
+        lokalen Moran's I aus, deren p-Wert unter dem Signifikanzniveau liegt. Die Auswahl wird als Regel
+        ('Moran', Spalte) gespeichert, die Anzahl in auswahl_tabelle und zurückgegeben; None, wenn das Distanzband
+        mehr als MAX_NACHBARN Punkte umfasst."""
+        selected_column = self.dlg.columnComboBox2.currentText()
+        typ = self.dlg.comboBox_moran_typ.currentIndex()
+        alpha = self.dlg.doubleSpinBox_moran_alpha.value()
+        permutationen = self.dlg.spinBox_moran_permutationen.value() if self.dlg.checkBox_moran_permutation.isChecked() else None
 
-            # Speichere die Anzahl der ausgewählten Zeilen in auswahl_tabelle in der Zeile für 'Standardabweichung'
-            self.auswahl_tabelle.at[2, selected_column] = anzahl_ausgewaehlter_zeilen
+        # Index 0: k nächste Nachbarn, Index 1: Distanzband
+        if self.dlg.comboBox_moran_modus.currentIndex() == 0:
+            k, radius = self.dlg.spinBox_moran_k.value(), None
+        else:
+            k, radius = None, self.dlg.doubleSpinBox_moran_radius.value()
+
+        # Zu große Distanzbänder werden nicht als Gewichtsmatrix aufgebaut
+        if self.nachbarschaft_zu_gross(new_layer, k, radius):
+            return None
+
+        def positionen():
+            lokal_i, z, lag, p = self.lokales_moran_ergebnis(new_layer, selected_column, k, radius, permutationen)
+            return np.flatnonzero(moran_ausreisser(lokal_i, z, lag, p, alpha, typ))
+
+        anzahl = self.regel_setzen(new_layer, 'Moran', selected_column, (k, radius, permutationen, alpha, typ), positionen)
+        self.auswahl_tabelle.at[8, selected_column] = anzahl
+        return anzahl
+
+    ###### Hampel ######
+    def fahrspur_nummern(self, new_layer, zeit_spalte, max_zeitdifferenz, spur_attribut=None, schwelle=None):
+        """ Gibt die Fahrspur je Position im Spalten-Cache zurück. Wie in UeberlappungFilter.process_timestamps
+        werden die Punkte in der Reihenfolge des Layers (Aufzeichnungsreihenfolge) an Zeitlücken getrennt und,
+        falls spur_attribut gewählt ist, an Sprüngen dieses Attributs um mehr als schwelle."""
+        spalten = self.spalten(new_layer)
+        attribut = spalten.spalte(spur_attribut)[0] if spur_attribut else None
+        zeit = spalten.zeitstempel(zeit_spalte)
+        spur, _ = fahrspuren(zeit, max_zeitdifferenz, attribut, schwelle if spur_attribut else None)
+        return spur
+
+    def hampel_median_mad(self, new_layer, selected_column, zeit_spalte, max_zeitdifferenz, spur_attribut, schwelle, halbe_breite):
+        """ Median und MAD im gleitenden Fenster entlang der Fahrspur je Punkt. Beides wird im Ergebnis-Cache
+        gehalten, sodass ein anderer Multiplikator oder eine andere Methode nichts neu berechnet."""
+        def berechnen():
+            spur = self.fahrspur_nummern(new_layer, zeit_spalte, max_zeitdifferenz, spur_attribut, schwelle)
+            werte, _ = self.spalten(new_layer).spalte(selected_column)
+            return laufender_median_mad(werte, spur, halbe_breite)
+
+        parameter = (zeit_spalte, max_zeitdifferenz, spur_attribut, schwelle, halbe_breite)
+        return self.ergebnis_cache.holen(new_layer, selected_column, 'Hampel', parameter, berechnen)
+
+    def filterfunction_hampel(self, new_layer):
+        """ Wendet den Hampel-Filter (gleitender Median +- Multiplikator * MAD je Fahrspur in der Reihenfolge der
+        Aufzeichnung) auf die Spalte aus columnComboBox2 an. Die Auswahl wird als Regel ('Hampel', Spalte)
+        gespeichert, die Anzahl in auswahl_tabelle. Gibt ohne lesbare Zeitstempel None zurück."""
+        selected_column = self.dlg.columnComboBox2.currentText()
+        zeit_spalte = self.dlg.comboBox_hampel_zeit.currentText()
+        max_zeitdifferenz = self.dlg.doubleSpinBox_hampel_luecke.value()
+        halbe_breite = self.dlg.spinBox_hampel_fenster.value()
+        multiplikator_wert = self.dlg.doubleSpinBox_hampel_mult.value()
+        selected_method = self.dlg.comboBox_hampel_seite.currentIndex()
+
+        # Optional: neue Fahrspur, wenn sich ein Attribut (z.B. Spur- oder Schlag-ID) um mehr als die Schwelle ändert
+        spur_attribut = self.dlg.comboBox_hampel_spur.currentText() or None
+        schwelle = self.dlg.doubleSpinBox_hampel_spur_schwelle.value() if spur_attribut else None
+
+        if not zeit_spalte or np.isnan(self.spalten(new_layer).zeitstempel(zeit_spalte)).all():
+            return None
+
+        def positionen():
+            werte, _ = self.spalten(new_layer).spalte(selected_column)
+            median, mad = self.hampel_median_mad(new_layer, selected_column, zeit_spalte, max_zeitdifferenz, spur_attribut, schwelle, halbe_breite)
+            return self.positionen_abweichung(werte, median, mad, multiplikator_wert, selected_method)
+
+        anzahl = self.regel_setzen(
+            new_layer, 'Hampel', selected_column,
+            (zeit_spalte, max_zeitdifferenz, spur_attribut, schwelle, halbe_breite, multiplikator_wert, selected_method), positionen,
+        )
+        self.auswahl_tabelle.at[9, selected_column] = anzahl
+        return anzahl
 
     #########################
     ### Attribute anfügen ###
@@ -1483,8 +2511,8 @@ class OFEFilter:
         if hasattr(self, 'filterparameter_tabelle'):
             self.filterparameter_tabelle = None
             
-        if hasattr(self, 'filter_punktauswahl'):
-            self.filter_punktauswahl = None
+        if hasattr(self, 'filter_auswahl'):
+            self.filter_auswahl = None
 
         # Reset any stored CRS transformations
         if hasattr(self, 'crs_transform'):
@@ -37,10 +37,12 @@ from PyQt5.QtWidgets import QTableWidgetItem, QVBoxLayout, QDialog, QHBoxLayout,
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
-import itertools
 import uuid
 from .ofe_LogManager import LogManager as log
 from .ofe_ueberlappung import UeberlappungFilter
+from .ofe_filterauswahl import ROBUSTE_VERFAHREN
+from .ofe_mahalanobis import grenzwert
+from .ofe_nachbarschaft import MAX_NACHBARN
 from configparser import ConfigParser
 
 
@@ -96,6 +98,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.cutPoints.clicked.connect(self.on_polygon_selection_clicked)
         self.pushButton_Auswahl_Attribut.clicked.connect(self.on_point_selection_clicked)
         self.cutAF.clicked.connect(self.on_af_ausschliessen_clicked)
+        self.cutAll.clicked.connect(self.on_alle_flaechen_zuschneiden_clicked)
+        self.pushButton_Stapel.clicked.connect(self.on_stapel_zuschnitt_clicked)
         self.exitButton.clicked.connect(self.on_cancel_button_clicked)
         self.SymbButton.clicked.connect(self.on_SymbButton_clicked)
         self.exitButton2.clicked.connect(self.on_cancel_button_clicked)
@@ -107,6 +111,18 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.untergrenze_reset.clicked.connect(self.on_untergrenze_reset_clicked)
         self.obergrenze_reset.clicked.connect(self.on_obergrenze_reset_clicked)
         self.pushButton_SD_reset.clicked.connect(self.on_sd_reset_clicked)
+        self.pushButton_SD_Spalten.clicked.connect(self.on_sd_spalten_anwenden_clicked)
+        self.pushButton_robust.clicked.connect(self.on_robust_anwenden_clicked)
+        self.pushButton_robust_reset.clicked.connect(self.on_robust_reset_clicked)
+        self.pushButton_robust_Spalten.clicked.connect(self.on_robust_spalten_anwenden_clicked)
+        self.pushButton_Maha.clicked.connect(self.on_maha_anwenden_clicked)
+        self.pushButton_Maha_reset.clicked.connect(self.on_maha_reset_clicked)
+        self.pushButton_lokal.clicked.connect(self.on_lokal_anwenden_clicked)
+        self.pushButton_lokal_reset.clicked.connect(self.on_lokal_reset_clicked)
+        self.pushButton_moran.clicked.connect(self.on_moran_anwenden_clicked)
+        self.pushButton_moran_reset.clicked.connect(self.on_moran_reset_clicked)
+        self.pushButton_hampel.clicked.connect(self.on_hampel_anwenden_clicked)
+        self.pushButton_hampel_reset.clicked.connect(self.on_hampel_reset_clicked)
         self.pushButton_Attribute.clicked.connect(self.on_attribut_button_clicked)
         self.pushButton_Beenden.clicked.connect(self.on_exit_button_clicked)
         self.WeiterButton2.clicked.connect(self.on_weiter_button_2_clicked)
@@ -125,6 +141,21 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.groupBox_fehlendeParzelle.setEnabled(False)
         self.groupBox_fehlendeParzelle.hide()
         self.comboBoxDatentyp.setEnabled(False)
+        
+        # Zellgröße nur bei aktivierter Raster-Beschleunigung einstellbar
+        self.doubleSpinBox_Raster.setEnabled(False)
+        self.checkBox_Raster.toggled.connect(self.doubleSpinBox_Raster.setEnabled)
+
+        # Randabstand: Breite und Fläche ändern nur die Vorschau, die Abstände werden nicht neu berechnet
+        self.pushButton_Randabstand.clicked.connect(self.on_randabstand_berechnen_clicked)
+        self.pushButton_Randschnitt.clicked.connect(self.on_rand_abschneiden_clicked)
+        self.doubleSpinBox_Randbreite.valueChanged.connect(self.on_randabstand_vorschau_changed)
+        self.comboBox_Randabstand.currentIndexChanged.connect(self.on_randabstand_vorschau_changed)
+
+        # Zuschnitt-Vorschau: Berechnung im Hintergrund, gelöscht wird erst beim Übernehmen
+        self.pushButton_VorschauUebernehmen.setEnabled(False)
+        self.checkBox_Vorschau.toggled.connect(self.aktualisiere_zuschnitt_vorschau)
+        self.pushButton_VorschauUebernehmen.clicked.connect(self.on_vorschau_uebernehmen_clicked)
 
         # Initialisieren der Buttons
         self.update_button_states()
@@ -134,6 +165,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.mMapLayerComboBox_Innenflaeche.currentIndexChanged.connect(self.on_combobox_changed)
         self.mMapLayerComboBox_Parzellen.currentIndexChanged.connect(self.on_combobox_changed)
         self.mMapLayerComboBox_AF.currentIndexChanged.connect(self.on_combobox_changed)
+        self.doubleSpinBox_AFPuffer.valueChanged.connect(self.aktualisiere_zuschnitt_vorschau)
         self.mMapLayerComboBox_Daten.currentIndexChanged.connect(self.validate_and_update_buttons)
         self.columnComboBox.currentIndexChanged.connect(self.validate_and_update_buttons)
         
@@ -146,6 +178,11 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.count_UB_label.setText("kein Filter angewand")
         self.label_auswahl.setText("keine Filter angewand")
         self.count_SD_label.setText("keine Filter angewand")
+        self.count_robust_label.setText("kein Filter angewand")
+        self.count_Maha_label.setText("kein Filter angewand")
+        self.count_lokal_label.setText("kein Filter angewand")
+        self.count_moran_label.setText("kein Filter angewand")
+        self.count_hampel_label.setText("kein Filter angewand")
         self.label_auswahl_rel.setText("")      
       
         # Verknüpfen der ComboBox-Signale mit der Aktuallisierung der Label und LB, UB Grenzwerten
@@ -158,6 +195,45 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Füllen von ComboBoxen
         self.populate_combobox_LB_UB()
         self.populate_combobox_SD()
+        self.populate_combobox_robust()
+        
+        # Verfahren der robusten Filter: Parameter und Anzahl-Label des Verfahrens anzeigen
+        self.comboBox_robust.currentIndexChanged.connect(self.on_robust_verfahren_changed)
+        
+        # Drop-Downs des lokalen Filters; je nach Nachbarschaft k oder Radius freigeben
+        self.populate_combobox_lokal()
+        self.comboBox_lokal_modus.currentIndexChanged.connect(self.on_lokal_modus_changed)
+        
+        # Drop-Downs des Moran-Filters; k oder Distanzband und Anzahl der Permutationen freigeben
+        self.populate_combobox_moran()
+        self.comboBox_moran_modus.currentIndexChanged.connect(self.on_moran_modus_changed)
+        self.checkBox_moran_permutation.toggled.connect(self.spinBox_moran_permutationen.setEnabled)
+        
+        # Drop-Down der Methode des Hampel-Filters
+        self.populate_combobox_hampel()
+        
+        # Drop-Down des Trendabzugs vor SD- und robusten Filtern; je nach Verfahren Grad oder Zellgröße freigeben
+        self.populate_combobox_trend()
+        self.comboBox_Trend.currentIndexChanged.connect(self.on_trend_verfahren_changed)
+        
+        # Live-Vorschau der Anzahl ausgewählter Punkte beim Ändern der Grenzwerte, Methoden und SD-Basis
+        self.doubleSpinBox_LB.valueChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.doubleSpinBox_UB.valueChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.doubleSpinBox_SD.valueChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.comboBox_LB.currentIndexChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.comboBox_UB.currentIndexChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.comboBox_sd.currentIndexChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.checkBox_SD.stateChanged.connect(self.aktualisiere_anzahl_vorschau)
+        # Iterativ oder gruppiert gibt es keine SD-Vorschau (volle Berechnung je Wert), nur das Umschalten zählt
+        self.checkBox_SD_iterativ.stateChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.comboBox_Gruppe.currentIndexChanged.connect(self.aktualisiere_anzahl_vorschau)
+        # Beim Trendabzug nur mit bereits angepasster Trendfläche (keine Anpassung aus der Vorschau)
+        self.comboBox_Trend.currentIndexChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.spinBox_Trend_Grad.valueChanged.connect(self.aktualisiere_anzahl_vorschau)
+        self.doubleSpinBox_Trend_Zelle.valueChanged.connect(self.aktualisiere_anzahl_vorschau)
+        
+        # Höchstzahl der Runden nur beim iterativen SD-Filter einstellbar
+        self.checkBox_SD_iterativ.toggled.connect(self.spinBox_SD_Runden.setEnabled)
         
         # Fertig-Status
         self.fertig = 0
@@ -189,6 +265,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
     def on_combobox_changed(self):
         self.validate_and_update_buttons()
         self.fill_map_widget_zuschneiden()
+        self.aktualisiere_zuschnitt_vorschau()
     
     
     def validate_and_update_buttons(self):
@@ -230,10 +307,10 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             self.mMapLayerComboBox_Feldgrenze.setCurrentIndex(-1)
             return False
 
-        # Überprüfen, ob der AF-Layer ein Polygonlayer ist
+        # Überprüfen, ob der AF-Layer ein Polygon- oder Linienlayer ist
         af_layer = self.mMapLayerComboBox_AF.currentLayer()
-        if af_layer is not None and not self.is_valid_polygon_layer(af_layer):
-            QMessageBox.critical(self, "Fehler", "Auswahl nicht korrekt: Es muss ein Polygon-Vektorlayer für 'AF' gewählt werden.")
+        if af_layer is not None and not self.is_valid_af_layer(af_layer):
+            QMessageBox.critical(self, "Fehler", "Auswahl nicht korrekt: Es muss ein Polygon- oder Linien-Vektorlayer für 'AF' gewählt werden.")
             self.mMapLayerComboBox_AF.setCurrentIndex(-1)
             return False
             
@@ -283,7 +360,19 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.cutFG.setEnabled(daten_layer_valid and self.is_valid_polygon_layer(self.mMapLayerComboBox_Feldgrenze.currentLayer()))
         self.cutFB.setEnabled(daten_layer_valid and self.is_valid_polygon_layer(self.mMapLayerComboBox_Innenflaeche.currentLayer()))
         self.cutPlot.setEnabled(daten_layer_valid and self.is_valid_polygon_layer(self.mMapLayerComboBox_Parzellen.currentLayer()))
-        self.cutAF.setEnabled(daten_layer_valid and self.is_valid_polygon_layer(self.mMapLayerComboBox_AF.currentLayer()))
+        self.cutAF.setEnabled(daten_layer_valid and self.is_valid_af_layer(self.mMapLayerComboBox_AF.currentLayer()))
+        self.doubleSpinBox_AFPuffer.setEnabled(self.is_valid_line_layer(self.mMapLayerComboBox_AF.currentLayer()))
+        self.cutAll.setEnabled(daten_layer_valid and (any(self.is_valid_polygon_layer(layer) for layer in (
+            self.mMapLayerComboBox_Feldgrenze.currentLayer(),
+            self.mMapLayerComboBox_Innenflaeche.currentLayer(),
+            self.mMapLayerComboBox_Parzellen.currentLayer())) or self.is_valid_af_layer(self.mMapLayerComboBox_AF.currentLayer())))
+        self.pushButton_Randabstand.setEnabled(daten_layer_valid and self.is_valid_polygon_layer(self.randabstand_layer()))
+        self.pushButton_Randschnitt.setEnabled(daten_layer_valid)
+        self.checkBox_Vorschau.setEnabled(daten_layer_valid)
+        self.pushButton_Stapel.setEnabled(any(self.is_valid_polygon_layer(layer) for layer in (
+            self.mMapLayerComboBox_Feldgrenze.currentLayer(),
+            self.mMapLayerComboBox_Innenflaeche.currentLayer(),
+            self.mMapLayerComboBox_Parzellen.currentLayer())) or self.is_valid_af_layer(self.mMapLayerComboBox_AF.currentLayer()))
         self.cutPoints.setEnabled(hasattr(self, 'new_layer') and self.new_layer is not None)
         self.SymbButton.setEnabled(hasattr(self, 'new_layer') and self.new_layer is not None and self.columnComboBox.currentText is not None)
 
@@ -294,6 +383,14 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
     def is_valid_polygon_layer(self, layer):
         """Überprüft, ob der Layer ein gültiger Polygon-Layer ist."""
         return layer is not None and QgsWkbTypes.geometryType(layer.wkbType()) == QgsWkbTypes.PolygonGeometry
+
+    def is_valid_line_layer(self, layer):
+        """Überprüft, ob der Layer ein gültiger Linien-Layer ist."""
+        return layer is not None and QgsWkbTypes.geometryType(layer.wkbType()) == QgsWkbTypes.LineGeometry
+
+    def is_valid_af_layer(self, layer):
+        """Ausschlussflächen können Polygone oder Linien mit Pufferbreite (z.B. Fahrgassen, Drainagen) sein."""
+        return self.is_valid_polygon_layer(layer) or self.is_valid_line_layer(layer)
         
     def populate_column_combobox(self, new_layer):
         """Fügt nur numerische Spalten des Layers in die QComboBox ein."""
@@ -301,6 +398,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.columnComboBox.clear()
         self.columnComboBox2.clear()
         self.columnComboBox_Attribute.clear()
+        self.mComboBox_SpaltenSD.clear()
+        self.mComboBox_SpaltenRobust.clear()
+        self.mComboBox_SpaltenMaha.clear()
 
         # Hole die Feldnamen (Spaltennamen) des Layers
         fields = new_layer.fields()
@@ -313,8 +413,39 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             if field.type() in (QVariant.Int, QVariant.Double, QVariant.LongLong, QVariant.UInt, QVariant.ULongLong):
                 self.columnComboBox.addItem(field.name())
                 self.columnComboBox2.addItem(field.name())
+                self.mComboBox_SpaltenSD.addItem(field.name())
+                self.mComboBox_SpaltenRobust.addItem(field.name())
+                self.mComboBox_SpaltenMaha.addItem(field.name())
             self.columnComboBox_Attribute.addItem(field.name())
 
+    def populate_gruppen_combobox(self, new_layer):
+        """Fügt alle Spalten des Layers (auch Text, z.B. Variante oder Parzellen-ID) als mögliche Gruppierung ein."""
+        self.comboBox_Gruppe.clear()
+        
+        # Leere Auswahl: keine Gruppierung
+        self.comboBox_Gruppe.addItem("")
+        for field in new_layer.fields():
+            self.comboBox_Gruppe.addItem(field.name())
+
+    def populate_hampel_zeit_combobox(self, new_layer):
+        """Fügt alle Spalten des Layers als mögliche Zeitstempel des Hampel-Filters ein; wie beim Überlappungsfilter
+        stehen Spalten mit typischen Namen (Zeit, Datum, ...) vorne. Dazu die numerischen Spalten als Attribut
+        für den Spurwechsel."""
+        self.comboBox_hampel_zeit.clear()
+        for field in new_layer.fields():
+            if any(keyword in field.name().lower() for keyword in ['time', 'date', 'zeit', 'datum', 'timestamp']):
+                self.comboBox_hampel_zeit.insertItem(0, field.name())
+            else:
+                self.comboBox_hampel_zeit.addItem(field.name())
+        self.comboBox_hampel_zeit.setCurrentIndex(0)
+        
+        # Numerische Attribute, deren Sprung eine neue Fahrspur beginnt (leer = nur Zeitlücken)
+        self.comboBox_hampel_spur.clear()
+        self.comboBox_hampel_spur.addItem("")
+        for field in new_layer.fields():
+            if field.type() in (QVariant.Int, QVariant.Double, QVariant.LongLong, QVariant.UInt, QVariant.ULongLong):
+                self.comboBox_hampel_spur.addItem(field.name())
+
     def populate_attribut_combobox(self, new_layer):
         self.columnComboBox_Attribute.clear()
         fields = new_layer.fields()
@@ -350,6 +481,65 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
     def on_af_ausschliessen_clicked(self):
         """Lösche Punkte in Ausschlussfläche"""
         self.plugin_instance.lösche_punkte_in_af(self.new_layer, self.mMapLayerComboBox_AF.currentLayer())
+
+    def on_alle_flaechen_zuschneiden_clicked(self):
+        """Lösche Punkte mit allen ausgewählten Flächen in einem Durchgang"""
+        self.plugin_instance.lösche_punkte_alle_masken(self.new_layer,
+                                                       self.mMapLayerComboBox_Feldgrenze.currentLayer(),
+                                                       self.mMapLayerComboBox_Innenflaeche.currentLayer(),
+                                                       self.mMapLayerComboBox_Parzellen.currentLayer(),
+                                                       self.mMapLayerComboBox_AF.currentLayer())
+
+    def on_stapel_zuschnitt_clicked(self):
+        """Mehrere Punktlayer mit allen ausgewählten Flächen zuschneiden"""
+        masken_layer = [layer if self.is_valid_polygon_layer(layer) else None for layer in (
+            self.mMapLayerComboBox_Feldgrenze.currentLayer(),
+            self.mMapLayerComboBox_Innenflaeche.currentLayer(),
+            self.mMapLayerComboBox_Parzellen.currentLayer())]
+        af_layer = self.mMapLayerComboBox_AF.currentLayer()
+        masken_layer.append(af_layer if self.is_valid_af_layer(af_layer) else None)
+        self.plugin_instance.stapel_zuschnitt_dialog(self.plugin_instance.alle_masken(*masken_layer))
+
+    def randabstand_layer(self):
+        """Gibt den Polygon-Layer zurück, zu dessen Rand der Abstand berechnet wird."""
+        if self.comboBox_Randabstand.currentText() == "Parzellen":
+            return self.mMapLayerComboBox_Parzellen.currentLayer()
+        return self.mMapLayerComboBox_Feldgrenze.currentLayer()
+
+    def on_randabstand_berechnen_clicked(self):
+        """Berechne den Randabstand aller Punkte zur gewählten Fläche"""
+        layer = self.randabstand_layer()
+        if not self.is_valid_polygon_layer(layer):
+            QMessageBox.warning(self, "Fehler", f"Bitte wählen Sie einen Polygon-Layer für {self.comboBox_Randabstand.currentText()} aus.")
+            return
+        self.plugin_instance.randabstand_berechnen(self.new_layer, layer, self.comboBox_Randabstand.currentText())
+
+    def on_randabstand_vorschau_changed(self):
+        """Aktualisiere die Vorschau des Randschnitts aus den gespeicherten Abständen"""
+        self.update_button_states()
+        if hasattr(self, 'new_layer') and self.new_layer is not None:
+            self.plugin_instance.randabstand_vorschau(self.new_layer)
+
+    def on_rand_abschneiden_clicked(self):
+        """Lösche Punkte innerhalb der Randbreite"""
+        self.plugin_instance.lösche_punkte_am_rand(self.new_layer)
+
+    def aktualisiere_zuschnitt_vorschau(self):
+        """Startet die Zuschnitt-Vorschau mit den aktuell ausgewählten Flächen neu (bricht eine laufende ab)"""
+        if not self.checkBox_Vorschau.isChecked() or not hasattr(self, 'new_layer') or self.new_layer is None:
+            self.plugin_instance.zuschnitt_vorschau_abbrechen()
+            return
+
+        masken = self.plugin_instance.alle_masken(
+            self.mMapLayerComboBox_Feldgrenze.currentLayer(),
+            self.mMapLayerComboBox_Innenflaeche.currentLayer(),
+            self.mMapLayerComboBox_Parzellen.currentLayer(),
+            self.mMapLayerComboBox_AF.currentLayer())
+        self.plugin_instance.zuschnitt_vorschau_starten(self.new_layer, masken)
+
+    def on_vorschau_uebernehmen_clicked(self):
+        """Lösche die Punkte der Zuschnitt-Vorschau"""
+        self.plugin_instance.zuschnitt_vorschau_uebernehmen(self.new_layer)
         
     def initialize_map_zuschnitt(self):
         """Initialisiert die Zuschnitt-Karte mit OpenStreetMap XYZ-Kachelkarte und zoomt auf eine spezifische Koordinate."""
@@ -552,6 +742,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.count_SD_label.setText("kein Filter angewand")
             else:
                 self.count_SD_label.setText(f"Anzahl ausgewählter Punkte: {sd_anzahl}")
+                
+            # Vorschau für die Grenzwerte der neuen Spalte (die SpinBoxen lösen sie nur bei geänderten Werten aus)
+            self.aktualisiere_anzahl_vorschau()
         
         # set parameter in der SpinBox für Untergrenze, Obergrenze, Standardabweichung
         if hasattr(self.plugin_instance, 'filterparameter_tabelle') and self.plugin_instance.filterparameter_tabelle is not None:
@@ -561,6 +754,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             method_ub = self.plugin_instance.filterparameter_tabelle.at[3, selected_column] # Lese Methode aus der Tabelle (Zeile 4 für Obergrenze)
             value_sd = self.plugin_instance.filterparameter_tabelle.at[4, selected_column] # Lese den Wert aus der Tabelle (Zeile 5 für Obergrenze)
             method_sd = self.plugin_instance.filterparameter_tabelle.at[5, selected_column] # Lese Methode aus der Tabelle (Zeile 6 für Obergrenze)
+            runden_sd = self.plugin_instance.filterparameter_tabelle.at[14, selected_column] # Lese Runden aus der Tabelle (Zeile 15 für iterativen SD-Filter)
             
             # Untergrenze Parameter
             if pd.isna(value_lb): # Wenn der Wert NaN ist, setze den Wert der SpinBox auf 0, sonst auf den Wert aus der Tabelle
@@ -594,11 +788,98 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.comboBox_sd.setCurrentIndex(0)
             else:
                 self.comboBox_sd.setCurrentIndex(method_sd)
+            # Standardabweichung iterativ
+            if pd.isna(runden_sd): # Wenn der Wert NaN ist, einfacher Filter
+                self.checkBox_SD_iterativ.setChecked(False)
+            else:
+                self.checkBox_SD_iterativ.setChecked(True)
+                self.spinBox_SD_Runden.setValue(int(runden_sd))
+            
+            # Parameter und Anzahl des gewählten robusten Verfahrens
+            self.on_robust_verfahren_changed()
+            
+            # Parameter und Anzahl des lokalen Filters, des Moran-Filters und des Hampel-Filters
+            self.lokal_parameter_anzeigen()
+            self.moran_parameter_anzeigen()
+            self.hampel_parameter_anzeigen()
                 
         if self.tabWidget.currentIndex() == 1:
             # Aktualisiere die Anzeige des Canvas
             self.create_histograms()
     
+    def aktualisiere_anzahl_vorschau(self, *args):
+        """Zeigt in den Anzahl-Labels live, wie viele Punkte die aktuellen Grenzwerte auswählen würden.
+        Gezählt wird per binärer Suche im sortierten Index der Spalte, ohne die Punkte erneut zu lesen."""
+        auswahl_tabelle = getattr(self.plugin_instance, 'auswahl_tabelle', None)
+        if self.is_closing or getattr(self, 'new_layer', None) is None or auswahl_tabelle is None:
+            return
+        
+        selected_column = self.columnComboBox2.currentText()
+        if selected_column not in auswahl_tabelle.columns:
+            return
+        
+        try:
+            lb_vorschau = len(self.plugin_instance.positionen_untergrenze(
+                self.new_layer, selected_column, self.doubleSpinBox_LB.value(), self.comboBox_LB.currentIndex()))
+            ub_vorschau = len(self.plugin_instance.positionen_obergrenze(
+                self.new_layer, selected_column, self.doubleSpinBox_UB.value(), self.comboBox_UB.currentIndex()))
+            # Die SD-Vorschau gibt es nur für den einfachen Filter (binäre Suche im sortierten Index): iterativ und
+            # gruppiert würde jeder Wert der SpinBox die volle Berechnung auslösen. Die Trendfläche wird erst beim
+            # Anwenden angepasst; bis dahin gibt es auch mit Trendabzug keine SD-Vorschau
+            trend = self.trend_einstellung()
+            sd_vorschau = None
+            if not self.sd_max_runden() and not self.gruppen_spalte() and (
+                    trend is None or self.plugin_instance.trend_vorhanden(self.new_layer, selected_column, trend)):
+                sd_vorschau = len(self.plugin_instance.positionen_sd(
+                    self.new_layer, selected_column, self.doubleSpinBox_SD.value(), self.comboBox_sd.currentIndex(),
+                    self.checkBox_SD.isChecked(), trend=trend))
+        except (KeyError, RuntimeError):
+            # Spalte nicht (mehr) im Layer oder Layer bereits gelöscht
+            return
+        
+        self.setze_anzahl_label(self.count_LB_label, auswahl_tabelle.at[0, selected_column], lb_vorschau)
+        self.setze_anzahl_label(self.count_UB_label, auswahl_tabelle.at[1, selected_column], ub_vorschau)
+        self.setze_anzahl_label(self.count_SD_label, auswahl_tabelle.at[2, selected_column], sd_vorschau)
+    
+    def sd_max_runden(self):
+        """Höchstzahl der Runden beim iterativen SD-Filter, None beim einfachen Filter."""
+        return self.spinBox_SD_Runden.value() if self.checkBox_SD_iterativ.isChecked() else None
+    
+    def gruppen_spalte(self):
+        """Gewählte Gruppierung für SD- und robuste Filter, None ohne Gruppierung."""
+        return self.comboBox_Gruppe.currentText() or None
+    
+    def trend_einstellung(self):
+        """Räumlicher Trend, der vor SD- und robusten Filtern abgezogen wird: None ohne Trendabzug,
+        sonst ('Polynom', Grad) oder ('Raster', Zellgröße in m)."""
+        verfahren = self.comboBox_Trend.currentIndex()
+        if verfahren == 1:
+            return ('Polynom', self.spinBox_Trend_Grad.value())
+        if verfahren == 2:
+            return ('Raster', self.doubleSpinBox_Trend_Zelle.value())
+        return None
+    
+    def trend_text(self):
+        """Trendabzug als Text für Parametertabelle und Log, None ohne Trendabzug."""
+        trend = self.trend_einstellung()
+        if trend is None:
+            return None
+        if trend[0] == 'Polynom':
+            return f"Polynom Grad {trend[1]}"
+        return f"Raster {trend[1]} m"
+    
+    def setze_anzahl_label(self, label, angewendet, vorschau):
+        """Setzt ein Anzahl-Label aus der angewendeten Anzahl und der Vorschau für die aktuellen Grenzwerte
+        (vorschau None: keine Vorschau verfügbar)."""
+        if vorschau is None:
+            label.setText("kein Filter angewand" if pd.isna(angewendet) else f"Anzahl ausgewählter Punkte: {angewendet}")
+        elif pd.isna(angewendet):
+            label.setText(f"kein Filter angewand (Vorschau: {vorschau})")
+        elif angewendet == vorschau:
+            label.setText(f"Anzahl ausgewählter Punkte: {angewendet}")
+        else:
+            label.setText(f"Anzahl ausgewählter Punkte: {angewendet} (Vorschau: {vorschau})")
+    
     def populate_combobox_LB_UB(self):
         """Drop-Downs für Ober- und Untergrenzenfilter füllen"""
         self.comboBox_LB.addItem("<")
@@ -612,6 +893,210 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.comboBox_sd.addItem("Untergrenze")
         self.comboBox_sd.addItem("Obergrenze")
         
+    def populate_combobox_robust(self):
+        """Drop-Downs für Verfahren und Methode der robusten Filter (Reihenfolge wie ROBUSTE_VERFAHREN)"""
+        self.comboBox_robust.addItem("Median ± Multiplikator x MAD")
+        self.comboBox_robust.addItem("Tukey-IQR (Q1/Q3 ± Multiplikator x IQR)")
+        self.comboBox_robust.addItem("Perzentile")
+        self.comboBox_robust_seite.addItem("Ober- und Untergrenze")
+        self.comboBox_robust_seite.addItem("Untergrenze")
+        self.comboBox_robust_seite.addItem("Obergrenze")
+        
+    def populate_combobox_lokal(self):
+        """Drop-Downs für Nachbarschaft und Methode des lokalen Filters"""
+        self.comboBox_lokal_modus.addItem("k nächste Nachbarn")
+        self.comboBox_lokal_modus.addItem("Radius")
+        self.comboBox_lokal_seite.addItem("Ober- und Untergrenze")
+        self.comboBox_lokal_seite.addItem("Untergrenze")
+        self.comboBox_lokal_seite.addItem("Obergrenze")
+    
+    def on_lokal_modus_changed(self, *args):
+        """Gibt je nach Nachbarschaft die Anzahl k oder den Radius frei."""
+        radius = self.comboBox_lokal_modus.currentIndex() == 1
+        self.spinBox_lokal_k.setEnabled(not radius)
+        self.doubleSpinBox_lokal_radius.setEnabled(radius)
+    
+    def lokal_parameter_anzeigen(self):
+        """Setzt Parameter und Anzahl-Label des lokalen Filters für die gewählte Spalte (Standardwerte, wenn er
+        für die Spalte nicht angewendet ist)."""
+        selected_column = self.columnComboBox2.currentText()
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        multiplikator = tabelle.at[20, selected_column]
+        methode = tabelle.at[21, selected_column]
+        k = tabelle.at[22, selected_column]
+        radius = tabelle.at[23, selected_column]
+        
+        self.doubleSpinBox_lokal_mult.setValue(3 if pd.isna(multiplikator) else multiplikator)
+        self.comboBox_lokal_seite.setCurrentIndex(0 if pd.isna(methode) else int(methode))
+        self.comboBox_lokal_modus.setCurrentIndex(1 if not pd.isna(radius) else 0)
+        if not pd.isna(k):
+            self.spinBox_lokal_k.setValue(int(k))
+        if not pd.isna(radius):
+            self.doubleSpinBox_lokal_radius.setValue(radius)
+        
+        anzahl = self.plugin_instance.auswahl_tabelle.at[7, selected_column]
+        if pd.isna(anzahl):
+            self.count_lokal_label.setText("kein Filter angewand")
+        else:
+            self.count_lokal_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+    
+    def lokal_wert_text(self):
+        """Multiplikator und Nachbarschaft des lokalen Filters als Text für den Log."""
+        if self.comboBox_lokal_modus.currentIndex() == 0:
+            nachbarschaft = f"k = {self.spinBox_lokal_k.value()}"
+        else:
+            nachbarschaft = f"Radius {self.doubleSpinBox_lokal_radius.value()} m"
+        return f"{self.doubleSpinBox_lokal_mult.value()} x MAD, {nachbarschaft}"
+
+    def populate_combobox_moran(self):
+        """Drop-Downs für Nachbarschaft und Art der Ausreißer des Moran-Filters"""
+        self.comboBox_moran_modus.addItem("k nächste Nachbarn")
+        self.comboBox_moran_modus.addItem("Distanzband")
+        self.comboBox_moran_typ.addItem("Hoch-Niedrig und Niedrig-Hoch")
+        self.comboBox_moran_typ.addItem("Hoch-Niedrig (hoher Wert, niedrige Umgebung)")
+        self.comboBox_moran_typ.addItem("Niedrig-Hoch (niedriger Wert, hohe Umgebung)")
+    
+    def on_moran_modus_changed(self, *args):
+        """Gibt je nach Nachbarschaft die Anzahl k oder das Distanzband frei."""
+        radius = self.comboBox_moran_modus.currentIndex() == 1
+        self.spinBox_moran_k.setEnabled(not radius)
+        self.doubleSpinBox_moran_radius.setEnabled(radius)
+    
+    def moran_parameter_anzeigen(self):
+        """Setzt Parameter und Anzahl-Label des Moran-Filters für die gewählte Spalte (Standardwerte, wenn er für
+        die Spalte nicht angewendet ist)."""
+        selected_column = self.columnComboBox2.currentText()
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        typ = tabelle.at[24, selected_column]
+        alpha = tabelle.at[25, selected_column]
+        k = tabelle.at[26, selected_column]
+        radius = tabelle.at[27, selected_column]
+        permutationen = tabelle.at[28, selected_column]
+        
+        self.comboBox_moran_typ.setCurrentIndex(0 if pd.isna(typ) else int(typ))
+        self.doubleSpinBox_moran_alpha.setValue(0.05 if pd.isna(alpha) else alpha)
+        self.comboBox_moran_modus.setCurrentIndex(1 if not pd.isna(radius) else 0)
+        if not pd.isna(k):
+            self.spinBox_moran_k.setValue(int(k))
+        if not pd.isna(radius):
+            self.doubleSpinBox_moran_radius.setValue(radius)
+        if not pd.isna(typ):
+            self.checkBox_moran_permutation.setChecked(not pd.isna(permutationen))
+        if not pd.isna(permutationen):
+            self.spinBox_moran_permutationen.setValue(int(permutationen))
+        
+        anzahl = self.plugin_instance.auswahl_tabelle.at[8, selected_column]
+        if pd.isna(anzahl):
+            self.count_moran_label.setText("kein Filter angewand")
+        else:
+            self.count_moran_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+    
+    def moran_wert_text(self):
+        """Signifikanzniveau, Test und Nachbarschaft des Moran-Filters als Text für den Log."""
+        if self.comboBox_moran_modus.currentIndex() == 0:
+            nachbarschaft = f"k = {self.spinBox_moran_k.value()}"
+        else:
+            nachbarschaft = f"Distanzband {self.doubleSpinBox_moran_radius.value()} m"
+        if self.checkBox_moran_permutation.isChecked():
+            test = f"{self.spinBox_moran_permutationen.value()} Permutationen"
+        else:
+            test = "analytisch"
+        return f"p < {self.doubleSpinBox_moran_alpha.value()} ({test}), {nachbarschaft}"
+
+    def populate_combobox_trend(self):
+        """Drop-Down für den Trendabzug füllen"""
+        self.comboBox_Trend.clear()
+        self.comboBox_Trend.addItem("kein Trendabzug")
+        self.comboBox_Trend.addItem("Polynom in x/y")
+        self.comboBox_Trend.addItem("geglättetes Raster")
+        self.on_trend_verfahren_changed()
+    
+    def on_trend_verfahren_changed(self, *args):
+        """Grad nur beim Polynom, Zellgröße nur beim Raster einstellbar."""
+        verfahren = self.comboBox_Trend.currentIndex()
+        self.spinBox_Trend_Grad.setEnabled(verfahren == 1)
+        self.doubleSpinBox_Trend_Zelle.setEnabled(verfahren == 2)
+    
+    def populate_combobox_hampel(self):
+        """Drop-Down für die Methode des Hampel-Filters"""
+        self.comboBox_hampel_seite.addItem("Ober- und Untergrenze")
+        self.comboBox_hampel_seite.addItem("Untergrenze")
+        self.comboBox_hampel_seite.addItem("Obergrenze")
+    
+    def hampel_parameter_anzeigen(self):
+        """Setzt Parameter und Anzahl-Label des Hampel-Filters für die gewählte Spalte (Standardwerte, wenn er für
+        die Spalte nicht angewendet ist)."""
+        selected_column = self.columnComboBox2.currentText()
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        multiplikator = tabelle.at[29, selected_column]
+        methode = tabelle.at[30, selected_column]
+        fenster = tabelle.at[31, selected_column]
+        luecke = tabelle.at[32, selected_column]
+        zeit_spalte = tabelle.at[33, selected_column]
+        spur_attribut = tabelle.at[38, selected_column]
+        schwelle = tabelle.at[39, selected_column]
+        
+        self.doubleSpinBox_hampel_mult.setValue(3 if pd.isna(multiplikator) else multiplikator)
+        self.comboBox_hampel_seite.setCurrentIndex(0 if pd.isna(methode) else int(methode))
+        self.spinBox_hampel_fenster.setValue(10 if pd.isna(fenster) else int(fenster))
+        self.doubleSpinBox_hampel_luecke.setValue(5 if pd.isna(luecke) else luecke)
+        if not pd.isna(zeit_spalte) and self.comboBox_hampel_zeit.findText(zeit_spalte) != -1:
+            self.comboBox_hampel_zeit.setCurrentIndex(self.comboBox_hampel_zeit.findText(zeit_spalte))
+        self.comboBox_hampel_spur.setCurrentIndex(max(self.comboBox_hampel_spur.findText("" if pd.isna(spur_attribut) else spur_attribut), 0))
+        self.doubleSpinBox_hampel_spur_schwelle.setValue(0 if pd.isna(schwelle) else schwelle)
+        
+        anzahl = self.plugin_instance.auswahl_tabelle.at[9, selected_column]
+        if pd.isna(anzahl):
+            self.count_hampel_label.setText("kein Filter angewand")
+        else:
+            self.count_hampel_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+    
+    def hampel_wert_text(self):
+        """Multiplikator, Fenster und Trennung der Fahrspuren des Hampel-Filters als Text für den Log."""
+        return (
+            f"{self.doubleSpinBox_hampel_mult.value()} x MAD, ± {self.spinBox_hampel_fenster.value()} Punkte, "
+            f"Zeitstempel {self.comboBox_hampel_zeit.currentText()}, max. Lücke {self.doubleSpinBox_hampel_luecke.value()} s"
+            + (f", Spurwechsel bei {self.comboBox_hampel_spur.currentText()} > {self.doubleSpinBox_hampel_spur_schwelle.value()}"
+               if self.comboBox_hampel_spur.currentText() else "")
+        )
+
+    def on_robust_verfahren_changed(self, *args):
+        """Schaltet zwischen Multiplikator und Perzentilen um und zeigt die gespeicherten Parameter und die Anzahl
+        des gewählten Verfahrens für die ausgewählte Spalte (ohne gespeicherte Parameter die Standardwerte)."""
+        verfahren = self.comboBox_robust.currentIndex()
+        perzentile = verfahren == 2
+        self.doubleSpinBox_robust_k.setEnabled(not perzentile)
+        self.doubleSpinBox_robust_p_unten.setEnabled(perzentile)
+        self.doubleSpinBox_robust_p_oben.setEnabled(perzentile)
+        
+        selected_column = self.columnComboBox2.currentText()
+        filterparameter_tabelle = getattr(self.plugin_instance, 'filterparameter_tabelle', None)
+        auswahl_tabelle = getattr(self.plugin_instance, 'auswahl_tabelle', None)
+        if filterparameter_tabelle is None or selected_column not in filterparameter_tabelle.columns:
+            return
+        
+        # Zeilen der Parametertabelle: MAD 8/9, IQR 10/11, Perzentil 12 bis 14
+        if perzentile:
+            p_unten = filterparameter_tabelle.at[11, selected_column]
+            p_oben = filterparameter_tabelle.at[12, selected_column]
+            methode = filterparameter_tabelle.at[13, selected_column]
+            self.doubleSpinBox_robust_p_unten.setValue(1 if pd.isna(p_unten) else p_unten)
+            self.doubleSpinBox_robust_p_oben.setValue(99 if pd.isna(p_oben) else p_oben)
+        else:
+            multiplikator = filterparameter_tabelle.at[7 + 2 * verfahren, selected_column]
+            methode = filterparameter_tabelle.at[8 + 2 * verfahren, selected_column]
+            # Üblicher Multiplikator: 3 für MAD, 1,5 für die Tukey-Zäune
+            standard = 3 if verfahren == 0 else 1.5
+            self.doubleSpinBox_robust_k.setValue(standard if pd.isna(multiplikator) else multiplikator)
+        self.comboBox_robust_seite.setCurrentIndex(0 if pd.isna(methode) else int(methode))
+        
+        if auswahl_tabelle is not None:
+            anzahl = auswahl_tabelle.at[3 + verfahren, selected_column]
+            if pd.isna(anzahl):
+                self.count_robust_label.setText("kein Filter angewand")
+            else:
+                self.count_robust_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+        
     def fill_table_widget(self, table_widget, df):
         """ Füllt ein QTableWidget mit den Daten eines Pandas DataFrame."""
         # Setze die Anzahl der Zeilen und Spalten im QTableWidget
@@ -655,8 +1140,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             self.clear_table_widget_completely(self.tableWidget_Auswahl)
             # Filterparametertabelle zurücksetzen
             self.filterparameter_tabelle = None
-            # Multiindex Dataframe für filterbasierte Punktauswahl zurücksetzen
-            self.filter_punktauswahl = None
+            # Bitmasken der filterbasierten Punktauswahl zurücksetzen
+            self.plugin_instance.filter_auswahl = None
+            self.plugin_instance.sd_iteration = {}
             # Auswahl zurücksetzen
             self.new_layer.removeSelection()
             # Auswahl-Liste zurücksetzen
@@ -667,6 +1153,11 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             self.count_LB_label.setText("kein Filter angewand")
             self.count_UB_label.setText("kein Filter angewand")
             self.count_SD_label.setText("kein Filter angewand")
+            self.count_robust_label.setText("kein Filter angewand")
+            self.count_Maha_label.setText("kein Filter angewand")
+            self.count_lokal_label.setText("kein Filter angewand")
+            self.count_moran_label.setText("kein Filter angewand")
+            self.count_hampel_label.setText("kein Filter angewand")
             self.label_auswahl.setText("keine Filter angewand")
             self.label_auswahl_rel.setText("")
             # SpinBoxes zurücksetzen        
@@ -680,8 +1171,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
             # Filterparametertabelle erstellen und füllen
             self.plugin_instance.create_filterparameter_tabelle(self.new_layer)
-            # Multiindex Dataframe für filterbasierte Punktauswahl erstellen
-            self.plugin_instance.create_multiindex_punktauswahl(self.new_layer)
+            # Bitmasken für die filterbasierte Punktauswahl erstellen
+            self.plugin_instance.create_filter_auswahl(self.new_layer)
 
     def update_map_widget2(self):
         """Aktualisiert die zweite Karte (mapWidget2) mit den aktuellen Layern und Auswahl."""
@@ -720,39 +1211,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
 
         # Prüfen, ob der Tab "Ober- und Untergrenze-Filter" ausgewählt ist
         if self.tabWidget_Filter.currentIndex() == 0 and self.tabWidget.currentIndex() == 1:
-            # Hole die Daten aus dem Layer und konvertiere sie in float, wenn möglich
-            values = [float(feat[column_name]) for feat in self.new_layer.getFeatures() if feat[column_name] is not None and self.is_numeric(feat[column_name])]
-
-            if self.checkBox_hist.isChecked():
-                alle_filter_punkte = self.plugin_instance.punktauswahl_gesamt               
-                alle_filter_punkte_flat = list(itertools.chain.from_iterable(alle_filter_punkte)) if any(isinstance(i, list) for i in alle_filter_punkte) else alle_filter_punkte               
-                alle_filter_punkte_set = set(alle_filter_punkte_flat)
-                
-                # Erstelle die gefilterten Daten
-                filtered_values = []
-                for feat in self.new_layer.getFeatures():
-                    feat_id = feat.id()
-                    if feat_id not in alle_filter_punkte_set and feat[column_name] is not None and self.is_numeric(feat[column_name]):
-                        filtered_values.append(float(feat[column_name])) 
-            else: 
-                # Hole die Zeilenindizes aus dem MultiIndex DataFrame (Untergrenze & Obergrenze)
-                untergrenze_indices = self.plugin_instance.filter_punktauswahl.loc['Untergrenze', column_name].tolist()
-                obergrenze_indices = self.plugin_instance.filter_punktauswahl.loc['Obergrenze', column_name].tolist()
-
-                # Flache die Listen, falls sie verschachtelt sind (Liste von Listen)
-                untergrenze_indices_flat = list(itertools.chain.from_iterable(untergrenze_indices)) if any(isinstance(i, list) for i in untergrenze_indices) else untergrenze_indices
-                obergrenze_indices_flat = list(itertools.chain.from_iterable(obergrenze_indices)) if any(isinstance(i, list) for i in obergrenze_indices) else obergrenze_indices
-
-                # Konvertiere flache Listen in Sets für effizienteres Filtern
-                untergrenze_indices_set = set(untergrenze_indices_flat)
-                obergrenze_indices_set = set(obergrenze_indices_flat)
-
-                # Erstelle die gefilterten Daten (ohne Zeilen aus Unter- und Obergrenze)
-                filtered_values = []
-                for feat in self.new_layer.getFeatures():
-                    feat_id = feat.id()
-                    if feat_id not in untergrenze_indices_set and feat_id not in obergrenze_indices_set and feat[column_name] is not None and self.is_numeric(feat[column_name]):
-                        filtered_values.append(float(feat[column_name]))
+            # Histogramme und Kenngrößen der Rohdaten und gefilterten Daten aus dem Ergebnis-Cache
+            roh, gefiltert = self.get_histogramme()
 
             # Hole die Werte für Ober- und Untergrenze
             ub_value = self.plugin_instance.filterparameter_tabelle.at[0, column_name]
@@ -773,7 +1233,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             axes2 = self.figure.add_subplot(122)  # Rechtes Histogramm
 
             # Plot des ersten Histogramms (Rohdaten)
-            counts, bins, _ = axes1.hist(values, bins=50, color='blue', edgecolor='black')
+            counts, bins, _ = axes1.hist(roh[1][:-1], bins=roh[1], weights=roh[0], color='blue', edgecolor='black')
             axes1.set_title(f"Rohdaten: {column_name}")
             if ub_value is not None:
                 axes1.axvline(x=ub_value, color='red', linestyle='--')  # Obergrenze in Rot
@@ -781,7 +1241,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 axes1.axvline(x=lb_value, color='red', linestyle='--')  # Untergrenze in Rot
 
             # Plot des zweiten Histogramms (gefiltert)
-            counts_filtered, bins_filtered, _ = axes2.hist(filtered_values, bins=50, color='blue', edgecolor='black')
+            counts_filtered, bins_filtered, _ = axes2.hist(gefiltert[1][:-1], bins=gefiltert[1], weights=gefiltert[0], color='blue', edgecolor='black')
             axes2.set_title(f"Ober- und Untergrenze: {column_name}")
             if ub_value is not None:
                 axes2.axvline(x=ub_value, color='red', linestyle='--')  # Obergrenze in Rot
@@ -797,57 +1257,39 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             total_points = self.new_layer.featureCount()
             
             if count + 3 >= total_points:
-                self.raw_stat.setText(f"Mittelwert: {round(np.mean(values), 2)}; Standardabweichung: {round(np.std(values), 2)}; Min: {round(np.min(values), 2)}; Max: {round(np.max(values), 2)}")
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
                 self.filter_stat.setText("Nicht genügend Punkte übrig")
             else: 
-                self.raw_stat.setText(f"Mittelwert: {round(np.mean(values), 2)}; Standardabweichung: {round(np.std(values), 2)}; Min: {round(np.min(values), 2)}; Max: {round(np.max(values), 2)}")
-                self.filter_stat.setText(f"Mittelwert: {round(np.mean(filtered_values), 2)}; Standardabweichung: {round(np.std(filtered_values), 2)}; Min: {round(np.min(filtered_values), 2)}; Max: {round(np.max(filtered_values), 2)}")
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText(self.kenngroessen_text(gefiltert[2]))
         
         elif self.tabWidget_Filter.currentIndex() == 1 and self.tabWidget.currentIndex() == 1:
-            # Hole die Daten aus dem Layer und konvertiere sie in float, wenn möglich
-            values = [float(feat[column_name]) for feat in self.new_layer.getFeatures() if feat[column_name] is not None and self.is_numeric(feat[column_name])]
-
-            if self.checkBox_hist.isChecked():
-                alle_filter_punkte = self.plugin_instance.punktauswahl_gesamt               
-                alle_filter_punkte_flat = list(itertools.chain.from_iterable(alle_filter_punkte)) if any(isinstance(i, list) for i in alle_filter_punkte) else alle_filter_punkte               
-                alle_filter_punkte_set = set(alle_filter_punkte_flat)
-                
-                # Erstelle die gefilterten Daten
-                filtered_values = []
-                for feat in self.new_layer.getFeatures():
-                    feat_id = feat.id()
-                    if feat_id not in alle_filter_punkte_set and feat[column_name] is not None and self.is_numeric(feat[column_name]):
-                        filtered_values.append(float(feat[column_name])) 
-            else: 
-                # Hole die Zeilenindizes aus dem MultiIndex DataFrame (Standardabweichung)
-                SD_indices = self.plugin_instance.filter_punktauswahl.loc['Standardabweichung', column_name].tolist()
-                
-                # Flache die Listen, falls sie verschachtelt sind (Liste von Listen)
-                SD_indices_flat = list(itertools.chain.from_iterable(SD_indices)) if any(isinstance(i, list) for i in SD_indices) else SD_indices
-                
-                # Konvertiere flache Listen in Sets für effizienteres Filtern
-                SD_indices_set = set(SD_indices_flat)
-                
-                # Erstelle die gefilterten Daten (ohne Zeilen aus Standardabweichung)
-                filtered_values = []
-                for feat in self.new_layer.getFeatures():
-                    feat_id = feat.id()
-                    if feat_id not in SD_indices_set and feat[column_name] is not None and self.is_numeric(feat[column_name]):
-                        filtered_values.append(float(feat[column_name]))
+            # Histogramme und Kenngrößen der Rohdaten und gefilterten Daten aus dem Ergebnis-Cache
+            roh, gefiltert = self.get_histogramme()
 
             # Hole die Werte für SD- Ober- und Untergrenze
             sd_value = self.plugin_instance.filterparameter_tabelle.at[4, column_name]
             sd_ub = None
             sd_lb = None
-            if self.plugin_instance.filterparameter_tabelle.at[5, column_name] == 0 and sd_value is not None:
-                sd_ub = np.mean(values) + (sd_value * np.std(values))
-                sd_lb = np.mean(values) - (sd_value * np.std(values))
-            elif self.plugin_instance.filterparameter_tabelle.at[5, column_name] == 1 and sd_value is not None:
-                sd_ub = None
-                sd_lb = np.mean(values) - (sd_value * np.std(values))
-            elif self.plugin_instance.filterparameter_tabelle.at[5, column_name] == 2 and sd_value is not None:
-                sd_ub = np.mean(values) + (sd_value * np.std(values))
-                sd_lb = None
+            # Gruppierter Filter: Grenzen je Gruppe, mit Trendabzug: Grenzen der Residuen, keine gemeinsamen Linien
+            if not pd.isna(self.plugin_instance.filterparameter_tabelle.at[15, column_name]) or not pd.isna(self.plugin_instance.filterparameter_tabelle.at[34, column_name]):
+                sd_value = None
+            if roh[2] is not None:
+                mean_raw, sd_raw = roh[2][0], roh[2][1]
+                if self.plugin_instance.filterparameter_tabelle.at[5, column_name] == 0 and sd_value is not None:
+                    sd_ub = mean_raw + (sd_value * sd_raw)
+                    sd_lb = mean_raw - (sd_value * sd_raw)
+                elif self.plugin_instance.filterparameter_tabelle.at[5, column_name] == 1 and sd_value is not None:
+                    sd_ub = None
+                    sd_lb = mean_raw - (sd_value * sd_raw)
+                elif self.plugin_instance.filterparameter_tabelle.at[5, column_name] == 2 and sd_value is not None:
+                    sd_ub = mean_raw + (sd_value * sd_raw)
+                    sd_lb = None
+                # Iterativer Filter: Grenzen der letzten Runde
+                if column_name in self.plugin_instance.sd_iteration and sd_value is not None:
+                    _, iter_lb, iter_ub = self.plugin_instance.sd_iteration[column_name]
+                    sd_lb = iter_lb if sd_lb is not None else None
+                    sd_ub = iter_ub if sd_ub is not None else None
             
             # Falls das Histogramm-Canvas noch nicht existiert, erzeuge es
             if not hasattr(self, 'histogram_canvas'):
@@ -864,7 +1306,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             axes2 = self.figure.add_subplot(122)  # Rechtes Histogramm
 
             # Plot des ersten Histogramms (Rohdaten)
-            counts, bins, _ = axes1.hist(values, bins=50, color='blue', edgecolor='black')
+            counts, bins, _ = axes1.hist(roh[1][:-1], bins=roh[1], weights=roh[0], color='blue', edgecolor='black')
             axes1.set_title(f"Rohdaten: {column_name}")
             if sd_ub is not None:
                 axes1.axvline(x=sd_ub, color='green', linestyle='--')  # Obergrenze in Rot
@@ -872,7 +1314,7 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 axes1.axvline(x=sd_lb, color='green', linestyle='--')  # Untergrenze in Rot
 
             # Plot des zweiten Histogramms (gefiltert)
-            counts_filtered, bins_filtered, _ = axes2.hist(filtered_values, bins=50, color='blue', edgecolor='black')
+            counts_filtered, bins_filtered, _ = axes2.hist(gefiltert[1][:-1], bins=gefiltert[1], weights=gefiltert[0], color='blue', edgecolor='black')
             axes2.set_title(f"Vielfachses der SD vom Mean: {column_name}")
             if sd_ub is not None:
                 axes2.axvline(x=sd_ub, color='green', linestyle='--')  # Obergrenze in Rot
@@ -888,29 +1330,17 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             total_points = self.new_layer.featureCount()
             
             if count + 3 >= total_points:
-                self.raw_stat.setText(f"Mittelwert: {round(np.mean(values), 2)}; Standardabweichung: {round(np.std(values), 2)}; Min: {round(np.min(values), 2)}; Max: {round(np.max(values), 2)}")
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
                 self.filter_stat.setText("Nicht genügend Punkte übrig")
             else: 
-                self.raw_stat.setText(f"Mittelwert: {round(np.mean(values), 2)}; Standardabweichung: {round(np.std(values), 2)}; Min: {round(np.min(values), 2)}; Max: {round(np.max(values), 2)}")
-                self.filter_stat.setText(f"Mittelwert: {round(np.mean(filtered_values), 2)}; Standardabweichung: {round(np.std(filtered_values), 2)}; Min: {round(np.min(filtered_values), 2)}; Max: {round(np.max(filtered_values), 2)}")
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText(self.kenngroessen_text(gefiltert[2]))
         
         # Prüfen, ob der Tab "Überlappungsfilter" ausgewählt ist
         elif self.tabWidget_Filter.currentIndex() == 2 and self.tabWidget.currentIndex() == 1:
-            # Hole die Daten aus dem Layer und konvertiere sie in float, wenn möglich
-            values = [float(feat[column_name]) for feat in self.new_layer.getFeatures() if feat[column_name] is not None and self.is_numeric(feat[column_name])]
+            # Histogramme und Kenngrößen der Rohdaten und gefilterten Daten aus dem Ergebnis-Cache
+            roh, gefiltert = self.get_histogramme()
 
-            if self.checkBox_hist.isChecked() or True:  # Immer alle Filter anzeigen für Überlappungsfilter
-                alle_filter_punkte = self.plugin_instance.punktauswahl_gesamt               
-                alle_filter_punkte_flat = list(itertools.chain.from_iterable(alle_filter_punkte)) if any(isinstance(i, list) for i in alle_filter_punkte) else alle_filter_punkte               
-                alle_filter_punkte_set = set(alle_filter_punkte_flat)
-                
-                # Erstelle die gefilterten Daten
-                filtered_values = []
-                for feat in self.new_layer.getFeatures():
-                    feat_id = feat.id()
-                    if feat_id not in alle_filter_punkte_set and feat[column_name] is not None and self.is_numeric(feat[column_name]):
-                        filtered_values.append(float(feat[column_name])) 
-            
             # Falls das Histogramm-Canvas noch nicht existiert, erzeuge es
             if not hasattr(self, 'histogram_canvas'):
                 self.figure = Figure(figsize=(10, 5), dpi=100)
@@ -926,11 +1356,11 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             axes2 = self.figure.add_subplot(122)  # Rechtes Histogramm
 
             # Plot des ersten Histogramms (Rohdaten)
-            counts, bins, _ = axes1.hist(values, bins=50, color='blue', edgecolor='black')
+            counts, bins, _ = axes1.hist(roh[1][:-1], bins=roh[1], weights=roh[0], color='blue', edgecolor='black')
             axes1.set_title(f"Rohdaten: {column_name}")
 
             # Plot des zweiten Histogramms (gefiltert)
-            counts_filtered, bins_filtered, _ = axes2.hist(filtered_values, bins=50, color='blue', edgecolor='black')
+            counts_filtered, bins_filtered, _ = axes2.hist(gefiltert[1][:-1], bins=gefiltert[1], weights=gefiltert[0], color='blue', edgecolor='black')
             axes2.set_title(f"Überlappungsfilter: {column_name}")
             
             # Aktualisiere die Anzeige des Canvas
@@ -942,21 +1372,127 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             total_points = self.new_layer.featureCount()
             
             if count + 3 >= total_points:
-                self.raw_stat.setText(f"Mittelwert: {round(np.mean(values), 2)}; Standardabweichung: {round(np.std(values), 2)}; Min: {round(np.min(values), 2)}; Max: {round(np.max(values), 2)}")
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
                 self.filter_stat.setText("Nicht genügend Punkte übrig")
             else: 
-                self.raw_stat.setText(f"Mittelwert: {round(np.mean(values), 2)}; Standardabweichung: {round(np.std(values), 2)}; Min: {round(np.min(values), 2)}; Max: {round(np.max(values), 2)}")
-                self.filter_stat.setText(f"Mittelwert: {round(np.mean(filtered_values), 2)}; Standardabweichung: {round(np.std(filtered_values), 2)}; Min: {round(np.min(filtered_values), 2)}; Max: {round(np.max(filtered_values), 2)}")
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText(self.kenngroessen_text(gefiltert[2]))
+        
+        # Prüfen, ob der Tab "Robuste Verfahren" ausgewählt ist
+        elif self.tabWidget_Filter.currentIndex() == 3 and self.tabWidget.currentIndex() == 1:
+            # Histogramme und Kenngrößen der Rohdaten und gefilterten Daten aus dem Ergebnis-Cache
+            roh, gefiltert = self.get_histogramme()
+
+            # Grenzen des gewählten Verfahrens, falls es für die Spalte angewendet ist
+            robust_ug = None
+            robust_og = None
+            verfahren = self.comboBox_robust.currentIndex()
+            tabelle = self.plugin_instance.filterparameter_tabelle
+            gruppiert = not pd.isna(tabelle.at[16 + verfahren, column_name]) or not pd.isna(tabelle.at[35 + verfahren, column_name])
+            if self.plugin_instance.filter_auswahl is not None and self.plugin_instance.filter_auswahl.aktiv(ROBUSTE_VERFAHREN[verfahren], column_name) and not gruppiert:
+                if verfahren == 2:
+                    method_robust = tabelle.at[13, column_name]
+                    robust_ug, robust_og = self.plugin_instance.robuste_grenzen(
+                        self.new_layer, column_name, verfahren, None, tabelle.at[11, column_name], tabelle.at[12, column_name])
+                else:
+                    method_robust = tabelle.at[8 + 2 * verfahren, column_name]
+                    robust_ug, robust_og = self.plugin_instance.robuste_grenzen(
+                        self.new_layer, column_name, verfahren, tabelle.at[7 + 2 * verfahren, column_name], None, None)
+                if method_robust == 1:
+                    robust_og = None
+                elif method_robust == 2:
+                    robust_ug = None
+
+            # Falls das Histogramm-Canvas noch nicht existiert, erzeuge es
+            if not hasattr(self, 'histogram_canvas'):
+                self.figure = Figure(figsize=(10, 5), dpi=100)
+                self.histogram_canvas = FigureCanvas(self.figure)
+                self.histogram_layout = QVBoxLayout(self.histogramm)  # Layout für das Widget
+                self.histogram_layout.addWidget(self.histogram_canvas)
+
+            # Bereite die Achsen für zwei Histogramme vor
+            self.figure.clear()
+            self.figure.subplots_adjust(wspace=0.3)  # Erhöht den horizontalen Abstand (Standard ist 0.2)
+            
+            axes1 = self.figure.add_subplot(121)  # Linkes Histogramm
+            axes2 = self.figure.add_subplot(122)  # Rechtes Histogramm
+
+            # Plot des ersten Histogramms (Rohdaten)
+            counts, bins, _ = axes1.hist(roh[1][:-1], bins=roh[1], weights=roh[0], color='blue', edgecolor='black')
+            axes1.set_title(f"Rohdaten: {column_name}")
+            if robust_og is not None:
+                axes1.axvline(x=robust_og, color='orange', linestyle='--')  # Obergrenze in Orange
+            if robust_ug is not None:
+                axes1.axvline(x=robust_ug, color='orange', linestyle='--')  # Untergrenze in Orange
+
+            # Plot des zweiten Histogramms (gefiltert)
+            counts_filtered, bins_filtered, _ = axes2.hist(gefiltert[1][:-1], bins=gefiltert[1], weights=gefiltert[0], color='blue', edgecolor='black')
+            axes2.set_title(f"Robuste Verfahren: {column_name}")
+            if robust_og is not None:
+                axes2.axvline(x=robust_og, color='orange', linestyle='--')  # Obergrenze in Orange
+            if robust_ug is not None:
+                axes2.axvline(x=robust_ug, color='orange', linestyle='--')  # Untergrenze in Orange
+            
+            # Aktualisiere die Anzeige des Canvas
+            self.histogram_canvas.draw()
+
+            # Deskriptive Statistik
+            selected_features = self.new_layer.selectedFeatures()  # Holen der aktuell ausgewählten Features           
+            count = len(selected_features)
+            total_points = self.new_layer.featureCount()
+            
+            if count + 3 >= total_points:
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText("Nicht genügend Punkte übrig")
+            else: 
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText(self.kenngroessen_text(gefiltert[2]))
+        
+        # Prüfen, ob der Tab "Multivariat", "Lokal", "Moran's I" oder "Hampel" ausgewählt ist
+        elif self.tabWidget_Filter.currentIndex() in (4, 5, 6, 7) and self.tabWidget.currentIndex() == 1:
+            # Histogramme und Kenngrößen der Rohdaten und gefilterten Daten aus dem Ergebnis-Cache
+            roh, gefiltert = self.get_histogramme()
+
+            # Falls das Histogramm-Canvas noch nicht existiert, erzeuge es
+            if not hasattr(self, 'histogram_canvas'):
+                self.figure = Figure(figsize=(10, 5), dpi=100)
+                self.histogram_canvas = FigureCanvas(self.figure)
+                self.histogram_layout = QVBoxLayout(self.histogramm)  # Layout für das Widget
+                self.histogram_layout.addWidget(self.histogram_canvas)
+
+            # Bereite die Achsen für zwei Histogramme vor
+            self.figure.clear()
+            self.figure.subplots_adjust(wspace=0.3)  # Erhöht den horizontalen Abstand (Standard ist 0.2)
+            
+            axes1 = self.figure.add_subplot(121)  # Linkes Histogramm
+            axes2 = self.figure.add_subplot(122)  # Rechtes Histogramm
+
+            # Plot des ersten Histogramms (Rohdaten)
+            counts, bins, _ = axes1.hist(roh[1][:-1], bins=roh[1], weights=roh[0], color='blue', edgecolor='black')
+            axes1.set_title(f"Rohdaten: {column_name}")
+
+            # Plot des zweiten Histogramms (gefiltert); die Grenzen gelten für die Distanz bzw. je Punkt, daher ohne Linien
+            counts_filtered, bins_filtered, _ = axes2.hist(gefiltert[1][:-1], bins=gefiltert[1], weights=gefiltert[0], color='blue', edgecolor='black')
+            titel = {4: "Mahalanobis", 5: "Lokal", 6: "Moran's I", 7: "Hampel"}[self.tabWidget_Filter.currentIndex()]
+            axes2.set_title(f"{titel}: {column_name}")
+            
+            # Aktualisiere die Anzeige des Canvas
+            self.histogram_canvas.draw()
+
+            # Deskriptive Statistik
+            selected_features = self.new_layer.selectedFeatures()  # Holen der aktuell ausgewählten Features           
+            count = len(selected_features)
+            total_points = self.new_layer.featureCount()
+            
+            if count + 3 >= total_points:
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText("Nicht genügend Punkte übrig")
+            else: 
+                self.raw_stat.setText(self.kenngroessen_text(roh[2]))
+                self.filter_stat.setText(self.kenngroessen_text(gefiltert[2]))
 
     #self.filter_stat.setText(f"Mittelwert: {round(np.mean(filtered_values), 2)}; Standardabweichung: {round(np.std(filtered_values), 2)}; Min: {round(np.min(filtered_values), 2)}; Max: {round(np.max(filtered_values), 2)}")
 
-    # Hilfsfunktion, um zu prüfen, ob ein Wert numerisch ist
-    def is_numeric(self, value):
-        try:
-            float(value)
-            return True
-        except (ValueError, TypeError):
-            return False
             
     # The setup_overlap_tab method is no longer needed as the UI elements are defined in the UI file
     
@@ -1029,20 +1565,11 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         
         # Select the filtered points in the layer
         if filtered_ids:
-            self.new_layer.selectByIds(filtered_ids)
-            
-            # Add these IDs to the plugin_instance's punktauswahl_gesamt
-            if not hasattr(self.plugin_instance, 'punktauswahl_gesamt'):
-                self.plugin_instance.punktauswahl_gesamt = []
-            
-            self.plugin_instance.punktauswahl_gesamt.extend(filtered_ids)
-            self.plugin_instance.punktauswahl_gesamt = list(set(self.plugin_instance.punktauswahl_gesamt))  # Remove duplicates
-            
-            # Update the selection count label
-            self.label_auswahl.setText(f"Anzahl ausgewählter Punkte: {len(self.plugin_instance.punktauswahl_gesamt)}")
-            self.label_auswahl_rel.setText(
-                f"Relativer Anteil ausgewählter Punkte: {round(len(self.plugin_instance.punktauswahl_gesamt) / self.new_layer.featureCount() * 100, 2)}%"
-            )
+            # Store the overlap points as their own filter rule and update the combined selection and labels
+            if self.plugin_instance.filter_auswahl is None:
+                self.plugin_instance.create_filter_auswahl(self.new_layer)
+            self.plugin_instance.filter_auswahl.setzen_ids('Überlappung', '', filtered_ids)
+            self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
             
             # Update the overlap count label
             stats = filter.get_statistics()
@@ -1071,45 +1598,10 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
     
     def on_overlap_reset_clicked(self):
         """Reset the overlap filter."""
-        # Remove overlap-filtered points from the selection
-        if hasattr(self.plugin_instance, 'punktauswahl_gesamt') and hasattr(self, 'new_layer'):
-            # We don't know exactly which points were from the overlap filter, so we just clear the selection
-            # and recreate it from the other filters
-            self.plugin_instance.punktauswahl_gesamt = []
-            
-            # Re-apply other filters if they exist
-            selected_column = self.columnComboBox2.currentText()
-            if hasattr(self.plugin_instance, 'filter_punktauswahl') and selected_column:
-                # Get points from other filters
-                untergrenze_indices = self.plugin_instance.filter_punktauswahl.loc['Untergrenze', selected_column].tolist()
-                obergrenze_indices = self.plugin_instance.filter_punktauswahl.loc['Obergrenze', selected_column].tolist()
-                sd_indices = self.plugin_instance.filter_punktauswahl.loc['Standardabweichung', selected_column].tolist()
-                
-                # Flatten lists if needed
-                import itertools
-                untergrenze_indices_flat = list(itertools.chain.from_iterable(untergrenze_indices)) if any(isinstance(i, list) for i in untergrenze_indices) else untergrenze_indices
-                obergrenze_indices_flat = list(itertools.chain.from_iterable(obergrenze_indices)) if any(isinstance(i, list) for i in obergrenze_indices) else obergrenze_indices
-                sd_indices_flat = list(itertools.chain.from_iterable(sd_indices)) if any(isinstance(i, list) for i in sd_indices) else sd_indices
-                
-                # Combine all filter indices
-                all_indices = untergrenze_indices_flat + obergrenze_indices_flat + sd_indices_flat
-                self.plugin_instance.punktauswahl_gesamt = list(set(all_indices))  # Remove duplicates
-            
-            # Update selection in layer
-            if self.plugin_instance.punktauswahl_gesamt:
-                self.new_layer.selectByIds(self.plugin_instance.punktauswahl_gesamt)
-            else:
-                self.new_layer.removeSelection()
-            
-            # Update labels
-            if self.plugin_instance.punktauswahl_gesamt:
-                self.label_auswahl.setText(f"Anzahl ausgewählter Punkte: {len(self.plugin_instance.punktauswahl_gesamt)}")
-                self.label_auswahl_rel.setText(
-                    f"Relativer Anteil ausgewählter Punkte: {round(len(self.plugin_instance.punktauswahl_gesamt) / self.new_layer.featureCount() * 100, 2)}%"
-                )
-            else:
-                self.label_auswahl.setText("keine Filter angewand")
-                self.label_auswahl_rel.setText("")
+        # Remove the overlap rule and rebuild the combined selection from the remaining filters
+        if self.plugin_instance.filter_auswahl is not None and hasattr(self, 'new_layer'):
+            self.plugin_instance.filter_auswahl.entfernen('Überlappung', '')
+            self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
         # Reset the overlap count label
         self.count_overlap_label.setText("")
@@ -1180,6 +1672,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Aktuallisiere das Lable
         self.count_LB_label.setText(f"Anzahl ausgewählter Punkte: {self.plugin_instance.auswahl_tabelle.at[0, selected_column]}")
         
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
         # Aktualisiere die Gesamtauswahl
         self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
@@ -1217,8 +1712,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Setze die Auswhaltabelle zurück
         self.plugin_instance.auswahl_tabelle.at[0, selected_column] = None
         
-        # filter_punktauswahl zurücksetzen
-        self.plugin_instance.filter_punktauswahl.at[('Untergrenze', selected_column), 'Werte'] = None
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Untergrenze', selected_column)
         
         # Aktuallisiere die Filtertabelle
         self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
@@ -1226,6 +1721,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # aktualisiere das Lable
         self.count_LB_label.setText("kein Filter angewand")
         
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
         # Aktualisiere die Gesamtauswahl
         self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
@@ -1269,6 +1767,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Aktuallisiere das Lable
         self.count_UB_label.setText(f"Anzahl ausgewählter Punkte: {self.plugin_instance.auswahl_tabelle.at[1, selected_column]}")
         
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
         # Aktualisiere die Gesamtauswahl
         self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
@@ -1303,8 +1804,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Setze die Auswhaltabelle zurück
         self.plugin_instance.auswahl_tabelle.at[1, selected_column] = None
         
-        # filter_punktauswahl zurücksetzen
-        self.plugin_instance.filter_punktauswahl.at[('Obergrenze', selected_column), 'Werte'] = None
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Obergrenze', selected_column)
         
         # Aktuallisiere die Filtertabelle
         self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
@@ -1312,6 +1813,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # aktualisiere das Lable
         self.count_UB_label.setText("kein Filter angewand")
         
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
         # Aktualisiere die Gesamtauswahl
         self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
@@ -1357,6 +1861,15 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         
         # Schreibe die Basis in die Parametertabelle
         self.plugin_instance.filterparameter_tabelle.at[6, selected_column] = basis       
+        
+        # Schreibe die Höchstzahl der Runden (nur iterativ) in die Parametertabelle
+        self.plugin_instance.filterparameter_tabelle.at[14, selected_column] = self.sd_max_runden()
+        
+        # Schreibe die Gruppierung in die Parametertabelle
+        self.plugin_instance.filterparameter_tabelle.at[15, selected_column] = self.gruppen_spalte()
+        
+        # Schreibe den Trendabzug in die Parametertabelle
+        self.plugin_instance.filterparameter_tabelle.at[34, selected_column] = self.trend_text()
                
         # Führe den Filter aus
         self.plugin_instance.filterfunction_sd(self.new_layer)
@@ -1367,6 +1880,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Aktuallisiere das Lable
         self.count_SD_label.setText(f"Anzahl ausgewählter Punkte: {self.plugin_instance.auswahl_tabelle.at[2, selected_column]}")
         
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
         # Aktualisiere die Gesamtauswahl
         self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
@@ -1379,6 +1895,42 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.log_sd(id)
         self.log_kenngroessen(id)
         
+    def on_sd_spalten_anwenden_clicked(self):
+        """Wendet den SD-Filter mit den aktuellen Einstellungen auf alle in mComboBox_SpaltenSD gewählten Spalten an."""
+        id = str(uuid.uuid4())
+
+        # Hole die gewählten Spalten
+        spalten_liste = self.mComboBox_SpaltenSD.checkedItems()
+        if not spalten_liste:
+            QMessageBox.warning(self, "Fehler", "Bitte wählen Sie mindestens eine Spalte aus.")
+            return
+        
+        # Schreibe Multiplikator, Methode und Basis für alle Spalten in die Parametertabelle
+        basis = 1 if self.checkBox_SD.isChecked() else 0
+        self.plugin_instance.filterparameter_tabelle.loc[4, spalten_liste] = self.doubleSpinBox_SD.value()
+        self.plugin_instance.filterparameter_tabelle.loc[5, spalten_liste] = self.comboBox_sd.currentIndex()
+        self.plugin_instance.filterparameter_tabelle.loc[6, spalten_liste] = basis
+        self.plugin_instance.filterparameter_tabelle.loc[14, spalten_liste] = self.sd_max_runden()
+        self.plugin_instance.filterparameter_tabelle.loc[15, spalten_liste] = self.gruppen_spalte()
+        self.plugin_instance.filterparameter_tabelle.loc[34, spalten_liste] = self.trend_text()
+        
+        # Führe den Filter für alle Spalten in einem Durchgang aus
+        anzahlen = self.plugin_instance.filterfunction_sd_spalten(self.new_layer, spalten_liste)
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Live-Vorschau aller Filter nachführen (die aktuelle Spalte kann unter den gewählten sein)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+        self.log_sd_spalten(id, spalten_liste, anzahlen)
+        
     def on_sd_reset_clicked(self):
         # Hole den Spaltennamen aus columnComboBox2
         selected_column = self.columnComboBox2.currentText()
@@ -1396,6 +1948,10 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         self.plugin_instance.filterparameter_tabelle.at[4, selected_column] = None
         self.plugin_instance.filterparameter_tabelle.at[5, selected_column] = None
         self.plugin_instance.filterparameter_tabelle.at[6, selected_column] = None
+        self.plugin_instance.filterparameter_tabelle.at[14, selected_column] = None
+        self.plugin_instance.filterparameter_tabelle.at[15, selected_column] = None
+        self.plugin_instance.filterparameter_tabelle.at[34, selected_column] = None
+        self.plugin_instance.sd_iteration.pop(selected_column, None)
         
         # SpinBox zurücksetzen
         self.doubleSpinBox_SD.setValue(2)
@@ -1403,8 +1959,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Setze die Auswhaltabelle zurück
         self.plugin_instance.auswahl_tabelle.at[2, selected_column] = None
         
-        # filter_punktauswahl zurücksetzen
-        self.plugin_instance.filter_punktauswahl.at[('Standardabweichung', selected_column), 'Werte'] = None
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Standardabweichung', selected_column)
         
         # Aktuallisiere die Filtertabelle
         self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
@@ -1412,6 +1968,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # aktualisiere das Lable
         self.count_SD_label.setText("kein Filter angewand")
         
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
         # Aktualisiere die Gesamtauswahl
         self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
         
@@ -1423,6 +1982,427 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
         # Aktualisiere die Anzeige des Canvas
         self.create_histograms()
 
+    def on_robust_anwenden_clicked(self):
+        id = str(uuid.uuid4())
+
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+        
+        # Hole Verfahren (0 = MAD, 1 = IQR, 2 = Perzentile) und Methode
+        verfahren = self.comboBox_robust.currentIndex()
+        method_robust = self.comboBox_robust_seite.currentIndex()
+        
+        # Schreibe Parameter und Methode in die Parametertabelle (MAD: Zeilen 8/9, IQR: 10/11, Perzentil: 12 bis 14)
+        if verfahren == 2:
+            self.plugin_instance.filterparameter_tabelle.at[11, selected_column] = self.doubleSpinBox_robust_p_unten.value()
+            self.plugin_instance.filterparameter_tabelle.at[12, selected_column] = self.doubleSpinBox_robust_p_oben.value()
+            self.plugin_instance.filterparameter_tabelle.at[13, selected_column] = method_robust
+        else:
+            self.plugin_instance.filterparameter_tabelle.at[7 + 2 * verfahren, selected_column] = self.doubleSpinBox_robust_k.value()
+            self.plugin_instance.filterparameter_tabelle.at[8 + 2 * verfahren, selected_column] = method_robust
+        
+        # Schreibe die Gruppierung in die Parametertabelle (MAD: Zeile 17, IQR: 18, Perzentil: 19)
+        self.plugin_instance.filterparameter_tabelle.at[16 + verfahren, selected_column] = self.gruppen_spalte()
+        
+        # Schreibe den Trendabzug in die Parametertabelle (MAD: Zeile 36, IQR: 37, Perzentil: 38)
+        self.plugin_instance.filterparameter_tabelle.at[35 + verfahren, selected_column] = self.trend_text()
+        
+        # Führe den Filter aus
+        untergrenze, obergrenze = self.plugin_instance.filterfunction_robust(self.new_layer)
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Aktuallisiere das Lable
+        self.count_robust_label.setText(f"Anzahl ausgewählter Punkte: {self.plugin_instance.auswahl_tabelle.at[3 + verfahren, selected_column]}")
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas und der zweiten Karte
+        self.create_histograms()
+
+        self.log_robust(id, untergrenze, obergrenze)
+        self.log_kenngroessen(id)
+        
+    def on_robust_spalten_anwenden_clicked(self):
+        """Wendet das robuste Verfahren mit den aktuellen Einstellungen auf alle in mComboBox_SpaltenRobust gewählten Spalten an."""
+        id = str(uuid.uuid4())
+
+        # Hole die gewählten Spalten
+        spalten_liste = self.mComboBox_SpaltenRobust.checkedItems()
+        if not spalten_liste:
+            QMessageBox.warning(self, "Fehler", "Bitte wählen Sie mindestens eine Spalte aus.")
+            return
+
+        # Schreibe Parameter, Methode, Gruppierung und Trendabzug für alle Spalten in die Parametertabelle
+        # (Zeilen wie in on_robust_anwenden_clicked)
+        verfahren = self.comboBox_robust.currentIndex()
+        method_robust = self.comboBox_robust_seite.currentIndex()
+        if verfahren == 2:
+            self.plugin_instance.filterparameter_tabelle.loc[11, spalten_liste] = self.doubleSpinBox_robust_p_unten.value()
+            self.plugin_instance.filterparameter_tabelle.loc[12, spalten_liste] = self.doubleSpinBox_robust_p_oben.value()
+            self.plugin_instance.filterparameter_tabelle.loc[13, spalten_liste] = method_robust
+        else:
+            self.plugin_instance.filterparameter_tabelle.loc[7 + 2 * verfahren, spalten_liste] = self.doubleSpinBox_robust_k.value()
+            self.plugin_instance.filterparameter_tabelle.loc[8 + 2 * verfahren, spalten_liste] = method_robust
+        self.plugin_instance.filterparameter_tabelle.loc[16 + verfahren, spalten_liste] = self.gruppen_spalte()
+        self.plugin_instance.filterparameter_tabelle.loc[35 + verfahren, spalten_liste] = self.trend_text()
+
+        # Führe den Filter für alle Spalten in einem Durchgang aus
+        anzahlen = self.plugin_instance.filterfunction_robust_spalten(self.new_layer, spalten_liste)
+
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+
+        # Live-Vorschau aller Filter nachführen (die aktuelle Spalte kann unter den gewählten sein)
+        self.aktualisiere_anzahl_vorschau()
+
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+        self.log_robust_spalten(id, spalten_liste, anzahlen)
+
+    def on_robust_reset_clicked(self):
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+        verfahren = self.comboBox_robust.currentIndex()
+
+        # Entfernt "actions" und "statistics" aus dem Log, entsprechend aktionstyp, typ, selected_column, methode, wert
+        aktionstyp = "Filter"
+        typ = ROBUSTE_VERFAHREN[verfahren]
+        methode = self.comboBox_robust_seite.currentText()
+        wert = self.robust_wert_text()
+        id = str(self.log.remove_action_by_parameters(aktionstyp, typ, selected_column, methode, wert))
+        if id:
+            self.log.remove_by_id(id)
+        
+        # Setze die Werte in der Tabelle Filterparameter zurück
+        if verfahren == 2:
+            zeilen = [11, 12, 13]
+        else:
+            zeilen = [7 + 2 * verfahren, 8 + 2 * verfahren]
+        zeilen += [16 + verfahren, 35 + verfahren]
+        for zeile in zeilen:
+            self.plugin_instance.filterparameter_tabelle.at[zeile, selected_column] = None
+        
+        # Setze die Auswhaltabelle zurück
+        self.plugin_instance.auswahl_tabelle.at[3 + verfahren, selected_column] = None
+        
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen(ROBUSTE_VERFAHREN[verfahren], selected_column)
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # SpinBoxen auf die Standardwerte und Label zurücksetzen
+        self.on_robust_verfahren_changed()
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+    def on_lokal_anwenden_clicked(self):
+        id = str(uuid.uuid4())
+
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+        
+        # Führe den Filter aus (der KD-Baum wird nur beim ersten Aufruf für den Layer aufgebaut)
+        anzahl = self.plugin_instance.filterfunction_lokal(self.new_layer)
+        if anzahl is None:
+            QMessageBox.warning(self, "Fehler", f"Die Nachbarschaft umfasst bei einzelnen Punkten mehr als {MAX_NACHBARN} Nachbarn. Bitte wählen Sie einen kleineren Radius oder k nächste Nachbarn.")
+            return
+        
+        # Schreibe Multiplikator, Methode und Nachbarschaft in die Parametertabelle (Zeilen 21 bis 24)
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        tabelle.at[20, selected_column] = self.doubleSpinBox_lokal_mult.value()
+        tabelle.at[21, selected_column] = self.comboBox_lokal_seite.currentIndex()
+        if self.comboBox_lokal_modus.currentIndex() == 0:
+            tabelle.at[22, selected_column] = self.spinBox_lokal_k.value()
+            tabelle.at[23, selected_column] = None
+        else:
+            tabelle.at[22, selected_column] = None
+            tabelle.at[23, selected_column] = self.doubleSpinBox_lokal_radius.value()
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Aktuallisiere das Lable
+        self.count_lokal_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+        self.log_lokal(id)
+        self.log_kenngroessen(id)
+        
+    def on_lokal_reset_clicked(self):
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+
+        # Entfernt "actions" und "statistics" aus dem Log, entsprechend aktionstyp, typ, selected_column, methode, wert
+        id = self.log.remove_action_by_parameters("Filter", "Lokal", selected_column, self.comboBox_lokal_seite.currentText(), self.lokal_wert_text())
+        if id:
+            self.log.remove_by_id(id)
+        
+        # Setze die Werte in der Tabelle Filterparameter und die Auswahltabelle zurück
+        for zeile in (20, 21, 22, 23):
+            self.plugin_instance.filterparameter_tabelle.at[zeile, selected_column] = None
+        self.plugin_instance.auswahl_tabelle.at[7, selected_column] = None
+        
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Lokal', selected_column)
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # SpinBoxen auf die Standardwerte und Label zurücksetzen
+        self.lokal_parameter_anzeigen()
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+    def on_moran_anwenden_clicked(self):
+        id = str(uuid.uuid4())
+
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+        
+        # Führe den Filter aus (die Gewichtsmatrix wird nur bei neuer Nachbarschaft aufgebaut)
+        anzahl = self.plugin_instance.filterfunction_moran(self.new_layer)
+        if anzahl is None:
+            QMessageBox.warning(self, "Fehler", f"Das Distanzband umfasst bei einzelnen Punkten mehr als {MAX_NACHBARN} Nachbarn. Bitte wählen Sie einen kleineren Radius oder k nächste Nachbarn.")
+            return
+        
+        # Schreibe Typ, Signifikanzniveau, Nachbarschaft und Permutationen in die Parametertabelle (Zeilen 25 bis 29)
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        tabelle.at[24, selected_column] = self.comboBox_moran_typ.currentIndex()
+        tabelle.at[25, selected_column] = self.doubleSpinBox_moran_alpha.value()
+        if self.comboBox_moran_modus.currentIndex() == 0:
+            tabelle.at[26, selected_column] = self.spinBox_moran_k.value()
+            tabelle.at[27, selected_column] = None
+        else:
+            tabelle.at[26, selected_column] = None
+            tabelle.at[27, selected_column] = self.doubleSpinBox_moran_radius.value()
+        tabelle.at[28, selected_column] = self.spinBox_moran_permutationen.value() if self.checkBox_moran_permutation.isChecked() else None
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Aktuallisiere das Lable
+        self.count_moran_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+        self.log_moran(id)
+        self.log_kenngroessen(id)
+        
+    def on_moran_reset_clicked(self):
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+
+        # Entfernt "actions" und "statistics" aus dem Log, entsprechend aktionstyp, typ, selected_column, methode, wert
+        id = self.log.remove_action_by_parameters("Filter", "Moran", selected_column, self.comboBox_moran_typ.currentText(), self.moran_wert_text())
+        if id:
+            self.log.remove_by_id(id)
+        
+        # Setze die Werte in der Tabelle Filterparameter und die Auswahltabelle zurück
+        for zeile in (24, 25, 26, 27, 28):
+            self.plugin_instance.filterparameter_tabelle.at[zeile, selected_column] = None
+        self.plugin_instance.auswahl_tabelle.at[8, selected_column] = None
+        
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Moran', selected_column)
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Parameter auf die Standardwerte und Label zurücksetzen
+        self.moran_parameter_anzeigen()
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+    def on_hampel_anwenden_clicked(self):
+        id = str(uuid.uuid4())
+
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+        
+        # Führe den Filter aus (Fahrspuren und gleitende Mediane werden nur bei neuem Zeitstempel, neuer Lücke, neuem Spurwechsel oder neuem Fenster berechnet)
+        anzahl = self.plugin_instance.filterfunction_hampel(self.new_layer)
+        if anzahl is None:
+            QMessageBox.warning(self, "Fehler", "Keine gültigen Zeitstempel gefunden. Bitte überprüfen Sie die Zeitstempel-Spalte.")
+            return
+        
+        # Schreibe Multiplikator, Methode, Fenster, Lücke und Zeitstempel (Zeilen 30 bis 34) sowie das Attribut für
+        # den Spurwechsel mit Schwelle (Zeilen 39 und 40) in die Parametertabelle
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        tabelle.at[29, selected_column] = self.doubleSpinBox_hampel_mult.value()
+        tabelle.at[30, selected_column] = self.comboBox_hampel_seite.currentIndex()
+        tabelle.at[31, selected_column] = self.spinBox_hampel_fenster.value()
+        tabelle.at[32, selected_column] = self.doubleSpinBox_hampel_luecke.value()
+        tabelle.at[33, selected_column] = self.comboBox_hampel_zeit.currentText()
+        tabelle.at[38, selected_column] = self.comboBox_hampel_spur.currentText() or None
+        tabelle.at[39, selected_column] = self.doubleSpinBox_hampel_spur_schwelle.value() if self.comboBox_hampel_spur.currentText() else None
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Aktuallisiere das Lable
+        self.count_hampel_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+        self.log_hampel(id)
+        self.log_kenngroessen(id)
+        
+    def on_hampel_reset_clicked(self):
+        # Hole den Spaltennamen aus columnComboBox2
+        selected_column = self.columnComboBox2.currentText()
+
+        # Entfernt "actions" und "statistics" aus dem Log, entsprechend aktionstyp, typ, selected_column, methode, wert
+        id = self.log.remove_action_by_parameters("Filter", "Hampel", selected_column, self.comboBox_hampel_seite.currentText(), self.hampel_wert_text())
+        if id:
+            self.log.remove_by_id(id)
+        
+        # Setze die Werte in der Tabelle Filterparameter und die Auswahltabelle zurück
+        for zeile in (29, 30, 31, 32, 33, 38, 39):
+            self.plugin_instance.filterparameter_tabelle.at[zeile, selected_column] = None
+        self.plugin_instance.auswahl_tabelle.at[9, selected_column] = None
+        
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Hampel', selected_column)
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Parameter auf die Standardwerte und Label zurücksetzen
+        self.hampel_parameter_anzeigen()
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+    def maha_spalten(self):
+        """Spalten, auf die der Mahalanobis-Filter angewendet ist (Zeile 20 der Parametertabelle gesetzt)."""
+        tabelle = self.plugin_instance.filterparameter_tabelle
+        return [spalte for spalte in tabelle.columns[1:] if not pd.isna(tabelle.at[19, spalte])]
+
+    def on_maha_anwenden_clicked(self):
+        """Wendet den Mahalanobis-Filter auf die in mComboBox_SpaltenMaha gewählten Spalten an. Ein erneutes
+        Anwenden ersetzt die bisherige Auswahl des Filters."""
+        id = str(uuid.uuid4())
+
+        # Hole die gewählten Spalten
+        spalten_liste = self.mComboBox_SpaltenMaha.checkedItems()
+        if len(spalten_liste) < 2:
+            QMessageBox.warning(self, "Fehler", "Bitte wählen Sie mindestens zwei Spalten aus.")
+            return
+        
+        # Führe den Filter aus
+        anzahl = self.plugin_instance.filterfunction_mahalanobis(self.new_layer, spalten_liste)
+        if anzahl is None:
+            QMessageBox.warning(self, "Fehler", "Zu wenige Punkte mit Werten in allen gewählten Spalten.")
+            return
+        
+        # Bisherigen Log-Eintrag ersetzen und Quantil für die beteiligten Spalten in die Parametertabelle schreiben
+        self.remove_log_maha()
+        self.plugin_instance.filterparameter_tabelle.loc[19, self.plugin_instance.filterparameter_tabelle.columns[1:]] = None
+        self.plugin_instance.filterparameter_tabelle.loc[19, spalten_liste] = self.doubleSpinBox_Maha_Quantil.value()
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Aktuallisiere das Lable
+        self.count_Maha_label.setText(f"Anzahl ausgewählter Punkte: {anzahl}")
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
+        self.log_mahalanobis(id, spalten_liste, anzahl)
+        
+    def on_maha_reset_clicked(self):
+        # Entfernt "actions" und "statistics" aus dem Log
+        self.remove_log_maha()
+        
+        # Setze die Werte in der Tabelle Filterparameter und die Auswahltabelle zurück
+        self.plugin_instance.filterparameter_tabelle.loc[19, self.plugin_instance.filterparameter_tabelle.columns[1:]] = None
+        self.plugin_instance.auswahl_tabelle.loc[6, self.plugin_instance.auswahl_tabelle.columns[1:]] = None
+        
+        # Bitmaske der Regel entfernen
+        self.plugin_instance.filter_auswahl.entfernen('Mahalanobis', '')
+        
+        # Aktuallisiere die Filtertabelle
+        self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
+        
+        # Label zurücksetzen
+        self.count_Maha_label.setText("kein Filter angewand")
+        
+        # Live-Vorschau aller Filter nachführen (die SD-Basis hängt von den übrigen Filtern ab)
+        self.aktualisiere_anzahl_vorschau()
+        
+        # Aktualisiere die Gesamtauswahl
+        self.plugin_instance.combine_filter_punktauswahl(self.new_layer)
+        
+        # Aktualisiere die Anzeige des Canvas
+        self.create_histograms()
+
     ########## Log alle Änderungen im Tab "Filter" ##########
     # Log Untergrenze
     def log_untergrenze(self, id):
@@ -1469,73 +2449,237 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             methode = self.comboBox_sd.currentText()
             relativ = round((count / self.anzahl_punkte) * 100, 2)
 
-            self.log.log_event("Filter",{
+            details = {
                 "ID": id,
                 "Typ:": "Standardabweichung",
                 "Attribut:": f"{selected_column}",
                 "Methode:": f"{methode}",
                 "Wert:": f"{value}",
                 "Entfernte Punkte:": {"absolut:": f"{count}", "relativ:": f"{relativ}%"}
+            }
+            # Gruppierter Filter: Kennwerte je Gruppe dieser Spalte
+            if self.gruppen_spalte():
+                details["Gruppierung:"] = self.gruppen_spalte()
+            # Filter auf den Residuen nach Abzug des räumlichen Trends
+            if self.trend_text():
+                details["Trendabzug:"] = self.trend_text()
+            # Iterativer Filter: Anzahl der Runden und in jeder Runde neu entfernte Punkte
+            if selected_column in self.plugin_instance.sd_iteration:
+                entfernt, SD_ug, SD_og = self.plugin_instance.sd_iteration[selected_column]
+                details["Runden:"] = f"{len(entfernt)}"
+                details["Entfernte Punkte je Runde:"] = [f"{anzahl}" for anzahl in entfernt]
+                if SD_ug is not None:
+                    details["Grenzen:"] = f"{round(SD_ug, 2)} / {round(SD_og, 2)}"
+            self.log.log_event("Filter", details)
+
+    # Log SD-Filter auf mehreren Spalten: ein gemeinsamer Eintrag mit den entfernten Punkten je Spalte
+    def log_sd_spalten(self, id, spalten_liste, anzahlen):
+        value = self.doubleSpinBox_SD.value()
+        methode = self.comboBox_sd.currentText()
+        
+        self.log.log_event("Filter",{
+            "ID": id,
+            "Typ:": "Standardabweichung (mehrere Spalten)",
+            "Attribute:": list(spalten_liste),
+            "Methode:": f"{methode}",
+            "Wert:": f"{value}",
+            "Basis:": "gefilterte Daten" if self.checkBox_SD.isChecked() else "Rohdaten",
+            "Gruppierung:": self.gruppen_spalte() or "keine",
+            "Trendabzug:": self.trend_text() or "keiner",
+            "Entfernte Punkte:": {
+                spalte: {"absolut:": f"{anzahl}", "relativ:": f"{round((anzahl / self.anzahl_punkte) * 100, 2)}%"}
+                for spalte, anzahl in zip(spalten_liste, anzahlen.tolist())
+            },
+            # Iterativer Filter: in jeder Runde neu entfernte Punkte je Spalte
+            "Entfernte Punkte je Runde:": {
+                spalte: [f"{anzahl}" for anzahl in self.plugin_instance.sd_iteration[spalte][0]]
+                for spalte in spalten_liste if spalte in self.plugin_instance.sd_iteration
+            }
+        })
+
+    # Wert eines robusten Filters für den Log: Multiplikator bzw. unteres und oberes Perzentil
+    def robust_wert_text(self):
+        if self.comboBox_robust.currentIndex() == 2:
+            return f"{self.doubleSpinBox_robust_p_unten.value()} - {self.doubleSpinBox_robust_p_oben.value()} %"
+        return str(self.doubleSpinBox_robust_k.value())
+
+    # Log robuste Verfahren (MAD, IQR, Perzentile)
+    def log_robust(self, id, untergrenze, obergrenze):
+        selected_column = self.columnComboBox2.currentText()
+        verfahren = self.comboBox_robust.currentIndex()
+        count = self.plugin_instance.auswahl_tabelle.at[3 + verfahren, selected_column]
+        if count != None:
+            methode = self.comboBox_robust_seite.currentText()
+            relativ = round((count / self.anzahl_punkte) * 100, 2)
+
+            details = {
+                "ID": id,
+                "Typ:": ROBUSTE_VERFAHREN[verfahren],
+                "Attribut:": f"{selected_column}",
+                "Methode:": f"{methode}",
+                "Wert:": self.robust_wert_text(),
+                "Entfernte Punkte:": {"absolut:": f"{count}", "relativ:": f"{relativ}%"}
+            }
+            # Mit Trendabzug gelten die Grenzen für die Residuen
+            if self.trend_text():
+                details["Trendabzug:"] = self.trend_text()
+            # Bei Gruppierung gibt es Grenzen je Gruppe, sonst eine gemeinsame Ober- und Untergrenze
+            if self.gruppen_spalte():
+                details["Gruppierung:"] = self.gruppen_spalte()
+            else:
+                details["Grenzen:"] = f"{round(untergrenze, 2)} / {round(obergrenze, 2)}"
+            self.log.log_event("Filter", details)
+
+    # Log robuste Verfahren auf mehreren Spalten: ein gemeinsamer Eintrag mit den entfernten Punkten je Spalte
+    def log_robust_spalten(self, id, spalten_liste, anzahlen):
+        self.log.log_event("Filter", {
+            "ID": id,
+            "Typ:": f"{ROBUSTE_VERFAHREN[self.comboBox_robust.currentIndex()]} (mehrere Spalten)",
+            "Attribute:": list(spalten_liste),
+            "Methode:": f"{self.comboBox_robust_seite.currentText()}",
+            "Wert:": self.robust_wert_text(),
+            "Gruppierung:": self.gruppen_spalte() or "keine",
+            "Trendabzug:": self.trend_text() or "keiner",
+            "Entfernte Punkte:": {
+                spalte: {"absolut:": f"{anzahl}", "relativ:": f"{round((anzahl / self.anzahl_punkte) * 100, 2)}%"}
+                for spalte, anzahl in zip(spalten_liste, anzahlen.tolist())
+            }
+        })
+
+    # Log lokaler Filter
+    def log_lokal(self, id):
+        selected_column = self.columnComboBox2.currentText()
+        count = self.plugin_instance.auswahl_tabelle.at[7, selected_column]
+        if count != None:
+            relativ = round((count / self.anzahl_punkte) * 100, 2)
+            self.log.log_event("Filter", {
+                "ID": id,
+                "Typ:": "Lokal",
+                "Attribut:": f"{selected_column}",
+                "Methode:": self.comboBox_lokal_seite.currentText(),
+                "Wert:": self.lokal_wert_text(),
+                "Entfernte Punkte:": {"absolut:": f"{count}", "relativ:": f"{relativ}%"}
+            })
+
+    # Log Moran-Filter
+    def log_moran(self, id):
+        selected_column = self.columnComboBox2.currentText()
+        count = self.plugin_instance.auswahl_tabelle.at[8, selected_column]
+        if count != None:
+            relativ = round((count / self.anzahl_punkte) * 100, 2)
+            self.log.log_event("Filter", {
+                "ID": id,
+                "Typ:": "Moran",
+                "Attribut:": f"{selected_column}",
+                "Methode:": self.comboBox_moran_typ.currentText(),
+                "Wert:": self.moran_wert_text(),
+                "Entfernte Punkte:": {"absolut:": f"{count}", "relativ:": f"{relativ}%"}
+            })
+
+    # Log Hampel-Filter
+    def log_hampel(self, id):
+        selected_column = self.columnComboBox2.currentText()
+        count = self.plugin_instance.auswahl_tabelle.at[9, selected_column]
+        if count != None:
+            relativ = round((count / self.anzahl_punkte) * 100, 2)
+            self.log.log_event("Filter", {
+                "ID": id,
+                "Typ:": "Hampel",
+                "Attribut:": f"{selected_column}",
+                "Methode:": self.comboBox_hampel_seite.currentText(),
+                "Wert:": self.hampel_wert_text(),
+                "Entfernte Punkte:": {"absolut:": f"{count}", "relativ:": f"{relativ}%"}
             })
 
+    # Log Mahalanobis: ein Eintrag für alle beteiligten Spalten
+    def log_mahalanobis(self, id, spalten_liste, anzahl):
+        quantil = self.doubleSpinBox_Maha_Quantil.value()
+        relativ = round((anzahl / self.anzahl_punkte) * 100, 2)
+        self.log.log_event("Filter", {
+            "ID": id,
+            "Typ:": "Mahalanobis",
+            "Attribut:": ", ".join(spalten_liste),
+            "Methode:": "MCD",
+            "Wert:": f"{quantil} %",
+            "Grenze (Distanz²):": f"{round(grenzwert(quantil / 100, len(spalten_liste)), 2)}",
+            "Entfernte Punkte:": {"absolut:": f"{anzahl}", "relativ:": f"{relativ}%"}
+        })
+
+    def remove_log_maha(self):
+        """Entfernt den Log-Eintrag des angewendeten Mahalanobis-Filters."""
+        spalten_liste = self.maha_spalten()
+        if not spalten_liste:
+            return
+        quantil = self.plugin_instance.filterparameter_tabelle.at[19, spalten_liste[0]]
+        id = self.log.remove_action_by_parameters("Filter", "Mahalanobis", ", ".join(spalten_liste), "MCD", f"{quantil} %")
+        if id:
+            self.log.remove_by_id(id)
+
     # Log Überlappung
     def log_ueberlappung(self):
         self.log.log_event()
 
-    # Helferfunktion zum Flatten
-    def _flatten(self, item):
-        return list(itertools.chain.from_iterable(item)) if any(isinstance(i, list) for i in item) else item
-
     # Hilfsfunktion um Werte und gefilterte Werte herauszubekommen
-    # To-Do: Sinnvoller Einbau in create_histograms() 
-    def get_values_and_filtered_values(self):
+    def get_histogramme(self):
+        """Gibt für die ausgewählte Spalte (Anzahlen, Klassengrenzen, Kenngrößen) der Rohdaten (ohne NULL) und der
+        Daten ohne die Punkte zurück, die die Filter des aktuellen Tabs ausgewählt haben (bei gesetzter Checkbox bzw.
+        im Überlappungs-Tab: alle Filter; im Tab der robusten Verfahren: MAD, IQR und Perzentile; im Tab Multivariat:
+        der Mahalanobis-Filter; im Tab Lokal, Moran's I bzw. Hampel: der lokale, der Moran- bzw. der Hampel-Filter). Beides kommt aus dem Ergebnis-Cache und wird nur bei einer neuen
+        Kombination aus Spalte und Auswahl aus dem Spalten-Cache berechnet."""
         column_name = self.columnComboBox2.currentText()
-        values = [float(feat[column_name]) for feat in self.new_layer.getFeatures()
-                if feat[column_name] is not None and self.is_numeric(feat[column_name])]
+        roh = self.plugin_instance.histogramm(self.new_layer, column_name)
+        gefiltert = self.plugin_instance.histogramm(self.new_layer, column_name, self.get_ausgewaehlt())
+        return roh, gefiltert
 
-        filtered_values = []
-
-        if self.tabWidget_Filter.currentIndex() == 0:
-            if self.checkBox_hist.isChecked():
-                alle_filter_punkte = self.plugin_instance.punktauswahl_gesamt
-                flat = list(itertools.chain.from_iterable(alle_filter_punkte)) if any(isinstance(i, list) for i in alle_filter_punkte) else alle_filter_punkte
-                punkt_ids = set(flat)
-            else:
-                unter_ids = self._flatten(self.plugin_instance.filter_punktauswahl.loc['Untergrenze', column_name])
-                ober_ids = self._flatten(self.plugin_instance.filter_punktauswahl.loc['Obergrenze', column_name])
-                punkt_ids = set(unter_ids).union(ober_ids)
-
-        elif self.tabWidget_Filter.currentIndex() == 1:
-            if self.checkBox_hist.isChecked():
-                alle_filter_punkte = self.plugin_instance.punktauswahl_gesamt
-                flat = list(itertools.chain.from_iterable(alle_filter_punkte)) if any(isinstance(i, list) for i in alle_filter_punkte) else alle_filter_punkte
-                punkt_ids = set(flat)
-            else:
-                sd_ids = self._flatten(self.plugin_instance.filter_punktauswahl.loc['Standardabweichung', column_name])
-                punkt_ids = set(sd_ids)
-
-        # Generiere gefilterte Werte
-        for feat in self.new_layer.getFeatures():
-            if feat.id() not in punkt_ids and feat[column_name] is not None and self.is_numeric(feat[column_name]):
-                filtered_values.append(float(feat[column_name]))
+    def get_ausgewaehlt(self):
+        """Gibt die Punkte, die die Filter des aktuellen Tabs ausgewählt haben, als Maske im Spalten-Cache zurück."""
+        column_name = self.columnComboBox2.currentText()
+        # Nur die Feature-IDs, damit große Layer (gestreamte Histogramme) keine Spalte laden
+        fids = self.plugin_instance.spalten(self.new_layer).feature_ids()
+        filter_auswahl = self.plugin_instance.filter_auswahl
+
+        if filter_auswahl is None:
+            ausgewaehlt = np.zeros(len(fids), dtype=bool)
+        elif self.tabWidget_Filter.currentIndex() == 0 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=('Untergrenze', 'Obergrenze'), spalte=column_name)
+        elif self.tabWidget_Filter.currentIndex() == 1 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=('Standardabweichung',), spalte=column_name)
+        elif self.tabWidget_Filter.currentIndex() == 3 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=ROBUSTE_VERFAHREN, spalte=column_name)
+        elif self.tabWidget_Filter.currentIndex() == 4 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=('Mahalanobis',))
+        elif self.tabWidget_Filter.currentIndex() == 5 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=('Lokal',), spalte=column_name)
+        elif self.tabWidget_Filter.currentIndex() == 6 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=('Moran',), spalte=column_name)
+        elif self.tabWidget_Filter.currentIndex() == 7 and not self.checkBox_hist.isChecked():
+            ausgewaehlt = filter_auswahl.maske_fuer(fids, gruppen=('Hampel',), spalte=column_name)
+        else:
+            ausgewaehlt = filter_auswahl.maske_fuer(fids)
+        return ausgewaehlt
 
-        return values, filtered_values
+    def kenngroessen_text(self, kenngroessen):
+        """Text für die Kenngrößen (Mittelwert, SD, Min, Max, Anzahl) aus dem Ergebnis-Cache."""
+        if kenngroessen is None:
+            return "Keine Werte vorhanden"
+        mittel, sd, minimum, maximum, _ = kenngroessen
+        return f"Mittelwert: {round(mittel, 2)}; Standardabweichung: {round(sd, 2)}; Min: {round(minimum, 2)}; Max: {round(maximum, 2)}"
 
     # Log der wichtigsten statistischen Kenngrößen
     def log_kenngroessen(self, id:str):
         column_name = self.columnComboBox2.currentText()
-        values, filtered_values = self.get_values_and_filtered_values()
-        count_c = len(values)
-        count_fv = len(filtered_values)
-        if ((values != None) or (filtered_values != None)) and (count_fv != count_c):
-            mittel_raw = round(np.mean(values), 2)
-            mittel_filtered = round(np.mean(filtered_values), 2)
-            sd_raw = round(np.std(values), 2)
-            sd__filtered = round(np.std(filtered_values), 2)
-            min_raw = round(np.min(values), 2)
-            min_filtered = round(np.min(filtered_values), 2)
-            max_raw = round(np.max(values), 2)
-            max_filtered = round(np.max(filtered_values), 2)
+        roh, gefiltert = self.get_histogramme()
+        count_c = roh[2][4] if roh[2] is not None else 0
+        count_fv = gefiltert[2][4] if gefiltert[2] is not None else 0
+        if count_fv > 0 and count_fv != count_c:
+            mittel_raw = round(roh[2][0], 2)
+            mittel_filtered = round(gefiltert[2][0], 2)
+            sd_raw = round(roh[2][1], 2)
+            sd__filtered = round(gefiltert[2][1], 2)
+            min_raw = round(roh[2][2], 2)
+            min_filtered = round(gefiltert[2][2], 2)
+            max_raw = round(roh[2][3], 2)
+            max_filtered = round(gefiltert[2][3], 2)
             self.log.log_statistic(f"Gesamtdatenmenge - {column_name}", {
                 "Mittelwert:": f"{mittel_raw}",
                 "Min:":f"{min_raw}",
@@ -1718,8 +2862,12 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             self.fill_table_widget(self.tableWidget_Auswahl, self.plugin_instance.auswahl_tabelle)
             # Filterparametertabelle erstellen und füllen
             self.plugin_instance.create_filterparameter_tabelle(self.new_layer)
-            # Multiindex Dataframe für filterbasierte Punktauswahl erstellen
-            self.plugin_instance.create_multiindex_punktauswahl(self.new_layer)
+            # Bitmasken für die filterbasierte Punktauswahl erstellen
+            self.plugin_instance.create_filter_auswahl(self.new_layer)
+            # Gruppierungen anbieten (inkl. beim Zuschnitt angefügter Attribute)
+            self.populate_gruppen_combobox(self.new_layer)
+            # Mögliche Zeitstempel für den Hampel-Filter anbieten
+            self.populate_hampel_zeit_combobox(self.new_layer)
             # Aktualisiere die Histogramme
             self.create_histograms()
             # Zuschnitt-Karte zurücksetzen
@@ -1740,10 +2888,10 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             QMessageBox.critical(self, "Fehler", "Sie müssen einen Punktdatensatz auswählen")
             
     def on_weiter_button_2_clicked(self):
-        selected_features = self.new_layer.selectedFeatures() # Holen der aktuell ausgewählten Features
+        selected_ids = self.new_layer.selectedFeatureIds() # Holen der IDs der aktuell ausgewählten Features
         
-        if selected_features:
-            count = len(selected_features)
+        if selected_ids:
+            count = len(selected_ids)
             total_points = self.new_layer.featureCount()
             
             if count == total_points:
@@ -1757,6 +2905,10 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             
             if rp == QMessageBox.Yes:
                 #### TODO: Filer-Protokoll erstellen
+                # Nur die verbleibenden Punkte in eine kompakte Datei schreiben und austauschen; schlägt das fehl,
+                # bleiben Filter und Auswahl erhalten und der Vorgang kann wiederholt werden
+                if not self.plugin_instance.layer_finalisieren(self.new_layer, selected_ids):
+                    return
                 # Fertig-Status setzen
                 self.fertig = 1
                 # Auswahltabelle zurücksetzen und Darstellung löschen
@@ -1764,8 +2916,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.clear_table_widget_completely(self.tableWidget_Auswahl)
                 # Filterparametertabelle zurücksetzen
                 self.filterparameter_tabelle = None
-                # Multiindex Dataframe für filterbasierte Punktauswahl zurücksetzen
-                self.filter_punktauswahl = None
+                # Bitmasken der filterbasierten Punktauswahl zurücksetzen
+                self.plugin_instance.filter_auswahl = None
                 # Lable zurücksetzen
                 self.count_LB_label.setText("kein Filter angewand")
                 self.count_UB_label.setText("kein Filter angewand")
@@ -1778,11 +2930,6 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.tabWidget.setTabEnabled(2, True)
                 # Auf Attribute-Tab wechseln
                 self.tabWidget.setCurrentIndex(2)
-                # Punkte löschen          
-                self.new_layer.startEditing() # Bearbeitung des Layers starten
-                for feature in selected_features: # Löschen der ausgewählten Features
-                    self.new_layer.deleteFeature(feature.id())
-                self.new_layer.commitChanges() # Änderungen speichern und Bearbeitung beenden
                 self.on_SymbButton_clicked()
         else:
             rp = QMessageBox.question(self, 'Bestätigung', 
@@ -1790,6 +2937,11 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                                      QMessageBox.Yes | QMessageBox.No, 
                                      QMessageBox.No)
             if rp == QMessageBox.Yes:
+                # Änderungen speichern, Bearbeitung beenden und die Datei kompaktieren (entfernt beim Zuschnitt
+                # gelöschte Datensätze endgültig); schlägt das fehl, bleibt der Filter-Tab offen
+                self.new_layer.commitChanges()
+                if not self.plugin_instance.layer_finalisieren(self.new_layer, []):
+                    return
                 # Fertig-Status setzen
                 self.fertig = 1
                 # Auswahltabelle zurücksetzen und Darstellung löschen
@@ -1797,8 +2949,8 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.clear_table_widget_completely(self.tableWidget_Auswahl)
                 # Filterparametertabelle zurücksetzen
                 self.filterparameter_tabelle = None
-                # Multiindex Dataframe für filterbasierte Punktauswahl zurücksetzen
-                self.filter_punktauswahl = None
+                # Bitmasken der filterbasierten Punktauswahl zurücksetzen
+                self.plugin_instance.filter_auswahl = None
                 # Lable zurücksetzen
                 self.count_LB_label.setText("kein Filter angewand")
                 self.count_UB_label.setText("kein Filter angewand")
@@ -1811,8 +2963,6 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.tabWidget.setTabEnabled(2, True)
                 # Auf Attribute-Tab wechseln
                 self.tabWidget.setCurrentIndex(2)
-                # Änderungen speichern und Bearbeitung beenden
-                self.new_layer.commitChanges() # Änderungen speichern und Bearbeitung beenden
                 self.on_SymbButton_clicked()
 
         self.parzellen_layer_check(False)
@@ -1838,8 +2988,9 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
             self.clear_table_widget_completely(self.tableWidget_Auswahl)
             # Filterparametertabelle zurücksetzen
             self.filterparameter_tabelle = None
-            # Multiindex Dataframe für filterbasierte Punktauswahl zurücksetzen
-            self.filter_punktauswahl = None
+            # Bitmasken der filterbasierten Punktauswahl zurücksetzen
+            self.plugin_instance.filter_auswahl = None
+            self.plugin_instance.sd_iteration = {}
             # Auswahl zurücksetzen
             self.new_layer.removeSelection()
             # Auswahl-Liste zurücksetzen
@@ -1915,12 +3066,25 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.mMapLayerComboBox_AF.setCurrentIndex(-1)
                 self.columnComboBox.clear()
                 self.columnComboBox2.clear() # neu
+                self.mComboBox_SpaltenSD.clear()
+                self.mComboBox_SpaltenRobust.clear()
+                self.mComboBox_SpaltenMaha.clear()
+                self.comboBox_Gruppe.clear()
+                self.comboBox_hampel_zeit.clear()
+                self.comboBox_hampel_spur.clear()
                 self.columnComboBox_Attribute.clear()
                 self.cutFG.setEnabled(False)
                 self.cutFB.setEnabled(False)
                 self.cutPlot.setEnabled(False)
                 self.cutPoints.setEnabled(False)
                 self.cutAF.setEnabled(False)
+                self.cutAll.setEnabled(False)
+                self.pushButton_Stapel.setEnabled(False)
+                self.pushButton_Randabstand.setEnabled(False)
+                self.pushButton_Randschnitt.setEnabled(False)
+                self.label_Randvorschau.setText("kein Randabstand berechnet")
+                self.checkBox_Vorschau.setChecked(False)
+                self.plugin_instance.zuschnitt_vorschau_abbrechen()
                 self.SymbButton.setEnabled(False)
                 self.Attribut_label.setText("")
                 self.clear_table_widget_completely(self.tableWidget_Auswahl)
@@ -1991,12 +3155,25 @@ class OFEFilterDialog(QtWidgets.QDialog, FORM_CLASS):
                 self.mMapLayerComboBox_AF.setCurrentIndex(-1)
                 self.columnComboBox.clear()
                 self.columnComboBox2.clear() # neu
+                self.mComboBox_SpaltenSD.clear()
+                self.mComboBox_SpaltenRobust.clear()
+                self.mComboBox_SpaltenMaha.clear()
+                self.comboBox_Gruppe.clear()
+                self.comboBox_hampel_zeit.clear()
+                self.comboBox_hampel_spur.clear()
                 self.columnComboBox_Attribute.clear()
                 self.cutFG.setEnabled(False)
                 self.cutFB.setEnabled(False)
                 self.cutPlot.setEnabled(False)
                 self.cutPoints.setEnabled(False)
                 self.cutAF.setEnabled(False)
+                self.cutAll.setEnabled(False)
+                self.pushButton_Stapel.setEnabled(False)
+                self.pushButton_Randabstand.setEnabled(False)
+                self.pushButton_Randschnitt.setEnabled(False)
+                self.label_Randvorschau.setText("kein Randabstand berechnet")
+                self.checkBox_Vorschau.setChecked(False)
+                self.plugin_instance.zuschnitt_vorschau_abbrechen()
                 self.SymbButton.setEnabled(False)
                 self.Attribut_label.setText("")
                 self.clear_table_widget_completely(self.tableWidget_Auswahl)
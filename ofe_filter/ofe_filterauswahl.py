@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+# Gruppen der robusten Verfahren in der Reihenfolge von comboBox_robust (Zeilen 3 bis 5 der auswahl_tabelle)
+ROBUSTE_VERFAHREN = ('MAD', 'IQR', 'Perzentil')
+
+# Anzahl gesetzter Bits je Byte für das Zählen in gepackten Masken
+_BITS_JE_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class FilterAuswahl:
+    """Durch die Filterregeln ausgewählte Punkte als Bitmaske je Regel.
+
+    Eine Regel ist (Gruppe, Spalte), z.B. ("Untergrenze", "Ertrag"). Jede Regel belegt ein Bit je Punkt
+    (mit np.packbits gepackt), ausgerichtet an der Reihenfolge der Feature-IDs fids. Vereinigung,
+    Differenz und Anzahl werden als bitweise Operationen über die gepackten Masken berechnet.
+
+    Regeln auf gefilterter Basis (SD auf den gefilterten Daten) sind als Abhängigkeiten eingetragen:
+    sie hängen von der Vereinigung aller Regeln außerhalb ihrer ausgenommenen Gruppen ab und werden
+    nach einer Änderung dieser Regeln neu berechnet."""
+
+    def __init__(self, fids):
+        self.fids = np.asarray(fids, dtype=np.int64)
+
+        # (Gruppe, Spalte) -> gepackte Maske (uint8)
+        self._regeln = {}
+        # Zählt jede Änderung der Regeln (für abgeleitete Caches)
+        self.stand = 0
+
+        # (Gruppe, Spalte) -> (ausgenommene Gruppen, Parameter zum Neuberechnen)
+        self._abhaengigkeiten = {}
+        # Seit dem letzten Nachführen geänderte Regeln
+        self._geaendert = set()
+
+    def __len__(self):
+        return len(self.fids)
+
+    def setzen(self, gruppe, spalte, treffer, fids=None):
+        """Speichert die Auswahl einer Regel. treffer ist ein boolsches Array, ausgerichtet an fids
+        (ohne Angabe an self.fids); bei abweichender Reihenfolge wird über die IDs zugeordnet."""
+        if not self._ausgerichtet(fids):
+            treffer = np.isin(self.fids, np.asarray(fids)[treffer])
+        self.setzen_gepackt(gruppe, spalte, np.packbits(treffer))
+
+    def setzen_gepackt(self, gruppe, spalte, gepackt, fids=None):
+        """Speichert die Auswahl einer Regel als bereits gepackte Maske (z.B. aus dem Ergebnis-Cache).
+        Die Maske wird nicht kopiert und darf danach nicht mehr verändert werden."""
+        if not self._ausgerichtet(fids):
+            self.setzen(gruppe, spalte, np.unpackbits(gepackt, count=len(fids)).view(bool), fids)
+            return
+        self._regeln[(gruppe, spalte)] = gepackt
+        self._geaendert.add((gruppe, spalte))
+        self.stand += 1
+
+    def _ausgerichtet(self, fids):
+        """Prüft, ob fids (None = self.fids) dieselbe Reihenfolge wie self.fids hat."""
+        return fids is None or fids is self.fids or np.array_equal(fids, self.fids)
+
+    def setzen_ids(self, gruppe, spalte, ids):
+        """Speichert die Auswahl einer Regel als Liste von Feature-IDs."""
+        self.setzen(gruppe, spalte, np.isin(self.fids, np.asarray(ids, dtype=np.int64)))
+
+    def entfernen(self, gruppe, spalte):
+        """Entfernt eine Regel (Filter zurückgesetzt)."""
+        self._abhaengigkeiten.pop((gruppe, spalte), None)
+        if self._regeln.pop((gruppe, spalte), None) is not None:
+            self._geaendert.add((gruppe, spalte))
+            self.stand += 1
+
+    def aktiv(self, gruppe, spalte):
+        return (gruppe, spalte) in self._regeln
+
+    def abhaengigkeit_setzen(self, gruppe, spalte, ohne_gruppen, parameter):
+        """Trägt die Regel als abhängig von der Vereinigung aller Regeln außerhalb von ohne_gruppen ein.
+        parameter wird beim Neuberechnen unverändert zurückgegeben."""
+        self._abhaengigkeiten[(gruppe, spalte)] = (tuple(ohne_gruppen), parameter)
+
+    def abhaengigkeit_entfernen(self, gruppe, spalte):
+        """Die Regel hängt nicht mehr von anderen Regeln ab (z.B. SD wieder auf Basis der Rohdaten)."""
+        self._abhaengigkeiten.pop((gruppe, spalte), None)
+
+    def abhaengige(self, regeln):
+        """Gibt [((Gruppe, Spalte), Parameter)] aller aktiven Regeln zurück, deren Basis sich durch eine
+        der übergebenen Regeln geändert hat."""
+        ergebnis = []
+        for regel, (ohne_gruppen, parameter) in self._abhaengigkeiten.items():
+            if regel not in self._regeln:
+                continue
+            if any(gruppe not in ohne_gruppen and (gruppe, spalte) != regel for gruppe, spalte in regeln):
+                ergebnis.append((regel, parameter))
+        return ergebnis
+
+    def geaenderte_regeln(self):
+        """Gibt die seit dem letzten Aufruf geänderten Regeln zurück und setzt die Liste zurück."""
+        geaendert, self._geaendert = self._geaendert, set()
+        return geaendert
+
+    def gepackt(self, gruppen=None, spalte=None, ohne_gruppen=()):
+        """Bitweise Vereinigung aller Regeln, die zu gruppen und spalte passen (None = alle)."""
+        gepackt = np.zeros((len(self.fids) + 7) // 8, dtype=np.uint8)
+        for (gruppe, regel_spalte), maske in self._regeln.items():
+            if gruppen is not None and gruppe not in gruppen:
+                continue
+            if spalte is not None and regel_spalte != spalte:
+                continue
+            if gruppe in ohne_gruppen:
+                continue
+            np.bitwise_or(gepackt, maske, out=gepackt)
+        return gepackt
+
+    def anzahl(self, gruppen=None, spalte=None, ohne_gruppen=()):
+        """Anzahl der Punkte in der Vereinigung der passenden Regeln."""
+        return int(_BITS_JE_BYTE[self.gepackt(gruppen, spalte, ohne_gruppen)].sum())
+
+    def maske(self, gruppen=None, spalte=None, ohne_gruppen=()):
+        """Vereinigung der passenden Regeln als boolsches Array, ausgerichtet an fids."""
+        gepackt = self.gepackt(gruppen, spalte, ohne_gruppen)
+        return np.unpackbits(gepackt, count=len(self.fids)).view(bool)
+
+    def maske_fuer(self, fids, gruppen=None, spalte=None, ohne_gruppen=()):
+        """Wie maske(), aber ausgerichtet an einer anderen Reihenfolge von Feature-IDs."""
+        maske = self.maske(gruppen, spalte, ohne_gruppen)
+        if np.array_equal(fids, self.fids):
+            return maske
+        return np.isin(fids, self.fids[maske])
+
+    def ids(self, gruppen=None, spalte=None, ohne_gruppen=()):
+        """Feature-IDs in der Vereinigung der passenden Regeln (in der Reihenfolge von fids)."""
+        return self.fids[self.maske(gruppen, spalte, ohne_gruppen)]
+
+
+class GefilterteBasis:
+    """Laufende Summen einer Spalte über die gefilterte Basis einer abhängigen Regel.
+
+    Die Basis sind alle Nicht-NULL-Punkte außerhalb der gepackten Ausschlussmaske (Vereinigung der
+    Regeln, von denen die Regel abhängt). Ändert sich die Ausschlussmaske, werden nur die Punkte
+    verrechnet, deren Zugehörigkeit gewechselt hat. Die Summen laufen um eine feste Verschiebung
+    (Mittelwert aller Werte), damit die Quadratsumme numerisch stabil bleibt."""
+
+    def __init__(self, werte, null, ausgeschlossen):
+        self.werte = werte
+        self.null = null
+        self.ausgeschlossen = ausgeschlossen
+
+        basis = ~null & ~np.unpackbits(ausgeschlossen, count=len(werte)).view(bool)
+        self.verschiebung = float(np.mean(werte[~null])) if np.any(~null) else 0.0
+        abweichung = werte[basis] - self.verschiebung
+        self.anzahl = len(abweichung)
+        self.summe = float(np.sum(abweichung))
+        self.quadratsumme = float(np.dot(abweichung, abweichung))
+
+    def passt_zu(self, werte):
+        """Prüft, ob die Summen noch zu diesem Werte-Array gehören."""
+        return self.werte is werte
+
+    def nachfuehren(self, ausgeschlossen):
+        """Übernimmt eine neue Ausschlussmaske und verrechnet nur die gewechselten Punkte."""
+        unterschied = self.ausgeschlossen ^ ausgeschlossen
+        bytes_gewechselt = np.flatnonzero(unterschied)
+        if len(bytes_gewechselt) == 0:
+            return
+
+        # Nur die Bytes mit gewechselten Bits entpacken
+        bits = np.unpackbits(unterschied[bytes_gewechselt][:, None], axis=1).view(bool)
+        positionen = (bytes_gewechselt[:, None] * 8 + np.arange(8))[bits]
+        positionen = positionen[~self.null[positionen]]
+
+        # Bit der Position in der neuen Maske (packbits legt das erste Element ins höchste Bit)
+        jetzt_ausgeschlossen = (ausgeschlossen[positionen // 8] >> (7 - positionen % 8)) & 1 == 1
+
+        hinein = self.werte[positionen[~jetzt_ausgeschlossen]] - self.verschiebung
+        hinaus = self.werte[positionen[jetzt_ausgeschlossen]] - self.verschiebung
+        self.anzahl += len(hinein) - len(hinaus)
+        self.summe += float(np.sum(hinein) - np.sum(hinaus))
+        self.quadratsumme += float(np.dot(hinein, hinein) - np.dot(hinaus, hinaus))
+        self.ausgeschlossen = ausgeschlossen
+
+    def statistik(self):
+        """Gibt (Mittelwert, Standardabweichung) der Basis zurück (wie np.mean und np.std)."""
+        if self.anzahl == 0:
+            return np.nan, np.nan
+        mittel = self.summe / self.anzahl
+        varianz = max(self.quadratsumme / self.anzahl - mittel * mittel, 0.0)
+        return self.verschiebung + mittel, np.sqrt(varianz)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def gruppen_segmente(codes_sortiert, anzahl_gruppen):
+    """Gibt (Start, Anzahl) jeder Gruppe in nach Gruppencode sortierten Codes zurück."""
+    anzahl = np.bincount(codes_sortiert, minlength=anzahl_gruppen)
+    start = np.concatenate(([0], np.cumsum(anzahl)[:-1])).astype(np.int64)
+    return start, anzahl
+
+
+def gruppen_mittel_sd(werte, codes, anzahl_gruppen):
+    """Mittelwert und Standardabweichung (wie np.mean und np.std) je Gruppe in einem Durchgang über alle Werte
+    (np.bincount statt einer Schleife über die Gruppen). Gruppen ohne Werte erhalten NaN."""
+    anzahl = np.bincount(codes, minlength=anzahl_gruppen)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mittel = np.bincount(codes, werte, anzahl_gruppen) / anzahl
+        abweichung = werte - mittel[codes]
+        sd = np.sqrt(np.bincount(codes, abweichung * abweichung, anzahl_gruppen) / anzahl)
+    return mittel, sd
+
+
+def gruppen_quantile(werte_sortiert, start, anzahl, anteile):
+    """Quantile je Gruppe (lineare Interpolation wie np.quantile) aus nach (Gruppe, Wert) sortierten Werten.
+    Gibt ein Array Gruppen x Anteile zurück; Gruppen ohne Werte erhalten NaN."""
+    anteile = np.asarray(anteile, dtype=np.float64)
+    ergebnis = np.full((len(anzahl), len(anteile)), np.nan)
+    belegt = anzahl > 0
+    if not np.any(belegt):
+        return ergebnis
+
+    positionen = (anzahl[belegt, None] - 1) * anteile[None, :]
+    unten = np.floor(positionen).astype(np.int64)
+    oben = np.ceil(positionen).astype(np.int64)
+    anfang = start[belegt, None]
+    wert_unten = werte_sortiert[anfang + unten]
+    wert_oben = werte_sortiert[anfang + oben]
+    ergebnis[belegt] = wert_unten + (positionen - unten) * (wert_oben - wert_unten)
+    return ergebnis
+
+
+def gruppen_sortieren(werte, codes):
+    """Sortiert die Werte nach (Gruppe, Wert). Gibt (Reihenfolge, sortierte Werte, sortierte Codes) zurück."""
+    reihenfolge = np.lexsort((werte, codes))
+    return reihenfolge, werte[reihenfolge], codes[reihenfolge]
+
+
+def gruppen_median_mad(werte, codes, anzahl_gruppen, sortierung=None):
+    """Median und MAD (Median der absoluten Abweichungen vom Gruppenmedian) je Gruppe. sortierung ist das
+    Ergebnis von gruppen_sortieren(werte, codes), falls bereits vorhanden."""
+    if sortierung is None:
+        sortierung = gruppen_sortieren(werte, codes)
+    _, werte_sortiert, codes_sortiert = sortierung
+    start, anzahl = gruppen_segmente(codes_sortiert, anzahl_gruppen)
+    median = gruppen_quantile(werte_sortiert, start, anzahl, [0.5])[:, 0]
+
+    # Abweichungen innerhalb jeder Gruppe erneut sortieren (die Segmentgrenzen bleiben gleich)
+    abweichung = np.abs(werte_sortiert - median[codes_sortiert])
+    abweichung = abweichung[np.lexsort((abweichung, codes_sortiert))]
+    mad = gruppen_quantile(abweichung, start, anzahl, [0.5])[:, 0]
+    return median, mad
+
+
+def je_punkt(gruppenwerte, codes):
+    """Verteilt Werte je Gruppe auf die Punkte; Punkte ohne Gruppe (Code -1) erhalten NaN."""
+    return np.append(gruppenwerte, np.nan)[codes]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from scipy.stats import chi2
+
+
+def _block(spalten, start, ende):
+    """Zeilen start bis ende der Spalten als 2-D-Block (Punkte x Spalten)."""
+    return np.column_stack([werte[start:ende] for werte in spalten])
+
+
+def abstand_quadrat(spalten, zentrum, kovarianz, blockgroesse=262144):
+    """Quadrierte Mahalanobis-Distanz aller Punkte zu (zentrum, kovarianz). spalten ist eine Liste gleich langer
+    Arrays (z.B. aus dem Spalten-Cache); gerechnet wird blockweise, sodass nie mehr als blockgroesse Zeilen als
+    Block im Speicher liegen. Punkte mit NULL (NaN) in einer der Spalten erhalten NaN."""
+    # Pseudoinverse, damit auch konstante oder linear abhängige Spalten eine Distanz liefern
+    inverse = np.linalg.pinv(kovarianz)
+    anzahl = len(spalten[0])
+    ergebnis = np.empty(anzahl)
+    for start in range(0, anzahl, blockgroesse):
+        abweichung = _block(spalten, start, start + blockgroesse) - zentrum
+        ergebnis[start:start + blockgroesse] = np.einsum('ij,jk,ik->i', abweichung, inverse, abweichung)
+    return ergebnis
+
+
+def _kennwerte(daten):
+    return daten.mean(axis=0), np.cov(daten, rowvar=False, bias=True).reshape(daten.shape[1], daten.shape[1])
+
+
+def mcd_schaetzen(daten, anteil=0.75, versuche=10, c_schritte=30, seed=0):
+    """Robuste Schätzung von Zentrum und Kovarianz nach dem Minimum-Covariance-Determinant-Verfahren (FastMCD):
+    aus zufälligen Startmengen werden mit Konzentrationsschritten die anteil * n Punkte mit der kleinsten
+    Kovarianz-Determinante gesucht. Die Kovarianz wird anschließend auf Konsistenz bei Normalverteilung skaliert
+    und einmal mit allen Punkten innerhalb des 97,5-%-Quantils neu geschätzt. daten enthält keine NaN.
+    Gibt (Zentrum, Kovarianz) zurück."""
+    n, p = daten.shape
+    h = min(max(int(np.ceil(anteil * n)), (n + p + 1) // 2), n)
+    rng = np.random.default_rng(seed)
+
+    beste = None
+    for _ in range(versuche):
+        # Startmenge aus p + 1 Punkten; ist ihre Kovarianz singulär, mit h zufälligen Punkten beginnen
+        zentrum, kovarianz = _kennwerte(daten[rng.choice(n, min(p + 1, n), replace=False)])
+        if np.linalg.slogdet(kovarianz)[0] <= 0:
+            zentrum, kovarianz = _kennwerte(daten[rng.choice(n, h, replace=False)])
+
+        logdet = np.inf
+        for _ in range(c_schritte):
+            # Konzentrationsschritt: die h Punkte mit der kleinsten Distanz bilden die neue Teilmenge
+            d2 = abstand_quadrat([daten[:, j] for j in range(p)], zentrum, kovarianz)
+            teilmenge = np.argpartition(d2, h - 1)[:h]
+            zentrum, kovarianz = _kennwerte(daten[teilmenge])
+            vorzeichen, neu = np.linalg.slogdet(kovarianz)
+            if vorzeichen <= 0 or neu >= logdet - 1e-10:
+                logdet = neu if vorzeichen > 0 else -np.inf
+                break
+            logdet = neu
+
+        if beste is None or logdet < beste[0]:
+            beste = (logdet, zentrum, kovarianz)
+
+    _, zentrum, kovarianz = beste
+    spalten = [daten[:, j] for j in range(p)]
+
+    # Konsistenzfaktor: Median der Distanzen auf den Median der Chi-Quadrat-Verteilung bringen
+    d2 = abstand_quadrat(spalten, zentrum, kovarianz)
+    median = np.median(d2)
+    if median > 0:
+        kovarianz = kovarianz * median / chi2.ppf(0.5, p)
+
+    # Umgewichtung mit allen Punkten innerhalb des 97,5-%-Quantils; die Kovarianz der abgeschnittenen
+    # Normalverteilung ist um den Faktor P(Chi²(p + 2) <= q) / 0,975 zu klein
+    q = chi2.ppf(0.975, p)
+    innen = abstand_quadrat(spalten, zentrum, kovarianz) <= q
+    if np.count_nonzero(innen) > p:
+        zentrum, kovarianz = _kennwerte(daten[innen])
+        kovarianz = kovarianz * 0.975 / chi2.cdf(q, p + 2)
+    return zentrum, kovarianz
+
+
+def grenzwert(anteil, anzahl_spalten):
+    """Chi-Quadrat-Quantil (anteil 0..1) mit anzahl_spalten Freiheitsgraden als Grenze der quadrierten Distanz."""
+    return chi2.ppf(anteil, anzahl_spalten)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+from .ofe_gruppen import gruppen_median_mad
+
+
+# Mindestanzahl an Nachbarn mit Wert, damit Median und MAD der Nachbarschaft bestimmt werden
+MIN_NACHBARN = 3
+
+# Höchstzahl an Nachbarn je Punkt; größere Nachbarschaften (zu großer Radius) werden nicht abgefragt
+MAX_NACHBARN = 1000
+
+# Höchstzahl an Nachbarschaftspaaren (Punkt, Nachbar) je Block einer Abfrage
+PAARE_JE_BLOCK = 1 << 22
+
+
+def _zeilen_median(matrix):
+    """Median je Zeile ohne NaN (NaN am Zeilenende aufgefüllt) und Anzahl der Werte je Zeile."""
+    sortiert = np.sort(matrix, axis=1)  # NaN werden ans Ende sortiert
+    anzahl = np.count_nonzero(~np.isnan(sortiert), axis=1)
+    unten = np.maximum(anzahl - 1, 0) // 2
+    oben = anzahl // 2
+    zeilen = np.arange(len(matrix))
+    with np.errstate(invalid='ignore'):
+        median = (sortiert[zeilen, unten] + sortiert[zeilen, np.minimum(oben, matrix.shape[1] - 1)]) / 2
+    median[anzahl == 0] = np.nan
+    return median, anzahl
+
+
+class NachbarIndex:
+    """KD-Baum über die Punktkoordinaten für Filter, die jeden Punkt mit seiner Nachbarschaft vergleichen.
+
+    Der Baum wird einmal aufgebaut und für alle Spalten und Parameter wiederverwendet; ein anderes k oder ein
+    anderer Radius fragt den Baum nur neu ab. Die Abfragen laufen in Blöcken mit höchstens etwa paare_je_block
+    Nachbarschaftspaaren, Nachbarschaften mit mehr als MAX_NACHBARN Punkten werden abgelehnt (ValueError);
+    workers wird an cKDTree übergeben (-1 = alle Kerne).
+    x und y sind an den Positionen des Spalten-Caches ausgerichtet; Punkte ohne Koordinaten haben keine
+    Nachbarn und sind selbst niemandes Nachbar."""
+
+    def __init__(self, x, y, workers=1, paare_je_block=PAARE_JE_BLOCK):
+        self.anzahl = len(x)
+        self.workers = workers
+        self.paare_je_block = paare_je_block
+        # Radius -> Anzahl der Nachbarn je Baumpunkt
+        self._anzahl_im_radius = {}
+
+        # Baum nur über Punkte mit gültigen Koordinaten; gueltig bildet Baumindex -> Position ab
+        self.gueltig = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        self.koordinaten = np.column_stack([x[self.gueltig], y[self.gueltig]])
+        self.baum = cKDTree(self.koordinaten)
+
+    def anzahl_nachbarn(self, k=None, radius=None):
+        """Anzahl der Nachbarn (ohne den Punkt selbst) je Baumpunkt. Im Radius wird nur gezählt, ohne die
+        Nachbarlisten anzulegen; das Ergebnis wird je Radius gehalten."""
+        if k is not None:
+            return np.full(len(self.gueltig), max(min(k, len(self.gueltig) - 1), 0), dtype=np.int64)
+        if radius not in self._anzahl_im_radius:
+            anzahl = self.baum.query_ball_point(self.koordinaten, radius, workers=self.workers, return_length=True)
+            self._anzahl_im_radius[radius] = np.asarray(anzahl, dtype=np.int64) - 1
+        return self._anzahl_im_radius[radius]
+
+    def max_nachbarn(self, k=None, radius=None):
+        """Größte Anzahl an Nachbarn eines Punktes (0 ohne Punkte)."""
+        return int(self.anzahl_nachbarn(k, radius).max(initial=0))
+
+    def bloecke(self, k=None, radius=None):
+        """Baumindizes in Blöcken in der Reihenfolge der Baumblätter: benachbarte Abfragen durchlaufen dieselben
+        Knoten, was die Abfragen gegenüber der Reihenfolge der Punkte im Layer deutlich beschleunigt. Die Blöcke
+        werden nach der aufsummierten Anzahl der Nachbarn geschnitten, sodass jeder Block höchstens etwa
+        paare_je_block Paare (Punkt, Nachbar) ergibt, unabhängig von Radius und Punktdichte."""
+        anzahl = self.anzahl_nachbarn(k, radius)
+        if anzahl.max(initial=0) > MAX_NACHBARN:
+            raise ValueError(f"Nachbarschaft mit bis zu {anzahl.max()} Nachbarn je Punkt (höchstens {MAX_NACHBARN})")
+        reihenfolge = self.baum.indices
+        # Jeder Punkt zählt mindestens einfach, damit auch Blöcke ohne Nachbarn begrenzt bleiben
+        gewicht = np.maximum(anzahl[reihenfolge], 1)
+        bisher = np.cumsum(gewicht) - gewicht
+        grenzen = np.flatnonzero(np.diff(bisher // self.paare_je_block)) + 1
+        return np.split(reihenfolge, grenzen) if len(reihenfolge) else []
+
+    def nachbarn(self, block, k=None, radius=None):
+        """Nachbarn der Baumpunkte block (ohne den Punkt selbst) als Paare (Zeile im Block, Baumindex des Nachbarn).
+        Mit k die k nächsten Nachbarn, sonst alle Nachbarn im Abstand bis radius."""
+        eigene = block
+        if k is not None:
+            k = min(k, len(self.gueltig) - 1)
+            if k < 1:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            _, index = self.baum.query(self.koordinaten[block], k=k + 1, workers=self.workers)
+            index = index.reshape(len(block), k + 1)
+
+            # Den Punkt selbst entfernen; liegt er nicht in der Liste (gleiche Koordinaten), den entferntesten
+            behalten = index != eigene[:, None]
+            behalten[behalten.all(axis=1), -1] = False
+            zeilen = np.repeat(np.arange(len(block)), k)
+            return zeilen, index[behalten]
+
+        listen = self.baum.query_ball_point(self.koordinaten[block], radius, workers=self.workers, return_sorted=False)
+        anzahl = np.fromiter(map(len, listen), np.int64, len(listen))
+        index = np.fromiter((i for liste in listen for i in liste), np.int64, anzahl.sum())
+        zeilen = np.repeat(np.arange(len(block)), anzahl)
+        behalten = index != eigene[zeilen]
+        return zeilen[behalten], index[behalten]
+
+    def median_mad(self, werte, k=None, radius=None):
+        """Median und MAD der Werte in der Nachbarschaft jedes Punktes (ohne den Punkt selbst), ausgerichtet an
+        den Positionen von werte. Nachbarn ohne Wert (NaN) zählen nicht; Punkte mit weniger als MIN_NACHBARN
+        Nachbarn mit Wert erhalten NaN.
+
+        Mit k hat jeder Punkt gleich viele Nachbarn: die Nachbarwerte bilden eine volle Matrix (Zeile je Punkt),
+        die zeilenweise sortiert wird. Im Radius schwankt die Anzahl stark; die Paare werden dann nach (Punkt, Wert)
+        sortiert und je Punkt als Segment ausgewertet, sodass der Speicher nur mit der Anzahl der Paare wächst."""
+        median = np.full(self.anzahl, np.nan)
+        mad = np.full(self.anzahl, np.nan)
+        werte_baum = werte[self.gueltig]
+
+        for block in self.bloecke(k, radius):
+            zeilen, index = self.nachbarn(block, k, radius)
+            nachbar_werte = werte_baum[index]
+
+            if k is not None:
+                # Nachbarwerte je Punkt als Zeile einer vollen Matrix (NaN für Nachbarn ohne Wert)
+                matrix = nachbar_werte.reshape(len(block), -1) if len(zeilen) else np.full((len(block), 1), np.nan)
+                block_median, mit_wert = _zeilen_median(matrix)
+                block_mad, _ = _zeilen_median(np.abs(matrix - block_median[:, None]))
+            else:
+                mit_wert_maske = ~np.isnan(nachbar_werte)
+                zeilen, nachbar_werte = zeilen[mit_wert_maske], nachbar_werte[mit_wert_maske]
+                block_median, block_mad = gruppen_median_mad(nachbar_werte, zeilen, len(block))
+                mit_wert = np.bincount(zeilen, minlength=len(block))
+
+            zu_wenige = mit_wert < MIN_NACHBARN
+            block_median[zu_wenige] = np.nan
+            block_mad[zu_wenige] = np.nan
+            median[self.gueltig[block]] = block_median
+            mad[self.gueltig[block]] = block_mad
+        return median, mad
+
+    def gewichte(self, k=None, radius=None):
+        """Binäre Nachbarschaftsmatrix (k nächste Nachbarn oder Distanzband bis radius, ohne den Punkt selbst) als
+        scipy.sparse CSR-Matrix Punkte x Punkte, ausgerichtet an den Positionen des Spalten-Caches. Die Nachbarn
+        werden vorab gezählt; mit mehr als MAX_NACHBARN Nachbarn je Punkt wird die Matrix nicht aufgebaut (ValueError),
+        sodass sie höchstens MAX_NACHBARN Einträge je Zeile hat."""
+        zeilen_bloecke = []
+        spalten_bloecke = []
+        for block in self.bloecke(k, radius):
+            zeilen, index = self.nachbarn(block, k, radius)
+            zeilen_bloecke.append(self.gueltig[block[zeilen]])
+            spalten_bloecke.append(self.gueltig[index])
+
+        zeilen = np.concatenate(zeilen_bloecke) if zeilen_bloecke else np.empty(0, dtype=np.int64)
+        spalten = np.concatenate(spalten_bloecke) if spalten_bloecke else np.empty(0, dtype=np.int64)
+        return csr_matrix((np.ones(len(zeilen)), (zeilen, spalten)), shape=(self.anzahl, self.anzahl))
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from qgis.core import QgsFeatureRequest
+
+from .ofe_fahrspuren import unix_zeitstempel
+from .ofe_gruppen import gruppen_sortieren
+
+
+def _quantile(werte, anteile, sortiert=False):
+    """Quantile wie np.quantile (lineare Interpolation). Unsortierte Werte werden nur an den benötigten
+    Stellen per np.partition (lineare Auswahl) geordnet, nicht vollständig sortiert."""
+    anteile = np.asarray(anteile, dtype=np.float64)
+    if len(werte) == 0:
+        return np.full(anteile.shape, np.nan)
+
+    positionen = (len(werte) - 1) * anteile
+    unten = np.floor(positionen).astype(np.int64)
+    oben = np.ceil(positionen).astype(np.int64)
+    if not sortiert:
+        werte = np.partition(werte, np.unique(np.concatenate((unten, oben))))
+    return werte[unten] + (positionen - unten) * (werte[oben] - werte[unten])
+
+
+def _als_zahlen(roh):
+    """Wandelt Attributwerte in ein float64-Array; NULL (und alles, was keine Zahl ist) wird NaN."""
+    return np.fromiter(
+        (wert if type(wert) in (int, float) else np.nan for wert in roh), dtype=np.float64, count=len(roh)
+    )
+
+
+def spalte_in_bloecken(layer, name, blockgroesse=65536):
+    """Liest eine Spalte in einem Durchgang ohne Geometrie und gibt sie blockweise als (Feature-IDs, Werte)
+    zurück (NULL als NaN). Es wird immer nur ein Block im Speicher gehalten."""
+    field_index = layer.fields().indexOf(name)
+    if field_index == -1:
+        raise KeyError(name)
+
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setSubsetOfAttributes([field_index])
+
+    fids = []
+    roh = []
+    for feature in layer.getFeatures(request):
+        fids.append(feature.id())
+        roh.append(feature[field_index])
+        if len(roh) == blockgroesse:
+            yield np.asarray(fids, dtype=np.int64), _als_zahlen(roh)
+            fids = []
+            roh = []
+    if roh:
+        yield np.asarray(fids, dtype=np.int64), _als_zahlen(roh)
+
+
+class SpaltenCache:
+    """Numerische Spalten eines Punktlayers als NumPy-Arrays für Filter, Histogramme und Statistik.
+
+    Jede Spalte wird beim ersten Zugriff einmal ohne Geometrie und nur mit diesem Attribut gelesen
+    und als float64-Array mit NULL-Maske abgelegt. Alle Spalten sind an derselben Reihenfolge der
+    Feature-IDs (fids) ausgerichtet. Für Schwellenwerte wird je Spalte einmal ein sortierter Index
+    (argsort) aufgebaut; die Punkte unter- oder oberhalb einer Grenze sind darin ein zusammenhängender
+    Ausschnitt, der per binärer Suche gefunden wird. Beliebige Attribute können als Gruppierung (Codes je Punkt)
+    gelesen werden. Änderungen am Layer im Bearbeitungsmodus verwerfen den Cache;
+    direkt im Datenanbieter gelöschte Punkte werden mit entfernen() nachgeführt."""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.layer_id = layer.id()
+        self.fids = None
+
+        # Spaltenname -> (Werte, NULL-Maske)
+        self._spalten = {}
+        # Spaltenname -> (Positionen in fids aufsteigend nach Wert, sortierte Werte), nur Nicht-NULL-Werte
+        self._sortierung = {}
+        # Spaltenname -> (Mittelwert, Standardabweichung) der Nicht-NULL-Werte
+        self._statistik = {}
+        # Spaltenname -> (Gruppencodes mit -1 für NULL, Gruppenbezeichnungen) für beliebige Attribute
+        self._gruppen = {}
+        # (Spaltenname, Gruppenspalte) -> (Positionen, Werte, Codes) nach (Gruppe, Wert) sortiert, ohne NULL
+        self._gruppen_sortierung = {}
+        # Spaltenname -> Zeitstempel in Sekunden (NaN für NULL und nicht lesbare Werte)
+        self._zeitstempel = {}
+        self._gueltig = True
+
+        self._signale = [
+            layer.attributeValueChanged, layer.featureAdded, layer.featureDeleted,
+            layer.attributeAdded, layer.attributeDeleted, layer.dataChanged,
+        ]
+        for signal in self._signale:
+            signal.connect(self._verwerfen)
+
+    def passt_zu(self, layer):
+        """Prüft, ob der Cache noch zum Layer passt."""
+        return (
+            self._gueltig
+            and layer.id() == self.layer_id
+            and (self.fids is None or len(self.fids) == layer.featureCount())
+        )
+
+    def _verwerfen(self, *args):
+        self._gueltig = False
+
+    def trennen(self):
+        """Trennt die Verbindungen zum Layer."""
+        for signal in self._signale:
+            try:
+                signal.disconnect(self._verwerfen)
+            except (TypeError, RuntimeError):
+                # Layer wurde bereits gelöscht
+                pass
+        self._signale = []
+
+    def feature_ids(self):
+        """Gibt die Feature-IDs zurück, an denen alle Spalten ausgerichtet sind (ohne Attribute gelesen)."""
+        if self.fids is None:
+            request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes()
+            self.fids = np.fromiter((feature.id() for feature in self.layer.getFeatures(request)), dtype=np.int64)
+        return self.fids
+
+    def spalte(self, name):
+        """Gibt (Werte, NULL-Maske) der Spalte zurück, ausgerichtet an fids. NULL-Werte sind NaN."""
+        if name not in self._spalten:
+            self._laden(name)
+        return self._spalten[name]
+
+    def abgeleitete_spalte(self, key, berechnen):
+        """Legt eine aus geladenen Spalten berechnete Spalte (z. B. Residuen nach Trendabzug) unter key ab, sofern
+        sie noch fehlt; berechnen() liefert die Werte (NaN für NULL), ausgerichtet an fids. Danach steht key wie
+        ein Attribut für sortierung(), statistik(), quantile() und gruppen_sortierung() bereit. Je Ausgangsspalte
+        und Art (key[:2], z. B. (Spalte, 'Trend')) wird nur die zuletzt angelegte abgeleitete Spalte gehalten."""
+        if key not in self._spalten:
+            self._abgeleitete_verwerfen(key[:2])
+            werte = berechnen()
+            self._spalten[key] = (werte, np.isnan(werte))
+        return key
+
+    def hat_spalte(self, key):
+        """Prüft, ob die Spalte (oder abgeleitete Spalte) bereits geladen ist."""
+        return key in self._spalten
+
+    def _abgeleitete_verwerfen(self, art):
+        """Entfernt die abgeleiteten Spalten der Art art samt sortiertem Index und Kennwerten."""
+        for key in [key for key in self._spalten if isinstance(key, tuple) and key[:2] == art]:
+            del self._spalten[key]
+            self._sortierung.pop(key, None)
+            self._statistik.pop(key, None)
+            for gruppen_key in [gruppen_key for gruppen_key in self._gruppen_sortierung if gruppen_key[0] == key]:
+                del self._gruppen_sortierung[gruppen_key]
+
+    def block(self, namen):
+        """Gibt mehrere Spalten als 2-D-Block (Punkte x Spalten, NULL als NaN) zurück, ausgerichtet an fids."""
+        return np.column_stack([self.spalte(name)[0] for name in namen])
+
+    def werte(self, name):
+        """Gibt alle Werte der Spalte ohne NULL-Werte zurück."""
+        werte, null = self.spalte(name)
+        return werte[~null]
+
+    def sortierung(self, name):
+        """Gibt (Reihenfolge, sortierte Werte) der Nicht-NULL-Werte zurück. Reihenfolge enthält die
+        Positionen in fids aufsteigend nach Wert; wird einmal je Spalte per argsort aufgebaut."""
+        if name not in self._sortierung:
+            werte, null = self.spalte(name)
+            # NaN wird von argsort ans Ende sortiert und abgeschnitten
+            reihenfolge = np.argsort(werte, kind='stable')[:np.count_nonzero(~null)]
+            self._sortierung[name] = (reihenfolge, werte[reihenfolge])
+        return self._sortierung[name]
+
+    def positionen_unter(self, name, grenze, gleich=False):
+        """Positionen in fids aller Werte < grenze (mit gleich: <=) als Ausschnitt des sortierten Index."""
+        reihenfolge, sortiert = self.sortierung(name)
+        return reihenfolge[:np.searchsorted(sortiert, grenze, side='right' if gleich else 'left')]
+
+    def positionen_ueber(self, name, grenze, gleich=False):
+        """Positionen in fids aller Werte > grenze (mit gleich: >=) als Ausschnitt des sortierten Index."""
+        reihenfolge, sortiert = self.sortierung(name)
+        return reihenfolge[np.searchsorted(sortiert, grenze, side='left' if gleich else 'right'):]
+
+    def quantile(self, name, anteile):
+        """Gibt Quantile (Anteile 0..1) der Nicht-NULL-Werte zurück. Ist der sortierte Index bereits aufgebaut,
+        werden sie dort abgelesen, sonst per linearer Auswahl ohne vollständige Sortierung bestimmt."""
+        if name in self._sortierung:
+            return _quantile(self._sortierung[name][1], anteile, sortiert=True)
+        return _quantile(self.werte(name), anteile)
+
+    def median_mad(self, name):
+        """Gibt (Median, MAD) der Nicht-NULL-Werte zurück; MAD ist der Median der absoluten Abweichungen vom Median."""
+        median = self.quantile(name, [0.5])[0]
+        return median, _quantile(np.abs(self.werte(name) - median), [0.5])[0]
+
+    def gruppen(self, name):
+        """Gibt (Codes, Bezeichnungen) eines beliebigen Attributs als Gruppierung zurück, ausgerichtet an fids.
+        Code i steht für Bezeichnungen[i] (als Text), NULL für -1."""
+        if name not in self._gruppen:
+            fids, roh = self._lesen(name)
+            null = np.fromiter((wert is None or (hasattr(wert, 'isNull') and wert.isNull()) for wert in roh), dtype=bool, count=len(roh))
+            texte = np.array([str(wert) for wert in roh], dtype=object)
+            codes = np.full(len(roh), -1, dtype=np.int64)
+            bezeichnungen, codes[~null] = np.unique(texte[~null].astype(str), return_inverse=True)
+            self._ausrichten(fids)
+            self._gruppen[name] = (codes, bezeichnungen)
+        return self._gruppen[name]
+
+    def zeitstempel(self, name):
+        """Gibt die Werte eines Zeitstempel-Attributs (Zahl, Datum/Zeit oder Text) in Sekunden zurück, ausgerichtet
+        an fids. NULL und nicht lesbare Werte sind NaN."""
+        if name not in self._zeitstempel:
+            fids, roh = self._lesen(name)
+            zeit = unix_zeitstempel(roh)
+            self._ausrichten(fids)
+            self._zeitstempel[name] = zeit
+        return self._zeitstempel[name]
+
+    def gruppen_sortierung(self, name, gruppen_name):
+        """Gibt (Positionen in fids, Werte, Codes) aller Punkte mit Wert und Gruppe zurück, sortiert nach Gruppe
+        und innerhalb der Gruppe nach Wert. Wird je Kombination aus Spalte und Gruppierung einmal aufgebaut."""
+        key = (name, gruppen_name)
+        if key not in self._gruppen_sortierung:
+            codes, _ = self.gruppen(gruppen_name)
+            werte, null = self.spalte(name)
+            positionen = np.flatnonzero(~null & (codes >= 0))
+            reihenfolge, werte_sortiert, codes_sortiert = gruppen_sortieren(werte[positionen], codes[positionen])
+            self._gruppen_sortierung[key] = (positionen[reihenfolge], werte_sortiert, codes_sortiert)
+        return self._gruppen_sortierung[key]
+
+    def statistik(self, name):
+        """Gibt (Mittelwert, Standardabweichung) der Nicht-NULL-Werte zurück."""
+        if name not in self._statistik:
+            werte = self.werte(name)
+            self._statistik[name] = (np.mean(werte), np.std(werte))
+        return self._statistik[name]
+
+    def _lesen(self, name):
+        """Liest (Feature-IDs, Rohwerte) eines Attributs ohne Geometrie."""
+        field_index = self.layer.fields().indexOf(name)
+        if field_index == -1:
+            raise KeyError(name)
+
+        # Nur dieses Attribut, keine Geometrie lesen
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setSubsetOfAttributes([field_index])
+
+        fids = []
+        roh = []
+        for feature in self.layer.getFeatures(request):
+            fids.append(feature.id())
+            roh.append(feature[field_index])
+        return np.asarray(fids, dtype=np.int64), roh
+
+    def _ausrichten(self, fids):
+        """Übernimmt die Reihenfolge fids; weicht sie ab, passen bereits geladene Spalten nicht mehr."""
+        if self.fids is None:
+            self.fids = fids
+        elif not np.array_equal(fids, self.fids):
+            self._spalten = {}
+            self._sortierung = {}
+            self._statistik = {}
+            self._gruppen = {}
+            self._gruppen_sortierung = {}
+            self._zeitstempel = {}
+            self.fids = fids
+
+    def _laden(self, name):
+        fids, roh = self._lesen(name)
+        werte = _als_zahlen(roh)
+        self._ausrichten(fids)
+
+        self._spalten[name] = (werte, np.isnan(werte))
+        self._sortierung.pop(name, None)
+        self._statistik.pop(name, None)
+        for key in [key for key in self._gruppen_sortierung if key[0] == name]:
+            del self._gruppen_sortierung[key]
+
+    def entfernen(self, ids):
+        """Entfernt gelöschte Punkte aus allen geladenen Spalten."""
+        if self.fids is None:
+            return
+        behalten = ~np.isin(self.fids, ids)
+        self.fids = self.fids[behalten]
+        self._spalten = {name: (werte[behalten], null[behalten]) for name, (werte, null) in self._spalten.items()}
+
+        # Der sortierte Index bleibt ohne die gelöschten Punkte sortiert, nur die Positionen verschieben sich
+        neue_position = np.cumsum(behalten) - 1
+        sortierung = {}
+        for name, (reihenfolge, sortiert) in self._sortierung.items():
+            bleibt = behalten[reihenfolge]
+            sortierung[name] = (neue_position[reihenfolge[bleibt]], sortiert[bleibt])
+        self._sortierung = sortierung
+        self._statistik = {}
+        self._gruppen = {name: (codes[behalten], bezeichnungen) for name, (codes, bezeichnungen) in self._gruppen.items()}
+        self._gruppen_sortierung = {}
+        self._zeitstempel = {name: zeit[behalten] for name, zeit in self._zeitstempel.items()}
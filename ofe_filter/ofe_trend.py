@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def _exponenten(grad):
+    """Exponentenpaare (i, j) der Terme x^i * y^j eines Polynoms in x und y bis zum Gesamtgrad grad."""
+    return [(i, gesamt - i) for gesamt in range(grad + 1) for i in range(gesamt, -1, -1)]
+
+
+def _terme(u, v, exponenten):
+    """Designmatrix (Punkte x Terme) aus den normierten Koordinaten u, v."""
+    return np.column_stack([u ** i * v ** j for i, j in exponenten])
+
+
+def polynom_trend(x, y, werte, grad=2, blockgroesse=262144):
+    """Trendfläche als Polynom in x und y bis zum Gesamtgrad grad, angepasst nach kleinsten Quadraten an alle
+    Punkte mit Koordinaten und Wert. Die Koordinaten werden auf [-1, 1] normiert, damit die Normalgleichungen auch
+    bei großen Rechts- und Hochwerten gut konditioniert sind; sie werden blockweise aufsummiert, sodass nie mehr
+    als blockgroesse Zeilen der Designmatrix im Speicher liegen. Gibt den Trend je Punkt zurück (NaN ohne
+    Koordinaten)."""
+    trend = np.full(len(werte), np.nan)
+    mit_koordinaten = np.isfinite(x) & np.isfinite(y)
+    gueltig = mit_koordinaten & ~np.isnan(werte)
+    exponenten = _exponenten(grad)
+    if np.count_nonzero(gueltig) < len(exponenten):
+        return trend
+
+    mitte = np.array([x[gueltig].min() + x[gueltig].max(), y[gueltig].min() + y[gueltig].max()]) / 2
+    spanne = np.array([x[gueltig].max() - x[gueltig].min(), y[gueltig].max() - y[gueltig].min()]) / 2
+    spanne[spanne == 0] = 1
+
+    # Normalgleichungen A'A b = A'w über alle Blöcke
+    positionen = np.flatnonzero(gueltig)
+    ata = np.zeros((len(exponenten), len(exponenten)))
+    atw = np.zeros(len(exponenten))
+    for start in range(0, len(positionen), blockgroesse):
+        block = positionen[start:start + blockgroesse]
+        a = _terme((x[block] - mitte[0]) / spanne[0], (y[block] - mitte[1]) / spanne[1], exponenten)
+        ata += a.T @ a
+        atw += a.T @ werte[block]
+    koeffizienten = np.linalg.lstsq(ata, atw, rcond=None)[0]
+
+    positionen = np.flatnonzero(mit_koordinaten)
+    for start in range(0, len(positionen), blockgroesse):
+        block = positionen[start:start + blockgroesse]
+        a = _terme((x[block] - mitte[0]) / spanne[0], (y[block] - mitte[1]) / spanne[1], exponenten)
+        trend[block] = a @ koeffizienten
+    return trend
+
+
+def _nachbarsumme(raster):
+    """Summe jeder Rasterzelle mit ihren acht Nachbarn (Rand mit Nullen aufgefüllt)."""
+    aufgefuellt = np.pad(raster, 1)
+    zeilen, spalten = raster.shape
+    return sum(aufgefuellt[i:i + zeilen, j:j + spalten] for i in range(3) for j in range(3))
+
+
+def raster_trend(x, y, werte, zellgroesse):
+    """Trendfläche aus einem groben Raster: je Zelle der Mittelwert der Punkte (Kleinste-Quadrate-Schätzung einer
+    konstanten Fläche je Zelle), geglättet über die Zelle und ihre acht Nachbarn (nach Anzahl gewichtet, sodass
+    leere Zellen aus ihren Nachbarn gefüllt werden) und bilinear zwischen den Zellmittelpunkten auf die Punkte
+    interpoliert. Gibt den Trend je Punkt zurück (NaN ohne Koordinaten oder ohne Werte in der Umgebung)."""
+    trend = np.full(len(werte), np.nan)
+    mit_koordinaten = np.isfinite(x) & np.isfinite(y)
+    gueltig = mit_koordinaten & ~np.isnan(werte)
+    if not np.any(gueltig):
+        return trend
+
+    x0, y0 = x[mit_koordinaten].min(), y[mit_koordinaten].min()
+    anzahl_x = int((x[mit_koordinaten].max() - x0) // zellgroesse) + 1
+    anzahl_y = int((y[mit_koordinaten].max() - y0) // zellgroesse) + 1
+
+    # Summe und Anzahl je Zelle in einem Durchgang
+    zelle = ((y[gueltig] - y0) // zellgroesse).astype(np.int64) * anzahl_x + ((x[gueltig] - x0) // zellgroesse).astype(np.int64)
+    summe = np.bincount(zelle, werte[gueltig], anzahl_x * anzahl_y).reshape(anzahl_y, anzahl_x)
+    anzahl = np.bincount(zelle, minlength=anzahl_x * anzahl_y).reshape(anzahl_y, anzahl_x).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flaeche = _nachbarsumme(summe) / _nachbarsumme(anzahl)
+
+    # Bilineare Interpolation zwischen den Zellmittelpunkten; Ecken ohne Wert werden ausgelassen
+    positionen = np.flatnonzero(mit_koordinaten)
+    u = (x[positionen] - x0) / zellgroesse - 0.5
+    v = (y[positionen] - y0) / zellgroesse - 0.5
+    i0 = np.floor(u).astype(np.int64)
+    j0 = np.floor(v).astype(np.int64)
+    du = u - i0
+    dv = v - j0
+    summe_gewichtet = np.zeros(len(positionen))
+    summe_gewichte = np.zeros(len(positionen))
+    for di, gewicht_u in ((0, 1 - du), (1, du)):
+        for dj, gewicht_v in ((0, 1 - dv), (1, dv)):
+            ecke = flaeche[np.clip(j0 + dj, 0, anzahl_y - 1), np.clip(i0 + di, 0, anzahl_x - 1)]
+            gewicht = np.where(np.isnan(ecke), 0.0, gewicht_u * gewicht_v)
+            summe_gewichtet += gewicht * np.nan_to_num(ecke)
+            summe_gewichte += gewicht
+    with np.errstate(invalid='ignore', divide='ignore'):
+        trend[positionen] = summe_gewichtet / summe_gewichte
+    return trend
+
+
+def residuen(x, y, werte, verfahren, parameter):
+    """Werte abzüglich der Trendfläche: verfahren 'Polynom' mit parameter = Grad, 'Raster' mit parameter =
+    Zellgröße in Metern. NaN für Punkte ohne Wert oder ohne Trend."""
+    if verfahren == 'Polynom':
+        trend = polynom_trend(x, y, werte, int(parameter))
+    else:
+        trend = raster_trend(x, y, werte, parameter)
+    return werte - trend
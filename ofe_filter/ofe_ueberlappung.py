@@ -10,6 +10,8 @@ from qgis.PyQt.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from .ofe_fahrspuren import fahrspuren
+
 class UeberlappungFilter:
     """Class for filtering point data based on overlapping paths."""
     
@@ -55,74 +57,23 @@ class UeberlappungFilter:
             self.parent_dialog.log.log_event("Überlappung", {"Fehler": "Keine gültigen Zeitstempel gefunden. Bitte überprüfen Sie das Zeitstempelformat."})
             return False
         
-        # Create Duration column
-        self.gdf['Duration'] = None
-        
-        # Calculate time delta between points, handling None values
-        for u in range(1, len(self.gdf)):
-            if pd.notna(self.gdf.loc[u, 'unix_timestamp']) and pd.notna(self.gdf.loc[u - 1, 'unix_timestamp']):
-                self.gdf.loc[u, 'Duration'] = self.gdf.loc[u, 'unix_timestamp'] - self.gdf.loc[u - 1, 'unix_timestamp']
-            else:
-                # Use a default value if timestamps are missing
-                self.gdf.loc[u, 'Duration'] = self.max_timedelta + 1 
-        
-        # Calculate median time delta (ignoring NaN values)
-        valid_durations = self.gdf['Duration'].dropna()
-        if len(valid_durations) > 0:
-            median_duration = valid_durations.median()
-        else:
-            # If no valid durations, use a default value
-            median_duration = self.max_timedelta
+        # Warn if there are no time deltas to take the median from
+        if len(self.gdf) < 2:
             self.parent_dialog.log.log_event("Überlappung", {"Warnung": "Keine gültigen Zeitdifferenzen gefunden. Verwende Standardwert."})
         
-        # Handle None values in Duration column
-        none_count = self.gdf['Duration'].isna().sum()
-        if none_count > 0:
-            self.gdf['Duration'].fillna(median_duration, inplace=True)
-        
-        # Calculate cutoff for path separation
-        cut_off = self.max_timedelta + median_duration
-        
-        # Generate path numbers
-        nr = 1
-        self.gdf['Path'] = None
-        
         # Check if additional attribute for path breaks is specified
         has_attr_break = self.path_break_attribute is not None and \
                         self.path_break_threshold is not None and \
                         self.path_break_attribute in self.gdf.columns
+        attribute = pd.to_numeric(self.gdf[self.path_break_attribute], errors='coerce') if has_attr_break else None
         
-        # If additional attribute is specified, create a column for attribute changes
-        if has_attr_break:
-            self.gdf['attr_change'] = 0
-            for i in range(1, len(self.gdf)):
-                try:
-                    current_val = float(self.gdf.loc[i, self.path_break_attribute])
-                    prev_val = float(self.gdf.loc[i-1, self.path_break_attribute])
-                    # Mark significant changes in the attribute
-                    if abs(current_val - prev_val) > self.path_break_threshold:
-                        self.gdf.loc[i, 'attr_change'] = 1
-                except (ValueError, TypeError):
-                    pass
-        
-        # Assign path numbers based on time gaps and attribute changes
-        for v in range(len(self.gdf)):
-            # First point always starts a new path
-            if v == 0:
-                self.gdf.loc[v, 'Path'] = nr
-                continue
-                
-            # Check for time gap
-            time_break = self.gdf.loc[v, 'Duration'] > cut_off
-            
-            # Check for attribute break
-            attr_break = has_attr_break and self.gdf.loc[v, 'attr_change'] == 1
-            
-            # Start a new path if either condition is met
-            if time_break or attr_break:
-                nr += 1
-            
-            self.gdf.loc[v, 'Path'] = nr
+        # Time deltas and path numbers (new path on time gaps and attribute changes), shared with the Hampel filter
+        path, duration = fahrspuren(
+            self.gdf['unix_timestamp'].to_numpy(dtype=np.float64, na_value=np.nan),
+            self.max_timedelta, attribute, self.path_break_threshold if has_attr_break else None
+        )
+        self.gdf['Duration'] = duration
+        self.gdf['Path'] = path
         
         return True
     
@@ -0,0 +1,778 @@
+# -*- coding: utf-8 -*-
+
+from functools import partial
+
+import numpy as np
+import shapely
+from shapely import wkb
+from scipy.spatial import cKDTree
+from qgis.core import (
+    QgsProject, QgsCoordinateTransform, QgsFeatureRequest, QgsGeometry, QgsTask, QgsVectorFileWriter, QgsWkbTypes
+)
+
+
+class PunktKoordinaten:
+    """Feature-IDs und Koordinaten eines Punktlayers als NumPy-Arrays.
+
+    Die Punkte werden einmal ohne Attribute gelesen und zusätzlich nach der
+    x-Koordinate sortiert, damit je Maskenpolygon nur die Punkte innerhalb
+    seines Bounding-Box-Streifens geprüft werden müssen. source kann auch eine
+    QgsVectorLayerFeatureSource sein (für das Lesen in einem Hintergrund-Task)."""
+
+    def __init__(self, source, feedback=None):
+        # Nur Geometrien lesen, keine Attribute
+        request = QgsFeatureRequest().setNoAttributes()
+
+        fids = []
+        xs = []
+        ys = []
+
+        for feature in source.getFeatures(request):
+            # Abbruch (z.B. durch einen Hintergrund-Task) regelmäßig prüfen
+            if feedback is not None and len(fids) % 10_000 == 0 and feedback.isCanceled():
+                break
+
+            fids.append(feature.id())
+            geom = feature.geometry()
+
+            # Leere Geometrien erhalten NaN und liegen damit in keinem Polygon
+            if geom is None or geom.isNull() or geom.isEmpty():
+                xs.append(np.nan)
+                ys.append(np.nan)
+                continue
+
+            if geom.isMultipart():
+                punkte = geom.asMultiPoint()
+                punkt = punkte[0] if len(punkte) == 1 else geom.centroid().asPoint()
+            else:
+                punkt = geom.asPoint()
+            xs.append(punkt.x())
+            ys.append(punkt.y())
+
+        self.fids = np.asarray(fids, dtype=np.int64)
+        self.x = np.asarray(xs, dtype=np.float64)
+        self.y = np.asarray(ys, dtype=np.float64)
+
+        # Sortierung nach x für die Streifensuche (NaN landen am Ende)
+        self.order = np.argsort(self.x, kind="stable")
+        self.x_sorted = self.x[self.order]
+
+    def __len__(self):
+        return len(self.fids)
+
+    def teilmenge(self, behalten):
+        """Gibt die Punkte zurück, für die das boolsche Array behalten True ist (ohne erneutes Lesen)."""
+        teil = PunktKoordinaten.__new__(PunktKoordinaten)
+        teil.fids = self.fids[behalten]
+        teil.x = self.x[behalten]
+        teil.y = self.y[behalten]
+        teil.order = np.argsort(teil.x, kind="stable")
+        teil.x_sorted = teil.x[teil.order]
+        return teil
+
+    def kandidaten(self, xmin, ymin, xmax, ymax):
+        """Gibt die Positionen aller Punkte innerhalb der Bounding-Box zurück."""
+        lo = np.searchsorted(self.x_sorted, xmin, side="left")
+        hi = np.searchsorted(self.x_sorted, xmax, side="right")
+        idx = self.order[lo:hi]
+        y = self.y[idx]
+        return idx[(y >= ymin) & (y <= ymax)]
+
+
+def zu_loeschende_punkte(punkte, masken, zellgroesse=None, zustand=None):
+    """Prüft alle Punkte in einem Durchgang gegen die Masken und gibt ein boolsches Array der zu
+    löschenden Punkte sowie die Anzahl der entfernten Punkte je Fläche zurück.
+
+    masken ist eine Liste von (ZuschnittMaske, innen_behalten, flaeche). Bei innen_behalten=True werden
+    Punkte außerhalb gelöscht, bei False Punkte innerhalb der Polygone. Mit einem ZuschnittZustand
+    (dessen Punkte punkte sind) werden nur die Punkte geänderter Polygone neu geprüft."""
+    loeschen = np.zeros(len(punkte), dtype=bool)
+    entfernt = []
+
+    for maske, innen_behalten, flaeche in masken:
+        # Punkt-in-Polygon-Test für alle Punkte (bzw. nur für die von Änderungen betroffenen)
+        if zustand is not None:
+            innen = zustand.enthaelt(maske, zellgroesse)
+        else:
+            innen = maske.enthaelt(punkte, zellgroesse)
+        verletzt = ~innen if innen_behalten else innen
+
+        # Punkte werden der ersten Fläche zugerechnet, die sie entfernt (wie bei nacheinander geklickten Buttons)
+        neu = verletzt & ~loeschen
+        entfernt.append((flaeche, int(np.count_nonzero(neu))))
+        loeschen |= neu
+
+    return loeschen, entfernt
+
+
+class ZuschnittZustand:
+    """Punktkoordinaten eines Punktlayers und die Zugehörigkeit jedes Punktes zu den Masken,
+    über mehrere Zuschnitte hinweg gehalten.
+
+    Liefert der MaskenCache nach einer Änderung am Masken-Layer eine neue Maske, werden nur die
+    Punkte in den alten und neuen Bounding-Boxen der geänderten Polygone neu geprüft. Die Punkte
+    werden nur neu gelesen, wenn sich die Geometrien des Punktlayers selbst ändern."""
+
+    def __init__(self, punkt_layer):
+        self.layer_id = punkt_layer.id()
+        self.punkte = PunktKoordinaten(punkt_layer)
+
+        # Schlüssel der Maske (Layer-ID, bei Linien mit Pufferbreite) -> (Maske, boolsches Array innen)
+        self._innen = {}
+        self._gueltig = True
+
+        self._signale = [punkt_layer.geometryChanged, punkt_layer.featureAdded, punkt_layer.featureDeleted]
+        for signal in self._signale:
+            signal.connect(self._verwerfen)
+
+    def passt_zu(self, punkt_layer):
+        """Prüft, ob der Zustand noch zum Punktlayer passt."""
+        return (
+            self._gueltig
+            and punkt_layer.id() == self.layer_id
+            and len(self.punkte) == punkt_layer.featureCount()
+        )
+
+    def _verwerfen(self, *args):
+        self._gueltig = False
+
+    def trennen(self):
+        """Trennt die Verbindungen zum Punktlayer."""
+        for signal in self._signale:
+            try:
+                signal.disconnect(self._verwerfen)
+            except (TypeError, RuntimeError):
+                # Layer wurde bereits gelöscht
+                pass
+        self._signale = []
+
+    def enthaelt(self, maske, zellgroesse=None):
+        """Wie ZuschnittMaske.enthaelt für die Punkte des Zustands, prüft aber nur die Punkte neu,
+        die von geänderten Polygonen betroffen sein können."""
+        vorher = self._innen.get(maske.schluessel)
+
+        if vorher is None:
+            innen = maske.enthaelt(self.punkte, zellgroesse)
+        else:
+            alte_maske, innen = vorher
+            if alte_maske is not maske:
+                innen = innen.copy()
+
+                # Nur Punkte in den Bounding-Boxen geänderter, neuer oder gelöschter Polygone neu prüfen
+                betroffen = np.zeros(len(self.punkte), dtype=bool)
+                for xmin, ymin, xmax, ymax in geaenderte_boxen(alte_maske, maske):
+                    betroffen[self.punkte.kandidaten(xmin, ymin, xmax, ymax)] = True
+
+                if betroffen.any():
+                    innen[betroffen] = maske.enthaelt(self.punkte.teilmenge(betroffen))
+
+        self._innen[maske.schluessel] = (maske, innen)
+        return innen
+
+    def entfernen(self, ids):
+        """Entfernt gelöschte Punkte aus dem Zustand."""
+        behalten = ~np.isin(self.punkte.fids, ids)
+        self.punkte = self.punkte.teilmenge(behalten)
+        self._innen = {schluessel: (maske, innen[behalten]) for schluessel, (maske, innen) in self._innen.items()}
+
+
+def geaenderte_boxen(alte_maske, neue_maske):
+    """Bounding-Boxen aller Geometrien, die nur in einer der beiden Masken vorkommen
+    (geändert, hinzugefügt oder gelöscht)."""
+    alt_wkb = shapely.to_wkb(alte_maske.geometrien) if len(alte_maske) else []
+    neu_wkb = shapely.to_wkb(neue_maske.geometrien) if len(neue_maske) else []
+    alt_menge = set(alt_wkb)
+    neu_menge = set(neu_wkb)
+
+    nur_alt = np.fromiter((w not in neu_menge for w in alt_wkb), dtype=bool, count=len(alt_wkb))
+    nur_neu = np.fromiter((w not in alt_menge for w in neu_wkb), dtype=bool, count=len(neu_wkb))
+    return np.vstack([alte_maske.bounds[nur_alt], neue_maske.bounds[nur_neu]])
+
+
+class ZuschnittVorschauTask(QgsTask):
+    """Berechnet im Hintergrund, welche Punkte ein Zuschnitt entfernen würde, ohne etwas zu löschen.
+
+    Die Punkte werden aus einer QgsVectorLayerFeatureSource gelesen, die Masken werden vorbereitet
+    übergeben. Nach Abschluss oder Abbruch wird fertig(task, erfolgreich) im Haupt-Thread aufgerufen."""
+
+    def __init__(self, punkt_quelle, masken, zellgroesse, fertig):
+        super().__init__("Zuschnitt-Vorschau", QgsTask.CanCancel)
+        self.punkt_quelle = punkt_quelle
+        self.masken = masken
+        self.zellgroesse = zellgroesse
+        self.fertig = fertig
+
+        # Ergebnis
+        self.anzahl_punkte = 0
+        self.ids = None
+        self.entfernt = []
+
+    def run(self):
+        punkte = PunktKoordinaten(self.punkt_quelle, feedback=self)
+        if self.isCanceled():
+            return False
+        self.setProgress(50)
+
+        loeschen, self.entfernt = zu_loeschende_punkte(punkte, self.masken, self.zellgroesse)
+        self.anzahl_punkte = len(punkte)
+        self.ids = punkte.fids[loeschen]
+        return not self.isCanceled()
+
+    def finished(self, result):
+        self.fertig(self, result)
+
+
+def masken_geometrien(masken_layer, ziel_crs):
+    """Liest alle nicht leeren Geometrien des Masken-Layers, in das ziel_crs transformiert, als Shapely-Array."""
+    transform_context = QgsProject.instance().transformContext()
+    coord_transform = QgsCoordinateTransform(masken_layer.crs(), ziel_crs, transform_context)
+
+    geometrien = []
+    for feature in masken_layer.getFeatures(QgsFeatureRequest().setNoAttributes()):
+        geom = feature.geometry()
+        if geom is None or geom.isNull() or geom.isEmpty():
+            continue
+
+        # Sichere Kopie, transform() arbeitet in-place
+        geom = QgsGeometry(geom)
+        geom.transform(coord_transform)
+        geometrien.append(wkb.loads(bytes(geom.asWkb())))
+
+    return np.array(geometrien, dtype=object)
+
+
+def linien_segmente(linien):
+    """Gibt Start- und Endpunkte aller Segmente einfacher Linien (bzw. Ringe) als (n, 2)-Arrays zurück."""
+    coords, linien_idx = shapely.get_coordinates(linien, return_index=True)
+    gleiche_linie = linien_idx[1:] == linien_idx[:-1]
+    return coords[:-1][gleiche_linie], coords[1:][gleiche_linie]
+
+
+class ZuschnittMaske:
+    """In das Ziel-KBS transformierte und vorbereitete Polygone eines Masken-Layers."""
+
+    def __init__(self, masken_layer, ziel_crs):
+        self.layer_id = masken_layer.id()
+        self.schluessel = self.layer_id
+        self.polygone = masken_geometrien(masken_layer, ziel_crs)
+
+        # Polygone einmalig vorbereiten (GEOS prepared geometry)
+        shapely.prepare(self.polygone)
+        self.bounds = shapely.bounds(self.polygone) if len(self.polygone) else np.empty((0, 4))
+
+        # Gerasterte Fassungen der Maske je Zellgröße und Index der Randsegmente (bei Bedarf erstellt)
+        self._raster = {}
+        self._segment_index = None
+
+    def __len__(self):
+        return len(self.polygone)
+
+    @property
+    def geometrien(self):
+        return self.polygone
+
+    def kopie(self):
+        """Kopie mit eigenen, neu vorbereiteten Polygonen für die Verwendung in einem anderen Thread
+        (vorbereitete GEOS-Geometrien dürfen nicht gleichzeitig aus mehreren Threads genutzt werden).
+        Die Raster werden geteilt, da sie nach dem Erstellen nur gelesen werden."""
+        kopie = ZuschnittMaske.__new__(ZuschnittMaske)
+        kopie.layer_id = self.layer_id
+        kopie.schluessel = self.schluessel
+        kopie.polygone = shapely.from_wkb(shapely.to_wkb(self.polygone)) if len(self) else self.polygone
+        shapely.prepare(kopie.polygone)
+        kopie.bounds = self.bounds
+        kopie._raster = self._raster
+        kopie._segment_index = self._segment_index
+        return kopie
+
+    def enthaelt(self, punkte, zellgroesse=None):
+        """Gibt ein boolsches Array zurück: True, wenn mindestens ein Polygon den Punkt enthält.
+
+        Mit zellgroesse wird die Maske einmalig gerastert; nur Punkte in Zellen, die vom
+        Polygonrand berührt werden, erhalten den exakten Geometrietest. Das Ergebnis ist
+        identisch mit dem exakten Test."""
+        if zellgroesse:
+            raster = self.raster(zellgroesse)
+            if raster is not None:
+                klassen = raster.klassifiziere(punkte.x, punkte.y)
+                innen = klassen == MaskenRaster.INNEN
+                rand = klassen == MaskenRaster.RAND
+                innen[rand] = self._enthaelt_exakt(punkte, rand)[rand]
+                return innen
+
+        return self._enthaelt_exakt(punkte)
+
+    def _enthaelt_exakt(self, punkte, auswahl=None):
+        """Exakter Punkt-in-Polygon-Test, optional nur für die Punkte in auswahl."""
+        innen = np.zeros(len(punkte), dtype=bool)
+
+        for polygon, (xmin, ymin, xmax, ymax) in zip(self.polygone, self.bounds):
+            idx = punkte.kandidaten(xmin, ymin, xmax, ymax)
+            if auswahl is not None:
+                idx = idx[auswahl[idx]]
+            # Bereits zugeordnete Punkte nicht erneut prüfen
+            idx = idx[~innen[idx]]
+            if len(idx) == 0:
+                continue
+            innen[idx] = shapely.contains_xy(polygon, punkte.x[idx], punkte.y[idx])
+
+        return innen
+
+    def segmente(self):
+        """Gibt Start- und Endpunkte aller Randsegmente (Außen- und Innenringe) als (n, 2)-Arrays zurück."""
+        return linien_segmente(shapely.get_parts(shapely.boundary(self.polygone)))
+
+    def segment_index(self):
+        """Gibt den (zwischengespeicherten) räumlichen Index über alle Randsegmente zurück."""
+        if self._segment_index is None:
+            self._segment_index = SegmentIndex(*self.segmente())
+        return self._segment_index
+
+    def randabstand(self, punkte):
+        """Vorzeichenbehafteter Abstand jedes Punktes zum nächsten Randsegment der Maske:
+        positiv innerhalb, negativ außerhalb der Polygone, NaN für leere Geometrien."""
+        if len(self) == 0:
+            return np.full(len(punkte), np.nan)
+
+        abstand = self.segment_index().abstand(punkte.x, punkte.y)
+        abstand[~self.enthaelt(punkte)] *= -1
+        return abstand
+
+    def raster(self, zellgroesse):
+        """Gibt das (zwischengespeicherte) Raster der Maske für die Zellgröße zurück,
+        oder None, wenn das Raster zu groß würde."""
+        if zellgroesse not in self._raster:
+            self._raster[zellgroesse] = MaskenRaster.erstellen(self, zellgroesse)
+        return self._raster[zellgroesse]
+
+
+class LinienMaske:
+    """In das Ziel-KBS transformierte Linien eines Masken-Layers (z.B. Fahrgassen oder Drainagen)
+    mit einem Index über alle Liniensegmente.
+
+    Die Pufferbreite wird erst mit puffer() festgelegt; Pufferpolygone werden nie erzeugt,
+    daher ist das Ausprobieren verschiedener Breiten günstig."""
+
+    def __init__(self, masken_layer, ziel_crs):
+        self.layer_id = masken_layer.id()
+        self.linien = masken_geometrien(masken_layer, ziel_crs)
+        self.bounds = shapely.bounds(self.linien) if len(self.linien) else np.empty((0, 4))
+        self._segment_index = None
+
+    def __len__(self):
+        return len(self.linien)
+
+    def segment_index(self):
+        """Gibt den (zwischengespeicherten) räumlichen Index über alle Liniensegmente zurück."""
+        if self._segment_index is None:
+            self._segment_index = SegmentIndex(*linien_segmente(shapely.get_parts(self.linien)))
+        return self._segment_index
+
+    def puffer(self, breite):
+        """Gibt die Maske für die Pufferbreite breite zurück."""
+        return PufferMaske(self, breite)
+
+
+class PufferMaske:
+    """Linienmaske mit Pufferbreite: ein Punkt liegt innen, wenn sein Abstand zur nächsten Linie
+    kleiner als die Pufferbreite ist (wie beim Test gegen ein Pufferpolygon zählt der Rand nicht dazu)."""
+
+    def __init__(self, linien_maske, breite):
+        self.linien_maske = linien_maske
+        self.breite = breite
+        self.layer_id = linien_maske.layer_id
+        self.schluessel = (self.layer_id, breite)
+
+        # Bounding-Boxen der Linien um die Pufferbreite erweitert
+        self.bounds = linien_maske.bounds + np.array([-breite, -breite, breite, breite])
+
+    def __len__(self):
+        return len(self.linien_maske)
+
+    @property
+    def geometrien(self):
+        return self.linien_maske.linien
+
+    def kopie(self):
+        """Für die Verwendung in einem anderen Thread: der Segmentindex wird hier erstellt und danach nur gelesen."""
+        self.linien_maske.segment_index()
+        return self
+
+    def enthaelt(self, punkte, zellgroesse=None):
+        """Gibt ein boolsches Array zurück: True, wenn der Punkt näher als die Pufferbreite an einer Linie liegt.
+        zellgroesse wird nicht benötigt, da Punkte fern aller Linien ohnehin übersprungen werden."""
+        innen = np.zeros(len(punkte), dtype=bool)
+        if len(self) == 0 or self.breite <= 0:
+            return innen
+
+        # Nur Punkte innerhalb der erweiterten Bounding-Box aller Linien messen
+        idx = punkte.kandidaten(self.bounds[:, 0].min(), self.bounds[:, 1].min(),
+                                self.bounds[:, 2].max(), self.bounds[:, 3].max())
+        if len(idx) == 0:
+            return innen
+
+        abstand = self.linien_maske.segment_index().abstand(punkte.x[idx], punkte.y[idx], max_abstand=self.breite)
+        innen[idx] = abstand < self.breite
+        return innen
+
+
+class SegmentIndex:
+    """KD-Baum über die Mittelpunkte kurzer Liniensegmente für exakte Abstandsabfragen.
+
+    Lange Segmente werden in Stücke zerlegt, damit die halbe Stücklänge klein bleibt. Die Punkte
+    werden in Gitterzellen gruppiert; je Zelle wird eine obere Schranke für den Randabstand
+    bestimmt und nur die Segmente, die diese Schranke unterschreiten können, werden für die
+    Punkte der Zelle exakt gemessen."""
+
+    def __init__(self, start, ende):
+        laenge = np.hypot(*(ende - start).T)
+        max_laenge = 2 * np.median(laenge) if len(laenge) else 0.0
+
+        # Wenige lange Segmente (z.B. gerade Fahrgassen) zusätzlich relativ zur Ausdehnung begrenzen
+        if len(laenge):
+            ausdehnung = np.ptp(np.vstack([start, ende]), axis=0).max()
+            max_laenge = min(max_laenge, ausdehnung / 256)
+
+        # Segmente länger als max_laenge in gleich lange Stücke teilen
+        if max_laenge > 0:
+            anzahl = np.maximum(np.ceil(laenge / max_laenge).astype(np.int64), 1)
+        else:
+            anzahl = np.ones(len(laenge), dtype=np.int64)
+        segment = np.repeat(np.arange(len(start)), anzahl)
+        stueck = np.arange(len(segment)) - np.repeat(np.cumsum(anzahl) - anzahl, anzahl)
+        t0 = (stueck / anzahl[segment])[:, None]
+        t1 = ((stueck + 1) / anzahl[segment])[:, None]
+        richtung = ende[segment] - start[segment]
+
+        self.start = start[segment] + richtung * t0
+        self.ende = start[segment] + richtung * t1
+        self.halbe_laenge = np.hypot(*(self.ende - self.start).T).max() / 2 if len(segment) else 0.0
+        self.baum = cKDTree((self.start + self.ende) / 2) if len(segment) else None
+
+    def __len__(self):
+        return len(self.start)
+
+    def abstand(self, x, y, punkte_je_zelle=16, blockgroesse=4_000_000, max_abstand=None):
+        """Exakter Abstand jedes Punktes zum nächsten Segment (NaN für ungültige Koordinaten).
+
+        Mit max_abstand werden Zellen übersprungen, deren Punkte sicher mindestens so weit vom
+        nächsten Segment entfernt sind; diese Punkte erhalten inf."""
+        abstand = np.full(len(x), np.nan)
+        gueltig = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        if self.baum is None or len(gueltig) == 0:
+            return abstand
+        px, py = x[gueltig], y[gueltig]
+
+        # Gitter so wählen, dass im Mittel punkte_je_zelle Punkte in eine Zelle fallen
+        x0, y0 = px.min(), py.min()
+        breite, hoehe = px.max() - x0, py.max() - y0
+        g = np.sqrt(breite * hoehe / len(px) * punkte_je_zelle)
+        g = max(g, max(breite, hoehe) / 10_000, 1e-6)
+        ix = ((px - x0) // g).astype(np.int64)
+        iy = ((py - y0) // g).astype(np.int64)
+        ny = iy.max() + 1
+        zellen, zelle_je_punkt = np.unique(ix * ny + iy, return_inverse=True)
+        zelle_je_punkt = zelle_je_punkt.ravel()
+        cx = x0 + (zellen // ny + 0.5) * g
+        cy = y0 + (zellen % ny + 0.5) * g
+        halbe_diagonale = g * np.sqrt(0.5)
+
+        # Obere Schranke je Zelle: größter Eckenabstand zum Segment des nächsten Mittelpunkts
+        abstand_mitte, naechstes = self.baum.query(np.column_stack([cx, cy]), k=1)
+        start, ende = self.start[naechstes], self.ende[naechstes]
+        schranke = np.max([
+            self._punkt_segment_abstand(cx + sx * g / 2, cy + sy * g / 2, start, ende)
+            for sx in (-1, 1) for sy in (-1, 1)
+        ], axis=0)
+
+        # Untere Schranke je Zelle: Zellen jenseits von max_abstand werden nicht gemessen
+        if max_abstand is not None:
+            nah = abstand_mitte - self.halbe_laenge - halbe_diagonale < max_abstand
+        else:
+            nah = np.ones(len(zellen), dtype=bool)
+        nahe_zellen = np.flatnonzero(nah)
+
+        # Kandidaten je Zelle: Segmente, die einem Punkt der Zelle näher als die Schranke sein können
+        listen = self.baum.query_ball_point(
+            np.column_stack([cx[nah], cy[nah]]), (schranke + halbe_diagonale + self.halbe_laenge)[nah], return_sorted=False
+        )
+        anzahl = np.fromiter(map(len, listen), np.int64, len(listen))
+        kandidat = np.fromiter((i for liste in listen for i in liste), np.int64, anzahl.sum())
+        kandidat_zelle = np.repeat(nahe_zellen, anzahl)
+        d = self._punkt_segment_abstand(
+            cx[kandidat_zelle], cy[kandidat_zelle], self.start[kandidat], self.ende[kandidat]
+        )
+        behalten = d - halbe_diagonale <= schranke[kandidat_zelle]
+        kandidat = kandidat[behalten]
+        anzahl = np.bincount(kandidat_zelle[behalten], minlength=len(zellen))
+        versatz = np.cumsum(anzahl) - anzahl
+
+        # Punkte nach Zelle sortiert blockweise gegen ihre Kandidaten messen
+        ergebnis = np.full(len(px), np.inf)
+        reihenfolge = np.argsort(zelle_je_punkt, kind="stable")
+        reihenfolge = reihenfolge[nah[zelle_je_punkt[reihenfolge]]]
+        if len(reihenfolge) == 0:
+            abstand[gueltig] = ergebnis
+            return abstand
+        paare = np.cumsum(anzahl[zelle_je_punkt[reihenfolge]])
+        grenzen = np.unique(np.r_[np.searchsorted(paare, np.arange(blockgroesse, paare[-1], blockgroesse)), len(paare)])
+        anfang = 0
+        for grenze in grenzen:
+            if grenze <= anfang:
+                continue
+            idx = reihenfolge[anfang:grenze]
+            n = anzahl[zelle_je_punkt[idx]]
+            erste = np.cumsum(n) - n
+            punkt = np.repeat(idx, n)
+            segment = kandidat[np.repeat(versatz[zelle_je_punkt[idx]] - erste, n) + np.arange(n.sum())]
+            d = self._punkt_segment_abstand(px[punkt], py[punkt], self.start[segment], self.ende[segment])
+            ergebnis[idx] = np.minimum.reduceat(d, erste)
+            anfang = grenze
+
+        abstand[gueltig] = ergebnis
+        return abstand
+
+    @staticmethod
+    def _punkt_segment_abstand(px, py, start, ende):
+        ax, ay = start[:, 0], start[:, 1]
+        dx, dy = ende[:, 0] - ax, ende[:, 1] - ay
+        laenge2 = dx * dx + dy * dy
+        t = ((px - ax) * dx + (py - ay) * dy) / np.where(laenge2 > 0, laenge2, 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+class MaskenRaster:
+    """Bitmap einer Maske: jede Zelle ist außen, innen oder wird vom Polygonrand berührt."""
+
+    AUSSEN = 0
+    INNEN = 1
+    RAND = 2
+
+    # Obergrenze für die Anzahl der Zellen, darüber wird exakt gerechnet
+    MAX_ZELLEN = 25_000_000
+
+    def __init__(self, x0, y0, zellgroesse, zellen):
+        self.x0 = x0
+        self.y0 = y0
+        self.zellgroesse = zellgroesse
+        self.zellen = zellen
+
+    @classmethod
+    def erstellen(cls, maske, zellgroesse):
+        if len(maske) == 0:
+            return None
+
+        xmin, ymin = maske.bounds[:, 0].min(), maske.bounds[:, 1].min()
+        xmax, ymax = maske.bounds[:, 2].max(), maske.bounds[:, 3].max()
+
+        # Eine Zelle Rand um die Maske, damit die Dilatation nicht abgeschnitten wird
+        x0 = xmin - zellgroesse
+        y0 = ymin - zellgroesse
+        nx = int(np.ceil((xmax - x0) / zellgroesse)) + 2
+        ny = int(np.ceil((ymax - y0) / zellgroesse)) + 2
+        if nx * ny > cls.MAX_ZELLEN:
+            return None
+
+        zellen = np.full((ny, nx), cls.AUSSEN, dtype=np.int8)
+        raster = cls(x0, y0, zellgroesse, zellen)
+
+        # 1. Randzellen: Polygonränder mit halber Zellgröße abtasten und um eine Zelle dilatieren.
+        #    Jeder Randpunkt liegt höchstens eine Viertelzelle neben einem Abtastpunkt, damit ist
+        #    jede vom Rand berührte Zelle sicher markiert.
+        start, ende = maske.segmente()
+
+        laenge = np.hypot(*(ende - start).T)
+        anzahl = np.ceil(laenge / (zellgroesse / 2)).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(start)), anzahl)
+        versatz = np.arange(len(segment)) - np.repeat(np.cumsum(anzahl) - anzahl, anzahl)
+        t = versatz / np.repeat(np.maximum(anzahl - 1, 1), anzahl)
+        proben = start[segment] + (ende[segment] - start[segment]) * t[:, None]
+
+        ix, iy = raster._zellindex(proben[:, 0], proben[:, 1])
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                zellen[np.clip(iy + dy, 0, ny - 1), np.clip(ix + dx, 0, nx - 1)] = cls.RAND
+
+        # 2. Alle übrigen Zellen liegen vollständig innen oder außen: Zellmittelpunkt prüfen
+        for polygon, (pxmin, pymin, pxmax, pymax) in zip(maske.polygone, maske.bounds):
+            ix0, iy0 = raster._zellindex(pxmin, pymin)
+            ix1, iy1 = raster._zellindex(pxmax, pymax)
+            block = zellen[iy0:iy1 + 1, ix0:ix1 + 1]
+            offen = block == cls.AUSSEN
+            if not offen.any():
+                continue
+            jy, jx = np.nonzero(offen)
+            cx = x0 + (ix0 + jx + 0.5) * zellgroesse
+            cy = y0 + (iy0 + jy + 0.5) * zellgroesse
+            innen = shapely.contains_xy(polygon, cx, cy)
+            block[jy[innen], jx[innen]] = cls.INNEN
+
+        return raster
+
+    def _zellindex(self, x, y):
+        ix = np.floor((np.asarray(x) - self.x0) / self.zellgroesse).astype(np.int64)
+        iy = np.floor((np.asarray(y) - self.y0) / self.zellgroesse).astype(np.int64)
+        return ix, iy
+
+    def klassifiziere(self, x, y):
+        """Gibt für jeden Punkt die Klasse seiner Zelle zurück (AUSSEN, INNEN oder RAND)."""
+        ny, nx = self.zellen.shape
+        klassen = np.full(len(x), self.AUSSEN, dtype=np.int8)
+
+        gueltig = np.isfinite(x) & np.isfinite(y)
+        ix, iy = self._zellindex(x[gueltig], y[gueltig])
+        im_raster = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+
+        pos = np.flatnonzero(gueltig)[im_raster]
+        klassen[pos] = self.zellen[iy[im_raster], ix[im_raster]]
+        return klassen
+
+
+class StapelZuschnittTask(QgsTask):
+    """Schneidet einen Punktlayer im Hintergrund mit vorbereiteten Masken zu und schreibt die
+    verbleibenden Punkte in einem Durchgang in eine neue Shapefile.
+
+    quelle ist eine QgsVectorLayerFeatureSource; Felder, Geometrietyp und KBS werden im Haupt-Thread
+    vom Layer übernommen. Nach Abschluss oder Abbruch wird fertig(task, erfolgreich) im Haupt-Thread
+    aufgerufen; bei einem Fehler steht die Meldung in task.fehler."""
+
+    def __init__(self, layer_name, quelle, fields, wkb_type, crs, masken, zellgroesse, ziel_pfad, fertig):
+        super().__init__(f"Zuschnitt {layer_name}", QgsTask.CanCancel)
+        self.layer_name = layer_name
+        self.quelle = quelle
+        self.fields = fields
+        self.wkb_type = wkb_type
+        self.crs = crs
+        self.masken = masken
+        self.zellgroesse = zellgroesse
+        self.ziel_pfad = ziel_pfad
+        self.transform_context = QgsProject.instance().transformContext()
+        self.fertig = fertig
+
+        # Ergebnis
+        self.anzahl_punkte = 0
+        self.entfernt = []
+        self.fehler = None
+
+    def run(self):
+        punkte = PunktKoordinaten(self.quelle, feedback=self)
+        if self.isCanceled():
+            return False
+        self.setProgress(30)
+
+        loeschen, self.entfernt = zu_loeschende_punkte(punkte, self.masken, self.zellgroesse)
+        self.anzahl_punkte = len(punkte)
+        if loeschen.all():
+            self.fehler = "Alle Punkte würden gelöscht, es wurde keine Datei geschrieben."
+            return False
+        self.setProgress(50)
+
+        # Nur die verbleibenden Punkte in einem Durchgang schreiben
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "ESRI Shapefile"
+        options.fileEncoding = "UTF-8"
+        writer = QgsVectorFileWriter.create(
+            self.ziel_pfad, self.fields, self.wkb_type, self.crs, self.transform_context, options
+        )
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            self.fehler = writer.errorMessage()
+            return False
+
+        request = QgsFeatureRequest().setFilterFids(punkte.fids[~loeschen].tolist())
+        for feature in self.quelle.getFeatures(request):
+            if self.isCanceled():
+                break
+            writer.addFeature(feature)
+
+        # Datei schließen
+        del writer
+        return not self.isCanceled()
+
+    def finished(self, result):
+        self.fertig(self, result)
+
+
+class MaskenCache:
+    """Zwischenspeicher für vorbereitete Masken über mehrere Zuschnitte hinweg.
+
+    Schlüssel ist (Layer-ID, Ziel-KBS, Bearbeitungsstand). Der Bearbeitungsstand wird bei jeder
+    Änderung am Masken-Layer hochgezählt; dabei und beim Entfernen des Layers aus dem Projekt
+    werden die zugehörigen Einträge verworfen. Welche Polygone sich geändert haben, ermittelt der
+    ZuschnittZustand durch Vergleich der alten mit der neuen Maske."""
+
+    def __init__(self):
+        self._eintraege = {}
+        self._generation = {}
+        self._verbindungen = {}
+
+        QgsProject.instance().layersWillBeRemoved.connect(self._layer_entfernt)
+        QgsProject.instance().cleared.connect(self.leeren)
+
+    def maske(self, masken_layer, ziel_crs):
+        """Gibt die vorbereitete Maske für masken_layer im ziel_crs zurück (aus dem Cache oder neu erstellt).
+        Für Linien-Layer ist das eine LinienMaske, sonst eine ZuschnittMaske."""
+        layer_id = masken_layer.id()
+        self._beobachten(masken_layer)
+
+        key = (layer_id, ziel_crs.authid() or ziel_crs.toWkt(), self._generation[layer_id])
+        maske = self._eintraege.get(key)
+        if maske is None:
+            if QgsWkbTypes.geometryType(masken_layer.wkbType()) == QgsWkbTypes.LineGeometry:
+                maske = LinienMaske(masken_layer, ziel_crs)
+            else:
+                maske = ZuschnittMaske(masken_layer, ziel_crs)
+            self._eintraege[key] = maske
+        return maske
+
+    def _beobachten(self, masken_layer):
+        """Verbindet die Änderungssignale des Masken-Layers einmalig mit dem Cache."""
+        layer_id = masken_layer.id()
+        if layer_id in self._verbindungen:
+            return
+
+        self._generation[layer_id] = 0
+        slot = partial(self._verwerfen, layer_id)
+        signale = [
+            masken_layer.geometryChanged, masken_layer.featureAdded, masken_layer.featureDeleted,
+            masken_layer.layerModified, masken_layer.dataChanged, masken_layer.crsChanged,
+        ]
+        for signal in signale:
+            signal.connect(slot)
+        self._verbindungen[layer_id] = (signale, slot)
+
+    def _verwerfen(self, layer_id, *args):
+        """Erhöht den Bearbeitungsstand des Layers und entfernt seine Einträge."""
+        self._generation[layer_id] = self._generation.get(layer_id, 0) + 1
+        self._eintraege = {key: maske for key, maske in self._eintraege.items() if key[0] != layer_id}
+
+    def _layer_entfernt(self, layer_ids):
+        for layer_id in layer_ids:
+            self._verwerfen(layer_id)
+            self._trennen(layer_id)
+            self._generation.pop(layer_id, None)
+
+    def _trennen(self, layer_id):
+        signale, slot = self._verbindungen.pop(layer_id, ([], None))
+        for signal in signale:
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                # Layer wurde bereits gelöscht
+                pass
+
+    def leeren(self):
+        """Verwirft alle Einträge und trennt alle Signalverbindungen."""
+        for layer_id in list(self._verbindungen):
+            self._trennen(layer_id)
+        self._eintraege = {}
+        self._generation = {}
+
+    def entladen(self):
+        """Trennt den Cache vom Projekt (beim Entladen des Plugins)."""
+        self.leeren()
+        try:
+            QgsProject.instance().layersWillBeRemoved.disconnect(self._layer_entfernt)
+            QgsProject.instance().cleared.disconnect(self.leeren)
+        except (TypeError, RuntimeError):
+            pass
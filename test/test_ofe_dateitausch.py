@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Tests für den Austausch des Shapefile-Dateisatzes beim Abschließen des Filtervorgangs.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ofe_filter.ofe_dateitausch import dateisatz_tauschen
+
+ALT = ['.shp', '.shx', '.dbf', '.prj', '.qpj', '.shp.xml', '.qix']
+NEU = ['.shp', '.shx', '.dbf', '.prj', '.cpg']
+
+
+def schreiben(basis, endungen, inhalt):
+    for ext in endungen:
+        with open(basis + ext, 'w') as datei:
+            datei.write(inhalt + ext)
+
+
+def lesen(ordner):
+    """Alle Dateien unterhalb von ordner als {relativer Pfad: Inhalt}."""
+    dateien = {}
+    for wurzel, _, namen in os.walk(ordner):
+        for name in namen:
+            pfad = os.path.join(wurzel, name)
+            with open(pfad) as datei:
+                dateien[os.path.relpath(pfad, ordner)] = datei.read()
+    return dateien
+
+
+class DateisatzTauschenTest(unittest.TestCase):
+    """Der Dateisatz wird vollständig ersetzt oder bleibt vollständig erhalten."""
+
+    def setUp(self):
+        self.ordner = tempfile.mkdtemp()
+        self.basis = os.path.join(self.ordner, 'Filter_punkte')
+        os.mkdir(os.path.join(self.ordner, 'neu'))
+        self.neu_basis = os.path.join(self.ordner, 'neu', 'Filter_punkte')
+        schreiben(self.basis, ALT, 'alt')
+        schreiben(self.neu_basis, NEU, 'neu')
+
+    def tearDown(self):
+        shutil.rmtree(self.ordner)
+
+    def test_austausch(self):
+        """Danach liegt genau der neue Satz unter basis; veraltete Begleitdateien und die Sicherung sind entfernt."""
+        dateisatz_tauschen(self.neu_basis, self.basis)
+        self.assertEqual(lesen(self.ordner), {'Filter_punkte' + ext: 'neu' + ext for ext in NEU})
+
+    def test_fehler_mitten_im_austausch(self):
+        """Ein OSError bei jeder einzelnen Umbenennung stellt alle Originaldateien und den neuen Satz wieder her."""
+        vorher = lesen(self.ordner)
+        os_replace = os.replace
+        for fehlschlag in range(len(ALT) + len(NEU)):
+            aufrufe = []
+
+            def umbenennen(quelle, ziel):
+                aufrufe.append(quelle)
+                if len(aufrufe) == fehlschlag + 1:
+                    raise OSError('Datei gesperrt')
+                os_replace(quelle, ziel)
+
+            with self.subTest(fehlschlag=fehlschlag):
+                with mock.patch('os.replace', side_effect=umbenennen):
+                    with self.assertRaisesRegex(OSError, 'Datei gesperrt'):
+                        dateisatz_tauschen(self.neu_basis, self.basis)
+                self.assertEqual(lesen(self.ordner), vorher)
+                self.assertEqual(sorted(os.listdir(self.ordner)), sorted(['neu'] + ['Filter_punkte' + ext for ext in ALT]))
+
+    def test_wiederherstellung_fehlgeschlagen(self):
+        """Lässt sich eine Sicherung nicht zurückholen, nennt der Fehler das Sicherungsverzeichnis mit der Datei."""
+        os_replace = os.replace
+        aufrufe = []
+
+        def umbenennen(quelle, ziel):
+            aufrufe.append(quelle)
+            if len(aufrufe) == len(ALT) + 2 or (ziel == self.basis + '.dbf' and '.ofe_sicherung_' in quelle):
+                raise OSError('Datei gesperrt')
+            os_replace(quelle, ziel)
+
+        with mock.patch('os.replace', side_effect=umbenennen):
+            with self.assertRaisesRegex(OSError, r'\(\.dbf\) liegen noch in .*\.ofe_sicherung_'):
+                dateisatz_tauschen(self.neu_basis, self.basis)
+        sicherung = [name for name in os.listdir(self.ordner) if name.startswith('.ofe_sicherung_')]
+        self.assertEqual(os.listdir(os.path.join(self.ordner, sicherung[0])), ['Filter_punkte.dbf'])
+
+
+if __name__ == "__main__":
+    unittest.main()
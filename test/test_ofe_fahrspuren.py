@@ -0,0 +1,113 @@
+# coding=utf-8
+"""Tests für die Fahrspuren des Hampel-Filters gegen die Schleifen des Überlappungsfilters.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ofe_filter.ofe_fahrspuren import MIN_WERTE, fahrspuren, laufender_median_mad, unix_zeitstempel
+
+
+def process_timestamps_schleife(zeit, max_timedelta, attribut=None, schwelle=None):
+    """Spurnummern und Abstände wie die ursprünglichen Schleifen in UeberlappungFilter.process_timestamps."""
+    dauer = [None] * len(zeit)
+    for u in range(1, len(zeit)):
+        if pd.notna(zeit[u]) and pd.notna(zeit[u - 1]):
+            dauer[u] = zeit[u] - zeit[u - 1]
+        else:
+            dauer[u] = max_timedelta + 1
+    gueltige = pd.Series(dauer, dtype=float).dropna()
+    median = gueltige.median() if len(gueltige) > 0 else max_timedelta
+    dauer = [median if d is None else d for d in dauer]
+    cut_off = max_timedelta + median
+
+    wechsel = [0] * len(zeit)
+    if attribut is not None:
+        for i in range(1, len(zeit)):
+            try:
+                if abs(float(attribut[i]) - float(attribut[i - 1])) > schwelle:
+                    wechsel[i] = 1
+            except (ValueError, TypeError):
+                pass
+
+    nr = 1
+    spur = []
+    for v in range(len(zeit)):
+        if v > 0 and (dauer[v] > cut_off or wechsel[v] == 1):
+            nr += 1
+        spur.append(nr)
+    return np.array(spur), np.array(dauer, dtype=float)
+
+
+def beispielzeit(rng, anzahl=3000):
+    """Zeitstempel im Sekundentakt mit Wendezeiten, fehlenden Werten und einem Rücksprung."""
+    schritt = np.where(rng.random(anzahl) < 0.01, rng.uniform(20, 60, anzahl), rng.uniform(0.9, 1.1, anzahl))
+    zeit = np.cumsum(schritt)
+    zeit[rng.random(anzahl) < 0.01] = np.nan
+    zeit[1500] = zeit[1499] - 100
+    return zeit
+
+
+class FahrspurenTest(unittest.TestCase):
+    """fahrspuren ergibt dieselben Spuren wie process_timestamps; die gleitenden Fenster bleiben in ihrer Spur."""
+
+    def test_wie_process_timestamps(self):
+        """Spurnummern und Abstände entsprechen den Schleifen, mit und ohne Spurwechsel-Attribut."""
+        rng = np.random.default_rng(1)
+        zeit = beispielzeit(rng)
+        attribut = np.round(rng.normal(0, 1, len(zeit)), 1)
+        attribut[::50] += 10
+        attribut[7] = np.nan
+        for max_timedelta, mit_attribut in ((5.0, False), (5.0, True), (0.05, False), (100.0, True)):
+            with self.subTest(max_timedelta=max_timedelta, mit_attribut=mit_attribut):
+                spur, dauer = fahrspuren(zeit, max_timedelta, attribut if mit_attribut else None, 3.0 if mit_attribut else None)
+                referenz_spur, referenz_dauer = process_timestamps_schleife(
+                    zeit, max_timedelta, attribut if mit_attribut else None, 3.0)
+                np.testing.assert_array_equal(spur, referenz_spur)
+                np.testing.assert_allclose(dauer, referenz_dauer)
+
+    def test_kurze_folgen(self):
+        """Ein einzelner Punkt bildet eine Spur; zwei Punkte mit Lücke werden nicht getrennt (Median = Lücke)."""
+        spur, _ = fahrspuren(np.array([5.0]), 2.0)
+        np.testing.assert_array_equal(spur, [1])
+        spur, _ = fahrspuren(np.array([0.0, 100.0]), 2.0)
+        np.testing.assert_array_equal(spur, process_timestamps_schleife(np.array([0.0, 100.0]), 2.0)[0])
+
+    def test_laufender_median_mad(self):
+        """Median und MAD im Fenster entsprechen np.median über die Punkte derselben Spur im Fenster."""
+        rng = np.random.default_rng(2)
+        anzahl = 2000
+        werte = rng.normal(size=anzahl)
+        werte[rng.random(anzahl) < 0.1] = np.nan
+        spur = np.cumsum(rng.random(anzahl) < 0.02) + 1
+        for halbe_breite, blockgroesse in ((1, 65536), (3, 65536), (5, 97)):
+            with self.subTest(halbe_breite=halbe_breite, blockgroesse=blockgroesse):
+                median, mad = laufender_median_mad(werte, spur, halbe_breite, blockgroesse)
+                for i in range(anzahl):
+                    fenster = np.arange(max(i - halbe_breite, 0), min(i + halbe_breite + 1, anzahl))
+                    fenster_werte = werte[fenster[spur[fenster] == spur[i]]]
+                    fenster_werte = fenster_werte[~np.isnan(fenster_werte)]
+                    if len(fenster_werte) < MIN_WERTE:
+                        self.assertTrue(np.isnan(median[i]) and np.isnan(mad[i]))
+                        continue
+                    referenz = np.median(fenster_werte)
+                    self.assertAlmostEqual(median[i], referenz)
+                    self.assertAlmostEqual(mad[i], np.median(np.abs(fenster_werte - referenz)))
+
+    def test_unix_zeitstempel(self):
+        """Zahlen, Texte in beiden Schreibweisen, reine Uhrzeiten (01.01.0000) und NULL werden gelesen."""
+        roh = [1700000000, None, '2023-11-14 22:13:20', '14.11.2023 22:13:21', '01.01.0000 00:00:05', 'kein Datum']
+        zeit = unix_zeitstempel(roh)
+        np.testing.assert_allclose(zeit, [1700000000, np.nan, 1700000000, 1700000001, 5, np.nan])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# coding=utf-8
+"""Tests für die gefilterte Basis des SD-Filters: nachgeführte Summen gegen Neuberechnung.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ofe_filter.ofe_filterauswahl import GefilterteBasis
+
+
+def beispielwerte(rng, anzahl=20001):
+    """Normalverteilte Werte mit großem Versatz, einigen Ausreißern und NULL (NaN)."""
+    werte = rng.normal(5000, 10, anzahl)
+    werte[rng.choice(anzahl, 200, replace=False)] += rng.normal(0, 200, 200)
+    werte[rng.choice(anzahl, 500, replace=False)] = np.nan
+    return werte, np.isnan(werte)
+
+
+def sigma_clipping_naiv(werte, multiplikator, max_runden):
+    """Sigma-Clipping mit Neuberechnung von np.mean und np.std über die verbliebenen Werte in jeder Runde."""
+    raus = np.isnan(werte)
+    entfernt = []
+    for _ in range(max_runden):
+        mittel, sd = np.mean(werte[~raus]), np.std(werte[~raus])
+        with np.errstate(invalid='ignore'):
+            neu = ~raus & ((werte < mittel - multiplikator * sd) | (werte > mittel + multiplikator * sd))
+        if not np.any(neu):
+            break
+        raus |= neu
+        entfernt.append(int(np.count_nonzero(neu)))
+    return raus & ~np.isnan(werte), entfernt
+
+
+class GefilterteBasisTest(unittest.TestCase):
+    """Die nachgeführten Summen entsprechen einer Neuberechnung über die gefilterte Basis."""
+
+    def test_statistik_wie_numpy(self):
+        """Mittelwert und SD entsprechen np.mean und np.std über alle Nicht-NULL-Punkte außerhalb der Maske."""
+        werte, null = beispielwerte(np.random.default_rng(1))
+        maske = np.random.default_rng(2).random(len(werte)) < 0.3
+        basis = GefilterteBasis(werte, null, np.packbits(maske))
+        auswahl = werte[~null & ~maske]
+        np.testing.assert_allclose(basis.statistik(), (np.mean(auswahl), np.std(auswahl)), rtol=1e-9)
+
+    def test_nachfuehren_wie_neuberechnung(self):
+        """Nach mehreren Wechseln der Ausschlussmaske (hinein und hinaus) stimmen die Summen weiter."""
+        rng = np.random.default_rng(3)
+        werte, null = beispielwerte(rng)
+        basis = GefilterteBasis(werte, null, np.packbits(np.zeros(len(werte), dtype=bool)))
+        for _ in range(5):
+            maske = rng.random(len(werte)) < rng.uniform(0, 0.5)
+            basis.nachfuehren(np.packbits(maske))
+            auswahl = werte[~null & ~maske]
+            self.assertEqual(basis.anzahl, len(auswahl))
+            np.testing.assert_allclose(basis.statistik(), (np.mean(auswahl), np.std(auswahl)), rtol=1e-9)
+
+    def test_sigma_clipping(self):
+        """Iteratives Sigma-Clipping mit nachgeführter Basis (wie OFEFilter.sd_clipping) entfernt in jeder Runde
+        dieselben Punkte wie die naive Neuberechnung."""
+        werte, null = beispielwerte(np.random.default_rng(4))
+        referenz, entfernt_referenz = sigma_clipping_naiv(werte, 2.5, 20)
+
+        raus = np.zeros(len(werte), dtype=bool)
+        gepackt = np.packbits(raus)
+        basis = GefilterteBasis(werte, null, gepackt)
+        entfernt = []
+        for _ in range(20):
+            mittel, sd = basis.statistik()
+            with np.errstate(invalid='ignore'):
+                neu = np.flatnonzero(~raus & ((werte < mittel - 2.5 * sd) | (werte > mittel + 2.5 * sd)))
+            if len(neu) == 0:
+                break
+            raus[neu] = True
+            entfernt.append(len(neu))
+            gepackt = gepackt.copy()
+            np.bitwise_or.at(gepackt, neu // 8, (0x80 >> (neu % 8)).astype(np.uint8))
+            basis.nachfuehren(gepackt)
+
+        self.assertGreater(len(entfernt_referenz), 1)
+        self.assertEqual(entfernt, entfernt_referenz)
+        np.testing.assert_array_equal(raus, referenz)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# coding=utf-8
+"""Tests für gestreamte Filter und Histogramme großer Layer: kein Laden der Spalte in den Spalten-Cache.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import types
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ofe_filter.ofe_ergebniscache import ErgebnisCache
+from ofe_filter.ofe_filter import OFEFilter
+from ofe_filter.ofe_filterauswahl import FilterAuswahl
+
+
+class Signal(object):
+    """Signal ohne Qt: connect und disconnect genügen den Caches."""
+
+    def connect(self, slot):
+        pass
+
+    def disconnect(self, slot):
+        pass
+
+
+class Feature(object):
+
+    def __init__(self, fid, wert):
+        self._fid = fid
+        self._wert = wert
+
+    def id(self):
+        return self._fid
+
+    def __getitem__(self, index):
+        return self._wert
+
+
+class Felder(object):
+
+    def indexOf(self, name):
+        return 0 if name == 'ertrag' else -1
+
+
+class Layer(object):
+    """Punktlayer mit einer Spalte 'ertrag' und nicht fortlaufenden Feature-IDs."""
+
+    def __init__(self, werte):
+        self.werte = werte
+        for name in ('attributeValueChanged', 'featureAdded', 'featureDeleted', 'attributeAdded',
+                     'attributeDeleted', 'dataChanged', 'afterCommitChanges', 'afterRollBack'):
+            setattr(self, name, Signal())
+
+    def id(self):
+        return 'punkte'
+
+    def fields(self):
+        return Felder()
+
+    def featureCount(self):
+        return len(self.werte)
+
+    def getFeatures(self, request=None):
+        return (Feature(3 * i + 1, wert) for i, wert in enumerate(self.werte))
+
+
+class Eingabe(object):
+    """Steuerelement des Dialogs mit festem Wert."""
+
+    def __init__(self, wert):
+        self.wert = wert
+
+    def currentText(self):
+        return self.wert
+
+    currentIndex = value = currentText
+
+
+def beispiel_plugin(werte, verfahren, seite):
+    """Plugin ohne QGIS-Oberfläche, das jeden Layer als groß behandelt (gestreamt)."""
+    plugin = OFEFilter.__new__(OFEFilter)
+    plugin.spalten_cache = None
+    plugin.sd_basen = {}
+    plugin.ergebnis_cache = ErgebnisCache(64 * 1024 * 1024)
+    plugin.skizze_ab_punkten = 0
+    plugin.skizze_k = 200
+    plugin.auswahl_tabelle = pd.DataFrame({'ertrag': [None] * 10})
+    plugin.dlg = types.SimpleNamespace(
+        columnComboBox2=Eingabe('ertrag'), comboBox_robust=Eingabe(verfahren), comboBox_robust_seite=Eingabe(seite),
+        doubleSpinBox_robust_k=Eingabe(1.5), doubleSpinBox_robust_p_unten=Eingabe(5.0),
+        doubleSpinBox_robust_p_oben=Eingabe(95.0), comboBox_Gruppe=Eingabe(''), trend_einstellung=lambda: None,
+    )
+    layer = Layer(werte)
+    plugin.filter_auswahl = FilterAuswahl(plugin.spalten(layer).feature_ids())
+    return plugin, layer
+
+
+def beispielwerte(rng, anzahl=150000):
+    """Schiefe Werte mit NULL (None) über mehr als zwei Blöcke von spalte_in_bloecken."""
+    werte = rng.lognormal(3, 1, anzahl)
+    return [None if zufall < 0.05 else float(wert) for zufall, wert in zip(rng.random(anzahl), werte)]
+
+
+class GestreamtTest(unittest.TestCase):
+    """Robuste Filter und Histogramme großer Layer laufen blockweise und lassen den Spalten-Cache leer."""
+
+    def test_filter_ohne_spalten_cache(self):
+        """Der Filter speichert die Feature-IDs außerhalb der Skizzen-Grenzen, ohne die Spalte zu laden."""
+        werte = beispielwerte(np.random.default_rng(1))
+        roh = np.array([np.nan if wert is None else wert for wert in werte])
+        for verfahren, seite in ((1, 0), (2, 0), (2, 1), (2, 2)):
+            with self.subTest(verfahren=verfahren, seite=seite):
+                plugin, layer = beispiel_plugin(werte, verfahren, seite)
+                untergrenze, obergrenze = plugin.filterfunction_robust(layer)
+
+                treffer = [(roh < untergrenze) | (roh > obergrenze), roh < untergrenze, roh > obergrenze][seite]
+                fids = plugin.spalten(layer).feature_ids()
+                np.testing.assert_array_equal(plugin.filter_auswahl.maske_fuer(fids), treffer)
+                self.assertEqual(plugin.auswahl_tabelle.at[3 + verfahren, 'ertrag'], np.count_nonzero(treffer))
+                self.assertEqual(plugin.spalten_cache._spalten, {})
+
+    def test_histogramm_ohne_spalten_cache(self):
+        """Histogramm und Kenngrößen aus dem blockweisen Durchgang entsprechen NumPy über die ganze Spalte."""
+        werte = beispielwerte(np.random.default_rng(2))
+        roh = np.array([np.nan if wert is None else wert for wert in werte])
+        plugin, layer = beispiel_plugin(werte, 2, 0)
+        plugin.filterfunction_robust(layer)
+        ausgeschlossen = plugin.filter_auswahl.maske_fuer(plugin.spalten(layer).feature_ids())
+
+        for maske in (None, ausgeschlossen):
+            with self.subTest(gefiltert=maske is not None):
+                counts, bins, kenngroessen = plugin.histogramm(layer, 'ertrag', maske)
+                auswahl = roh[~np.isnan(roh) & (True if maske is None else ~maske)]
+                np.testing.assert_allclose(bins, np.histogram_bin_edges(roh[~np.isnan(roh)], bins=50))
+                np.testing.assert_array_equal(counts, np.histogram(auswahl, bins=bins)[0])
+                np.testing.assert_allclose(kenngroessen, (np.mean(auswahl), np.std(auswahl), np.min(auswahl),
+                                                          np.max(auswahl), len(auswahl)))
+        self.assertEqual(plugin.spalten_cache._spalten, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
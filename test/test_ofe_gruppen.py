@@ -0,0 +1,87 @@
+# coding=utf-8
+"""Tests für die Kennwerte je Gruppe: vektorisierte Segmente gegen eine Schleife über die Gruppen.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ofe_filter.ofe_gruppen import (
+    gruppen_median_mad, gruppen_mittel_sd, gruppen_quantile, gruppen_segmente, gruppen_sortieren, je_punkt
+)
+
+
+ANZAHL_GRUPPEN = 12
+
+
+def beispiel(rng, anzahl=30000):
+    """Werte mit Bindungen und Gruppencodes; Gruppe 3 bleibt leer, Gruppe 7 hat nur einen Wert."""
+    codes = rng.integers(0, ANZAHL_GRUPPEN, anzahl)
+    codes[codes == 3] = 4
+    codes[codes == 7] = 8
+    codes[0] = 7
+    werte = np.round(rng.normal(codes * 10, 1 + codes), 1)
+    return werte, codes
+
+
+class GruppenTest(unittest.TestCase):
+    """Die Kennwerte je Gruppe entsprechen NumPy auf den Werten jeder einzelnen Gruppe."""
+
+    def test_mittel_sd(self):
+        """gruppen_mittel_sd entspricht np.mean und np.std je Gruppe, leere Gruppen sind NaN."""
+        werte, codes = beispiel(np.random.default_rng(1))
+        mittel, sd = gruppen_mittel_sd(werte, codes, ANZAHL_GRUPPEN)
+        for gruppe in range(ANZAHL_GRUPPEN):
+            with self.subTest(gruppe=gruppe):
+                auswahl = werte[codes == gruppe]
+                if len(auswahl) == 0:
+                    self.assertTrue(np.isnan(mittel[gruppe]) and np.isnan(sd[gruppe]))
+                else:
+                    self.assertAlmostEqual(mittel[gruppe], np.mean(auswahl))
+                    self.assertAlmostEqual(sd[gruppe], np.std(auswahl))
+
+    def test_quantile(self):
+        """gruppen_quantile entspricht np.quantile je Gruppe."""
+        werte, codes = beispiel(np.random.default_rng(2))
+        anteile = [0, 0.01, 0.25, 0.5, 0.75, 0.99, 1]
+        _, werte_sortiert, codes_sortiert = gruppen_sortieren(werte, codes)
+        start, anzahl = gruppen_segmente(codes_sortiert, ANZAHL_GRUPPEN)
+        ergebnis = gruppen_quantile(werte_sortiert, start, anzahl, anteile)
+        for gruppe in range(ANZAHL_GRUPPEN):
+            with self.subTest(gruppe=gruppe):
+                auswahl = werte[codes == gruppe]
+                if len(auswahl) == 0:
+                    self.assertTrue(np.all(np.isnan(ergebnis[gruppe])))
+                else:
+                    np.testing.assert_allclose(ergebnis[gruppe], np.quantile(auswahl, anteile))
+
+    def test_median_mad(self):
+        """gruppen_median_mad entspricht Median und MAD nach np.median je Gruppe, auch mit vorhandener Sortierung."""
+        werte, codes = beispiel(np.random.default_rng(3))
+        sortierung = gruppen_sortieren(werte, codes)
+        for median, mad in (gruppen_median_mad(werte, codes, ANZAHL_GRUPPEN),
+                            gruppen_median_mad(werte, codes, ANZAHL_GRUPPEN, sortierung)):
+            for gruppe in range(ANZAHL_GRUPPEN):
+                auswahl = werte[codes == gruppe]
+                if len(auswahl) == 0:
+                    self.assertTrue(np.isnan(median[gruppe]) and np.isnan(mad[gruppe]))
+                    continue
+                referenz = np.median(auswahl)
+                self.assertAlmostEqual(median[gruppe], referenz)
+                self.assertAlmostEqual(mad[gruppe], np.median(np.abs(auswahl - referenz)))
+
+    def test_je_punkt(self):
+        """je_punkt verteilt die Gruppenwerte auf die Punkte, Punkte ohne Gruppe (-1) erhalten NaN."""
+        gruppenwerte = np.array([1.5, 2.5, 3.5])
+        ergebnis = je_punkt(gruppenwerte, np.array([2, -1, 0, 1, -1]))
+        np.testing.assert_array_equal(ergebnis, [3.5, np.nan, 1.5, 2.5, np.nan])
+
+
+if __name__ == "__main__":
+    unittest.main()
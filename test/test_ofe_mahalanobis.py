@@ -0,0 +1,81 @@
+# coding=utf-8
+"""Tests für die Mahalanobis-Distanz und die robuste MCD-Schätzung.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+from scipy.stats import chi2
+
+from ofe_filter.ofe_mahalanobis import abstand_quadrat, grenzwert, mcd_schaetzen
+
+
+ZENTRUM = np.array([10.0, -5.0, 100.0])
+KOVARIANZ = np.array([[4.0, 1.5, 0.5], [1.5, 2.0, -0.3], [0.5, -0.3, 1.0]])
+
+
+def normalverteilt(rng, anzahl):
+    return rng.multivariate_normal(ZENTRUM, KOVARIANZ, anzahl)
+
+
+class MahalanobisTest(unittest.TestCase):
+    """Blockweise Distanzen entsprechen der Formel je Punkt; die MCD-Schätzung widersteht Ausreißern."""
+
+    def test_abstand_wie_formel(self):
+        """abstand_quadrat entspricht (x - m)' S^-1 (x - m) je Punkt, unabhängig von der Blockgröße; NULL ergibt NaN."""
+        daten = normalverteilt(np.random.default_rng(1), 5000)
+        daten[17, 1] = np.nan
+        inverse = np.linalg.inv(KOVARIANZ)
+        referenz = np.array([(zeile - ZENTRUM) @ inverse @ (zeile - ZENTRUM) for zeile in daten])
+        spalten = [daten[:, j] for j in range(3)]
+        for blockgroesse in (1, 777, 262144):
+            with self.subTest(blockgroesse=blockgroesse):
+                np.testing.assert_allclose(abstand_quadrat(spalten, ZENTRUM, KOVARIANZ, blockgroesse), referenz)
+        self.assertTrue(np.isnan(abstand_quadrat(spalten, ZENTRUM, KOVARIANZ)[17]))
+
+    def test_singulaere_kovarianz(self):
+        """Bei linear abhängigen Spalten liefert die Pseudoinverse weiterhin endliche Distanzen."""
+        rng = np.random.default_rng(2)
+        x = rng.normal(size=1000)
+        daten = np.column_stack([x, 2 * x])
+        kovarianz = np.cov(daten, rowvar=False)
+        d2 = abstand_quadrat([daten[:, 0], daten[:, 1]], daten.mean(axis=0), kovarianz)
+        self.assertTrue(np.all(np.isfinite(d2)))
+
+    def test_mcd_ohne_ausreisser(self):
+        """Ohne Ausreißer stimmt die konsistenzskalierte MCD-Schätzung mit Mittelwert und Kovarianz überein."""
+        daten = normalverteilt(np.random.default_rng(3), 20000)
+        zentrum, kovarianz = mcd_schaetzen(daten)
+        np.testing.assert_allclose(zentrum, daten.mean(axis=0), atol=0.05)
+        np.testing.assert_allclose(kovarianz, np.cov(daten, rowvar=False), atol=0.15)
+
+    def test_mcd_mit_ausreissern(self):
+        """Mit 15 % verschobenen Punkten bleibt die MCD-Schätzung beim sauberen Anteil, die klassische nicht."""
+        rng = np.random.default_rng(4)
+        sauber = normalverteilt(rng, 17000)
+        ausreisser = rng.multivariate_normal(ZENTRUM + [15, 15, -10], KOVARIANZ / 4, 3000)
+        daten = np.vstack([sauber, ausreisser])
+        zentrum, kovarianz = mcd_schaetzen(daten)
+        np.testing.assert_allclose(zentrum, ZENTRUM, atol=0.1)
+        np.testing.assert_allclose(kovarianz, KOVARIANZ, atol=0.3)
+        self.assertGreater(np.abs(daten.mean(axis=0) - ZENTRUM).max(), 1.0)
+
+        # Die Ausreißer liegen jenseits des 97,5-%-Quantils, vom sauberen Anteil nur etwa 2,5 %
+        d2 = abstand_quadrat([daten[:, j] for j in range(3)], zentrum, kovarianz)
+        grenze = grenzwert(0.975, 3)
+        self.assertGreater(np.mean(d2[17000:] > grenze), 0.99)
+        self.assertLess(np.mean(d2[:17000] > grenze), 0.04)
+
+    def test_grenzwert(self):
+        """grenzwert ist das Chi-Quadrat-Quantil mit einer Anzahl Freiheitsgrade gleich der Spaltenanzahl."""
+        self.assertAlmostEqual(grenzwert(0.975, 3), chi2.ppf(0.975, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# coding=utf-8
+"""Tests für das lokale Moran's I gegen eine Berechnung Punkt für Punkt.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.stats import norm
+
+from ofe_filter.ofe_moran import lokales_moran, moran_ausreisser, p_werte_analytisch, p_werte_permutation
+
+
+def beispiel(rng, anzahl=800, k=6):
+    """Zufällige Nachbarschaft mit k Nachbarn je Punkt, Werte mit NULL (NaN) und einem Hoch-Niedrig-Ausreißer."""
+    nachbarn = np.array([rng.choice(np.delete(np.arange(anzahl), i), k, replace=False) for i in range(anzahl)])
+    gewichte = csr_matrix((np.ones(anzahl * k), (np.repeat(np.arange(anzahl), k), nachbarn.ravel())), shape=(anzahl, anzahl))
+    werte = rng.normal(size=anzahl)
+    werte[rng.random(anzahl) < 0.05] = np.nan
+    werte[0] = 8.0
+    werte[nachbarn[0]] = -2.0
+    return gewichte, nachbarn, werte
+
+
+def lokales_moran_naiv(nachbarn, werte):
+    """I_i = z_i * Mittel der z_j über die Nachbarn mit Wert / m2, Punkt für Punkt."""
+    mit_wert = ~np.isnan(werte)
+    z = werte - np.mean(werte[mit_wert])
+    m2 = np.mean(z[mit_wert] ** 2)
+    lokal_i = np.full(len(werte), np.nan)
+    lag = np.full(len(werte), np.nan)
+    anzahl = np.zeros(len(werte), dtype=np.int64)
+    for i in range(len(werte)):
+        nachbar_z = z[nachbarn[i]][mit_wert[nachbarn[i]]]
+        anzahl[i] = len(nachbar_z)
+        if mit_wert[i] and len(nachbar_z):
+            lag[i] = nachbar_z.mean()
+            lokal_i[i] = z[i] * lag[i] / m2
+    return lokal_i, lag, anzahl
+
+
+class LokalesMoranTest(unittest.TestCase):
+    """Lokales I, p-Werte und Ausreißer entsprechen der Berechnung Punkt für Punkt."""
+
+    def test_lokales_i(self):
+        """lokales_moran entspricht der Formel mit zeilenstandardisierten Gewichten über die Nachbarn mit Wert."""
+        gewichte, nachbarn, werte = beispiel(np.random.default_rng(1))
+        lokal_i, z, lag, anzahl = lokales_moran(gewichte, werte)
+        referenz_i, referenz_lag, referenz_anzahl = lokales_moran_naiv(nachbarn, werte)
+        np.testing.assert_allclose(lokal_i, referenz_i, equal_nan=True)
+        np.testing.assert_allclose(lag, referenz_lag, equal_nan=True)
+        np.testing.assert_array_equal(anzahl, referenz_anzahl)
+        self.assertTrue(np.all(np.isnan(z[np.isnan(werte)])))
+
+    def test_p_analytisch(self):
+        """p_werte_analytisch entspricht der Varianz unter Randomisierung (Anselin 1995) aus den Gewichten je Zeile."""
+        gewichte, nachbarn, werte = beispiel(np.random.default_rng(2))
+        lokal_i, z, lag, anzahl = lokales_moran(gewichte, werte)
+        p = p_werte_analytisch(lokal_i, z, anzahl)
+
+        gueltig = ~np.isnan(z)
+        n = np.count_nonzero(gueltig)
+        m2 = np.mean(z[gueltig] ** 2)
+        b2 = np.mean(z[gueltig] ** 4) / m2 ** 2
+        erwartung = -1 / (n - 1)
+        for i in np.flatnonzero(~np.isnan(lokal_i)):
+            w = np.full(anzahl[i], 1 / anzahl[i])
+            w2 = np.sum(w ** 2)
+            kreuz = np.sum(w) ** 2 - w2
+            varianz = w2 * (n - b2) / (n - 1) + kreuz * (2 * b2 - n) / ((n - 1) * (n - 2)) - erwartung ** 2
+            self.assertAlmostEqual(p[i], norm.cdf((lokal_i[i] - erwartung) / np.sqrt(varianz)))
+
+    def test_p_permutation(self):
+        """Die sortierte Referenzverteilung mit binärer Suche zählt dieselben Permutationen wie ein Vergleich
+        mit jeder einzelnen Permutation."""
+        gewichte, nachbarn, werte = beispiel(np.random.default_rng(3))
+        lokal_i, z, lag, anzahl = lokales_moran(gewichte, werte)
+        p = p_werte_permutation(z, lag, anzahl, permutationen=199, seed=5)
+
+        # Dieselben Ziehungen wie in p_werte_permutation
+        werte_mit_wert = z[~np.isnan(z)]
+        k_max = int(anzahl[~np.isnan(lag)].max())
+        rng = np.random.default_rng(5)
+        gezogen = np.stack([werte_mit_wert[rng.choice(len(werte_mit_wert), k_max, replace=False)] for _ in range(199)])
+        for i in np.flatnonzero(~np.isnan(lag)):
+            lag_permutiert = gezogen[:, :anzahl[i]].mean(axis=1)
+            treffer = np.count_nonzero(z[i] * lag_permutiert <= z[i] * lag[i] + 1e-12)
+            self.assertAlmostEqual(p[i], (treffer + 1) / 200)
+        self.assertTrue(np.all(np.isnan(p[np.isnan(lag)])))
+
+    def test_ausreisser(self):
+        """Der hohe Wert in niedriger Umgebung ist Hoch-Niedrig-Ausreißer, aber kein Niedrig-Hoch-Ausreißer."""
+        gewichte, _, werte = beispiel(np.random.default_rng(4))
+        lokal_i, z, lag, anzahl = lokales_moran(gewichte, werte)
+        p = p_werte_analytisch(lokal_i, z, anzahl)
+        self.assertTrue(moran_ausreisser(lokal_i, z, lag, p, 0.05, 0)[0])
+        self.assertTrue(moran_ausreisser(lokal_i, z, lag, p, 0.05, 1)[0])
+        self.assertFalse(moran_ausreisser(lokal_i, z, lag, p, 0.05, 2)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# coding=utf-8
+"""Tests für den Nachbarschaftsindex des lokalen Filters gegen eine Suche über alle Punktpaare.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ofe_filter.ofe_nachbarschaft import MAX_NACHBARN, MIN_NACHBARN, NachbarIndex
+
+
+def beispiel(rng, anzahl=1500):
+    """Punkte mit ungleicher Dichte, einem Punkt ohne Koordinaten und Werten mit NULL (NaN)."""
+    x = np.concatenate([rng.uniform(0, 100, anzahl - 300), rng.uniform(40, 50, 300)])
+    y = np.concatenate([rng.uniform(0, 100, anzahl - 300), rng.uniform(40, 50, 300)])
+    x[5] = np.nan
+    werte = rng.normal(size=anzahl)
+    werte[rng.random(anzahl) < 0.1] = np.nan
+    return x, y, werte
+
+
+def nachbarn_naiv(x, y, k=None, radius=None):
+    """Nachbarn jedes Punktes (ohne den Punkt selbst) aus den Abständen zu allen Punkten."""
+    gueltig = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    nachbarn = {}
+    for i in gueltig:
+        abstand = np.hypot(x[gueltig] - x[i], y[gueltig] - y[i])
+        abstand[gueltig == i] = np.inf
+        if k is not None:
+            nachbarn[i] = gueltig[np.argsort(abstand, kind='stable')[:k]]
+        else:
+            nachbarn[i] = gueltig[abstand <= radius]
+    return nachbarn
+
+
+def median_mad_naiv(x, y, werte, k=None, radius=None):
+    median = np.full(len(werte), np.nan)
+    mad = np.full(len(werte), np.nan)
+    for i, nachbarn in nachbarn_naiv(x, y, k, radius).items():
+        nachbar_werte = werte[nachbarn]
+        nachbar_werte = nachbar_werte[~np.isnan(nachbar_werte)]
+        if len(nachbar_werte) >= MIN_NACHBARN:
+            median[i] = np.median(nachbar_werte)
+            mad[i] = np.median(np.abs(nachbar_werte - median[i]))
+    return median, mad
+
+
+class NachbarIndexTest(unittest.TestCase):
+    """Median, MAD und Gewichte entsprechen der naiven Suche, unabhängig von der Blockbildung."""
+
+    def test_median_mad(self):
+        """median_mad entspricht der naiven Nachbarschaft für k Nachbarn und Radius, auch in kleinen Blöcken."""
+        x, y, werte = beispiel(np.random.default_rng(1))
+        for k, radius in ((8, None), (1, None), (None, 2.5), (None, 6.0)):
+            referenz = median_mad_naiv(x, y, werte, k, radius)
+            for paare_je_block in (1 << 22, 300):
+                with self.subTest(k=k, radius=radius, paare_je_block=paare_je_block):
+                    index = NachbarIndex(x, y, paare_je_block=paare_je_block)
+                    median, mad = index.median_mad(werte, k, radius)
+                    np.testing.assert_allclose(median, referenz[0], equal_nan=True)
+                    np.testing.assert_allclose(mad, referenz[1], equal_nan=True)
+
+    def test_gewichte(self):
+        """Die Gewichtsmatrix enthält genau die naiven Nachbarpaare."""
+        x, y, _ = beispiel(np.random.default_rng(2))
+        for k, radius in ((6, None), (None, 4.0)):
+            with self.subTest(k=k, radius=radius):
+                gewichte = NachbarIndex(x, y, paare_je_block=500).gewichte(k, radius).tocsr()
+                for i, nachbarn in nachbarn_naiv(x, y, k, radius).items():
+                    zeile = gewichte.indices[gewichte.indptr[i]:gewichte.indptr[i + 1]]
+                    np.testing.assert_array_equal(np.sort(zeile), np.sort(nachbarn))
+                self.assertEqual(gewichte.getrow(5).nnz, 0)
+
+    def test_bloecke_begrenzt(self):
+        """Jeder Block umfasst höchstens paare_je_block Paare zuzüglich der Nachbarn eines Punktes; alle Punkte
+        kommen genau einmal vor."""
+        x, y, _ = beispiel(np.random.default_rng(3))
+        index = NachbarIndex(x, y, paare_je_block=1000)
+        anzahl = index.anzahl_nachbarn(radius=5.0)
+        bloecke = index.bloecke(radius=5.0)
+        self.assertGreater(len(bloecke), 1)
+        for block in bloecke:
+            self.assertLessEqual(np.maximum(anzahl[block], 1).sum(), 1000 + anzahl.max())
+        np.testing.assert_array_equal(np.sort(np.concatenate(bloecke)), np.arange(len(index.gueltig)))
+
+    def test_zu_grosse_nachbarschaft(self):
+        """Mehr als MAX_NACHBARN Nachbarn je Punkt werden gezählt und abgelehnt statt abgefragt."""
+        x, y, werte = beispiel(np.random.default_rng(4))
+        index = NachbarIndex(x, y)
+        self.assertGreater(index.max_nachbarn(radius=1000.0), MAX_NACHBARN)
+        with self.assertRaises(ValueError):
+            index.median_mad(werte, radius=1000.0)
+        with self.assertRaises(ValueError):
+            index.gewichte(radius=1000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
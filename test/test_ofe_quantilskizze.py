@@ -0,0 +1,78 @@
+# coding=utf-8
+"""Tests für die KLL-Quantil-Skizze: Rangfehler gegen exakte Quantile.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ofe_filter.ofe_quantilskizze import QuantilSkizze
+
+
+ANTEILE = np.linspace(0, 1, 201)
+
+
+def rangfehler(werte, ergebnis, anteile):
+    """Größter normierter Rangfehler: Abstand des Anteils zum Rangintervall des gelieferten Wertes."""
+    sortiert = np.sort(werte)
+    unten = np.searchsorted(sortiert, ergebnis, side='left') / len(werte)
+    oben = np.searchsorted(sortiert, ergebnis, side='right') / len(werte)
+    return np.max(np.clip(np.maximum(unten - anteile, anteile - oben), 0, None))
+
+
+class QuantilSkizzeTest(unittest.TestCase):
+    """Die Quantile der Skizze halten den Rangfehler fehler() ein, Minimum und Maximum sind exakt."""
+
+    def test_rangfehler_blockweise(self):
+        """Blockweise hinzugefügte Werte verschiedener Verteilungen bleiben innerhalb von fehler()."""
+        for seed in range(5):
+            rng = np.random.default_rng(seed)
+            for werte in (rng.lognormal(0, 1, 200000), rng.integers(0, 50, 200000).astype(float)):
+                skizze = QuantilSkizze(200, seed=seed)
+                for block in np.array_split(werte, 37):
+                    skizze.hinzufuegen(block)
+                with self.subTest(seed=seed):
+                    self.assertLessEqual(rangfehler(werte, skizze.quantile(ANTEILE), ANTEILE), skizze.fehler())
+                    self.assertEqual(skizze.anzahl, len(werte))
+
+    def test_rangfehler_zusammengefuehrt(self):
+        """Zusammengeführte Skizzen getrennter Blöcke halten die Schranke für alle Werte zusammen ein."""
+        rng = np.random.default_rng(10)
+        werte = rng.normal(100, 15, 300000)
+        skizze = QuantilSkizze(200, seed=1)
+        for i, block in enumerate(np.array_split(werte, 8)):
+            teil = QuantilSkizze(200, seed=i + 2)
+            teil.hinzufuegen(block)
+            skizze.zusammenfuehren(teil)
+        self.assertEqual(skizze.anzahl, len(werte))
+        self.assertLessEqual(rangfehler(werte, skizze.quantile(ANTEILE), ANTEILE), skizze.fehler())
+
+    def test_minimum_maximum_und_null(self):
+        """Die Anteile 0 und 1 liefern das exakte Minimum und Maximum; NaN (NULL) zählt nicht."""
+        rng = np.random.default_rng(11)
+        werte = rng.normal(size=100000)
+        werte[::97] = np.nan
+        skizze = QuantilSkizze.aus_bloecken(np.array_split(werte, 10))
+        self.assertEqual(skizze.anzahl, np.count_nonzero(~np.isnan(werte)))
+        np.testing.assert_array_equal(skizze.quantile([0, 1]), [np.nanmin(werte), np.nanmax(werte)])
+
+    def test_speicher_begrenzt(self):
+        """Der Speicherbedarf bleibt unabhängig von der Anzahl der Werte bei etwa 3 * k Werten."""
+        skizze = QuantilSkizze(200, seed=0)
+        for block in np.array_split(np.random.default_rng(12).random(1000000), 100):
+            skizze.hinzufuegen(block)
+        self.assertLessEqual(skizze.nbytes, 3 * 200 * 8)
+
+    def test_leer(self):
+        """Eine leere Skizze liefert NaN."""
+        self.assertTrue(np.all(np.isnan(QuantilSkizze().quantile([0.01, 0.5]))))
+
+
+if __name__ == "__main__":
+    unittest.main()
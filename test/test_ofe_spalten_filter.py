@@ -0,0 +1,165 @@
+# coding=utf-8
+"""Tests für SD- und robuste Filter auf mehreren Spalten gegen den Filter einzelner Spalten.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import types
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ofe_filter.ofe_ergebniscache import ErgebnisCache
+from ofe_filter.ofe_filter import OFEFilter
+from ofe_filter.ofe_filterauswahl import ROBUSTE_VERFAHREN, FilterAuswahl
+
+SPALTEN = ['ertrag', 'feuchte', 'leer']
+
+
+class Signal(object):
+    """Signal ohne Qt: connect und disconnect genügen den Caches."""
+
+    def connect(self, slot):
+        pass
+
+    def disconnect(self, slot):
+        pass
+
+
+class Feature(object):
+
+    def __init__(self, fid, attribute):
+        self._fid = fid
+        self._attribute = attribute
+
+    def id(self):
+        return self._fid
+
+    def __getitem__(self, index):
+        return self._attribute[index]
+
+
+class Felder(object):
+
+    def indexOf(self, name):
+        return SPALTEN.index(name) if name in SPALTEN else -1
+
+
+class Layer(object):
+    """Punktlayer im Speicher mit den Spalten 'ertrag', 'feuchte' und 'leer' (nur NULL)."""
+
+    def __init__(self, zeilen):
+        self.zeilen = zeilen
+        for name in ('attributeValueChanged', 'featureAdded', 'featureDeleted', 'attributeAdded',
+                     'attributeDeleted', 'dataChanged', 'afterCommitChanges', 'afterRollBack'):
+            setattr(self, name, Signal())
+
+    def id(self):
+        return 'punkte'
+
+    def fields(self):
+        return Felder()
+
+    def featureCount(self):
+        return len(self.zeilen)
+
+    def getFeatures(self, request=None):
+        return (Feature(fid, zeile) for fid, zeile in enumerate(self.zeilen))
+
+
+class Eingabe(object):
+    """Steuerelement des Dialogs mit festem Wert."""
+
+    def __init__(self, wert):
+        self.wert = wert
+
+    def currentText(self):
+        return self.wert
+
+    currentIndex = value = isChecked = currentText
+
+
+def beispielzeilen(rng, anzahl=3000):
+    """Schiefe und normalverteilte Werte mit NULL (None) und Bindungen."""
+    ertrag = np.round(rng.lognormal(3, 1, anzahl), 1)
+    feuchte = rng.normal(20, 4, anzahl)
+    return [(None if a < 0.05 else float(e), None if b < 0.05 else float(f), None)
+            for a, b, e, f in zip(rng.random(anzahl), rng.random(anzahl), ertrag, feuchte)]
+
+
+def beispiel_plugin(zeilen, verfahren=0, seite=0):
+    """Plugin ohne QGIS-Oberfläche mit Dialogwerten für SD (1,5-fach, Rohdaten) und robuste Filter."""
+    plugin = OFEFilter.__new__(OFEFilter)
+    plugin.spalten_cache = None
+    plugin.sd_basen = {}
+    plugin.sd_iteration = {}
+    plugin.ergebnis_cache = ErgebnisCache(64 * 1024 * 1024)
+    plugin.skizze_ab_punkten = 5000000
+    plugin.skizze_k = 200
+    plugin.auswahl_tabelle = pd.DataFrame({spalte: [None] * 10 for spalte in SPALTEN})
+    plugin.dlg = types.SimpleNamespace(
+        columnComboBox2=Eingabe('ertrag'), comboBox_robust=Eingabe(verfahren), comboBox_robust_seite=Eingabe(seite),
+        doubleSpinBox_robust_k=Eingabe(1.5), doubleSpinBox_robust_p_unten=Eingabe(5.0),
+        doubleSpinBox_robust_p_oben=Eingabe(95.0), comboBox_Gruppe=Eingabe(''), trend_einstellung=lambda: None,
+        doubleSpinBox_SD=Eingabe(1.5), comboBox_sd=Eingabe(seite), checkBox_SD=Eingabe(False),
+        checkBox_SD_iterativ=Eingabe(False), spinBox_SD_Runden=Eingabe(0),
+    )
+    layer = Layer(zeilen)
+    plugin.filter_auswahl = FilterAuswahl(plugin.spalten(layer).feature_ids())
+    return plugin, layer
+
+
+class SpaltenFilterTest(unittest.TestCase):
+    """Der Filter über den Block der Spalten ergibt dieselben Regeln wie der Filter jeder einzelnen Spalte."""
+
+    def test_robust_wie_einzelne_spalten(self):
+        """Masken und Anzahlen entsprechen robust_regel_setzen je Spalte; die Regeln stehen im Ergebnis-Cache
+        unter denselben Parametern, sodass der Filter einer einzelnen Spalte danach nichts neu berechnet."""
+        zeilen = beispielzeilen(np.random.default_rng(1))
+        for verfahren in range(len(ROBUSTE_VERFAHREN)):
+            for seite in (0, 1, 2):
+                with self.subTest(verfahren=verfahren, seite=seite):
+                    plugin, layer = beispiel_plugin(zeilen, verfahren, seite)
+                    anzahlen = plugin.filterfunction_robust_spalten(layer, SPALTEN)
+
+                    einzeln, einzeln_layer = beispiel_plugin(zeilen, verfahren, seite)
+                    fids = plugin.spalten(layer).feature_ids()
+                    for spalte, anzahl in zip(SPALTEN, anzahlen):
+                        referenz = einzeln.robust_regel_setzen(einzeln_layer, spalte, verfahren, seite, 1.5, 5.0, 95.0)[2]
+                        self.assertEqual(anzahl, referenz)
+                        self.assertEqual(plugin.auswahl_tabelle.at[3 + verfahren, spalte], referenz)
+                        np.testing.assert_array_equal(
+                            plugin.filter_auswahl.maske_fuer(fids, gruppen=(ROBUSTE_VERFAHREN[verfahren],), spalte=spalte),
+                            einzeln.filter_auswahl.maske_fuer(fids, gruppen=(ROBUSTE_VERFAHREN[verfahren],), spalte=spalte))
+                    self.assertEqual(anzahlen[2], 0)
+
+                    eintraege = len(plugin.ergebnis_cache._eintraege)
+                    plugin.filterfunction_robust(layer)
+                    self.assertEqual(len(plugin.ergebnis_cache._eintraege), eintraege)
+
+    def test_sd_wie_einzelne_spalten(self):
+        """Masken und Anzahlen entsprechen sd_regel_setzen je Spalte; jede Spalte ist eine Regel im Ergebnis-Cache."""
+        zeilen = beispielzeilen(np.random.default_rng(2))
+        for seite in (0, 1, 2):
+            with self.subTest(seite=seite):
+                plugin, layer = beispiel_plugin(zeilen, seite=seite)
+                anzahlen = plugin.filterfunction_sd_spalten(layer, SPALTEN)
+
+                einzeln, einzeln_layer = beispiel_plugin(zeilen, seite=seite)
+                fids = plugin.spalten(layer).feature_ids()
+                for spalte, anzahl in zip(SPALTEN, anzahlen):
+                    self.assertEqual(anzahl, einzeln.sd_regel_setzen(einzeln_layer, spalte, 1.5, seite, False))
+                    np.testing.assert_array_equal(
+                        plugin.filter_auswahl.maske_fuer(fids, gruppen=('Standardabweichung',), spalte=spalte),
+                        einzeln.filter_auswahl.maske_fuer(fids, gruppen=('Standardabweichung',), spalte=spalte))
+                self.assertEqual(
+                    [key[3] for key in plugin.ergebnis_cache._eintraege].count('Standardabweichung'), len(SPALTEN))
+
+
+if __name__ == "__main__":
+    unittest.main()
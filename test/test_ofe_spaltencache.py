@@ -0,0 +1,133 @@
+# coding=utf-8
+"""Tests für den Spalten-Cache: Quantile, Median und MAD gegen NumPy.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from .utilities import install_qgis_core_stub
+install_qgis_core_stub()
+
+from ofe_filter.ofe_spaltencache import SpaltenCache, _quantile  # noqa: E402
+
+
+class Signal(object):
+    """Signal ohne Qt: connect und disconnect genügen dem Cache."""
+
+    def connect(self, slot):
+        pass
+
+    def disconnect(self, slot):
+        pass
+
+
+class Feature(object):
+
+    def __init__(self, fid, attribute):
+        self._fid = fid
+        self._attribute = attribute
+
+    def id(self):
+        return self._fid
+
+    def __getitem__(self, index):
+        return self._attribute[index]
+
+
+class Felder(object):
+
+    def __init__(self, namen):
+        self.namen = namen
+
+    def indexOf(self, name):
+        return self.namen.index(name) if name in self.namen else -1
+
+
+class Layer(object):
+    """Punktlayer im Speicher mit den Methoden, die der Spalten-Cache liest."""
+
+    def __init__(self, spalten):
+        self.namen = list(spalten)
+        self.zeilen = list(zip(*spalten.values()))
+        self.attributeValueChanged = Signal()
+        self.featureAdded = Signal()
+        self.featureDeleted = Signal()
+        self.attributeAdded = Signal()
+        self.attributeDeleted = Signal()
+        self.dataChanged = Signal()
+
+    def id(self):
+        return 'punkte'
+
+    def fields(self):
+        return Felder(self.namen)
+
+    def featureCount(self):
+        return len(self.zeilen)
+
+    def getFeatures(self, request=None):
+        return (Feature(fid, zeile) for fid, zeile in enumerate(self.zeilen))
+
+
+def beispielwerte(rng, anzahl=5001):
+    """Schiefe Werte mit Bindungen und NULL (None)."""
+    werte = np.round(rng.lognormal(3, 1, anzahl), 1)
+    return [None if rng.random() < 0.05 else float(wert) for wert in werte]
+
+
+class QuantileTest(unittest.TestCase):
+    """Die robusten Kenngrößen (MAD, IQR, Perzentile) entsprechen np.quantile bzw. np.median."""
+
+    def test_quantile_wie_numpy(self):
+        """_quantile mit linearer Auswahl und auf sortierten Werten entspricht np.quantile."""
+        rng = np.random.default_rng(1)
+        anteile = [0, 0.01, 0.25, 0.5, 0.75, 0.99, 1]
+        for anzahl in (1, 2, 3, 10, 1001):
+            werte = rng.normal(size=anzahl)
+            with self.subTest(anzahl=anzahl):
+                np.testing.assert_allclose(_quantile(werte.copy(), anteile), np.quantile(werte, anteile))
+                np.testing.assert_allclose(_quantile(np.sort(werte), anteile, sortiert=True), np.quantile(werte, anteile))
+        self.assertTrue(np.all(np.isnan(_quantile(np.empty(0), anteile))))
+
+    def test_median_mad(self):
+        """median_mad ohne NULL-Werte entspricht Median und Median der absoluten Abweichungen nach NumPy."""
+        roh = beispielwerte(np.random.default_rng(2))
+        cache = SpaltenCache(Layer({'ertrag': roh}))
+        werte = np.array([wert for wert in roh if wert is not None])
+        median, mad = cache.median_mad('ertrag')
+        self.assertAlmostEqual(median, np.median(werte))
+        self.assertAlmostEqual(mad, np.median(np.abs(werte - np.median(werte))))
+
+    def test_quantile_mit_und_ohne_sortierung(self):
+        """Quantile sind gleich, ob der sortierte Index schon aufgebaut ist oder nicht."""
+        roh = beispielwerte(np.random.default_rng(3))
+        cache = SpaltenCache(Layer({'ertrag': roh}))
+        werte = np.array([wert for wert in roh if wert is not None])
+        anteile = [0.01, 0.25, 0.75, 0.99]
+        np.testing.assert_allclose(cache.quantile('ertrag', anteile), np.quantile(werte, anteile))
+        cache.sortierung('ertrag')
+        np.testing.assert_allclose(cache.quantile('ertrag', anteile), np.quantile(werte, anteile))
+
+    def test_positionen_unter_ueber(self):
+        """Die Ausschnitte des sortierten Index entsprechen den Vergleichen auf allen Werten."""
+        roh = beispielwerte(np.random.default_rng(4))
+        cache = SpaltenCache(Layer({'ertrag': roh}))
+        werte, _ = cache.spalte('ertrag')
+        grenze = np.nanmedian(werte)
+        for gleich in (False, True):
+            with self.subTest(gleich=gleich):
+                unter = np.flatnonzero(werte <= grenze if gleich else werte < grenze)
+                ueber = np.flatnonzero(werte >= grenze if gleich else werte > grenze)
+                np.testing.assert_array_equal(np.sort(cache.positionen_unter('ertrag', grenze, gleich)), unter)
+                np.testing.assert_array_equal(np.sort(cache.positionen_ueber('ertrag', grenze, gleich)), ueber)
+
+
+if __name__ == "__main__":
+    unittest.main()
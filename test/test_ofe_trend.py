@@ -0,0 +1,122 @@
+# coding=utf-8
+"""Tests für die Trendflächen gegen direkte Kleinste-Quadrate- und Zellberechnungen.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ofe_filter.ofe_trend import polynom_trend, raster_trend, residuen
+
+
+def beispiel(rng, anzahl=5000):
+    """Punkte in UTM-Größenordnung mit quadratischem Trend, Rauschen, NULL-Werten und fehlenden Koordinaten."""
+    x = 500000 + rng.uniform(0, 400, anzahl)
+    y = 6000000 + rng.uniform(0, 300, anzahl)
+    u, v = (x - 500000) / 100, (y - 6000000) / 100
+    werte = 8 + 0.5 * u - 0.3 * v + 0.1 * u * v - 0.05 * u ** 2 + rng.normal(0, 0.2, anzahl)
+    werte[rng.random(anzahl) < 0.05] = np.nan
+    x[3] = np.nan
+    return x, y, werte
+
+
+def polynom_naiv(x, y, werte, grad):
+    """Kleinste Quadrate mit np.linalg.lstsq über die volle Designmatrix (Koordinaten nur verschoben)."""
+    trend = np.full(len(werte), np.nan)
+    mit_koordinaten = np.isfinite(x) & np.isfinite(y)
+    gueltig = mit_koordinaten & ~np.isnan(werte)
+    u, v = x - np.nanmean(x), y - np.nanmean(y)
+    terme = [(i, j) for i in range(grad + 1) for j in range(grad + 1 - i)]
+    a = np.column_stack([u ** i * v ** j for i, j in terme])
+    koeffizienten = np.linalg.lstsq(a[gueltig], werte[gueltig], rcond=None)[0]
+    trend[mit_koordinaten] = a[mit_koordinaten] @ koeffizienten
+    return trend
+
+
+def raster_naiv(x, y, werte, zellgroesse):
+    """Zellmittel, über 3 x 3 Zellen nach Anzahl gewichtet, bilinear zwischen Zellmittelpunkten, Punkt für Punkt."""
+    mit_koordinaten = np.isfinite(x) & np.isfinite(y)
+    gueltig = mit_koordinaten & ~np.isnan(werte)
+    x0, y0 = x[mit_koordinaten].min(), y[mit_koordinaten].min()
+    nx = int((x[mit_koordinaten].max() - x0) // zellgroesse) + 1
+    ny = int((y[mit_koordinaten].max() - y0) // zellgroesse) + 1
+    summe = np.zeros((ny, nx))
+    anzahl = np.zeros((ny, nx))
+    for i in np.flatnonzero(gueltig):
+        zeile, spalte = int((y[i] - y0) // zellgroesse), int((x[i] - x0) // zellgroesse)
+        summe[zeile, spalte] += werte[i]
+        anzahl[zeile, spalte] += 1
+    flaeche = np.full((ny, nx), np.nan)
+    for zeile in range(ny):
+        for spalte in range(nx):
+            umgebung = (slice(max(zeile - 1, 0), zeile + 2), slice(max(spalte - 1, 0), spalte + 2))
+            if anzahl[umgebung].sum() > 0:
+                flaeche[zeile, spalte] = summe[umgebung].sum() / anzahl[umgebung].sum()
+
+    trend = np.full(len(werte), np.nan)
+    for i in np.flatnonzero(mit_koordinaten):
+        u, v = (x[i] - x0) / zellgroesse - 0.5, (y[i] - y0) / zellgroesse - 0.5
+        i0, j0 = int(np.floor(u)), int(np.floor(v))
+        summe_gewichtet = summe_gewichte = 0.0
+        for di, gu in ((0, 1 - (u - i0)), (1, u - i0)):
+            for dj, gv in ((0, 1 - (v - j0)), (1, v - j0)):
+                ecke = flaeche[min(max(j0 + dj, 0), ny - 1), min(max(i0 + di, 0), nx - 1)]
+                if not np.isnan(ecke):
+                    summe_gewichtet += gu * gv * ecke
+                    summe_gewichte += gu * gv
+        if summe_gewichte > 0:
+            trend[i] = summe_gewichtet / summe_gewichte
+    return trend
+
+
+class TrendTest(unittest.TestCase):
+    """Die blockweisen Trendflächen entsprechen den direkten Berechnungen."""
+
+    def test_polynom_wie_lstsq(self):
+        """polynom_trend entspricht lstsq über die volle Designmatrix, unabhängig von der Blockgröße."""
+        x, y, werte = beispiel(np.random.default_rng(1))
+        for grad in (1, 2, 3):
+            referenz = polynom_naiv(x, y, werte, grad)
+            for blockgroesse in (262144, 333):
+                with self.subTest(grad=grad, blockgroesse=blockgroesse):
+                    np.testing.assert_allclose(polynom_trend(x, y, werte, grad, blockgroesse), referenz,
+                                               rtol=0, atol=1e-8, equal_nan=True)
+
+    def test_polynom_exakt(self):
+        """Ein Polynom vom angepassten Grad wird ohne Rauschen exakt wiedergegeben."""
+        rng = np.random.default_rng(2)
+        x = 500000 + rng.uniform(0, 400, 1000)
+        y = 6000000 + rng.uniform(0, 300, 1000)
+        werte = 3 + 0.01 * (x - 500000) - 0.02 * (y - 6000000) + 1e-4 * (x - 500000) * (y - 6000000)
+        np.testing.assert_allclose(polynom_trend(x, y, werte, 2), werte, rtol=0, atol=1e-8)
+
+    def test_zu_wenige_punkte(self):
+        """Mit weniger Punkten als Termen ist der Trend NaN."""
+        x = np.array([0.0, 1.0, 2.0])
+        self.assertTrue(np.all(np.isnan(polynom_trend(x, x, x, 2))))
+
+    def test_raster_wie_zellen(self):
+        """raster_trend entspricht Zellmitteln, Glättung und bilinearer Interpolation Punkt für Punkt."""
+        x, y, werte = beispiel(np.random.default_rng(3), 2000)
+        werte[(x - 500000 > 150) & (x - 500000 < 260)] = np.nan
+        for zellgroesse in (25.0, 60.0, 1000.0):
+            with self.subTest(zellgroesse=zellgroesse):
+                np.testing.assert_allclose(raster_trend(x, y, werte, zellgroesse), raster_naiv(x, y, werte, zellgroesse),
+                                           rtol=0, atol=1e-10, equal_nan=True)
+
+    def test_residuen(self):
+        """residuen zieht den Trend des gewählten Verfahrens ab; NULL bleibt NaN."""
+        x, y, werte = beispiel(np.random.default_rng(4))
+        np.testing.assert_allclose(residuen(x, y, werte, 'Polynom', 2), werte - polynom_trend(x, y, werte, 2), equal_nan=True)
+        np.testing.assert_allclose(residuen(x, y, werte, 'Raster', 50.0), werte - raster_trend(x, y, werte, 50.0), equal_nan=True)
+        self.assertTrue(np.all(np.isnan(residuen(x, y, werte, 'Polynom', 2)[np.isnan(werte)])))
+
+
+if __name__ == "__main__":
+    unittest.main()
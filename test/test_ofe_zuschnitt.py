@@ -0,0 +1,158 @@
+# coding=utf-8
+"""Tests für den Zuschnitt: Raster-Beschleunigung und Randabstand gegen exakte Referenzen.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+import shapely
+
+from .utilities import install_qgis_core_stub
+install_qgis_core_stub()
+
+from ofe_filter.ofe_zuschnitt import MaskenRaster, PunktKoordinaten, SegmentIndex, ZuschnittMaske, linien_segmente  # noqa: E402
+
+
+def maske_aus_polygonen(polygone):
+    """ZuschnittMaske aus Shapely-Polygonen ohne Masken-Layer (wie ZuschnittMaske.kopie)."""
+    maske = ZuschnittMaske.__new__(ZuschnittMaske)
+    maske.layer_id = maske.schluessel = 'test'
+    maske.polygone = np.array(polygone, dtype=object)
+    shapely.prepare(maske.polygone)
+    maske.bounds = shapely.bounds(maske.polygone)
+    maske._raster = {}
+    maske._segment_index = None
+    return maske
+
+
+def punkte_aus_koordinaten(x, y):
+    """PunktKoordinaten aus Arrays ohne Punktlayer."""
+    punkte = PunktKoordinaten.__new__(PunktKoordinaten)
+    punkte.fids = np.arange(len(x), dtype=np.int64)
+    punkte.x = np.asarray(x, dtype=np.float64)
+    punkte.y = np.asarray(y, dtype=np.float64)
+    return punkte.teilmenge(np.ones(len(x), dtype=bool))
+
+
+def beispielmaske():
+    """Zwei Polygone, eines mit Loch und schrägen Kanten, eines mit spitzem Winkel."""
+    schlag = shapely.Polygon(
+        [(0, 0), (100, 10), (110, 90), (20, 100), (0, 0)],
+        holes=[[(40, 40), (60, 40), (50, 60), (40, 40)]],
+    )
+    keil = shapely.Polygon([(120, 0), (200, 5), (121, 9), (120, 0)])
+    return maske_aus_polygonen([schlag, keil])
+
+
+def beispielpunkte(rng, anzahl=20000):
+    """Zufällige Punkte, Punkte genau auf Ecken und Rasterlinien sowie NaN-Koordinaten."""
+    x = rng.uniform(-10, 210, anzahl)
+    y = rng.uniform(-10, 110, anzahl)
+    ecken = shapely.get_coordinates(beispielmaske().polygone)
+    gitter = np.arange(-10, 210, 0.5)
+    x = np.concatenate([x, ecken[:, 0], gitter, [np.nan, 5.0]])
+    y = np.concatenate([y, ecken[:, 1], np.full(len(gitter), 50.0), [5.0, np.nan]])
+    return punkte_aus_koordinaten(x, y)
+
+
+class MaskenRasterTest(unittest.TestCase):
+    """Das Raster darf nur beschleunigen: das Ergebnis ist identisch mit dem exakten Test."""
+
+    def test_identisch_mit_exaktem_test(self):
+        """enthaelt() mit Raster entspricht für alle Zellgrößen dem exakten Punkt-in-Polygon-Test."""
+        punkte = beispielpunkte(np.random.default_rng(1))
+        maske = beispielmaske()
+        exakt = maske.enthaelt(punkte)
+        for zellgroesse in (0.25, 0.5, 1.0, 3.0, 7.5, 40.0):
+            with self.subTest(zellgroesse=zellgroesse):
+                self.assertIsNotNone(maske.raster(zellgroesse))
+                np.testing.assert_array_equal(maske.enthaelt(punkte, zellgroesse), exakt)
+
+    def test_exakt_gegen_shapely(self):
+        """Der exakte Test entspricht shapely.contains_xy über die Vereinigung der Polygone."""
+        punkte = beispielpunkte(np.random.default_rng(2))
+        maske = beispielmaske()
+        referenz = np.zeros(len(punkte), dtype=bool)
+        for polygon in maske.polygone:
+            referenz |= shapely.contains_xy(polygon, punkte.x, punkte.y)
+        np.testing.assert_array_equal(maske.enthaelt(punkte), referenz)
+
+    def test_innen_und_aussen_zellen_sicher(self):
+        """Zellen ohne Rand liegen vollständig innen oder außen: alle Punkte einer Zelle haben dieselbe Antwort."""
+        punkte = beispielpunkte(np.random.default_rng(3))
+        maske = beispielmaske()
+        exakt = maske.enthaelt(punkte)
+        klassen = maske.raster(2.0).klassifiziere(punkte.x, punkte.y)
+        self.assertTrue(np.all(exakt[klassen == MaskenRaster.INNEN]))
+        self.assertFalse(np.any(exakt[klassen == MaskenRaster.AUSSEN]))
+
+    def test_zu_grosses_raster(self):
+        """Über MAX_ZELLEN wird kein Raster erstellt und exakt gerechnet."""
+        punkte = beispielpunkte(np.random.default_rng(4), 1000)
+        maske = beispielmaske()
+        self.assertIsNone(maske.raster(0.001))
+        np.testing.assert_array_equal(maske.enthaelt(punkte, 0.001), maske.enthaelt(punkte))
+
+
+
+def abstand_naiv(x, y, geometrie):
+    """Abstand jedes Punktes zum Rand bzw. zur Linie nach Shapely (NaN ohne Koordinaten)."""
+    abstand = np.full(len(x), np.nan)
+    gueltig = np.isfinite(x) & np.isfinite(y)
+    abstand[gueltig] = shapely.distance(geometrie, shapely.points(x[gueltig], y[gueltig]))
+    return abstand
+
+
+class RandabstandTest(unittest.TestCase):
+    """Der Segmentindex misst exakt; das Vorzeichen des Randabstands folgt dem Punkt-in-Polygon-Test."""
+
+    def test_abstand_exakt(self):
+        """SegmentIndex.abstand entspricht dem Abstand zum Polygonrand nach Shapely."""
+        punkte = beispielpunkte(np.random.default_rng(5))
+        maske = beispielmaske()
+        rand = shapely.union_all(shapely.boundary(maske.polygone))
+        for punkte_je_zelle in (1, 16, 200):
+            with self.subTest(punkte_je_zelle=punkte_je_zelle):
+                abstand = maske.segment_index().abstand(punkte.x, punkte.y, punkte_je_zelle, blockgroesse=5000)
+                np.testing.assert_allclose(abstand, abstand_naiv(punkte.x, punkte.y, rand), rtol=0, atol=1e-9)
+
+    def test_vorzeichen(self):
+        """randabstand ist innen positiv und außen negativ, der Betrag der exakte Randabstand."""
+        punkte = beispielpunkte(np.random.default_rng(6))
+        maske = beispielmaske()
+        rand = shapely.union_all(shapely.boundary(maske.polygone))
+        abstand = maske.randabstand(punkte)
+        innen = maske.enthaelt(punkte)
+        gueltig = np.isfinite(punkte.x) & np.isfinite(punkte.y)
+        np.testing.assert_allclose(np.abs(abstand), abstand_naiv(punkte.x, punkte.y, rand), rtol=0, atol=1e-9)
+        self.assertTrue(np.all(abstand[innen] >= 0))
+        self.assertTrue(np.all(abstand[gueltig & ~innen] <= 0))
+        self.assertTrue(np.all(np.isnan(abstand[~gueltig])))
+
+    def test_max_abstand(self):
+        """Mit max_abstand sind alle näheren Punkte exakt; übersprungene Punkte (inf) liegen wirklich weiter weg."""
+        rng = np.random.default_rng(7)
+        linien = shapely.MultiLineString([[(0, 0), (500, 3)], [(0, 20), (250, 20), (250, 400)]])
+        index = SegmentIndex(*linien_segmente(shapely.get_parts(linien)))
+        x = rng.uniform(-50, 550, 30000)
+        y = rng.uniform(-50, 450, 30000)
+        referenz = abstand_naiv(x, y, linien)
+        abstand = index.abstand(x, y, max_abstand=6.0)
+        nah = referenz < 6.0
+        np.testing.assert_allclose(abstand[nah], referenz[nah], rtol=0, atol=1e-9)
+        self.assertTrue(np.all(abstand[~nah] >= 6.0 - 1e-9))
+
+    def test_ohne_segmente(self):
+        """Ohne Segmente sind alle Abstände NaN."""
+        index = SegmentIndex(np.empty((0, 2)), np.empty((0, 2)))
+        self.assertTrue(np.all(np.isnan(index.abstand(np.array([1.0, 2.0]), np.array([3.0, 4.0])))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,3 +59,44 @@ def get_qgis_app():
         IFACE = QgisInterface(CANVAS)
 
     return QGIS_APP, CANVAS, IFACE, PARENT
+
+
+def install_qgis_core_stub():
+    """Register a minimal qgis.core module if QGIS is not installed.
+
+    Only the names the NumPy based plugin modules (ofe_zuschnitt,
+    ofe_spaltencache) need at import time are provided, so their pure
+    array code can be tested without a QGIS installation. With QGIS
+    installed this does nothing.
+    """
+    try:
+        import qgis.core  # pylint: disable=W0611  # NOQA
+        return
+    except ImportError:
+        pass
+
+    import types
+
+    class QgsFeatureRequest(object):
+        """Chainable stand-in for the request flags used by the plugin."""
+
+        NoGeometry = 1
+
+        def setFlags(self, *args):
+            return self
+
+        def setNoAttributes(self):
+            return self
+
+        def setSubsetOfAttributes(self, *args):
+            return self
+
+    core = types.ModuleType('qgis.core')
+    core.QgsFeatureRequest = QgsFeatureRequest
+    for name in ('QgsProject', 'QgsCoordinateTransform', 'QgsGeometry',
+                 'QgsTask', 'QgsVectorFileWriter', 'QgsWkbTypes'):
+        setattr(core, name, type(name, (object,), {}))
+
+    qgis = sys.modules.setdefault('qgis', types.ModuleType('qgis'))
+    qgis.core = core
+    sys.modules['qgis.core'] = core